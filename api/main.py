@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
@@ -39,6 +39,8 @@ from api.v1.routers.admin_routes import (
     transaction_templates_route,
     account_configurations_route,
     branches_route,
+    jobs_route,
+    profiles_route,
 )
 from api.v1.routers.people_routes import departments_route, employees_route
 from api.v1.routers.account_routes import (
@@ -70,7 +72,7 @@ from api.v1.routers.account_routes import (
     aging_route,
     tds_route,
 )
-from core.database.connection import db_manager
+from core.database.connection import db_manager, pool_liveness_checker
 import types
 from fastapi import APIRouter
 from core.shared.utils.logger import logger
@@ -133,6 +135,7 @@ testpanels_route = _safe_import_health("testpanels_route")
 testresults_route = _safe_import_health("testresults_route")
 tests_route = _safe_import_health("tests_route")
 testinvoices_route = _safe_import_health("testinvoices_route")
+lab_worklist_route = _safe_import_health("lab_worklist_route")
 
 try:
     # import public routes
@@ -140,6 +143,11 @@ try:
 except Exception:
     test_results_public_route = types.SimpleNamespace(router=APIRouter())
 
+try:
+    from api.v1.routers.public_routes import payment_webhooks_route
+except Exception:
+    payment_webhooks_route = types.SimpleNamespace(router=APIRouter())
+
 def _load_optional(name, module_path="api.v1.routers"):
     try:
         module = __import__(module_path, fromlist=[name])
@@ -155,13 +163,33 @@ account_extensions = _load_optional('account_extensions')
 inventory_extensions = _load_optional('inventory_extensions')
 invoice = _load_optional('invoice')
 from api.v2.routers.admin_routes import user_route as admin_v2
-from api.middleware.auth_middleware import get_current_user
+from api.middleware.auth_middleware import get_current_user, require_admin
 from api.version_manager import version_manager
+from modules.account_module.services.audit_writer import audit_writer
+from modules.health_module.services.lab_worklist_service import lab_worklist_listener
+from core.shared.services.email_outbox import email_delivery_worker
+from core.shared.utils import metrics
+from core.shared.utils.query_detector import QueryDetectorMiddleware, query_detector
+from api.middleware.profiling_middleware import ProfilingMiddleware
+from modules.account_module.services.payment_webhook_service import payment_webhook_processor
+from modules.admin_module.services.job_service import JobService
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     db_manager._initialize_database()
+    db_manager.warm_pool(int(os.getenv('DB_POOL_WARM', 0)))
+    pool_liveness_checker.start()
+    audit_writer.start()
+    lab_worklist_listener.start()
+    email_delivery_worker.start()
+    payment_webhook_processor.start()
+    JobService.fail_orphaned()
     yield
+    payment_webhook_processor.stop()
+    email_delivery_worker.stop()
+    lab_worklist_listener.stop()
+    audit_writer.stop()
+    pool_liveness_checker.stop()
 
 app = FastAPI(
     title="FIDEAS API",
@@ -195,6 +223,20 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Request latency, in-flight and per-request SQL metrics, exposed at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# N+1 / slow-query reports for development and staging (QUERY_DETECTOR=true)
+if query_detector.enabled:
+    app.add_middleware(QueryDetectorMiddleware)
+
+    @app.get("/debug/query-reports", include_in_schema=False, dependencies=[Depends(require_admin)])
+    async def query_reports(limit: int = 50):
+        return {"reports": query_detector.recent(limit)}
+
+# Admin-only sampling profile of a single request ("X-Profile: 1" or ?__profile=1)
+app.add_middleware(ProfilingMiddleware)
+
 #region v1 -all routes
 
 #region auth routes
@@ -220,6 +262,8 @@ app.include_router(financial_years_route.router, prefix="/api/v1/admin", tags=["
 app.include_router(agencies_route.router, prefix="/api/v1/admin", tags=["admin-agencies v1"], dependencies=[Depends(get_current_user)])
 app.include_router(agency_commission_route.router, prefix="/api/v1/admin", tags=["admin-agency-commissions v1"], dependencies=[Depends(get_current_user)])
 app.include_router(branches_route.router, prefix="/api/v1/admin", tags=["admin-branches v1"], dependencies=[Depends(get_current_user)])
+app.include_router(jobs_route.router, prefix="/api/v1/admin", tags=["admin-jobs v1"], dependencies=[Depends(get_current_user)])
+app.include_router(profiles_route.router, prefix="/api/v1/admin", tags=["admin-profiles v1"], dependencies=[Depends(get_current_user)])
 
 #endregion admin routes
 
@@ -298,6 +342,7 @@ app.include_router(testcategories_route.router, prefix="/api/v1/health", tags=["
 app.include_router(testorders_route.router, prefix="/api/v1/health", tags=["health-test-orders v1"], dependencies=[Depends(get_current_user)])
 app.include_router(testpanels_route.router, prefix="/api/v1/health", tags=["health-test-panels v1"], dependencies=[Depends(get_current_user)])
 app.include_router(testresults_route.router, prefix="/api/v1/health", tags=["health-test-results v1"], dependencies=[Depends(get_current_user)])
+app.include_router(lab_worklist_route.router, prefix="/api/v1/health", tags=["health-lab-worklist v1"], dependencies=[Depends(get_current_user)])
 app.include_router(tests_route.router, prefix="/api/v1/health", tags=["health-tests v1"], dependencies=[Depends(get_current_user)])
 app.include_router(testinvoices_route.router, prefix="/api/v1/health", tags=["health-test-invoices v1"], dependencies=[Depends(get_current_user)])
 #endregion health routes
@@ -315,6 +360,7 @@ app.include_router(fixed_assets.router, prefix="/api/v1/asset", tags=["asset-fix
 
 #region public routes
 app.include_router(test_results_public_route.router, prefix="/api/public/v1/health", tags=["public"])
+app.include_router(payment_webhooks_route.router, prefix="/api/public/v1/payments", tags=["public"])
 #endregion public routes
 
 #region people routes
@@ -356,6 +402,15 @@ async def root():
 async def health_check():
     return {"status": "healthy", "version": version_manager.default_version}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(authorization: str = Header(None)):
+    # Set METRICS_TOKEN to require "Authorization: Bearer <token>" from the scraper
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 import os
@@ -13,6 +13,7 @@ security = HTTPBearer()
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ADMIN_ROLE = "Admin"
 
 class AuthMiddleware:
     def __init__(self):
@@ -56,7 +57,7 @@ class AuthMiddleware:
 
 auth_middleware = AuthMiddleware()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = auth_middleware.verify_token(credentials.credentials)
         user_id = int(payload.get("sub"))
@@ -69,6 +70,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             'username': username,
             'tenant_id': tenant_id
         })
+        # Read by the metrics middleware for the tenant tier label
+        request.state.tenant_id = tenant_id
         
         return {
             "user_id": user_id,
@@ -79,4 +82,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Authentication failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+async def require_admin(current_user: dict = Depends(get_current_user),
+                        credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Current user, provided the token carries the Admin role"""
+    payload = auth_middleware.verify_token(credentials.credentials)
+    if ADMIN_ROLE not in (payload.get("roles") or []):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return current_user
@@ -0,0 +1,192 @@
+"""
+On-demand request profiling.
+
+An Admin sends a request with "X-Profile: 1" (or ?__profile=1) and the request
+runs under pyinstrument's sampling profiler. The SQL it issues is recorded as a
+timeline. Both are written to PROFILE_DIR as one speedscope file: the Python
+samples are the first profile and the SQL statements the second, so they line
+up on the same clock in https://www.speedscope.app. A JSON summary is written
+next to it. The response carries X-Profile-Id; the artifacts are served by
+/api/v1/admin/profiles.
+
+The sampler follows the event loop thread. Routes declared with a plain `def`
+run in Starlette's threadpool, so their Python work appears only as time spent
+awaiting the worker thread. Their SQL timeline is still complete, because the
+threadpool runs them in a copy of the request's context.
+
+Requests without the flag only pay for the header check. The engine listeners
+that build the SQL timeline are attached while at least one profile is running
+and removed afterwards.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+from sqlalchemy import event
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from api.middleware.auth_middleware import auth_middleware, ADMIN_ROLE
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'logs/profiles')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', 1)) / 1000
+
+_timeline: ContextVar[Optional[list]] = ContextVar('profile_sql_timeline', default=None)
+
+
+class _SQLTimeline:
+    """Engine listeners shared by all running profiles; attached only while one is active"""
+
+    def __init__(self):
+        self._active = 0
+        self._engine = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        timeline = _timeline.get()
+        if timeline is not None:
+            conn.info.setdefault('profile_sql_start', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        timeline = _timeline.get()
+        starts = conn.info.get('profile_sql_start')
+        if timeline is not None and starts:
+            started = starts.pop()
+            timeline.append((started, time.perf_counter(), statement, cursor.rowcount))
+
+    @staticmethod
+    def _error(context):
+        starts = context.connection.info.get('profile_sql_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def acquire(self):
+        with self._lock:
+            self._active += 1
+            if self._active == 1:
+                self._engine = db_manager._engine
+                event.listen(self._engine, "before_cursor_execute", self._before)
+                event.listen(self._engine, "after_cursor_execute", self._after)
+                event.listen(self._engine, "handle_error", self._error)
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0 and self._engine is not None:
+                event.remove(self._engine, "before_cursor_execute", self._before)
+                event.remove(self._engine, "after_cursor_execute", self._after)
+                event.remove(self._engine, "handle_error", self._error)
+                self._engine = None
+
+
+sql_timeline = _SQLTimeline()
+
+
+def _requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value not in (b"", b"0", b"false")
+    query = scope.get("query_string", b"")
+    return b"__profile=" in query and parse_qs(query.decode()).get("__profile", ["0"])[0] not in ("", "0", "false")
+
+
+def _admin_tenant(scope) -> Optional[int]:
+    """Tenant of the caller when the bearer token belongs to an Admin, else None"""
+    for name, value in scope["headers"]:
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            try:
+                payload = auth_middleware.verify_token(value[7:].decode())
+            except Exception:
+                return None
+            if ADMIN_ROLE in (payload.get("roles") or []):
+                return payload.get("tenant_id")
+    return None
+
+
+def _speedscope(profiler, name: str, started: float, ended: float, timeline: List[tuple]) -> Dict:
+    """pyinstrument's speedscope document with the SQL timeline appended as a second, evented profile"""
+    from pyinstrument.renderers import SpeedscopeRenderer
+    document = json.loads(profiler.output(SpeedscopeRenderer()))
+    document["name"] = name
+    frames = document["shared"]["frames"]
+    index: Dict[str, int] = {}
+    events = []
+    for start, end, statement, _ in timeline:
+        label = " ".join(statement.split())[:200]
+        if label not in index:
+            index[label] = len(frames)
+            frames.append({"name": label, "file": "SQL"})
+        events.append({"type": "O", "frame": index[label], "at": start - started})
+        events.append({"type": "C", "frame": index[label], "at": end - started})
+    document["profiles"].append({"type": "evented", "name": f"SQL ({len(timeline)} statements)",
+                                 "unit": "seconds", "startValue": 0, "endValue": ended - started,
+                                 "events": events})
+    return document
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        tenant_id = _admin_tenant(scope)
+        if tenant_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+        profile_id = f"{tenant_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        timeline: List[tuple] = []
+        token = _timeline.set(timeline)
+        sql_timeline.acquire()
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            ended = time.perf_counter()
+            sql_timeline.release()
+            _timeline.reset(token)
+            try:
+                self._store(profile_id, scope, status[0], profiler, started, ended, timeline)
+            except Exception as e:
+                logger.error(f"Could not store profile {profile_id}: {str(e)}", "ProfilingMiddleware")
+
+    @staticmethod
+    def _store(profile_id: str, scope, status: int, profiler, started: float, ended: float, timeline: List[tuple]):
+        name = f"{scope['method']} {scope['path']}"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json"), 'w') as handle:
+            json.dump(_speedscope(profiler, name, started, ended, timeline), handle)
+        summary = {
+            "id": profile_id, "request": name, "query_string": scope.get("query_string", b"").decode(),
+            "status": status, "at": datetime.now().isoformat(), "ms": round((ended - started) * 1000, 2),
+            "sql_ms": round(sum(end - start for start, end, _, _ in timeline) * 1000, 2),
+            "sql": [{"offset_ms": round((start - started) * 1000, 2), "ms": round((end - start) * 1000, 2),
+                     "rows": rows, "statement": statement} for start, end, statement, rows in timeline]
+        }
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'w') as handle:
+            json.dump(summary, handle)
+        logger.info(f"Profiled {name}: {summary['ms']} ms, {len(timeline)} statements ({profile_id})",
+                    "ProfilingMiddleware")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, root_validator
 from typing import Optional, List
 from datetime import datetime, date
 from decimal import Decimal
@@ -18,14 +18,15 @@ class AppointmentInvoicePaymentStatus(str, Enum):
 class AppointmentInvoiceItemSchema(BaseModel):
     line_no: int = Field(..., gt=0)
     billing_master_id: Optional[int] = None
-    description: str = Field(..., min_length=1)
+    description: Optional[str] = Field(None, min_length=1)
     hsn_code: Optional[str] = None
     quantity: int = Field(default=1, gt=0)
-    unit_price: Decimal = Field(..., ge=0)
-    rate: Decimal = Field(..., ge=0)
+    # Leave rate out to price the line from its billing master
+    unit_price: Optional[Decimal] = Field(None, ge=0)
+    rate: Optional[Decimal] = Field(None, ge=0)
     disc_percentage: Optional[Decimal] = Field(default=0, ge=0, le=100)
     disc_amount: Optional[Decimal] = Field(default=0, ge=0)
-    taxable_amount: Decimal = Field(..., ge=0)
+    taxable_amount: Optional[Decimal] = Field(None, ge=0)
     cgst_rate: Optional[Decimal] = Field(default=0, ge=0)
     cgst_amount: Optional[Decimal] = Field(default=0, ge=0)
     sgst_rate: Optional[Decimal] = Field(default=0, ge=0)
@@ -34,9 +35,17 @@ class AppointmentInvoiceItemSchema(BaseModel):
     igst_amount: Optional[Decimal] = Field(default=0, ge=0)
     cess_rate: Optional[Decimal] = Field(default=0, ge=0)
     cess_amount: Optional[Decimal] = Field(default=0, ge=0)
-    total_amount: Decimal = Field(..., ge=0)
+    total_amount: Optional[Decimal] = Field(None, ge=0)
     remarks: Optional[str] = None
 
+    @root_validator(skip_on_failure=True)
+    def validate_client_pricing(cls, values):
+        # A line that carries its own rate is stored as sent, so its amounts must be complete
+        if values.get('rate') is not None and (values.get('taxable_amount') is None
+                                               or values.get('total_amount') is None):
+            raise ValueError('taxable_amount and total_amount are required when rate is given')
+        return values
+
 class AppointmentInvoiceCreateSchema(BaseModel):
     invoice_number: str = Field(..., min_length=1, max_length=50)
     invoice_date: Optional[datetime] = None
@@ -57,17 +66,20 @@ class AppointmentInvoiceCreateSchema(BaseModel):
     doctor_address: Optional[str] = None
     doctor_license_number: Optional[str] = None
     doctor_speciality: Optional[str] = None
-    subtotal_amount: Decimal = Field(..., ge=0)
-    items_total_discount_amount: Optional[Decimal] = Field(default=0, ge=0)
-    taxable_amount: Decimal = Field(..., ge=0)
-    cgst_amount: Optional[Decimal] = Field(default=0, ge=0)
-    sgst_amount: Optional[Decimal] = Field(default=0, ge=0)
-    igst_amount: Optional[Decimal] = Field(default=0, ge=0)
-    cess_amount: Optional[Decimal] = Field(default=0, ge=0)
+    # Catalog-priced lines carry IGST instead of CGST/SGST
+    is_interstate: Optional[bool] = False
+    # Amounts left out are totalled from the priced lines
+    subtotal_amount: Optional[Decimal] = Field(None, ge=0)
+    items_total_discount_amount: Optional[Decimal] = Field(None, ge=0)
+    taxable_amount: Optional[Decimal] = Field(None, ge=0)
+    cgst_amount: Optional[Decimal] = Field(None, ge=0)
+    sgst_amount: Optional[Decimal] = Field(None, ge=0)
+    igst_amount: Optional[Decimal] = Field(None, ge=0)
+    cess_amount: Optional[Decimal] = Field(None, ge=0)
     overall_disc_percentage: Optional[Decimal] = Field(default=0, ge=0, le=100)
     overall_disc_amount: Optional[Decimal] = Field(default=0, ge=0)
     roundoff: Optional[Decimal] = Field(default=0)
-    final_amount: Decimal = Field(..., ge=0)
+    final_amount: Optional[Decimal] = Field(None, ge=0)
     status: Optional[AppointmentInvoiceStatus] = Field(default=AppointmentInvoiceStatus.DRAFT)
     notes: Optional[str] = None
     tags: Optional[List[str]] = None
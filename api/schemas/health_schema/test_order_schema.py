@@ -1,5 +1,5 @@
 from enum import Enum
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, root_validator, validator
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
@@ -22,10 +22,11 @@ class TestOrderItemSchema(BaseModel):
     test_name: Optional[str] = None
     panel_id: Optional[int] = None
     panel_name: Optional[str] = None
-    rate: Decimal = Field(..., ge=0)
+    # Leave rate out to price the line from the test/panel catalog
+    rate: Optional[Decimal] = Field(None, ge=0)
     disc_percentage: Optional[Decimal] = Field(default=0, ge=0, le=100)
     disc_amount: Optional[Decimal] = Field(default=0, ge=0)
-    taxable_amount: Decimal = Field(..., ge=0)
+    taxable_amount: Optional[Decimal] = Field(None, ge=0)
     cgst_rate: Optional[Decimal] = Field(default=0, ge=0, le=100)
     cgst_amount: Optional[Decimal] = Field(default=0, ge=0)
     sgst_rate: Optional[Decimal] = Field(default=0, ge=0, le=100)
@@ -34,7 +35,7 @@ class TestOrderItemSchema(BaseModel):
     igst_amount: Optional[Decimal] = Field(default=0, ge=0)
     cess_rate: Optional[Decimal] = Field(default=0, ge=0, le=100)
     cess_amount: Optional[Decimal] = Field(default=0, ge=0)
-    total_amount: Decimal = Field(..., ge=0)
+    total_amount: Optional[Decimal] = Field(None, ge=0)
     item_status: Optional[str] = Field(default='PENDING')
     remarks: Optional[str] = None
 
@@ -54,6 +55,14 @@ class TestOrderItemSchema(BaseModel):
                 raise ValueError('Only one of test_id or panel_id should be provided')
         return v
 
+    @root_validator(skip_on_failure=True)
+    def validate_client_pricing(cls, values):
+        # A line that carries its own rate is stored as sent, so its amounts must be complete
+        if values.get('rate') is not None and (values.get('taxable_amount') is None
+                                               or values.get('total_amount') is None):
+            raise ValueError('taxable_amount and total_amount are required when rate is given')
+        return values
+
 class TestOrderCreateSchema(BaseModel):
     test_order_number: str = Field(..., min_length=1, max_length=50)
     order_date: Optional[datetime] = None
@@ -66,19 +75,22 @@ class TestOrderCreateSchema(BaseModel):
     doctor_license_number: Optional[str] = Field(None, max_length=100)
     appointment_id: Optional[int] = None
     agency_id: Optional[int] = None
-    subtotal_amount: Decimal = Field(..., ge=0)
-    items_total_discount_amount: Optional[Decimal] = Field(default=0, ge=0)
-    taxable_amount: Decimal = Field(..., ge=0)
-    cgst_amount: Optional[Decimal] = Field(default=0, ge=0)
-    sgst_amount: Optional[Decimal] = Field(default=0, ge=0)
-    igst_amount: Optional[Decimal] = Field(default=0, ge=0)
-    cess_amount: Optional[Decimal] = Field(default=0, ge=0)
+    # Catalog-priced lines carry IGST instead of CGST/SGST
+    is_interstate: Optional[bool] = False
+    # Amounts left out are totalled from the priced lines
+    subtotal_amount: Optional[Decimal] = Field(None, ge=0)
+    items_total_discount_amount: Optional[Decimal] = Field(None, ge=0)
+    taxable_amount: Optional[Decimal] = Field(None, ge=0)
+    cgst_amount: Optional[Decimal] = Field(None, ge=0)
+    sgst_amount: Optional[Decimal] = Field(None, ge=0)
+    igst_amount: Optional[Decimal] = Field(None, ge=0)
+    cess_amount: Optional[Decimal] = Field(None, ge=0)
     overall_disc_percentage: Optional[Decimal] = Field(default=0, ge=0, le=100)
     overall_disc_amount: Optional[Decimal] = Field(default=0, ge=0)
     overall_cess_percentage: Optional[Decimal] = Field(default=0, ge=0, le=100)
     overall_cess_amount: Optional[Decimal] = Field(default=0, ge=0)
     roundoff: Optional[Decimal] = Field(default=0)
-    final_amount: Decimal = Field(..., ge=0)
+    final_amount: Optional[Decimal] = Field(None, ge=0)
     urgency: Optional[str] = Field(default='ROUTINE')
     status: Optional[str] = Field(default='DRAFT')
     notes: Optional[str] = None
@@ -111,6 +123,8 @@ class TestOrderUpdateSchema(BaseModel):
     doctor_license_number: Optional[str] = Field(None, max_length=100)
     appointment_id: Optional[int] = None
     agency_id: Optional[int] = None
+    # Defaults to the order's current supply type when items are repriced
+    is_interstate: Optional[bool] = None
     subtotal_amount: Optional[Decimal] = Field(None, ge=0)
     items_total_discount_amount: Optional[Decimal] = Field(None, ge=0)
     taxable_amount: Optional[Decimal] = Field(None, ge=0)
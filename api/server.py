@@ -0,0 +1,155 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+Workers default to API_WORKERS_PER_CORE (2) per available core, counting the
+container's CPU quota. Routes are async handlers that call the database
+synchronously, so a worker serves one DB-bound request at a time and a
+second worker per core keeps the CPU busy.
+
+Connection pools are sized from one Postgres connection budget instead of
+per-process settings. DB_CONNECTION_BUDGET is the number of connections the
+whole deployment may hold (default: 80% of the server's max_connections),
+shared by API_REPLICAS instances. Each worker keeps DB_RESERVED_PER_WORKER
+connections outside its pool (the lab worklist LISTEN connection), and the
+rest of its share is split roughly 2:1 between pool_size and max_overflow.
+When the budget cannot give every worker a pool of two, fewer workers start.
+
+The app is preloaded in the master, so workers fork with the routes already
+imported. Workers recycle after API_MAX_REQUESTS (+ jitter) requests, SIGHUP
+restarts them gracefully within API_GRACEFUL_TIMEOUT, and each warms its pool
+on startup. Background jobs a recycled worker was still running are marked
+failed when the next worker starts.
+
+Each worker's process pools (barcode and lab report rendering) get the cores
+divided among the workers, so together they do not oversubscribe the machine.
+"""
+import math
+import os
+import tempfile
+from typing import Dict, Optional
+from core.shared.utils.logger import logger
+
+
+def available_cpus() -> int:
+    """Cores this process may use: CPU affinity capped by a cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as handle:
+            limit, period = handle.read().split()
+            if limit != 'max':
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as handle:
+                limit = int(handle.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as handle:
+                period = int(handle.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def _server_connection_budget() -> Optional[int]:
+    """80% of the Postgres server's max_connections, or None when it cannot be read"""
+    try:
+        from sqlalchemy import text
+        from core.database.connection import db_manager
+        with db_manager._engine.connect() as connection:
+            max_connections = int(connection.execute(text("SHOW max_connections")).scalar())
+        db_manager._engine.dispose()
+        return int(max_connections * 0.8)
+    except Exception as e:
+        logger.warning(f"Could not read max_connections: {str(e)}", "Server")
+        return None
+
+
+def plan_workers(budget: Optional[int], workers: int, reserved_per_worker: int = 1) -> Dict[str, int]:
+    """Worker count and per-worker pool sizes that keep all workers within `budget` connections"""
+    if budget is None:
+        # No budget: keep the per-process settings, as in development
+        return {"workers": workers, "pool_size": int(os.getenv('DB_POOL_SIZE', 10)),
+                "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 20))}
+    smallest = reserved_per_worker + 2
+    if budget < workers * smallest:
+        workers = max(1, budget // smallest)
+        logger.warning(f"Connection budget {budget} fits only {workers} worker(s)", "Server")
+    share = max(1, budget // workers - reserved_per_worker)
+    pool_size = max(1, math.ceil(share * 2 / 3))
+    return {"workers": workers, "pool_size": pool_size, "max_overflow": share - pool_size}
+
+
+def _post_fork(server, worker):
+    # The preloaded master's engine must not hand its sockets to a child
+    from core.database.connection import db_manager
+    if db_manager._engine is not None:
+        db_manager._engine.dispose(close=False)
+
+
+def _child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def run_production(host: str, port: int):
+    from gunicorn.app.base import BaseApplication
+
+    # Metrics from all workers are aggregated through files; must be set before prometheus_client loads
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='prometheus-'))
+
+    cores = available_cpus()
+    workers = int(os.getenv('API_WORKERS') or os.getenv('WEB_CONCURRENCY') or
+                  cores * int(os.getenv('API_WORKERS_PER_CORE', 2)))
+    replicas = max(1, int(os.getenv('API_REPLICAS', 1)))
+    total = int(os.environ['DB_CONNECTION_BUDGET']) if os.getenv('DB_CONNECTION_BUDGET') else \
+        _server_connection_budget()
+    budget = total // replicas if total is not None else None
+    plan = plan_workers(budget, workers, int(os.getenv('DB_RESERVED_PER_WORKER', 1)))
+
+    # Read when each worker's lifespan rebuilds its engine, and to warm the pool
+    os.environ['DB_POOL_SIZE'] = str(plan["pool_size"])
+    os.environ['DB_MAX_OVERFLOW'] = str(plan["max_overflow"])
+    os.environ.setdefault('DB_POOL_WARM', str(plan["pool_size"]))
+    pool_workers = str(max(1, cores // plan["workers"]))
+    os.environ.setdefault('BARCODE_WORKERS', pool_workers)
+    os.environ.setdefault('LAB_REPORT_WORKERS', pool_workers)
+
+    max_requests = int(os.getenv('API_MAX_REQUESTS', 10000))
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": plan["workers"],
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": os.getenv('API_PRELOAD', 'true').lower() == 'true',
+        "max_requests": max_requests,
+        "max_requests_jitter": max(1, max_requests // 10) if max_requests else 0,
+        "graceful_timeout": int(os.getenv('API_GRACEFUL_TIMEOUT', 30)),
+        "timeout": int(os.getenv('API_WORKER_TIMEOUT', 120)),
+        "keepalive": int(os.getenv('API_KEEPALIVE', 5)),
+        "accesslog": None,
+        "errorlog": "-",
+        "post_fork": _post_fork,
+        "child_exit": _child_exit,
+    }
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from api.main import app
+            return app
+
+    logger.info(f"Starting {plan['workers']} workers on {cores} core(s); per worker pool_size "
+                f"{plan['pool_size']} + overflow {plan['max_overflow']} (budget {budget}, replicas {replicas}), "
+                f"{os.environ['LAB_REPORT_WORKERS']} render process(es)",
+                "Server")
+    ProductionServer().run()
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Query
 from typing import Optional
+from datetime import date, timedelta
 from api.schemas.common import BaseResponse, PaginatedResponse, PaginationParams
 from api.middleware.auth_middleware import get_current_user
 import math
@@ -12,8 +13,11 @@ async def get_audit_trail(
     pagination: PaginationParams = Depends(),
     entity_type: Optional[str] = Query(None),
     entity_id: Optional[int] = Query(None),
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
+    """Audit entries are written shortly after the business transaction commits"""
     from core.database.connection import db_manager
     from modules.account_module.models.audit_trail import AuditTrail
     from sqlalchemy import or_
@@ -27,6 +31,11 @@ async def get_audit_trail(
             query = query.filter(AuditTrail.entity_type == entity_type)
         if entity_id:
             query = query.filter(AuditTrail.entity_id == entity_id)
+        # Date bounds let PostgreSQL prune the monthly audit partitions
+        if from_date:
+            query = query.filter(AuditTrail.created_at >= from_date)
+        if to_date:
+            query = query.filter(AuditTrail.created_at < to_date + timedelta(days=1))
         if pagination.search:
             query = query.filter(or_(
                 AuditTrail.username.ilike(f"%{pagination.search}%"),
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, date
 from api.schemas.common import BaseResponse
 from api.middleware.auth_middleware import get_current_user
 from core.database.connection import db_manager
-from modules.account_module.models.entities import AccountMaster, AccountGroup, Ledger, Budget
+from modules.account_module.models.entities import AccountMaster, Budget
+from modules.account_module.services.period_report_engine import period_report_engine, bucket_ranges
 from modules.admin_module.models.entities import FinancialYear
-from sqlalchemy import func, and_
 
 router = APIRouter()
 
@@ -19,45 +19,70 @@ async def get_comparative_profit_loss(
     current_user: dict = Depends(get_current_user)
 ):
     """Compare Profit & Loss between two periods"""
-    with db_manager.get_session() as session:
-        def get_pl_data(start_date, end_date):
-            query = session.query(
-                AccountMaster.name,
-                AccountGroup.account_type,
-                func.sum(Ledger.debit_amount).label('debit'),
-                func.sum(Ledger.credit_amount).label('credit')
-            ).join(AccountGroup).join(Ledger).filter(
-                AccountMaster.tenant_id == current_user['tenant_id'],
-                AccountGroup.account_type.in_(['INCOME', 'EXPENSE']),
-                Ledger.transaction_date >= datetime.fromisoformat(start_date),
-                Ledger.transaction_date <= datetime.fromisoformat(end_date)
-            ).group_by(AccountMaster.name, AccountGroup.account_type).all()
-            
-            income = sum((r.credit - r.debit) for r in query if r.account_type == 'INCOME')
-            expense = sum((r.debit - r.credit) for r in query if r.account_type == 'EXPENSE')
-            return {'income': float(income), 'expense': float(expense), 'profit': float(income - expense)}
-        
-        period1 = get_pl_data(period1_start, period1_end)
-        period2 = get_pl_data(period2_start, period2_end)
-        
-        return BaseResponse(
-            success=True,
-            message="Comparative P&L retrieved",
-            data={
-                'period1': period1,
-                'period2': period2,
-                'variance': {
-                    'income': period2['income'] - period1['income'],
-                    'expense': period2['expense'] - period1['expense'],
-                    'profit': period2['profit'] - period1['profit']
-                },
-                'variance_percent': {
-                    'income': ((period2['income'] - period1['income']) / period1['income'] * 100) if period1['income'] else 0,
-                    'expense': ((period2['expense'] - period1['expense']) / period1['expense'] * 100) if period1['expense'] else 0,
-                    'profit': ((period2['profit'] - period1['profit']) / period1['profit'] * 100) if period1['profit'] else 0
-                }
+    totals = period_report_engine.compute_ranges(
+        current_user['tenant_id'],
+        [('period1', period1_start, period1_end), ('period2', period2_start, period2_end)],
+        account_types=['INCOME', 'EXPENSE']
+    )
+
+    def get_pl_data(label):
+        income = totals[label].get('INCOME', {}).get('amount', 0.0)
+        expense = totals[label].get('EXPENSE', {}).get('amount', 0.0)
+        return {'income': income, 'expense': expense, 'profit': income - expense}
+
+    period1 = get_pl_data('period1')
+    period2 = get_pl_data('period2')
+
+    return BaseResponse(
+        success=True,
+        message="Comparative P&L retrieved",
+        data={
+            'period1': period1,
+            'period2': period2,
+            'variance': {
+                'income': period2['income'] - period1['income'],
+                'expense': period2['expense'] - period1['expense'],
+                'profit': period2['profit'] - period1['profit']
+            },
+            'variance_percent': {
+                'income': ((period2['income'] - period1['income']) / period1['income'] * 100) if period1['income'] else 0,
+                'expense': ((period2['expense'] - period1['expense']) / period1['expense'] * 100) if period1['expense'] else 0,
+                'profit': ((period2['profit'] - period1['profit']) / period1['profit'] * 100) if period1['profit'] else 0
             }
+        }
+    )
+
+@router.get("/comparative-periods", response_model=BaseResponse)
+async def get_comparative_periods(
+    granularity: str = Query("month", regex="^(month|quarter|year)$"),
+    from_date: str = Query(...),
+    to_date: str = Query(...),
+    account_types: str = Query("INCOME,EXPENSE", description="Comma-separated account types"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Totals per month/quarter/year for the given account types in one ledger pass"""
+    types = [t.strip().upper() for t in account_types.split(",") if t.strip()]
+    try:
+        buckets = bucket_ranges(granularity, from_date, to_date)
+        totals = period_report_engine.compute_buckets(
+            current_user['tenant_id'], granularity, from_date, to_date, account_types=types
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    periods = []
+    for label, start, end in buckets:
+        amounts = {t: totals.get(label, {}).get(t, {}).get('amount', 0.0) for t in types}
+        period = {'period': label, 'start_date': start.isoformat(), 'end_date': end.isoformat(), 'amounts': amounts}
+        if 'INCOME' in amounts and 'EXPENSE' in amounts:
+            period['profit'] = amounts['INCOME'] - amounts['EXPENSE']
+        periods.append(period)
+
+    return BaseResponse(
+        success=True,
+        message="Comparative period data retrieved",
+        data=periods
+    )
 
 @router.get("/budget-vs-actual", response_model=BaseResponse)
 async def get_budget_vs_actual(
@@ -71,6 +96,8 @@ async def get_budget_vs_actual(
         query = session.query(
             Budget.id,
             Budget.name,
+            Budget.account_id,
+            Budget.fiscal_year_id,
             AccountMaster.name.label('account_name'),
             Budget.budget_amount,
             FinancialYear.start_date,
@@ -78,45 +105,48 @@ async def get_budget_vs_actual(
         ).join(AccountMaster).join(FinancialYear).filter(
             Budget.tenant_id == current_user['tenant_id']
         )
-        
+
         if fiscal_year_id:
             query = query.filter(Budget.fiscal_year_id == fiscal_year_id)
         if account_id:
             query = query.filter(Budget.account_id == account_id)
         if cost_center_id:
             query = query.filter(Budget.cost_center_id == cost_center_id)
-        
+
         budgets = query.all()
-        results = []
-        
-        for budget in budgets:
-            actual = session.query(
-                func.coalesce(func.sum(Ledger.debit_amount), 0) - func.coalesce(func.sum(Ledger.credit_amount), 0)
-            ).join(AccountMaster).filter(
-                AccountMaster.id == budget.id,
-                Ledger.transaction_date >= budget.start_date,
-                Ledger.transaction_date <= budget.end_date,
-                Ledger.tenant_id == current_user['tenant_id']
-            ).scalar() or 0
-            
-            variance = float(budget.budget_amount) - float(actual)
-            variance_percent = (variance / float(budget.budget_amount) * 100) if budget.budget_amount else 0
-            
-            results.append({
-                'budget_name': budget.name,
-                'account': budget.account_name,
-                'budget_amount': float(budget.budget_amount),
-                'actual_amount': float(actual),
-                'variance': variance,
-                'variance_percent': variance_percent,
-                'status': 'Under Budget' if variance > 0 else 'Over Budget'
-            })
-        
-        return BaseResponse(
-            success=True,
-            message="Budget vs Actual retrieved",
-            data=results
-        )
+
+    # Actuals for every budgeted account and fiscal year in one grouped pass
+    fiscal_years = {b.fiscal_year_id: (str(b.fiscal_year_id), b.start_date, b.end_date) for b in budgets}
+    actuals = period_report_engine.compute_ranges(
+        current_user['tenant_id'],
+        list(fiscal_years.values()),
+        account_ids=list({b.account_id for b in budgets}),
+        by_account=True
+    )
+
+    results = []
+    for budget in budgets:
+        totals = actuals.get(str(budget.fiscal_year_id), {}).get(budget.account_id)
+        actual = (totals['debit'] - totals['credit']) if totals else 0.0
+
+        variance = float(budget.budget_amount) - float(actual)
+        variance_percent = (variance / float(budget.budget_amount) * 100) if budget.budget_amount else 0
+
+        results.append({
+            'budget_name': budget.name,
+            'account': budget.account_name,
+            'budget_amount': float(budget.budget_amount),
+            'actual_amount': float(actual),
+            'variance': variance,
+            'variance_percent': variance_percent,
+            'status': 'Under Budget' if variance > 0 else 'Over Budget'
+        })
+
+    return BaseResponse(
+        success=True,
+        message="Budget vs Actual retrieved",
+        data=results
+    )
 
 @router.get("/year-over-year", response_model=BaseResponse)
 async def get_year_over_year(
@@ -124,27 +154,22 @@ async def get_year_over_year(
     current_user: dict = Depends(get_current_user)
 ):
     """Year-over-year comparison for last 3 years"""
-    with db_manager.get_session() as session:
-        current_year = datetime.now().year
-        years_data = []
-        
-        for year in range(current_year - 2, current_year + 1):
-            start = datetime(year, 1, 1)
-            end = datetime(year, 12, 31)
-            
-            total = session.query(
-                func.coalesce(func.sum(Ledger.debit_amount), 0) - func.coalesce(func.sum(Ledger.credit_amount), 0)
-            ).join(AccountMaster).join(AccountGroup).filter(
-                AccountGroup.account_type == account_type,
-                Ledger.transaction_date >= start,
-                Ledger.transaction_date <= end,
-                Ledger.tenant_id == current_user['tenant_id']
-            ).scalar() or 0
-            
-            years_data.append({'year': year, 'amount': float(total)})
-        
-        return BaseResponse(
-            success=True,
-            message="Year-over-year data retrieved",
-            data=years_data
-        )
+    current_year = datetime.now().year
+    totals = period_report_engine.compute_buckets(
+        current_user['tenant_id'], 'year',
+        date(current_year - 2, 1, 1), date(current_year, 12, 31),
+        account_types=[account_type]
+    )
+
+    years_data = []
+    for year in range(current_year - 2, current_year + 1):
+        bucket = totals.get(str(year), {}).get(account_type)
+        # Keep the original debit-minus-credit convention of this report
+        amount = (bucket['debit'] - bucket['credit']) if bucket else 0.0
+        years_data.append({'year': year, 'amount': amount})
+
+    return BaseResponse(
+        success=True,
+        message="Year-over-year data retrieved",
+        data=years_data
+    )
@@ -5,6 +5,7 @@ from api.middleware.auth_middleware import get_current_user
 from api.schemas.common import BaseResponse
 from core.database.connection import db_manager
 from sqlalchemy import text
+from modules.account_module.services.gst_summary_service import GSTSummaryService
 
 router = APIRouter()
 
@@ -77,35 +78,24 @@ async def generate_eway_bill(data: Dict[str, Any], current_user: dict = Depends(
 
 @router.get("/gstr1-data", response_model=BaseResponse)
 async def get_gstr1_data(return_period: str, current_user: dict = Depends(get_current_user)):
-    """Get GSTR-1 return data for a period"""
-    with db_manager.get_session() as session:
-        # Get all invoices for the period
-        invoices = session.execute(text("""
-            SELECT si.*, c.tax_id as customer_gstin,
-                   SUM(sii.taxable_amount) as taxable_value,
-                   SUM(sii.cgst_amount) as cgst_amount,
-                   SUM(sii.sgst_amount) as sgst_amount,
-                   SUM(sii.igst_amount) as igst_amount
-            FROM sales_invoices si
-            JOIN customers c ON si.customer_id = c.id
-            JOIN sales_invoice_items sii ON si.id = sii.invoice_id
-            WHERE si.tenant_id = :tenant_id 
-            AND TO_CHAR(si.invoice_date, 'YYYY-MM') = :period
-            GROUP BY si.id, c.tax_id
-        """), {"tenant_id": current_user['tenant_id'], "period": return_period}).fetchall()
-        
-        data = [dict(row._mapping) for row in invoices]
-        
-        # Calculate totals
-        totals = {
-            "total_taxable": sum(inv['taxable_value'] or 0 for inv in data),
-            "total_cgst": sum(inv['cgst_amount'] or 0 for inv in data),
-            "total_sgst": sum(inv['sgst_amount'] or 0 for inv in data),
-            "total_igst": sum(inv['igst_amount'] or 0 for inv in data)
-        }
-        
-        return BaseResponse(success=True, message="GSTR-1 data retrieved", 
-                          data={"invoices": data, "totals": totals})
+    """
+    Get GSTR-1 return data for a period, read from the GST summaries kept current at posting:
+    posted invoices with their tax totals, period totals, and the section rows under `summary`
+    """
+    tenant_id = current_user['tenant_id']
+    data = GSTSummaryService.get_sales_invoice_rows(tenant_id, return_period)
+    summary = GSTSummaryService.get_period_rows(
+        tenant_id, return_period, ['B2B', 'B2CL', 'B2CS', 'CDNR', 'CDNUR', 'HSN']
+    )
+    outward = [row for row in summary if row['section'] in ('B2B', 'B2CL', 'B2CS')]
+    totals = {
+        "total_taxable": sum(row['taxable_value'] for row in outward),
+        "total_cgst": sum(row['cgst'] for row in outward),
+        "total_sgst": sum(row['sgst'] for row in outward),
+        "total_igst": sum(row['igst'] for row in outward)
+    }
+    return BaseResponse(success=True, message="GSTR-1 data retrieved", 
+                      data={"invoices": data, "totals": totals, "summary": summary})
 
 @router.get("/tds-deductions", response_model=BaseResponse)
 async def get_tds_deductions(from_date: str = None, to_date: str = None, current_user: dict = Depends(get_current_user)):
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any
 from api.schemas.common import BaseResponse
 from api.middleware.auth_middleware import get_current_user
 from modules.account_module.services.gst_service import GSTService
+from modules.account_module.services.gst_summary_service import GSTSummaryService
+from modules.account_module.services.gstr1_export_service import (
+    GSTR1Exporter, build_gstr3b_json, run_gstr1_export_job
+)
+from modules.admin_module.services.job_service import JobService
 
 router = APIRouter()
 
@@ -62,3 +68,84 @@ async def get_gstr3b(
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/gst-summaries/rebuild", response_model=BaseResponse)
+async def rebuild_gst_summaries(
+    return_period: str = Query(..., regex=r"^\d{4}-\d{2}$"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Recompute the precomputed GST return summaries of a period from source documents"""
+    try:
+        data = GSTSummaryService.rebuild_period(current_user['tenant_id'], return_period)
+        return BaseResponse(
+            success=True,
+            message="GST summaries rebuilt successfully",
+            data=data
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/returns/gstr1/file")
+async def download_gstr1_file(
+    return_period: str = Query(..., regex=r"^\d{4}-\d{2}$"),
+    gstin: str = Query(..., min_length=15, max_length=15),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream the GSTR-1 offline-tool JSON; use the export job for resumable downloads or Excel"""
+    try:
+        exporter = GSTR1Exporter(current_user['tenant_id'], return_period, gstin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"GSTR1_{exporter.gstin}_{exporter.start_date.strftime('%m%Y')}.json"
+    return StreamingResponse(
+        exporter.iter_json(),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/returns/gstr1/export-jobs", response_model=BaseResponse)
+async def create_gstr1_export_job(
+    return_period: str = Query(..., regex=r"^\d{4}-\d{2}$"),
+    gstin: str = Query(..., min_length=15, max_length=15),
+    file_format: str = Query("json", alias="format", regex="^(json|xlsx)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate the GSTR-1 file in the background; download it from /admin/jobs/{job_id}/download"""
+    try:
+        GSTR1Exporter(current_user['tenant_id'], return_period, gstin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        job_id = JobService.submit(
+            "GSTR1_EXPORT", current_user['tenant_id'], current_user.get('username'),
+            run_gstr1_export_job, current_user['tenant_id'], return_period, gstin.upper(), file_format,
+            params={"return_period": return_period, "gstin": gstin.upper(), "format": file_format}
+        )
+        return BaseResponse(
+            success=True,
+            message="GSTR-1 export queued",
+            data={"job_id": job_id}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/returns/gstr3b/file", response_model=BaseResponse)
+async def get_gstr3b_file(
+    return_period: str = Query(..., regex=r"^\d{4}-\d{2}$"),
+    gstin: str = Query(..., min_length=15, max_length=15),
+    current_user: dict = Depends(get_current_user)
+):
+    """GSTR-3B offline-tool JSON built from the precomputed summaries"""
+    try:
+        data = build_gstr3b_json(current_user['tenant_id'], return_period, gstin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BaseResponse(
+        success=True,
+        message="GSTR-3B file generated successfully",
+        data=data
+    )
@@ -343,3 +343,11 @@ async def confirm_gateway_payment(
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error confirming payment: {str(e)}")
+
+
+@router.get("/payments/{payment_id}/gateway-events", response_model=BaseResponse)
+async def get_payment_gateway_events(payment_id: int, current_user: dict = Depends(get_current_user)):
+    """Gateway webhook events received for a payment and how each was processed"""
+    from modules.account_module.services.payment_webhook_service import payment_webhook_service
+    events = payment_webhook_service.get_events(payment_id, current_user["tenant_id"])
+    return BaseResponse(success=True, message="Gateway events retrieved successfully", data=events)
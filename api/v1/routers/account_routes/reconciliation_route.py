@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import APIRouter, Depends, UploadFile, File, Query
 from typing import List, Dict
 from pydantic import BaseModel
 from api.middleware.auth_middleware import get_current_user
@@ -21,8 +21,13 @@ async def import_statement(account_id: int, file: UploadFile = File(...),
     return {"imported_count": len(imported), "statements": imported}
 
 @router.post("/auto-match/{account_id}")
-def auto_match(account_id: int, current_user: dict = Depends(get_current_user)):
-    matches = ReconciliationService.auto_match_transactions(account_id, current_user['tenant_id'])
+def auto_match(account_id: int,
+               date_window_days: int = Query(3, ge=0, le=15, description="Allowed days between statement and ledger dates"),
+               min_score: float = Query(0.3, ge=0, le=1, description="Minimum match score"),
+               current_user: dict = Depends(get_current_user)):
+    matches = ReconciliationService.auto_match_transactions(
+        account_id, current_user['tenant_id'], date_window_days, min_score
+    )
     return {"matched_count": len(matches), "matches": matches}
 
 @router.post("/manual-reconcile")
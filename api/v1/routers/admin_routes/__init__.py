@@ -11,6 +11,7 @@ from . import transaction_templates_route
 from . import account_configurations_route
 from . import accounts_route
 from . import branches_route
+from . import jobs_route
 
 __all__ = [
     "users_route",
@@ -25,5 +26,6 @@ __all__ = [
     "account_configurations_route",
     "accounts_route",
     "branches_route",
+    "jobs_route",
 ]
 # API v1 routers
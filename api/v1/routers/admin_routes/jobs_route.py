@@ -0,0 +1,41 @@
+# api/v1/routers/admin_routes/jobs_route.py
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from api.middleware.auth_middleware import get_current_user
+from api.schemas.common import BaseResponse
+from core.shared.utils.http_range import range_file_response
+from modules.admin_module.services.job_service import JobService
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/{job_id}", response_model=BaseResponse)
+def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = JobService.get(job_id, current_user['tenant_id'])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop('result_path', None)
+    return BaseResponse(success=True, message="Job retrieved successfully", data=job)
+
+
+@router.get("/{job_id}/download")
+def download_job_result(
+    job_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Download a job's output file; supports Range requests so interrupted downloads can resume"""
+    job = JobService.get(job_id, current_user['tenant_id'])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job['status'] != 'COMPLETED' or not job['result_path']:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, no file available")
+
+    return range_file_response(
+        job['result_path'],
+        media_type=job['content_type'] or "application/octet-stream",
+        filename=os.path.basename(job['result_path']),
+        range_header=range_header,
+        etag=f'"{job_id}-{job["result_size"]}"'
+    )
@@ -0,0 +1,52 @@
+# api/v1/routers/admin_routes/profiles_route.py
+import json
+import os
+import re
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from api.middleware.auth_middleware import require_admin
+from api.middleware.profiling_middleware import PROFILE_DIR
+from api.schemas.common import BaseResponse
+
+router = APIRouter(prefix="/profiles", tags=["Profiles"])
+
+_PROFILE_ID = re.compile(r"^\d+-\d{14}-[0-9a-f]{8}$")
+
+
+def _profile_path(profile_id: str, tenant_id: int, suffix: str) -> str:
+    if not _PROFILE_ID.match(profile_id) or not profile_id.startswith(f"{tenant_id}-"):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path = os.path.join(PROFILE_DIR, f"{profile_id}{suffix}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return path
+
+
+@router.get("", response_model=BaseResponse)
+def list_profiles(limit: int = Query(50, ge=1, le=500), current_user: dict = Depends(require_admin)):
+    """Request profiles captured for this tenant, newest first"""
+    prefix = f"{current_user['tenant_id']}-"
+    names = sorted((name for name in os.listdir(PROFILE_DIR)
+                    if name.startswith(prefix) and name.endswith(".json") and not name.endswith(".speedscope.json")),
+                   reverse=True)[:limit] if os.path.isdir(PROFILE_DIR) else []
+    profiles = []
+    for name in names:
+        with open(os.path.join(PROFILE_DIR, name)) as handle:
+            summary = json.load(handle)
+        profiles.append({key: summary[key] for key in ("id", "request", "status", "at", "ms", "sql_ms")}
+                        | {"statements": len(summary["sql"])})
+    return BaseResponse(success=True, message="Profiles retrieved successfully", data=profiles)
+
+
+@router.get("/{profile_id}", response_model=BaseResponse)
+def get_profile(profile_id: str, current_user: dict = Depends(require_admin)):
+    """Timing summary and SQL timeline of a profiled request"""
+    with open(_profile_path(profile_id, current_user['tenant_id'], ".json")) as handle:
+        return BaseResponse(success=True, message="Profile retrieved successfully", data=json.load(handle))
+
+
+@router.get("/{profile_id}/speedscope")
+def download_speedscope(profile_id: str, current_user: dict = Depends(require_admin)):
+    """Speedscope document (Python samples plus SQL timeline); open it at https://www.speedscope.app"""
+    path = _profile_path(profile_id, current_user['tenant_id'], ".speedscope.json")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
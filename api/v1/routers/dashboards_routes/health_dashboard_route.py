@@ -3,6 +3,7 @@ from typing import Dict, List
 from api.middleware.auth_middleware import get_current_user
 from api.schemas.common import BaseResponse
 from modules.dashboard.services.health_dashboard_service import HealthDashboardService
+from modules.health_module.services.health_metrics_service import health_metrics_service
 
 router = APIRouter()
 
@@ -49,4 +50,13 @@ async def get_test_analytics(current_user: dict = Depends(get_current_user)) ->
         analytics = HealthDashboardService.get_test_analytics(current_user["tenant_id"])
         return BaseResponse(success=True, message="Test analytics retrieved successfully", data=analytics)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/metrics/rebuild", response_model=BaseResponse)
+async def rebuild_health_metrics(current_user: dict = Depends(get_current_user)) -> BaseResponse:
+    """Recompute the tenant's dashboard counters from the health records"""
+    try:
+        health_metrics_service.rebuild(current_user["tenant_id"])
+        return BaseResponse(success=True, message="Health metrics rebuilt successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -7,6 +7,7 @@ __all__ = [
     'doctors_route',
     'invoices_route',
     'lab_technicians_route',
+    'lab_worklist_route',
     'medical_records_route',
     'patients_route',
     'prescriptions_route',
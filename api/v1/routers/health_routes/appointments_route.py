@@ -1,16 +1,17 @@
 from core.shared.utils.logger import logger
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.responses import StreamingResponse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import io
 import csv
-from datetime import datetime
+from datetime import datetime, date
 import math
 from fastapi import Query # Import Query
 from api.schemas.common import BaseResponse, PaginatedResponse, PaginationParams
 from api.schemas.health_schema.appointment_schemas import AppointmentCreate, AppointmentUpdate, AppointmentResponse
 from api.middleware.auth_middleware import get_current_user
 from modules.health_module.services.appointment_service import AppointmentService
+from modules.health_module.services.slot_availability_service import slot_availability_service
 
 router = APIRouter()
 
@@ -125,6 +126,35 @@ async def import_appointments(request_data: Dict[str, Any], current_user: dict =
         data=result
     )
 
+@router.get("/appointments/available-slots", response_model=BaseResponse)
+async def get_available_slots(
+    from_date: date = Query(...),
+    to_date: Optional[date] = Query(None),
+    doctor_id: Optional[int] = Query(None),
+    specialization: Optional[str] = Query(None),
+    count: int = Query(10, ge=1, le=200),
+    slot_minutes: Optional[int] = Query(None, ge=5, le=240),
+    current_user: dict = Depends(get_current_user)
+):
+    """Next free slots for a doctor or for all doctors of a specialization"""
+    try:
+        slots = slot_availability_service.find_free_slots(
+            tenant_id=current_user.get('tenant_id'),
+            from_date=from_date,
+            to_date=to_date,
+            doctor_id=doctor_id,
+            specialization=specialization,
+            count=count,
+            slot_minutes=slot_minutes
+        )
+        return BaseResponse(
+            success=True,
+            message="Available slots retrieved successfully",
+            data=slots
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/appointments/{appointment_identifier}", response_model=BaseResponse)
 async def get_appointment(appointment_identifier: str, current_user: dict = Depends(get_current_user)):
     try:
@@ -0,0 +1,94 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+from api.schemas.common import BaseResponse
+from api.middleware.auth_middleware import get_current_user
+from core.shared.utils.event_broker import event_broker
+from modules.health_module.services.lab_worklist_service import lab_worklist_service, WORKLIST_TOPIC
+
+router = APIRouter()
+
+SNAPSHOT_LIMIT = 200
+KEEPALIVE_SECONDS = 15
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/lab-worklist", response_model=BaseResponse)
+def get_lab_worklist(
+    stage: Optional[str] = Query(None, description="COLLECTION or PROCESSING"),
+    department_id: Optional[int] = Query(None, description="Test category id"),
+    urgency: Optional[str] = None,
+    after: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user)
+):
+    """Pending samples and tests, most urgent and oldest first"""
+    try:
+        data = lab_worklist_service.get_queue(current_user["tenant_id"], stage, department_id, urgency, after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BaseResponse(success=True, message="Lab worklist retrieved successfully", data=data)
+
+
+@router.get("/lab-worklist/summary", response_model=BaseResponse)
+def get_lab_worklist_summary(current_user: dict = Depends(get_current_user)):
+    """Queue sizes and oldest pending item per department, stage and urgency"""
+    data = lab_worklist_service.get_summary(current_user["tenant_id"])
+    return BaseResponse(success=True, message="Lab worklist summary retrieved successfully", data=data)
+
+
+@router.get("/lab-worklist/stream")
+async def stream_lab_worklist(
+    request: Request,
+    stage: Optional[str] = None,
+    department_id: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Server-Sent Events: a 'snapshot' of the queue, then 'delta' events carrying
+    the current rows of every changed order ({order_ids, rows}; rows of those
+    orders missing from 'rows' have left the queue). 'resync' means updates were
+    missed and the client should reload.
+    """
+    tenant_id = current_user["tenant_id"]
+
+    def in_view(row) -> bool:
+        return (not stage or row["stage"] == stage) and (not department_id or row["department_id"] == department_id)
+
+    # Subscribe before loading the snapshot so no change falls in between
+    subscription = event_broker.subscribe(WORKLIST_TOPIC, lambda e: e["tenant_id"] in (tenant_id, None))
+    try:
+        snapshot = await run_in_threadpool(lab_worklist_service.get_queue, tenant_id, stage, department_id,
+                                           None, None, SNAPSHOT_LIMIT)
+    except Exception as e:
+        event_broker.unsubscribe(subscription)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            yield _sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                change = await subscription.get(KEEPALIVE_SECONDS)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    yield _sse("resync", {})
+                elif change is None:
+                    yield ": keepalive\n\n"
+                elif change["type"] == "resync":
+                    yield _sse("resync", {})
+                else:
+                    yield _sse("delta", {"order_ids": change["order_ids"],
+                                         "rows": [row for row in change["rows"] if in_view(row)]})
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
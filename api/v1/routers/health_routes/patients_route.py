@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
 import io
@@ -13,6 +13,7 @@ from modules.health_module.services.patient_service import PatientService
 from modules.health_module.services.doctor_service import DoctorService
 from modules.health_module.services.appointment_service import AppointmentService
 from modules.health_module.services.medical_record_service import MedicalRecordService
+from modules.health_module.services.patient_search_service import patient_search_service, normalize_phone, looks_like_phone
 from modules.admin_module.models.agency import Agency
 
 router = APIRouter()
@@ -30,14 +31,16 @@ async def get_patients(pagination: PaginationParams = Depends(), current_user: d
         )
         
         if pagination.search:
-            search_term = f"%{pagination.search}%"
-            query = query.filter(or_(
+            # Every branch is served by a trigram index (see add_patient_search_index.sql)
+            search_term = f"%{pagination.search.strip().lower()}%"
+            conditions = [
                 Patient.patient_number.ilike(search_term),
-                Patient.first_name.ilike(search_term),
-                Patient.last_name.ilike(search_term),
-                Patient.email.ilike(search_term),
-                Patient.phone.ilike(search_term)
-            ))
+                Patient.search_name.ilike(search_term),
+                Patient.email.ilike(search_term)
+            ]
+            if looks_like_phone(pagination.search):
+                conditions.append(Patient.phone_normalized.like(f"%{normalize_phone(pagination.search)}%"))
+            query = query.filter(or_(*conditions))
         
         total = query.count()
         patients = query.offset(pagination.offset).limit(pagination.per_page).all()
@@ -134,6 +137,26 @@ async def import_patients(file: UploadFile = File(...), current_user: dict = Dep
         message=f"Imported {imported_count} patients successfully"
     )
 
+@router.get("/patients/search", response_model=BaseResponse)
+def search_patients(
+    q: str = Query(..., min_length=1, description="Name, phone or patient number"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Ranked fuzzy patient lookup: typos in names, partial phones and patient numbers"""
+    data = patient_search_service.search(current_user["tenant_id"], q, limit)
+    return BaseResponse(success=True, message="Patients retrieved successfully", data=data)
+
+@router.get("/patients/typeahead", response_model=BaseResponse)
+def typeahead_patients(
+    q: str = Query(..., min_length=1, description="Start of a name, phone or patient number"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """Prefix suggestions from the in-memory patient index"""
+    data = patient_search_service.typeahead(current_user["tenant_id"], q, limit)
+    return BaseResponse(success=True, message="Patients retrieved successfully", data=data)
+
 @router.get("/patients/{patient_id}", response_model=BaseResponse)
 async def get_patient(patient_id: int, current_user: dict = Depends(get_current_user)):
     from core.database.connection import db_manager
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import HTMLResponse
+from typing import Dict, Any
 
 from api.schemas.common import BaseResponse, PaginatedResponse, PaginationParams
 from api.schemas.health_schema.sample_collection_schema import SampleCollectionCreateSchema, SampleCollectionUpdateSchema
 from api.middleware.auth_middleware import get_current_user
 from modules.health_module.services.sample_collection_service import SampleCollectionService
+from modules.health_module.models.sample_collection_entity import SampleCollection
+from core.database.connection import db_manager
+from core.shared.utils.barcode_utils import build_labels, render_label_sheet
 
 router = APIRouter()
 
@@ -38,6 +43,33 @@ async def create_sample_collection(collection_data: SampleCollectionCreateSchema
         data={"id": collection.id}
     )
 
+@router.post("/sample-collections/labels")
+def get_sample_labels(request_data: Dict[str, Any], current_user: dict = Depends(get_current_user)):
+    """
+    Sample tube labels for many collections: {"collection_ids": [...], "format": "svg"|"png",
+    "as_html": false, "columns": 3}
+    """
+    collection_ids = request_data.get("collection_ids") or []
+    if not collection_ids or len(collection_ids) > 1000:
+        raise HTTPException(status_code=400, detail="collection_ids must contain 1 to 1000 ids")
+    output_format = request_data.get("format", "svg")
+    if output_format not in ("svg", "png"):
+        raise HTTPException(status_code=400, detail="Unsupported format")
+
+    with db_manager.get_session() as session:
+        rows = session.query(SampleCollection.id, SampleCollection.collection_number, SampleCollection.patient_name).filter(
+            SampleCollection.tenant_id == current_user["tenant_id"],
+            SampleCollection.id.in_(collection_ids),
+            SampleCollection.is_deleted == False
+        ).order_by(SampleCollection.id).all()
+    entries = [{"id": row.id, "value": row.collection_number, "title": row.collection_number,
+                "subtitle": row.patient_name} for row in rows]
+
+    labels = build_labels(entries, "barcode", output_format)
+    if request_data.get("as_html"):
+        return HTMLResponse(render_label_sheet(labels, int(request_data.get("columns", 3))))
+    return BaseResponse(success=True, message="Sample labels generated successfully", data=labels)
+
 @router.get("/sample-collections/{collection_id}", response_model=BaseResponse)
 async def get_sample_collection(collection_id: int, current_user: dict = Depends(get_current_user)):
     service = SampleCollectionService()
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Header
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional
 from sqlalchemy import or_
 import math
+import mimetypes
 
 from api.schemas.common import BaseResponse, PaginatedResponse, PaginationParams
 from api.middleware.auth_middleware import get_current_user
 from modules.health_module.services.test_panel_service import TestPanelService
 from modules.health_module.services.test_result_service import TestResultService
+from modules.health_module.services.lab_report_service import lab_report_service, run_lab_report_batch_job
+from modules.admin_module.services.job_service import JobService
+from modules.health_module.services.test_result_file_service import test_result_file_service
+from core.shared.utils.file_storage import get_file_storage
+from core.shared.utils.http_range import range_file_response, range_stream_response
 
 router = APIRouter()
 
@@ -58,7 +66,8 @@ async def get_test_result(result_id: int, current_user: dict = Depends(get_curre
                 "file_size": file.file_size,
                 "acquisition_date": file.acquisition_date.isoformat() if file.acquisition_date else None,
                 "description": file.description,
-                "storage_system": file.storage_system
+                "storage_system": file.storage_system,
+                "content_sha256": file.content_sha256
             } for file in files]
         }
     )
@@ -105,3 +114,133 @@ async def get_test_results_by_order(order_id: int, current_user: dict = Depends(
             "created_at": result.created_at.isoformat() if result.created_at else None
         } for result in results]
     )
+
+@router.get("/testresults/{result_id}/report")
+def get_test_result_report(result_id: int, current_user: dict = Depends(get_current_user)):
+    """Lab report PDF; rendered once per result version and served from the report cache"""
+    path = lab_report_service.get_report_path(current_user["tenant_id"], result_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Test result not found")
+    return FileResponse(path, media_type="application/pdf", filename=path.rsplit('/', 1)[-1])
+
+@router.post("/testresults/reports/batch", response_model=BaseResponse)
+async def create_test_result_report_batch(
+    report_date: str = Query(..., regex=r"^\d{4}-\d{2}-\d{2}$"),
+    branch_id: Optional[int] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Render all lab reports of a day (optionally one collection center) into a ZIP in the background"""
+    job_id = JobService.submit(
+        "LAB_REPORT_BATCH", current_user["tenant_id"], current_user.get("username"),
+        run_lab_report_batch_job, current_user["tenant_id"], report_date, branch_id,
+        params={"report_date": report_date, "branch_id": branch_id}
+    )
+    return BaseResponse(
+        success=True,
+        message="Lab report batch queued",
+        data={"job_id": job_id}
+    )
+
+@router.post("/testresults/{result_id}/files/uploads", response_model=BaseResponse)
+def create_test_result_file_upload(result_id: int, upload_data: Dict[str, Any], current_user: dict = Depends(get_current_user)):
+    """
+    Open a resumable upload: {"file_name", "file_size", "file_format", "description",
+    "acquisition_date", "sha256"}. Returns the upload id, chunk size and chunk count.
+    """
+    if not upload_data.get("file_name") or not upload_data.get("file_size"):
+        raise HTTPException(status_code=400, detail="file_name and file_size are required")
+    try:
+        data = test_result_file_service.create_upload(
+            current_user["tenant_id"], result_id, current_user["username"],
+            upload_data["file_name"], int(upload_data["file_size"]),
+            upload_data.get("file_format"), upload_data.get("description"),
+            upload_data.get("acquisition_date"), upload_data.get("sha256")
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BaseResponse(success=True, message="Upload created successfully", data=data)
+
+@router.get("/testresults/files/uploads/{upload_id}", response_model=BaseResponse)
+def get_test_result_file_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """Upload progress; resume by sending the chunks missing from received_chunks"""
+    try:
+        data = test_result_file_service.get_upload(current_user["tenant_id"], upload_id)
+    except (LookupError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return BaseResponse(success=True, message="Upload retrieved successfully", data=data)
+
+@router.put("/testresults/files/uploads/{upload_id}/chunks/{index}", response_model=BaseResponse)
+async def put_test_result_file_chunk(upload_id: str, index: int, request: Request, current_user: dict = Depends(get_current_user)):
+    """Raw chunk bytes as the request body; streamed to storage without buffering the chunk"""
+    try:
+        handle, expected = await run_in_threadpool(
+            test_result_file_service.open_chunk, current_user["tenant_id"], upload_id, index
+        )
+    except (LookupError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > expected:
+                break
+            await run_in_threadpool(handle.write, chunk)
+        size = await run_in_threadpool(
+            test_result_file_service.commit_chunk, upload_id, index, handle, expected, received
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        test_result_file_service.discard_chunk(handle)
+        raise
+    return BaseResponse(success=True, message="Chunk stored", data={"index": index, "size": size})
+
+@router.post("/testresults/files/uploads/{upload_id}/complete", response_model=BaseResponse)
+def complete_test_result_file_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """Assemble the chunks, verify and store the file, and attach it to the test result"""
+    try:
+        data = test_result_file_service.complete_upload(current_user["tenant_id"], upload_id)
+    except (LookupError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BaseResponse(success=True, message="File uploaded successfully", data=data)
+
+@router.delete("/testresults/files/uploads/{upload_id}", response_model=BaseResponse)
+def abort_test_result_file_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    try:
+        test_result_file_service.abort_upload(current_user["tenant_id"], upload_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return BaseResponse(success=True, message="Upload cancelled")
+
+@router.get("/testresults/{result_id}/files/{file_id}/content")
+def download_test_result_file(result_id: int, file_id: int, range_header: Optional[str] = Header(None, alias="Range"),
+                              current_user: dict = Depends(get_current_user)):
+    """File content with Range support; local files are served with sendfile"""
+    result_file = test_result_file_service.get_file(current_user["tenant_id"], result_id, file_id)
+    if not result_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        # Only files uploaded through the storage API carry a content hash
+        if not result_file.content_sha256:
+            raise ValueError(result_file.storage_system)
+        storage = get_file_storage(result_file.storage_system)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File content is not held by this server")
+
+    media_type = mimetypes.guess_type(result_file.file_name or '')[0] or "application/octet-stream"
+    etag = f'"{result_file.content_sha256}"' if result_file.content_sha256 else None
+    path = storage.local_path(result_file.file_path)
+    if path:
+        return range_file_response(path, media_type, result_file.file_name, range_header, etag)
+    size = storage.head_object(result_file.file_path)
+    if size is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return range_stream_response(size, lambda start, end: storage.get_object_range(result_file.file_path, start, end),
+                                 media_type, result_file.file_name, range_header, etag)
@@ -130,6 +130,42 @@ async def create_product(product_data: Dict[str, Any], current_user: dict = Depe
 
 
 
+@router.post("/products/labels")
+def get_product_labels(request_data: Dict[str, Any], current_user: dict = Depends(get_current_user)):
+    """
+    Barcode labels for many products: {"product_ids": [...], "format": "svg"|"png",
+    "symbology": "code128"|"qr", "as_html": false, "columns": 3}
+    """
+    from fastapi.responses import HTMLResponse
+    from modules.inventory_module.models.entities import Product
+    from core.shared.utils.barcode_utils import build_labels, render_label_sheet
+
+    product_ids = request_data.get('product_ids') or []
+    if not product_ids or len(product_ids) > 1000:
+        raise HTTPException(status_code=400, detail="product_ids must contain 1 to 1000 ids")
+    output_format = request_data.get('format', 'svg')
+    symbology = request_data.get('symbology', 'code128')
+    if output_format not in ('svg', 'png') or symbology not in ('code128', 'code39', 'qr'):
+        raise HTTPException(status_code=400, detail="Unsupported format or symbology")
+
+    with db_manager.get_session() as session:
+        rows = session.query(Product.id, Product.code, Product.name, Product.barcode).filter(
+            Product.tenant_id == current_user['tenant_id'],
+            Product.id.in_(product_ids),
+            Product.is_deleted == False
+        ).all()
+    by_id = {row.id: row for row in rows}
+    entries = [{"id": by_id[pid].id, "value": by_id[pid].barcode or by_id[pid].code,
+                "title": by_id[pid].code, "subtitle": by_id[pid].name}
+               for pid in product_ids if pid in by_id and (by_id[pid].barcode or by_id[pid].code)]
+
+    labels = build_labels(entries, 'qr' if symbology == 'qr' else 'barcode', output_format,
+                          symbology if symbology != 'qr' else 'code128')
+    if request_data.get('as_html'):
+        return HTMLResponse(render_label_sheet(labels, int(request_data.get('columns', 3))))
+    return BaseResponse(success=True, message="Product labels generated successfully", data=labels)
+
+
 @router.get("/products/get/{product_id}", response_model=BaseResponse)
 async def get_product(product_id: int, current_user: dict = Depends(get_current_user)):
     from core.database.connection import db_manager
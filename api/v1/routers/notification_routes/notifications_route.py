@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional
+from api.schemas.common import BaseResponse
 from api.middleware.auth_middleware import get_current_user
 from core.shared.services.notification_service import NotificationService
+from core.shared.services.email_outbox import email_outbox
+from modules.account_module.services.payment_reminder_service import payment_reminder_service
 
 router = APIRouter()
 
@@ -10,22 +14,61 @@ class EmailRequest(BaseModel):
     subject: str
     body: str
 
+class ReminderCampaignRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    subject_template: Optional[str] = None
+    body_template: Optional[str] = None
+    min_balance: float = Field(0, ge=0)
+    min_days_overdue: int = Field(0, ge=0)
+    rate_per_minute: int = Field(60, ge=1, le=6000)
+
+def _queued(outbox_id):
+    return {"status": "queued", "id": outbox_id} if outbox_id else {"status": "skipped", "id": None}
+
 @router.post("/send-email")
 def send_email(req: EmailRequest, current_user: dict = Depends(get_current_user)):
-    success = NotificationService.send_email(req.to_email, req.subject, req.body, current_user['tenant_id'])
-    return {"status": "sent" if success else "failed"}
+    outbox_id = NotificationService.send_email(req.to_email, req.subject, req.body, current_user['tenant_id'],
+                                               created_by=current_user.get('username'))
+    return _queued(outbox_id)
 
 @router.post("/invoice-email/{voucher_id}")
 def send_invoice(voucher_id: int, current_user: dict = Depends(get_current_user)):
-    success = NotificationService.send_invoice_email(voucher_id, current_user['tenant_id'])
-    return {"status": "sent" if success else "failed"}
+    return _queued(NotificationService.send_invoice_email(voucher_id, current_user['tenant_id']))
 
 @router.post("/payment-reminder/{party_id}")
 def send_reminder(party_id: int, current_user: dict = Depends(get_current_user)):
-    success = NotificationService.send_payment_reminder(party_id, current_user['tenant_id'])
-    return {"status": "sent" if success else "failed"}
+    return _queued(NotificationService.send_payment_reminder(party_id, current_user['tenant_id']))
 
 @router.post("/low-stock-alert/{product_id}")
 def send_stock_alert(product_id: int, current_user: dict = Depends(get_current_user)):
-    success = NotificationService.send_low_stock_alert(product_id, current_user['tenant_id'])
-    return {"status": "sent" if success else "failed"}
+    return _queued(NotificationService.send_low_stock_alert(product_id, current_user['tenant_id']))
+
+@router.get("/outbox/{outbox_id}")
+def get_outbox_message(outbox_id: int, current_user: dict = Depends(get_current_user)):
+    """Delivery state of a queued email"""
+    message = email_outbox.get(outbox_id, current_user['tenant_id'])
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
+
+@router.post("/payment-reminder-campaigns", response_model=BaseResponse)
+def create_reminder_campaign(req: ReminderCampaignRequest, current_user: dict = Depends(get_current_user)):
+    """Remind every customer with an open balance; runs as one background job"""
+    data = payment_reminder_service.create_campaign(
+        current_user['tenant_id'], current_user.get('username'), req.name, req.subject_template,
+        req.body_template, req.min_balance, req.min_days_overdue, req.rate_per_minute
+    )
+    return BaseResponse(success=True, message="Payment reminder campaign queued", data=data)
+
+@router.get("/payment-reminder-campaigns", response_model=BaseResponse)
+def list_reminder_campaigns(limit: int = Query(50, ge=1, le=500), current_user: dict = Depends(get_current_user)):
+    data = payment_reminder_service.list_campaigns(current_user['tenant_id'], limit)
+    return BaseResponse(success=True, message="Payment reminder campaigns retrieved successfully", data=data)
+
+@router.get("/payment-reminder-campaigns/{campaign_id}", response_model=BaseResponse)
+def get_reminder_campaign(campaign_id: int, current_user: dict = Depends(get_current_user)):
+    """Campaign state with delivery counts of its messages"""
+    data = payment_reminder_service.get_campaign(campaign_id, current_user['tenant_id'])
+    if not data:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return BaseResponse(success=True, message="Payment reminder campaign retrieved successfully", data=data)
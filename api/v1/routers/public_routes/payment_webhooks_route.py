@@ -0,0 +1,62 @@
+import hashlib
+import hmac
+import json
+import os
+from fastapi import APIRouter, HTTPException, Header, Request
+from typing import Optional
+from api.schemas.common import BaseResponse
+from modules.account_module.services.payment_webhook_service import payment_webhook_service
+from core.shared.utils.logger import logger
+
+router = APIRouter()
+
+
+def _verify_signature(gateway: str, body: bytes, signature: Optional[str]) -> bool:
+    """HMAC-SHA256 of the raw body with PAYMENT_WEBHOOK_SECRET_<GATEWAY> (or PAYMENT_WEBHOOK_SECRET)"""
+    secret = os.getenv(f"PAYMENT_WEBHOOK_SECRET_{gateway.upper()}") or os.getenv("PAYMENT_WEBHOOK_SECRET")
+    if not secret:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return bool(signature) and hmac.compare_digest(expected, signature.strip().lower())
+
+
+@router.post("/webhooks/{gateway}", response_model=BaseResponse)
+async def receive_payment_webhook(gateway: str, request: Request,
+                                  x_webhook_signature: Optional[str] = Header(None)):
+    """
+    Gateway payment notification. The event is stored (deduplicated by the gateway's
+    transaction id) and acknowledged at once; payments are posted by the webhook processor.
+    Expected body: transaction_id, status, and payment_id or tenant_id + payment_number;
+    optional transaction_reference and fee.
+    """
+    body = await request.body()
+    if len(gateway) > 50 or not _verify_signature(gateway, body, x_webhook_signature):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(payload, dict) or not payload.get("transaction_id") or not payload.get("status"):
+        raise HTTPException(status_code=400, detail="transaction_id and status are required")
+    if not payload.get("payment_id") and not (payload.get("tenant_id") and payload.get("payment_number")):
+        raise HTTPException(status_code=400, detail="payment_id or tenant_id and payment_number are required")
+
+    try:
+        result = payment_webhook_service.ingest(
+            gateway=gateway,
+            gateway_transaction_id=str(payload["transaction_id"])[:100],
+            gateway_status=str(payload["status"]),
+            payload=payload,
+            payment_id=int(payload["payment_id"]) if payload.get("payment_id") else None,
+            tenant_id=int(payload["tenant_id"]) if payload.get("tenant_id") else None,
+            transaction_reference=payload.get("transaction_reference"),
+            gateway_fee=payload.get("fee")
+        )
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error storing payment webhook: {str(e)}", "PaymentWebhookRoute")
+        raise HTTPException(status_code=500, detail="Webhook could not be stored, please retry")
+
+    return BaseResponse(success=True, message="Duplicate event" if result["duplicate"] else "Event accepted",
+                        data=result)
@@ -1,21 +1,23 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import Response
+from typing import Optional
 from api.schemas.common import BaseResponse
-from modules.health_module.services.test_result_service import TestResultService
-from core.shared.utils.crypto_utils import crypto_utils
-from core.shared.utils.barcode_utils import BarcodeGenerator
+from modules.health_module.services.public_result_bundle_service import public_result_bundle_service
+from core.shared.utils.http_range import if_none_match as etag_matches
 from core.shared.utils.logger import logger
 
 router = APIRouter()
 
 @router.get("/test-results/{encrypted_result_no}", response_model=BaseResponse)
-async def get_public_test_result(encrypted_result_no: str):
+async def get_public_test_result(encrypted_result_no: str, if_none_match: Optional[str] = Header(None)):
     """
     Public endpoint to fetch test result by encrypted result_no.
-    Decrypts the result_no and returns result details with barcode.
+    Serves the bundle rendered when the result was saved (details, files, tenant,
+    order and QR code); answers 304 when the client's ETag is still current.
     """
     try:
         # Decrypt result_no
-        result_number = crypto_utils.decrypt(encrypted_result_no)
+        result_number = public_result_bundle_service.resolve_token(encrypted_result_no)
         
         if not result_number:
             raise HTTPException(
@@ -27,11 +29,9 @@ async def get_public_test_result(encrypted_result_no: str):
                 }
             )
         
-        # Fetch result with barcode
-        service = TestResultService()
-        result = service.get_by_result_number(result_number)
+        bundle = public_result_bundle_service.get(result_number)
         
-        if not result:
+        if not bundle:
             raise HTTPException(
                 status_code=404,
                 detail={
@@ -41,75 +41,11 @@ async def get_public_test_result(encrypted_result_no: str):
                 }
             )
         
-        # Get details and files
-        details = service.get_details(result.id)
-        files = service.get_files(result.id)
-        
-        # Extract tenant and test_order data
-        tenant = getattr(result, 'tenant', None)
-        test_order = getattr(result, 'test_order', None)
-        
-        # Generate QR code
-        qr_code = None
-        try:
-            qr_data = crypto_utils.generate_test_result_url(result.result_number)
-            qr_code = BarcodeGenerator.generate_qr_code(qr_data)
-        except Exception as qr_error:
-            logger.error(f"QR code generation failed: {str(qr_error)}", "PublicTestResultRoute")
-        
-        return BaseResponse(
-            success=True,
-            message="Your test results are ready for viewing",
-            data={
-                "header": "Test Results Available",
-                "tenant": {
-                    "name": tenant.name if tenant else None,
-                    "code": tenant.code if tenant else None,
-                    "logo": tenant.logo if tenant else None,
-                    "tagline": tenant.tagline if tenant else None,
-                    "address": tenant.address if tenant else None
-                } if tenant else None,
-                "test_order": {
-                    "id": test_order.id if test_order else None,
-                    "test_order_number": test_order.test_order_number if test_order else None,
-                    "order_date": test_order.order_date.isoformat() if test_order and test_order.order_date else None,
-                    "patient_name": test_order.patient_name if test_order else None,
-                    "patient_phone": test_order.patient_phone if test_order else None,
-                    "doctor_name": test_order.doctor_name if test_order else None,
-                    "doctor_phone": test_order.doctor_phone if test_order else None,
-                    "doctor_license_number": test_order.doctor_license_number if test_order else None,
-                    "urgency": test_order.urgency if test_order else None,
-                    "status": test_order.status if test_order else None
-                } if test_order else None,
-                "result": {
-                    "id": result.id,
-                    "result_number": result.result_number,
-                    "result_date": result.result_date.isoformat() if result.result_date else None,
-                    "overall_report": result.overall_report,
-                    "performed_by": result.performed_by,
-                    "result_type": result.result_type,
-                    "notes": result.notes,
-                    "license_number": result.license_number,
-                    "qr_code": qr_code,
-                    "details": [{
-                        "parameter_name": detail.parameter_name,
-                        "unit": detail.unit,
-                        "parameter_value": detail.parameter_value,
-                        "reference_value": detail.reference_value,
-                        "verdict": detail.verdict,
-                        "notes": detail.notes
-                    } for detail in details],
-                    "files": [{
-                        "file_name": file.file_name,
-                        "file_path": file.file_path,
-                        "file_format": file.file_format,
-                        "file_size": file.file_size,
-                        "description": file.description
-                    } for file in files]
-                },
-                "action": "View Results"
-            }
-        )
+        body, etag = bundle
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
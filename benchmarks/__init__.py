@@ -0,0 +1,14 @@
+"""
+Benchmarks for the accounting and inventory hot paths.
+
+Run against a local database loaded with core.database.synthetic_data:
+
+    python -m core.database.synthetic_data --tenants 1 --scale 0.1
+    python -m benchmarks micro --output benchmarks/results/before.json
+    ... change something ...
+    python -m benchmarks micro --baseline benchmarks/results/before.json
+
+micro times services in-process (p50/p95/p99, SQL statements per call, and
+throughput under --concurrency threads); load drives a running API with
+concurrent virtual users. See docs/BENCHMARKS.md.
+"""
@@ -0,0 +1,90 @@
+"""
+python -m benchmarks micro [--tenant SYN0001] [--case NAME ...] [--rounds 50] [--concurrency 1,8]
+python -m benchmarks load  [--url http://localhost:8000] [--concurrency 1,8,32] [--duration 30]
+python -m benchmarks import-time [--budget-ms 800]
+
+micro and load write their results to --output and, given --baseline, compare
+against it and exit with status 1 when an operation regressed by more than
+--tolerance (p95 latency or throughput) or issues more queries than before.
+import-time exits with status 1 when importing the API exceeds its budget or
+loads a library that must stay lazy.
+"""
+import argparse
+import os
+import sys
+from benchmarks import harness
+
+
+def _levels(value: str):
+    return [int(level) for level in value.split(',') if level.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Accounting and inventory benchmarks")
+    parser.add_argument("--tenant", default="SYN0001", help="code of a tenant loaded by core.database.synthetic_data")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<kind>.json)")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p95/throughput change (0.10 = 10%%)")
+    parser.add_argument("--seed", type=int, default=1)
+    commands = parser.add_subparsers(dest="kind", required=True)
+
+    micro = commands.add_parser("micro", help="in-process service benchmarks")
+    micro.add_argument("--case", action="append", help="case to run (repeatable; default all)")
+    micro.add_argument("--rounds", type=int, default=50)
+    micro.add_argument("--warmup", type=int, default=5)
+    micro.add_argument("--concurrency", type=_levels, default=[1], help="comma-separated thread counts")
+
+    load = commands.add_parser("load", help="HTTP load scenarios against a running API")
+    load.add_argument("--url", default="http://localhost:8000")
+    load.add_argument("--password", default="Bench@123", help="password of the tenant's bench_ user")
+    load.add_argument("--concurrency", type=_levels, default=[1, 8, 32], help="comma-separated user counts")
+    load.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+
+    imports = commands.add_parser("import-time", help="check the API's import time against a budget")
+    imports.add_argument("--budget-ms", type=float, default=float(os.getenv('IMPORT_BUDGET_MS', 800)))
+    imports.add_argument("--module", default="api.main")
+
+    args = parser.parse_args(argv)
+    if args.kind == "import-time":
+        from benchmarks import import_time
+        sys.exit(0 if import_time.check(args.budget_ms, args.module) else 1)
+
+    results = []
+    if args.kind == "micro":
+        from core.database.connection import db_manager
+        from benchmarks.micro import CASES, BenchContext
+        unknown = set(args.case or []) - set(CASES)
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}; known: {', '.join(CASES)}")
+        harness.count_queries(db_manager._engine)
+        ctx = BenchContext(args.tenant, args.seed)
+        ctx.activate()
+        for name in args.case or CASES:
+            operation, setup = CASES[name](ctx)
+            for level in args.concurrency:
+                label = name if level == 1 else f"{name} @{level}"
+                results.append(harness.measure(label, operation, setup, args.rounds, args.warmup, level))
+                print(f"  {label}: p95 {results[-1]['p95_ms']:.2f} ms", file=sys.stderr)
+        settings = {"tenant": args.tenant, "rounds": args.rounds, "concurrency": args.concurrency}
+    else:
+        from benchmarks import load as load_runner
+        data = load_runner.fixtures(args.tenant)
+        token = load_runner.login(args.url, data["username"], args.password)
+        for level in args.concurrency:
+            print(f"  {level} user(s) for {args.duration:.0f}s", file=sys.stderr)
+            results.extend(load_runner.run(args.url, data, token, level, args.duration, args.seed))
+        settings = {"tenant": args.tenant, "url": args.url, "duration": args.duration,
+                    "concurrency": args.concurrency}
+
+    harness.print_results(results)
+    harness.save(args.output or f"benchmarks/results/{args.kind}.json", args.kind, results, settings)
+
+    if args.baseline:
+        rows = harness.compare(results, harness.load(args.baseline), args.tolerance)
+        harness.print_comparison(rows)
+        if any(row["status"] == "regressed" for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
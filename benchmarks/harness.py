@@ -0,0 +1,194 @@
+"""
+Timing, query counting and baseline comparison shared by the micro and load runners.
+
+A result is one dict per operation:
+
+    {"name", "ops", "errors", "concurrency", "p50_ms", "p95_ms", "p99_ms", "mean_ms",
+     "queries_per_op", "throughput"}
+
+Result files carry metadata (git commit, host, time) next to the results so a
+baseline says where it came from.
+"""
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import event
+
+_counter: ContextVar[Optional[list]] = ContextVar('benchmark_query_counter', default=None)
+_installed = set()
+
+
+def count_queries(engine):
+    """Count the statements each benchmarked call issues; safe to call more than once per engine"""
+    if id(engine) in _installed:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    _installed.add(id(engine))
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not samples:
+        return 0.0
+    rank = (len(samples) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (rank - low)
+
+
+def summarize(name: str, seconds: List[float], queries: List[int], errors: int, wall: float,
+              concurrency: int) -> Dict:
+    ordered = sorted(seconds)
+    return {
+        "name": name,
+        "ops": len(ordered),
+        "errors": errors,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "queries_per_op": round(sum(queries) / len(queries), 2) if queries else None,
+        "throughput": round(len(ordered) / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def measure(name: str, operation: Callable, setup: Optional[Callable] = None, rounds: int = 50, warmup: int = 5,
+            concurrency: int = 1) -> Dict:
+    """
+    Call operation(setup()) `rounds` times after `warmup` untimed calls. setup runs
+    outside the timed region, so per-call fixtures (a fresh voucher, a new invoice
+    number) do not count. With concurrency > 1 the rounds are shared by that many
+    threads and throughput is rounds over wall time.
+    """
+    for _ in range(warmup):
+        operation(setup() if setup else None)
+
+    seconds: List[float] = []
+    queries: List[int] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one_round(_):
+        argument = setup() if setup else None
+        counter = [0]
+        token = _counter.set(counter)
+        start = time.perf_counter()
+        try:
+            operation(argument)
+            failed = False
+        except Exception:
+            failed = True
+        finally:
+            elapsed = time.perf_counter() - start
+            _counter.reset(token)
+        with lock:
+            if failed:
+                errors[0] += 1
+            else:
+                seconds.append(elapsed)
+                queries.append(counter[0])
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one_round, range(rounds)))
+    else:
+        for n in range(rounds):
+            one_round(n)
+    return summarize(name, seconds, queries, errors[0], time.perf_counter() - started, concurrency)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path: str, kind: str, results: List[Dict], settings: Dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    document = {"kind": kind, "at": datetime.now().isoformat(), "commit": _git_commit(),
+                "host": platform.node(), "python": platform.python_version(), "settings": settings,
+                "results": results}
+    with open(path, 'w') as handle:
+        json.dump(document, handle, indent=2)
+
+
+def load(path: str) -> Dict[str, Dict]:
+    with open(path) as handle:
+        return {result["name"]: result for result in json.load(handle)["results"]}
+
+
+def _error_rate(result: Dict) -> float:
+    # Runs are time-bound, so compare errors per attempted operation rather than counts
+    attempts = result["ops"] + result["errors"]
+    return result["errors"] / attempts if attempts else 0.0
+
+
+def compare(results: List[Dict], baseline: Dict[str, Dict], tolerance: float) -> List[Dict]:
+    """
+    Per operation: p95 and throughput change against the baseline, and any rise in
+    queries or errors per operation. An operation regresses when p95 grows or
+    throughput drops by more than `tolerance` (0.10 = 10%), or it issues more
+    queries or fails more often than in the baseline.
+    """
+    rows = []
+    for result in results:
+        base = baseline.get(result["name"])
+        if base is None:
+            rows.append({"name": result["name"], "status": "new"})
+            continue
+        p95 = (result["p95_ms"] / base["p95_ms"] - 1) if base["p95_ms"] else 0.0
+        throughput = (result["throughput"] / base["throughput"] - 1) if base["throughput"] else 0.0
+        queries = None
+        if result["queries_per_op"] is not None and base.get("queries_per_op") is not None:
+            queries = result["queries_per_op"] - base["queries_per_op"]
+        errors = None
+        if base.get("errors") is not None:
+            errors = _error_rate(result) - _error_rate(base)
+        regressed = (p95 > tolerance or throughput < -tolerance or (queries is not None and queries > 0)
+                     or (errors is not None and errors > 0))
+        improved = (p95 < -tolerance or throughput > tolerance or (queries is not None and queries < 0)
+                    or (errors is not None and errors < 0))
+        rows.append({"name": result["name"], "p95_change": p95, "throughput_change": throughput,
+                     "queries_change": queries, "errors_change": errors,
+                     "status": "regressed" if regressed else "improved" if improved else "same"})
+    return rows
+
+
+def print_results(results: List[Dict]):
+    print(f"{'operation':<40} {'c':>3} {'ops':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'q/op':>7} {'ops/s':>9}")
+    for r in results:
+        queries = '-' if r["queries_per_op"] is None else f"{r['queries_per_op']:.1f}"
+        print(f"{r['name']:<40} {r['concurrency']:>3} {r['ops']:>6} {r['errors']:>4} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {queries:>7} {r['throughput']:>9.1f}")
+
+
+def print_comparison(rows: List[Dict]):
+    print(f"\n{'operation':<40} {'p95':>8} {'ops/s':>8} {'q/op':>6} {'err':>7}  status")
+    for row in rows:
+        if row["status"] == "new":
+            print(f"{row['name']:<40} {'':>8} {'':>8} {'':>6} {'':>7}  new")
+            continue
+        queries = '' if row["queries_change"] is None else f"{row['queries_change']:+.1f}"
+        errors = '' if row["errors_change"] is None else f"{row['errors_change']:+.1%}"
+        print(f"{row['name']:<40} {row['p95_change']:>+8.1%} {row['throughput_change']:>+8.1%} {queries:>6} "
+              f"{errors:>7}  {row['status']}")
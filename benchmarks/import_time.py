@@ -0,0 +1,54 @@
+"""
+Import-time budget for the API.
+
+Imports api.main in a fresh interpreter with -X importtime, reports the
+slowest top-level imports, and fails when the total exceeds the budget or a
+library that must load lazily (report, spreadsheet, barcode, crypto, desktop
+UI) was imported at startup.
+"""
+import ast
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Loaded inside the functions that use them, never at startup
+LAZY_MODULES = ('reportlab', 'openpyxl', 'pandas', 'numpy', 'barcode', 'qrcode', 'PIL', 'cryptography',
+                'customtkinter', 'tkinter', 'pyinstrument')
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+_PROBE = "import sys; import {module}; print(sorted({{m.split('.')[0] for m in sys.modules}}))"
+
+
+def measure(module: str = "api.main") -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """(total ms, [(top-level package, cumulative ms)] slowest first, loaded top-level module names)"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-4000:]}")
+
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        if depth == 1:
+            # Outermost imports: their cumulative times add up to the whole startup
+            total += cumulative
+            top = name.split('.')[0]
+            packages[top] = packages.get(top, 0.0) + cumulative
+    loaded = ast.literal_eval(completed.stdout.strip().splitlines()[-1])
+    return total, sorted(packages.items(), key=lambda item: item[1], reverse=True), loaded
+
+
+def check(budget_ms: float, module: str = "api.main", top: int = 15) -> bool:
+    total, packages, loaded = measure(module)
+    print(f"import {module}: {total:.0f} ms (budget {budget_ms:.0f} ms)")
+    for name, ms in packages[:top]:
+        print(f"  {name:<30} {ms:>8.1f} ms")
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"loaded at startup but should be lazy: {', '.join(eager)}")
+    return total <= budget_ms and not eager
@@ -0,0 +1,137 @@
+"""
+HTTP load scenarios against a running API.
+
+Virtual users log in as the synthetic tenant's bench_ user and loop over a
+weighted mix of requests for a fixed duration, once per concurrency level.
+Latency is measured per scenario at the client; queries per request are read
+from X-Query-Count when the server runs with QUERY_DETECTOR=true.
+"""
+import random
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from benchmarks.harness import summarize
+
+# name, weight, request builder(user) -> (method, path, json body or None)
+Scenario = Tuple[str, int, Callable]
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, token: str, fixtures: Dict, seed: int):
+        self.base_url = base_url
+        self.fixtures = fixtures
+        self.rng = random.Random(seed)
+        self.http = requests.Session()
+        self.http.headers["Authorization"] = f"Bearer {token}"
+
+    def hot(self, key: str):
+        """Mostly the first few ids of a fixture list, sometimes any of them"""
+        ids = self.fixtures[key]
+        return ids[min(int(self.rng.expovariate(0.3)), len(ids) - 1)]
+
+
+def _sales_invoice(user: VirtualUser):
+    product = user.hot('products')
+    quantity = user.rng.randrange(1, 5)
+    price = product["price"]
+    taxable = round(price * quantity, 2)
+    half = round(taxable * product["gst"] / 200, 2)
+    total = round(taxable + 2 * half, 2)
+    return "POST", "/api/v1/inventory/sales-invoices", {
+        "invoice_number": f"LOAD-{uuid.uuid4().hex[:12]}", "invoice_date": date.today().isoformat(),
+        "customer_id": user.hot('customers'), "warehouse_id": user.fixtures['warehouse_id'],
+        "base_currency_id": user.fixtures['currency_id'], "cgst_amount_base": half, "sgst_amount_base": half,
+        "subtotal_base": taxable, "tax_amount_base": round(2 * half, 2), "total_amount_base": total,
+        "items": [{"line_no": 1, "product_id": product["id"], "quantity": quantity, "unit_price_base": price,
+                   "unit_cost_base": product["cost"], "taxable_amount_base": taxable,
+                   "cgst_rate": product["gst"] / 2, "cgst_amount_base": half, "sgst_rate": product["gst"] / 2,
+                   "sgst_amount_base": half, "tax_amount_base": round(2 * half, 2), "total_amount_base": total}]}
+
+
+SCENARIOS: List[Scenario] = [
+    ("GET dashboard/kpis", 15, lambda u: ("GET", "/api/v1/dashboard/kpis", None)),
+    ("GET admin/menus/me", 15, lambda u: ("GET", "/api/v1/admin/menus/me", None)),
+    ("GET account/ledger", 15, lambda u: ("GET", f"/api/v1/account/ledger?account_id={u.hot('accounts')}"
+                                                 f"&per_page=50", None)),
+    ("GET account/trial-balance", 5, lambda u: ("GET", "/api/v1/account/trial-balance", None)),
+    ("GET inventory/stock-movements", 15, lambda u: ("GET", f"/api/v1/inventory/stock-movements"
+                                                            f"?product_id={u.hot('products')['id']}&per_page=50",
+                                                     None)),
+    ("GET inventory/sales-invoices", 20, lambda u: ("GET", "/api/v1/inventory/sales-invoices?page_size=50", None)),
+    ("POST inventory/sales-invoices", 15, _sales_invoice),
+]
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    response = requests.post(f"{base_url}/api/v1/auth/login", json={"username": username, "password": password},
+                             timeout=30)
+    response.raise_for_status()
+    return response.json()["data"]["access_token"]
+
+
+def fixtures(tenant_code: str) -> Dict:
+    """Ids the scenarios pick from, read from the database the API serves"""
+    from benchmarks.micro import BenchContext
+    ctx = BenchContext(tenant_code)
+    return {
+        "username": ctx.username,
+        "products": [{"id": p.id, "price": float(p.selling_price), "cost": float(p.cost_price),
+                      "gst": float(p.gst_rate or 0)} for p in ctx.products[:500]],
+        "customers": ctx.customers[:2000],
+        "accounts": [a for a in (ctx.accounts.get('ACCOUNTS_RECEIVABLE'), ctx.accounts.get('SALES'),
+                                 ctx.accounts.get('CASH'), ctx.accounts.get('BANK')) if a] + ctx.expense_accounts[:10],
+        "warehouse_id": ctx.warehouse_id,
+        "currency_id": ctx.currency_id,
+    }
+
+
+def run(base_url: str, data: Dict, token: str, concurrency: int, duration: float, seed: int = 1,
+        scenarios: Optional[List[Scenario]] = None) -> List[Dict]:
+    """Run the scenario mix with `concurrency` users for `duration` seconds; one result per scenario"""
+    scenarios = scenarios or SCENARIOS
+    names = [name for name, _, _ in scenarios]
+    weights = [weight for _, weight, _ in scenarios]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    queries: Dict[str, List[int]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user_loop(index: int):
+        user = VirtualUser(base_url, token, data, seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            scenario = user.rng.choices(scenarios, weights)[0]
+            method, path, body = scenario[2](user)
+            start = time.perf_counter()
+            try:
+                response = user.http.request(method, base_url + path, json=body, timeout=120)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                response, ok = None, False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if not ok:
+                    errors[scenario[0]] += 1
+                    continue
+                samples[scenario[0]].append(elapsed)
+                count = response.headers.get("X-Query-Count")
+                if count is not None:
+                    queries[scenario[0]].append(int(count))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user_loop, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    results = [summarize(f"load {name} @{concurrency}", samples[name], queries[name], errors[name], wall,
+                         concurrency) for name in names]
+    everything = [s for name in names for s in samples[name]]
+    results.append(summarize(f"load total @{concurrency}", everything,
+                             [q for name in names for q in queries[name]], sum(errors.values()), wall, concurrency))
+    return results
@@ -0,0 +1,214 @@
+"""
+Microbenchmarks: the accounting and inventory hot paths called in-process.
+
+Each case prepares its fixtures from a tenant loaded by
+core.database.synthetic_data and returns (operation, setup). Services are
+called the way their routes call them; operations that only exist as route
+functions (trial balance, stock movements, product import) are awaited
+directly. Write cases add rows to the benchmark tenant.
+"""
+import asyncio
+import io
+import random
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import text
+from core.database.connection import db_manager
+from core.database.synthetic_data import Zipf
+from core.shared.utils.session_manager import session_manager
+
+CASES: Dict[str, Callable] = {}
+
+TWO_PLACES = Decimal('0.01')
+
+
+def case(name: str):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+class BenchContext:
+    """Ids of one synthetic tenant, and the request context its services read"""
+
+    def __init__(self, tenant_code: str, seed: int = 1):
+        self.rng = random.Random(seed)
+        with db_manager.get_session() as session:
+            row = session.execute(text("""
+                SELECT t.id AS tenant_id, u.id AS user_id, u.username
+                FROM tenants t JOIN users u ON u.tenant_id = t.id AND u.is_tenant_admin
+                WHERE t.code = :code ORDER BY u.id LIMIT 1
+            """), {"code": tenant_code}).mappings().first()
+            if row is None:
+                raise ValueError(f"Tenant {tenant_code} with an admin user not found; "
+                                 f"load one with python -m core.database.synthetic_data")
+            self.tenant_id, self.user_id, self.username = row["tenant_id"], row["user_id"], row["username"]
+            params = {"tid": self.tenant_id}
+
+            def ids(sql: str) -> List[int]:
+                return [r[0] for r in session.execute(text(sql), params).fetchall()]
+
+            # Ordered by id: the synthetic generator ranks hot rows first
+            self.products = session.execute(text("""
+                SELECT id, selling_price, cost_price, gst_rate, hsn_code FROM products
+                WHERE tenant_id = :tid AND is_active ORDER BY id
+            """), params).fetchall()
+            self.customers = ids("SELECT id FROM customers WHERE tenant_id = :tid ORDER BY id")
+            self.suppliers = ids("SELECT id FROM suppliers WHERE tenant_id = :tid ORDER BY id")
+            self.warehouse_id = ids("SELECT id FROM warehouses WHERE tenant_id = :tid ORDER BY id LIMIT 1")[0]
+            self.currency_id = session.execute(text("SELECT id FROM currencies WHERE code = 'INR'")).scalar()
+            self.accounts = dict(session.execute(text("""
+                SELECT k.code, ac.account_id FROM account_configurations ac
+                JOIN account_configuration_keys k ON k.id = ac.config_key_id
+                WHERE ac.tenant_id = :tid
+            """), params).fetchall())
+            self.expense_accounts = ids("""
+                SELECT id FROM account_masters WHERE tenant_id = :tid AND account_type = 'EXPENSE' ORDER BY id
+            """)
+            self.journal_type_id = session.execute(text(
+                "SELECT id FROM voucher_types WHERE tenant_id = :tid AND code = 'JOURNAL'"), params).scalar()
+        if not self.products or not self.customers or not self.suppliers:
+            raise ValueError(f"Tenant {tenant_code} has no products, customers or suppliers")
+
+        self.pick_product = Zipf(len(self.products), 1.1, self.rng)
+        self.pick_customer = Zipf(len(self.customers), 0.9, self.rng)
+        self.pick_supplier = Zipf(len(self.suppliers), 1.2, self.rng)
+        self.current_user = {"user_id": self.user_id, "username": self.username, "tenant_id": self.tenant_id}
+
+    def activate(self):
+        """What get_current_user does for a request"""
+        session_manager._session_data.update({'user_id': self.user_id, 'username': self.username,
+                                              'tenant_id': self.tenant_id})
+
+    def invoice_payload(self, purchase: bool, lines: int = 3) -> dict:
+        items, subtotal, half_tax = [], Decimal(0), Decimal(0)
+        for line_no in range(1, lines + 1):
+            product = self.products[self.pick_product()]
+            quantity = Decimal(self.rng.randrange(1, 10))
+            unit_price = Decimal(product.cost_price if purchase else product.selling_price)
+            taxable = (unit_price * quantity).quantize(TWO_PLACES)
+            rate = Decimal(product.gst_rate or 0) / 2
+            half = (taxable * rate / 100).quantize(TWO_PLACES)
+            item = {"line_no": line_no, "product_id": product.id, "hsn_code": product.hsn_code,
+                    "quantity": quantity, "unit_price_base": unit_price, "taxable_amount_base": taxable,
+                    "cgst_rate": rate, "cgst_amount_base": half, "sgst_rate": rate, "sgst_amount_base": half,
+                    "tax_amount_base": 2 * half, "total_amount_base": taxable + 2 * half}
+            if not purchase:
+                item["unit_cost_base"] = Decimal(product.cost_price)
+            items.append(item)
+            subtotal += taxable
+            half_tax += half
+        payload = {"invoice_number": f"BENCH-{uuid.uuid4().hex[:12]}", "invoice_date": date.today(),
+                   "warehouse_id": self.warehouse_id, "base_currency_id": self.currency_id,
+                   "cgst_amount_base": half_tax, "sgst_amount_base": half_tax, "subtotal_base": subtotal,
+                   "tax_amount_base": 2 * half_tax, "total_amount_base": subtotal + 2 * half_tax, "items": items}
+        if purchase:
+            payload["supplier_id"] = self.suppliers[self.pick_supplier()]
+        else:
+            payload["customer_id"] = self.customers[self.pick_customer()]
+        return payload
+
+
+@case("sales_invoice.create")
+def sales_invoice_create(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from modules.inventory_module.models.sales_invoice_schemas import SalesInvoiceRequest
+    from modules.inventory_module.services.sales_invoice_service import SalesInvoiceService
+    service = SalesInvoiceService()
+    return service.create, lambda: SalesInvoiceRequest(**ctx.invoice_payload(purchase=False)).dict()
+
+
+@case("purchase_invoice.create")
+def purchase_invoice_create(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from modules.inventory_module.models.purchase_invoice_schemas import PurchaseInvoiceRequest
+    from modules.inventory_module.services.purchase_invoice_service import PurchaseInvoiceService
+    service = PurchaseInvoiceService()
+    return service.create, lambda: PurchaseInvoiceRequest(**ctx.invoice_payload(purchase=True)).dict()
+
+
+@case("ledger.create_from_voucher")
+def ledger_create_from_voucher(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from modules.account_module.services.ledger_service import LedgerService
+    service = LedgerService()
+    bank = ctx.accounts.get('BANK') or ctx.accounts.get('CASH')
+
+    def new_voucher() -> int:
+        """A two-line expense journal without ledger rows"""
+        amount = Decimal(ctx.rng.randrange(100, 500000)) / 100
+        with db_manager.get_session() as session:
+            voucher_id = session.execute(text("""
+                INSERT INTO vouchers (tenant_id, voucher_number, voucher_type_id, voucher_date, base_currency_id,
+                                      base_total_amount, base_total_debit, base_total_credit, narration, is_posted)
+                VALUES (:tid, :number, :type_id, :at, :currency, :amount, :amount, :amount, 'Benchmark', TRUE)
+                RETURNING id
+            """), {"tid": ctx.tenant_id, "number": f"BENCH-{uuid.uuid4().hex[:12]}", "type_id": ctx.journal_type_id,
+                   "at": datetime.now(), "currency": ctx.currency_id, "amount": amount}).scalar()
+            session.execute(text("""
+                INSERT INTO voucher_lines (tenant_id, voucher_id, line_no, account_id, debit_base, credit_base)
+                VALUES (:tid, :vid, 1, :expense, :amount, 0), (:tid, :vid, 2, :bank, 0, :amount)
+            """), {"tid": ctx.tenant_id, "vid": voucher_id, "amount": amount, "bank": bank,
+                   "expense": ctx.expense_accounts[ctx.rng.randrange(len(ctx.expense_accounts))]})
+        return voucher_id
+
+    return service.create_from_voucher, new_voucher
+
+
+@case("ledger.get_ledger_entries")
+def ledger_get_entries(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from modules.account_module.services.ledger_service import LedgerService
+    service = LedgerService()
+    accounts = [account_id for account_id in (ctx.accounts.get('ACCOUNTS_RECEIVABLE'), ctx.accounts.get('SALES'))
+                if account_id] + ctx.expense_accounts[:5]
+    pagination = {'offset': 0, 'per_page': 50}
+    return (lambda account_id: service.get_ledger_entries({'account_id': account_id}, pagination),
+            lambda: ctx.rng.choice(accounts))
+
+
+@case("reports.trial_balance")
+def trial_balance(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from api.v1.routers.account_routes.reports_route import get_trial_balance
+    return lambda _: asyncio.run(get_trial_balance(from_date=None, to_date=None, current_user=ctx.current_user)), None
+
+
+@case("dashboard.get_kpis")
+def dashboard_kpis(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from modules.dashboard.services.dashboard_service import DashboardService
+    return lambda _: DashboardService.get_kpis(ctx.tenant_id), None
+
+
+@case("stock.movements")
+def stock_movements(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from api.schemas.common import PaginationParams
+    from api.v1.routers.inventory_routes.stocks_route import get_stock_movements
+
+    def operation(product_id):
+        return asyncio.run(get_stock_movements(product_id=product_id, movement_type=None, reference_type=None,
+                                               from_date=None, to_date=None,
+                                               pagination=PaginationParams(page=1, per_page=50, search=None),
+                                               current_user=ctx.current_user))
+    return operation, lambda: ctx.products[ctx.pick_product()].id
+
+
+@case("menus.load")
+def menus_load(ctx: BenchContext) -> Tuple[Callable, Callable]:
+    from modules.admin_module.services.menu_service import MenuService
+    return lambda _: MenuService.get_user_menus_by_tenant_modules(ctx.user_id, ctx.tenant_id), None
+
+
+@case("products.import")
+def products_import(ctx: BenchContext, rows: int = 100) -> Tuple[Callable, Callable]:
+    from fastapi import UploadFile
+    from api.v1.routers.inventory_routes.products_route import import_products
+
+    def new_file():
+        batch = uuid.uuid4().hex[:8]
+        lines = ["name,code,category,unit,mrp_price,selling_price,gst_rate"]
+        for n in range(rows):
+            price = ctx.rng.randrange(10, 5000)
+            lines.append(f"Bench {batch} {n},BENCH-{batch}-{n},Category {ctx.rng.randrange(1, 21)},Numbers,"
+                         f"{price * 1.25:.2f},{price:.2f},{ctx.rng.choice((0, 5, 12, 18))}")
+        return UploadFile(file=io.BytesIO("\n".join(lines).encode()), filename="products.csv")
+
+    return lambda upload: asyncio.run(import_products(file=upload, current_user=ctx.current_user)), new_file
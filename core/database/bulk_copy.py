@@ -0,0 +1,56 @@
+import csv
+from io import StringIO
+from typing import Iterable, Sequence
+from core.shared.utils.logger import logger
+
+
+def _to_copy_value(value):
+    """Render a Python value for the CSV COPY format (None -> unquoted empty)"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+
+def copy_rows(session, table: str, columns: Sequence[str], rows: Iterable[Sequence], chunk_rows: int = 10000) -> int:
+    """
+    Bulk load rows into a table with COPY ... FROM STDIN on the session's connection.
+
+    Works with both psycopg2 (copy_expert) and psycopg 3 (cursor.copy). The rows are
+    written in chunks so memory stays bounded for large loads. Returns the row count.
+    """
+    column_list = ", ".join(columns)
+    copy_sql = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+    # session.connection() keeps the COPY inside the current ORM transaction
+    dbapi_conn = session.connection().connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    count = 0
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2: feed CSV text chunk by chunk
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(['\\N' if v is None else _to_copy_value(v) for v in row])
+                count += 1
+                if count % chunk_rows == 0:
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_sql, buffer)
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+        else:
+            # psycopg 3: stream rows through the COPY protocol with native adaptation
+            with cursor.copy(f"COPY {table} ({column_list}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+    finally:
+        cursor.close()
+
+    logger.debug(f"COPY loaded {count} rows into {table}", "bulk_copy")
+    return count
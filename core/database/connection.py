@@ -1,10 +1,14 @@
+import atexit
 import os
+import threading
+from typing import Optional
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 from core.shared.utils.logger import logger
 from core.shared.middleware.exception_handler import ExceptionMiddleware
+from core.shared.utils.metrics import InstrumentedQueuePool, instrument_engine
+from core.shared.utils.query_detector import query_detector
 from sqlalchemy.engine import URL
 
 Base = declarative_base()
@@ -25,8 +29,10 @@ class DatabaseManager:
     
     @ExceptionMiddleware.handle_exceptions("DatabaseManager")
     def _initialize_database(self):
+        # psycopg (3) by default; DB_DRIVER=psycopg2 keeps the previous driver
+        driver = os.getenv('DB_DRIVER', 'psycopg')
         database_url = URL.create(
-            drivername="postgresql",
+            drivername=f"postgresql+{driver}",
             username=os.getenv('DB_USER'),
             password=os.getenv('DB_PASSWORD'),  # Raw password with @ or #
             host=os.getenv('DB_HOST'),
@@ -35,22 +41,66 @@ class DatabaseManager:
         #database_url = os.getenv('DATABASE_URL')
         pool_size = int(os.getenv('DB_POOL_SIZE', 10))
         max_overflow = int(os.getenv('DB_MAX_OVERFLOW', 20))
-        
+        # Dead connections are found by pool_liveness_checker in the background;
+        # pinging on every checkout costs each request an extra round trip
+        pool_pre_ping = os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true'
+
+        # TCP keepalives let the OS notice a dropped server between liveness checks
+        connect_args = {
+            "keepalives": 1,
+            "keepalives_idle": int(os.getenv('DB_KEEPALIVES_IDLE', 60)),
+            "keepalives_interval": 10,
+            "keepalives_count": 3,
+        }
+        prepared_max = None
+        if driver == 'psycopg':
+            # Statements run this many times on a connection are prepared server-side, so
+            # Postgres skips parsing and planning them. Set DB_PREPARE_THRESHOLD=none behind
+            # PgBouncer in transaction mode, which cannot keep prepared statements.
+            threshold = os.getenv('DB_PREPARE_THRESHOLD', '5')
+            connect_args["prepare_threshold"] = None if threshold.lower() == 'none' else int(threshold)
+            prepared_max = int(os.getenv('DB_PREPARED_MAX', 200))
+
         self._engine = create_engine(
             database_url,
-            poolclass=QueuePool,
+            poolclass=InstrumentedQueuePool,
             pool_size=pool_size,
             max_overflow=max_overflow,
-            pool_pre_ping=True,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            connect_args=connect_args,
             echo=False
         )
+        if prepared_max is not None:
+            @event.listens_for(self._engine, "connect")
+            def _limit_prepared(dbapi_connection, connection_record):
+                dbapi_connection.prepared_max = prepared_max
+        instrument_engine(self._engine)
+        query_detector.install(self._engine)
         
         # Keep ORM instances usable after commit to avoid DetachedInstanceError
         # (expire_on_commit=False prevents SQLAlchemy from expiring attributes
         # when the session commits and closes)
         self._session_factory = sessionmaker(bind=self._engine, expire_on_commit=False)
         logger.info("Database connection pool initialized", "DatabaseManager")
-    
+
+    def warm_pool(self, connections: int):
+        """Open up to `connections` pooled connections now so the first requests do not pay for connecting"""
+        if connections <= 0:
+            return
+        held = []
+        try:
+            for _ in range(connections):
+                connection = self._engine.connect()
+                held.append(connection)
+                connection.exec_driver_sql("SELECT 1")
+        except Exception as e:
+            logger.warning(f"Pool warm-up stopped after {len(held)} connection(s): {str(e)}", "DatabaseManager")
+        finally:
+            for connection in held:
+                connection.close()
+        logger.info(f"Warmed {len(held)} pooled connection(s)", "DatabaseManager")
+
     @contextmanager
     def get_session(self):
         session = self._session_factory()
@@ -68,4 +118,71 @@ class DatabaseManager:
         Base.metadata.create_all(self._engine)
         logger.info("Database tables created", "DatabaseManager")
 
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
+
+
+class PoolLivenessChecker:
+    """
+    Pings idle pooled connections in the background so requests do not ping on checkout.
+
+    Every DB_POOL_CHECK_INTERVAL seconds each idle connection is checked out once, runs
+    SELECT 1 and goes back to the pool. A connection that fails makes SQLAlchemy
+    invalidate the pool, so every connection opened before the failure is replaced on
+    its next checkout instead of failing a request.
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv('DB_POOL_CHECK_INTERVAL', 30))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="db-pool-liveness", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Pool liveness check failed: {str(e)}", "PoolLivenessChecker")
+
+    def check(self) -> bool:
+        """Ping each idle connection once; returns False when a dead one was found"""
+        engine = db_manager._engine
+        if engine is None:
+            return True
+        # The queue pool hands out the oldest idle connection first, so checking
+        # them out one at a time visits each idle connection once
+        for _ in range(engine.pool.checkedin()):
+            if self._stop.is_set():
+                break
+            try:
+                with engine.connect() as connection:
+                    connection.exec_driver_sql("SELECT 1")
+            except Exception as e:
+                # The pool is invalidated now; the rest reconnect on their next checkout
+                logger.warning(f"Found a dead pooled connection, pool invalidated: {str(e)}",
+                               "PoolLivenessChecker")
+                return False
+        return True
+
+
+pool_liveness_checker = PoolLivenessChecker()
+atexit.register(pool_liveness_checker.stop)
\ No newline at end of file
@@ -0,0 +1,35 @@
+from typing import Iterable, Mapping, Tuple
+from core.shared.utils.logger import logger
+
+
+def execute_pipelined(session, statements: Iterable[Tuple[str, Mapping]]) -> int:
+    """
+    Run result-less statements on the session's connection, in one round trip when possible.
+
+    With psycopg 3 the statements are sent in pipeline mode: they are queued and the
+    results are read once at the end, so N statements wait on the network about once
+    instead of N times. psycopg2 has no pipeline mode and runs them one by one.
+    Statements use %(name)s placeholders and bypass the ORM, so callers must flush
+    before and expire loaded objects the statements change. Returns the statement count.
+    """
+    statements = list(statements)
+    if not statements:
+        return 0
+
+    # session.connection() keeps the statements inside the current ORM transaction
+    dbapi_conn = session.connection().connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    try:
+        if hasattr(dbapi_conn, 'pipeline'):
+            # psycopg 3: errors surface when the pipeline syncs on exit
+            with dbapi_conn.pipeline():
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+        else:
+            for sql, params in statements:
+                cursor.execute(sql, params)
+    finally:
+        cursor.close()
+
+    logger.debug(f"Ran {len(statements)} pipelined statement(s)", "pipeline")
+    return len(statements)
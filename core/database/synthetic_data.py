@@ -0,0 +1,628 @@
+"""
+Synthetic multi-tenant dataset for load and performance testing.
+
+Builds N tenants with a complete setup (currency, warehouses, chart of
+accounts, account configuration, voucher types, an Admin login) and then
+COPY-loads masters and transactions in chunks:
+
+    products, customers, suppliers, doctors, tests, patients
+    sales / purchase invoices with items, their vouchers, voucher lines,
+    ledger rows and stock transactions; expense journals
+    appointments, test orders with items
+
+Primary keys are reserved from each table's sequence up front, so children
+reference parents without reading anything back. Choices are skewed the way
+real books are: a Zipf distribution picks products, customers, suppliers,
+tests and expense accounts, so a few SKUs and accounts are hot and the long
+tail is cold. The same --seed gives the same data. Derived totals (customer
+outstanding, stock balances, account balances) are computed at the end with
+set-based statements, the health dashboard counters, lab worklist and GST
+return summaries are rebuilt, and every loaded table is ANALYZEd.
+
+Rows go through the application's DB_* connection, which must point at a
+local database unless --allow-remote is given:
+
+    python -m core.database.synthetic_data --tenants 3 --scale 0.1 --seed 7
+    python -m core.database.synthetic_data --tenants 1 --volume sales_invoices=5000000 --workers 4
+
+Login for each tenant: bench_<tenant code lowercase> / --password.
+"""
+import argparse
+import bisect
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Sequence
+import bcrypt
+from sqlalchemy import text
+from core.database.bulk_copy import copy_rows
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from modules.account_module.services.gst_summary_service import GSTSummaryService
+
+# Rows per tenant at --scale 1
+VOLUMES = {
+    'products': 5000,
+    'customers': 20000,
+    'suppliers': 500,
+    'doctors': 40,
+    'tests': 300,
+    'expense_accounts': 120,
+    'patients': 50000,
+    'sales_invoices': 1000000,
+    'purchase_invoices': 100000,
+    'journals': 50000,
+    'appointments': 200000,
+    'test_orders': 200000,
+}
+
+CHUNK = 10000
+GST_RATES = (0, 5, 12, 12, 18, 18, 18, 28)
+FIRST_NAMES = ("Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Meera", "Rohan", "Saanvi", "Arjun",
+               "Nisha", "Rahul", "Priya", "Karthik", "Lakshmi", "Farhan", "Zoya", "Joseph", "Mary", "Suresh", "Anjali")
+LAST_NAMES = ("Sharma", "Verma", "Nair", "Menon", "Iyer", "Reddy", "Patel", "Shah", "Khan", "Das", "Singh", "Gupta",
+              "Pillai", "Thomas", "Joshi", "Rao", "Kumar", "Bose", "Mehta", "George")
+SPECIALIZATIONS = ("General Medicine", "Pediatrics", "Cardiology", "Dermatology", "Orthopedics", "ENT", "Gynecology")
+
+# code, name, type, normal balance, configuration key
+ACCOUNTS = (
+    ('1001', 'Cash', 'ASSET', 'D', 'CASH'),
+    ('1002', 'Bank', 'ASSET', 'D', 'BANK'),
+    ('1100', 'Accounts Receivable', 'ASSET', 'D', 'ACCOUNTS_RECEIVABLE'),
+    ('1200', 'Inventory', 'ASSET', 'D', 'INVENTORY'),
+    ('1301', 'CGST Input', 'ASSET', 'D', 'GST_INPUT_CGST'),
+    ('1302', 'SGST Input', 'ASSET', 'D', 'GST_INPUT_SGST'),
+    ('1303', 'IGST Input', 'ASSET', 'D', 'GST_INPUT_IGST'),
+    ('2100', 'Accounts Payable', 'LIABILITY', 'C', 'ACCOUNTS_PAYABLE'),
+    ('2201', 'CGST Output', 'LIABILITY', 'C', 'GST_OUTPUT_CGST'),
+    ('2202', 'SGST Output', 'LIABILITY', 'C', 'GST_OUTPUT_SGST'),
+    ('2203', 'IGST Output', 'LIABILITY', 'C', 'GST_OUTPUT_IGST'),
+    ('2300', 'Customer Advance', 'LIABILITY', 'C', 'CUSTOMER_ADVANCE'),
+    ('3000', 'Capital', 'EQUITY', 'C', None),
+    ('4000', 'Sales Revenue', 'REVENUE', 'C', 'SALES'),
+    ('5000', 'Purchases', 'EXPENSE', 'D', 'PURCHASE'),
+)
+GROUPS = (('ASSET', 'Assets', 'AST'), ('LIABILITY', 'Liabilities', 'LIA'), ('EQUITY', 'Equity', 'EQT'),
+          ('REVENUE', 'Income', 'INC'), ('EXPENSE', 'Expenses', 'EXP'))
+VOUCHER_TYPES = (('Sales', 'SALES', 'SV'), ('Purchase', 'PURCHASE', 'PV'), ('Receipt', 'RECEIPT', 'RV'),
+                 ('Payment', 'PAYMENT', 'PY'), ('Journal', 'JOURNAL', 'JV'))
+
+SALES_INVOICE_COLUMNS = ("id", "tenant_id", "invoice_number", "invoice_date", "due_date", "customer_id", "warehouse_id",
+                         "base_currency_id", "cgst_amount_base", "sgst_amount_base", "subtotal_base",
+                         "tax_amount_base", "total_amount_base", "paid_amount_base", "balance_amount_base", "status",
+                         "voucher_id", "created_by", "updated_by")
+SALES_ITEM_COLUMNS = ("tenant_id", "invoice_id", "line_no", "product_id", "hsn_code", "quantity", "unit_price_base",
+                      "unit_cost_base", "taxable_amount_base", "cgst_rate", "cgst_amount_base", "sgst_rate",
+                      "sgst_amount_base", "tax_amount_base", "total_amount_base")
+PURCHASE_INVOICE_COLUMNS = ("id", "tenant_id", "invoice_number", "invoice_date", "due_date", "supplier_id",
+                            "warehouse_id", "base_currency_id", "cgst_amount_base", "sgst_amount_base",
+                            "subtotal_base", "tax_amount_base", "total_amount_base", "paid_amount_base",
+                            "balance_amount_base", "status", "voucher_id", "created_by", "updated_by")
+PURCHASE_ITEM_COLUMNS = ("tenant_id", "invoice_id", "line_no", "product_id", "hsn_code", "quantity", "unit_price_base",
+                         "taxable_amount_base", "cgst_rate", "cgst_amount_base", "sgst_rate", "sgst_amount_base",
+                         "tax_amount_base", "total_amount_base")
+VOUCHER_COLUMNS = ("id", "tenant_id", "voucher_number", "voucher_type_id", "voucher_date", "base_currency_id",
+                   "base_total_amount", "base_total_debit", "base_total_credit", "reference_type", "reference_id",
+                   "reference_number", "narration", "is_posted")
+VOUCHER_LINE_COLUMNS = ("id", "tenant_id", "voucher_id", "line_no", "account_id", "description", "debit_base",
+                        "credit_base", "reference_type", "reference_id")
+LEDGER_COLUMNS = ("tenant_id", "account_id", "voucher_id", "voucher_line_id", "transaction_date", "posting_date",
+                  "debit_amount", "credit_amount", "reference_type", "reference_id", "reference_number", "narration")
+STOCK_COLUMNS = ("tenant_id", "product_id", "transaction_type", "transaction_source", "reference_id",
+                 "reference_number", "quantity", "unit_price", "transaction_date", "warehouse_id")
+
+
+def _amount(paise: int) -> str:
+    """Exact decimal text for an amount held in paise"""
+    sign = '-' if paise < 0 else ''
+    paise = abs(paise)
+    return f"{sign}{paise // 100}.{paise % 100:02d}"
+
+
+class Zipf:
+    """Draws indexes 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+        self.total = self.cumulative[-1]
+
+    def __call__(self) -> int:
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.total)
+
+
+def reserve_ids(table: str, count: int) -> int:
+    """Take `count` consecutive ids from the table's sequence; returns the first"""
+    # A transaction of its own, so the sequence lock is not held while the chunk is loaded
+    with db_manager.get_session() as session:
+        sequence = session.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+        session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:seq))"), {"seq": sequence})
+        first = session.execute(text("SELECT nextval(CAST(:seq AS regclass))"), {"seq": sequence}).scalar()
+        if count > 1:
+            session.execute(text("SELECT setval(CAST(:seq AS regclass), :last)"),
+                            {"seq": sequence, "last": first + count - 1})
+    return first
+
+
+def _insert(session, table: str, values: Dict) -> int:
+    columns = ", ".join(values)
+    params = ", ".join(f":{key}" for key in values)
+    return session.execute(text(f"INSERT INTO {table} ({columns}) VALUES ({params}) RETURNING id"), values).scalar()
+
+
+class TenantGenerator:
+    def __init__(self, index: int, code: str, volumes: Dict[str, int], seed: int, days: int, password_hash: str):
+        self.index = index
+        self.code = code
+        self.volumes = volumes
+        self.rng = random.Random(seed * 1000003 + index)
+        self.days = days
+        self.password_hash = password_hash
+        self.start_date = date.today() - timedelta(days=days)
+        self.counts: Dict[str, int] = {}
+        self.user = f"bench_{code.lower()}"
+
+    # -- helpers -----------------------------------------------------------
+
+    def _copy(self, session, table: str, columns: Sequence[str], rows: List[Sequence]):
+        if rows:
+            copy_rows(session, table, columns, rows)
+            self.counts[table] = self.counts.get(table, 0) + len(rows)
+
+    def _name(self) -> tuple:
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def _phone(self) -> str:
+        return f"9{self.rng.randrange(100000000, 999999999)}"
+
+    def _day(self) -> date:
+        # Volume grows towards the present: recent days are busier than old ones
+        return self.start_date + timedelta(days=int(self.days * self.rng.random() ** 0.7))
+
+    def _items(self, max_lines: int) -> int:
+        lines = 1
+        while lines < max_lines and self.rng.random() < 0.55:
+            lines += 1
+        return lines
+
+    # -- setup -------------------------------------------------------------
+
+    def setup(self):
+        """Tenant, login, warehouses, chart of accounts and other per-tenant masters"""
+        with db_manager.get_session() as session:
+            if session.execute(text("SELECT 1 FROM tenants WHERE code = :code"), {"code": self.code}).first():
+                raise ValueError(f"Tenant {self.code} already exists; use another --prefix")
+            now = datetime.now()
+            self.tenant_id = _insert(session, 'tenants', {
+                "name": f"Synthetic Tenant {self.index}", "code": self.code, "description": "Synthetic load-test data",
+                "is_active": True, "created_at": now, "updated_at": now})
+            tid = self.tenant_id
+
+            self.currency_id = session.execute(text("SELECT id FROM currencies WHERE code = 'INR'")).scalar()
+            if self.currency_id is None:
+                self.currency_id = _insert(session, 'currencies', {"code": "INR", "name": "Indian Rupee",
+                                                                   "symbol": "Rs", "is_base": True})
+            session.execute(text("INSERT INTO tenant_settings (tenant_id, base_currency) VALUES (:tid, 'INR')"),
+                            {"tid": tid})
+
+            role_id = _insert(session, 'roles', {"name": "Admin", "description": "System Administrator",
+                                                 "tenant_id": tid, "is_active": True, "created_at": now})
+            user_id = _insert(session, 'users', {
+                "username": self.user, "email": f"{self.user}@example.com", "password_hash": self.password_hash,
+                "first_name": "Bench", "last_name": self.code, "tenant_id": tid, "is_tenant_admin": True,
+                "is_active": True, "created_at": now})
+            _insert(session, 'user_roles', {"user_id": user_id, "role_id": role_id, "tenant_id": tid,
+                                            "assigned_at": now})
+
+            self.warehouses = [_insert(session, 'warehouses', {"name": f"Warehouse {n}", "code": f"WH{n}",
+                                                               "tenant_id": tid}) for n in (1, 2)]
+            self.categories = [_insert(session, 'categories', {"name": f"Category {n}", "tenant_id": tid,
+                                                               "is_active": True}) for n in range(1, 21)]
+            self.units = [_insert(session, 'units', {"name": name, "symbol": symbol, "tenant_id": tid,
+                                                     "is_active": True})
+                          for name, symbol in (("Numbers", "NOS"), ("Strip", "STP"), ("Box", "BOX"))]
+
+            groups = {account_type: _insert(session, 'account_groups', {
+                "tenant_id": tid, "account_type": account_type, "name": name, "code": code})
+                for account_type, name, code in GROUPS}
+            self.accounts: Dict[str, int] = {}
+            keys = dict(session.execute(text("SELECT code, id FROM account_configuration_keys")).fetchall())
+            for code, name, account_type, normal, config in ACCOUNTS:
+                account_id = _insert(session, 'account_masters', {
+                    "tenant_id": tid, "account_group_id": groups[account_type], "code": code, "name": name,
+                    "account_type": account_type, "normal_balance": normal, "is_system_account": True,
+                    "system_code": config})
+                self.accounts[config or code] = account_id
+                if config in keys:
+                    _insert(session, 'account_configurations', {"tenant_id": tid, "config_key_id": keys[config],
+                                                                "account_id": account_id})
+            self.expense_accounts = [_insert(session, 'account_masters', {
+                "tenant_id": tid, "account_group_id": groups['EXPENSE'], "code": f"6{n:03d}",
+                "name": f"Expense {n}", "account_type": 'EXPENSE', "normal_balance": 'D'})
+                for n in range(1, self.volumes['expense_accounts'] + 1)]
+            self.voucher_types = {code: _insert(session, 'voucher_types', {
+                "tenant_id": tid, "name": name, "code": code, "prefix": prefix})
+                for name, code, prefix in VOUCHER_TYPES}
+
+    def masters(self):
+        """Products, customers, suppliers, doctors, tests and patients"""
+        tid, rng, v = self.tenant_id, self.rng, self.volumes
+        with db_manager.get_session() as session:
+            self.product_ids = reserve_ids('products', v['products'])
+            self.products = []  # (price paise, cost paise, gst rate, hsn)
+            rows = []
+            for n in range(v['products']):
+                cost = rng.randrange(500, 200000)
+                price = int(cost * rng.uniform(1.1, 1.6))
+                gst, hsn = rng.choice(GST_RATES), f"{rng.randrange(1000, 9999)}"
+                self.products.append((price, cost, gst, hsn))
+                rows.append((self.product_ids + n, tid, f"Product {self.code}-{n + 1}", f"{self.code}-P{n + 1:06d}",
+                             hsn, rng.choice(self.categories), rng.choice(self.units), _amount(int(price * 1.25)),
+                             _amount(price), _amount(cost), gst, True))
+            self._copy(session, 'products', ("id", "tenant_id", "name", "code", "hsn_code", "category_id", "unit_id",
+                                             "mrp_price", "selling_price", "cost_price", "gst_rate", "is_active"), rows)
+
+            self.customer_ids = reserve_ids('customers', v['customers'])
+            self.customers = []
+            rows = []
+            for n in range(v['customers']):
+                first, last = self._name()
+                self.customers.append(f"{first} {last}")
+                rows.append((self.customer_ids + n, f"{first} {last}", self._phone(),
+                             f"customer{n + 1}.{self.code.lower()}@example.com", tid, True, self.user))
+            self._copy(session, 'customers', ("id", "name", "phone", "email", "tenant_id", "is_active", "created_by"),
+                       rows)
+
+            self.supplier_ids = reserve_ids('suppliers', v['suppliers'])
+            self._copy(session, 'suppliers', ("id", "tenant_id", "name", "phone", "is_active"),
+                       [(self.supplier_ids + n, tid, f"Supplier {self.code}-{n + 1}", self._phone(), True)
+                        for n in range(v['suppliers'])])
+
+            self.doctor_ids = reserve_ids('doctors', v['doctors'])
+            self.doctors = []
+            rows = []
+            for n in range(v['doctors']):
+                first, last = self._name()
+                self.doctors.append((f"Dr. {first} {last}", self._phone()))
+                rows.append((self.doctor_ids + n, f"{self.code}-D{n + 1:04d}", first, last,
+                             rng.choice(SPECIALIZATIONS), f"LIC{self.index:03d}{n:05d}", self.doctors[-1][1],
+                             tid, True))
+            self._copy(session, 'doctors', ("id", "employee_id", "first_name", "last_name", "specialization",
+                                            "license_number", "phone", "tenant_id", "is_active"), rows)
+
+            self.test_ids = reserve_ids('tests', v['tests'])
+            self.tests = [(f"Test {n + 1}", rng.randrange(10000, 300000), rng.choice((0, 5, 12, 18)))
+                          for n in range(v['tests'])]
+            self._copy(session, 'tests', ("id", "tenant_id", "name", "rate", "gst", "is_active"),
+                       [(self.test_ids + n, tid, name, _amount(rate), gst, True)
+                        for n, (name, rate, gst) in enumerate(self.tests)])
+
+            self.patient_ids = reserve_ids('patients', v['patients'])
+            self.patients = []
+            rows = []
+            for n in range(v['patients']):
+                first, last = self._name()
+                phone = self._phone()
+                self.patients.append((f"{first} {last}", phone))
+                rows.append((self.patient_ids + n, tid, f"PAT{n + 1:07d}", first, last,
+                             date(1940, 1, 1) + timedelta(days=rng.randrange(0, 30000)),
+                             rng.choice(('MALE', 'FEMALE')), phone))
+            self._copy(session, 'patients', ("id", "tenant_id", "patient_number", "first_name", "last_name",
+                                             "date_of_birth", "gender", "phone"), rows)
+
+        self.pick_product = Zipf(v['products'], 1.1, self.rng)
+        self.pick_customer = Zipf(v['customers'], 0.9, self.rng)
+        self.pick_supplier = Zipf(v['suppliers'], 1.2, self.rng)
+        self.pick_test = Zipf(v['tests'], 1.0, self.rng)
+        self.pick_expense = Zipf(v['expense_accounts'], 1.3, self.rng)
+        self.pick_patient = Zipf(v['patients'], 0.6, self.rng)
+        self.pick_doctor = Zipf(v['doctors'], 0.8, self.rng)
+
+    # -- transactions ------------------------------------------------------
+
+    def _voucher(self, vouchers, lines, ledgers, voucher_id, line_id, type_code, number, when, reference_type,
+                 reference_id, reference_number, narration, entries):
+        """One posted voucher; entries are (account_id, debit paise, credit paise) with zero lines skipped"""
+        entries = [entry for entry in entries if entry[1] or entry[2]]
+        total = sum(debit for _, debit, _ in entries)
+        vouchers.append((voucher_id, self.tenant_id, number, self.voucher_types[type_code], when, self.currency_id,
+                         _amount(total), _amount(total), _amount(total), reference_type, reference_id,
+                         reference_number, narration, True))
+        for line_no, (account_id, debit, credit) in enumerate(entries, 1):
+            lines.append((line_id, self.tenant_id, voucher_id, line_no, account_id, narration, _amount(debit),
+                          _amount(credit), reference_type, reference_id))
+            ledgers.append((self.tenant_id, account_id, voucher_id, line_id, when, when, _amount(debit),
+                            _amount(credit), reference_type, reference_id, reference_number, narration))
+            line_id += 1
+        return line_id
+
+    @staticmethod
+    def _settlement(rng, total: int) -> tuple:
+        roll = rng.random()
+        if roll < 0.6:
+            return 'PAID', total
+        if roll < 0.75:
+            return 'PARTIALLY_PAID', int(total * rng.uniform(0.1, 0.9))
+        return 'POSTED', 0
+
+    def _line(self, product: int, quantity: int, purchase: bool) -> tuple:
+        price, cost, gst, hsn = self.products[product]
+        unit = cost if purchase else price
+        taxable = unit * quantity
+        half = round(taxable * gst / 200)
+        return unit, cost, gst, hsn, taxable, half
+
+    def sales_invoices(self):
+        self._invoices('sales_invoices', purchase=False)
+
+    def purchase_invoices(self):
+        self._invoices('purchase_invoices', purchase=True)
+
+    def _invoices(self, table: str, purchase: bool):
+        rng, tid, total_count = self.rng, self.tenant_id, self.volumes[table]
+        prefix, voucher_type = ('PI', 'PURCHASE') if purchase else ('SI', 'SALES')
+        a = self.accounts
+        for offset in range(0, total_count, CHUNK):
+            count = min(CHUNK, total_count - offset)
+            invoices, items, vouchers, lines, ledgers, stock = [], [], [], [], [], []
+            with db_manager.get_session() as session:
+                invoice_id = reserve_ids(table, count)
+                # A few invoices stay DRAFT and get no voucher; reserve for the worst case
+                voucher_id = reserve_ids('vouchers', count)
+                line_id = reserve_ids('voucher_lines', count * 4)
+                for n in range(count):
+                    number = f"{prefix}-{offset + n + 1:08d}"
+                    day = self._day()
+                    when = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(540, 1260))
+                    taxable_total = tax_half_total = 0
+                    for line_no in range(1, self._items(8) + 1):
+                        product = self.pick_product()
+                        quantity = rng.randrange(1, 50 if purchase else 10)
+                        unit, cost, gst, hsn, taxable, half = self._line(product, quantity, purchase)
+                        taxable_total += taxable
+                        tax_half_total += half
+                        row = [tid, invoice_id, line_no, self.product_ids + product, hsn, quantity, _amount(unit)]
+                        if not purchase:
+                            row.append(_amount(cost))
+                        items.append(tuple(row + [_amount(taxable), gst / 2, _amount(half), gst / 2, _amount(half),
+                                                  _amount(2 * half), _amount(taxable + 2 * half)]))
+                        stock.append((tid, self.product_ids + product, 'IN' if purchase else 'OUT',
+                                      'PURCHASE_INVOICE' if purchase else 'SALES_INVOICE', invoice_id, number,
+                                      quantity, _amount(unit), when, self.warehouses[0]))
+                    total = taxable_total + 2 * tax_half_total
+                    status, paid = ('DRAFT', 0) if rng.random() < 0.02 else self._settlement(rng, total)
+                    if status == 'DRAFT':
+                        invoice_voucher = None
+                    else:
+                        invoice_voucher = voucher_id
+                        if purchase:
+                            entries = [(a['PURCHASE'], taxable_total, 0), (a['GST_INPUT_CGST'], tax_half_total, 0),
+                                       (a['GST_INPUT_SGST'], tax_half_total, 0), (a['ACCOUNTS_PAYABLE'], 0, total)]
+                        else:
+                            entries = [(a['ACCOUNTS_RECEIVABLE'], total, 0), (a['SALES'], 0, taxable_total),
+                                       (a['GST_OUTPUT_CGST'], 0, tax_half_total),
+                                       (a['GST_OUTPUT_SGST'], 0, tax_half_total)]
+                        line_id = self._voucher(vouchers, lines, ledgers, voucher_id, line_id, voucher_type,
+                                                f"{prefix}V-{offset + n + 1:08d}", when,
+                                                'PURCHASE_INVOICE' if purchase else 'SALES_INVOICE', invoice_id,
+                                                number, f"{voucher_type.title()} invoice {number}", entries)
+                        voucher_id += 1
+                    party = (self.supplier_ids + self.pick_supplier()) if purchase \
+                        else (self.customer_ids + self.pick_customer())
+                    invoices.append((invoice_id, tid, number, day, day + timedelta(days=30), party,
+                                     self.warehouses[0], self.currency_id, _amount(tax_half_total),
+                                     _amount(tax_half_total), _amount(taxable_total), _amount(2 * tax_half_total),
+                                     _amount(total), _amount(paid), _amount(total - paid), status, invoice_voucher,
+                                     self.user, self.user))
+                    invoice_id += 1
+
+                self._copy(session, table, PURCHASE_INVOICE_COLUMNS if purchase else SALES_INVOICE_COLUMNS, invoices)
+                self._copy(session, f"{table[:-1]}_items", PURCHASE_ITEM_COLUMNS if purchase else SALES_ITEM_COLUMNS,
+                           items)
+                self._copy(session, 'vouchers', VOUCHER_COLUMNS, vouchers)
+                self._copy(session, 'voucher_lines', VOUCHER_LINE_COLUMNS, lines)
+                self._copy(session, 'ledgers', LEDGER_COLUMNS, ledgers)
+                self._copy(session, 'stock_transactions', STOCK_COLUMNS, stock)
+            self._progress(table, offset + count, total_count)
+
+    def journals(self):
+        """Expense journals: hot expense accounts paid from cash or bank"""
+        rng, total_count = self.rng, self.volumes['journals']
+        for offset in range(0, total_count, CHUNK):
+            count = min(CHUNK, total_count - offset)
+            vouchers, lines, ledgers = [], [], []
+            with db_manager.get_session() as session:
+                voucher_id = reserve_ids('vouchers', count)
+                line_id = reserve_ids('voucher_lines', count * 2)
+                for n in range(count):
+                    when = datetime.combine(self._day(), datetime.min.time()) + timedelta(hours=rng.randrange(9, 20))
+                    amount = int(rng.lognormvariate(9, 1.2)) + 100
+                    line_id = self._voucher(vouchers, lines, ledgers, voucher_id, line_id, 'JOURNAL',
+                                            f"JV-{offset + n + 1:08d}", when, 'JOURNAL', None, None, "Expense",
+                                            [(self.expense_accounts[self.pick_expense()], amount, 0),
+                                             (self.accounts['CASH' if rng.random() < 0.3 else 'BANK'], 0, amount)])
+                    voucher_id += 1
+                self._copy(session, 'vouchers', VOUCHER_COLUMNS, vouchers)
+                self._copy(session, 'voucher_lines', VOUCHER_LINE_COLUMNS, lines)
+                self._copy(session, 'ledgers', LEDGER_COLUMNS, ledgers)
+            self._progress('journals', offset + count, total_count)
+
+    def appointments(self):
+        rng, tid, total_count = self.rng, self.tenant_id, self.volumes['appointments']
+        statuses = ('COMPLETED',) * 7 + ('CANCELLED', 'NO_SHOW', 'SCHEDULED')
+        for offset in range(0, total_count, CHUNK):
+            count = min(CHUNK, total_count - offset)
+            rows = []
+            for n in range(count):
+                patient, doctor = self.pick_patient(), self.pick_doctor()
+                day = self._day()
+                rows.append((tid, f"APT{offset + n + 1:08d}", day,
+                             f"{rng.randrange(9, 20):02d}:{rng.choice((0, 15, 30, 45)):02d}:00", 15,
+                             self.patient_ids + patient, self.patients[patient][0], self.patients[patient][1],
+                             self.doctor_ids + doctor, self.doctors[doctor][0], self.doctors[doctor][1],
+                             'SCHEDULED' if day >= date.today() else rng.choice(statuses)))
+            with db_manager.get_session() as session:
+                self._copy(session, 'appointments', ("tenant_id", "appointment_number", "appointment_date",
+                                                     "appointment_time", "duration_minutes", "patient_id",
+                                                     "patient_name", "patient_phone", "doctor_id", "doctor_name",
+                                                     "doctor_phone", "status"), rows)
+            self._progress('appointments', offset + count, total_count)
+
+    def test_orders(self):
+        rng, tid, total_count = self.rng, self.tenant_id, self.volumes['test_orders']
+        statuses = ('REPORTED',) * 6 + ('COMPLETED', 'IN_PROGRESS', 'SAMPLE_COLLECTED', 'ORDERED', 'CANCELLED')
+        for offset in range(0, total_count, CHUNK):
+            count = min(CHUNK, total_count - offset)
+            orders, items = [], []
+            with db_manager.get_session() as session:
+                order_id = reserve_ids('test_orders', count)
+                for n in range(count):
+                    patient, doctor = self.pick_patient(), self.pick_doctor()
+                    when = datetime.combine(self._day(), datetime.min.time()) + timedelta(minutes=rng.randrange(480, 1200))
+                    taxable_total = half_total = 0
+                    for line_no in range(1, self._items(5) + 1):
+                        test = self.pick_test()
+                        name, rate, gst = self.tests[test]
+                        half = round(rate * gst / 200)
+                        taxable_total += rate
+                        half_total += half
+                        items.append((tid, order_id, line_no, self.test_ids + test, name, _amount(rate),
+                                      _amount(rate), gst / 2, _amount(half), gst / 2, _amount(half),
+                                      _amount(rate + 2 * half)))
+                    orders.append((order_id, tid, f"TO{offset + n + 1:08d}", when, self.patient_ids + patient,
+                                   self.patients[patient][0], self.patients[patient][1], self.doctor_ids + doctor,
+                                   self.doctors[doctor][0], _amount(taxable_total), _amount(taxable_total),
+                                   _amount(half_total), _amount(half_total), _amount(taxable_total + 2 * half_total),
+                                   rng.choice(statuses), self.user))
+                    order_id += 1
+                self._copy(session, 'test_orders', ("id", "tenant_id", "test_order_number", "order_date",
+                                                    "patient_id", "patient_name", "patient_phone", "doctor_id",
+                                                    "doctor_name", "subtotal_amount", "taxable_amount", "cgst_amount",
+                                                    "sgst_amount", "final_amount", "status", "created_by"), orders)
+                self._copy(session, 'test_order_items', ("tenant_id", "test_order_id", "line_no", "test_id",
+                                                         "test_name", "rate", "taxable_amount", "cgst_rate",
+                                                         "cgst_amount", "sgst_rate", "sgst_amount", "total_amount"),
+                           items)
+            self._progress('test_orders', offset + count, total_count)
+
+    def finish(self):
+        """Derived totals and summaries, computed from the loaded rows (COPY bypasses the app's hooks)"""
+        with db_manager.get_session() as session:
+            params = {"tid": self.tenant_id}
+            session.execute(text("""
+                UPDATE customers c SET outstanding_balance = s.balance
+                FROM (SELECT customer_id, SUM(balance_amount_base) AS balance FROM sales_invoices
+                      WHERE tenant_id = :tid AND status <> 'DRAFT' GROUP BY customer_id) s
+                WHERE c.id = s.customer_id
+            """), params)
+            session.execute(text("""
+                INSERT INTO stock_balances (product_id, batch_number, available_quantity, reserved_quantity,
+                                            total_quantity, average_cost, tenant_id)
+                SELECT st.product_id, '',
+                       SUM(CASE WHEN st.transaction_type = 'IN' THEN st.quantity ELSE -st.quantity END), 0,
+                       SUM(CASE WHEN st.transaction_type = 'IN' THEN st.quantity ELSE -st.quantity END),
+                       MAX(p.cost_price), :tid
+                FROM stock_transactions st JOIN products p ON p.id = st.product_id
+                WHERE st.tenant_id = :tid
+                GROUP BY st.product_id
+            """), params)
+            session.execute(text("""
+                UPDATE account_masters am
+                SET current_balance = CASE WHEN am.normal_balance = 'D' THEN s.debit - s.credit
+                                           ELSE s.credit - s.debit END
+                FROM (SELECT account_id, SUM(debit_amount) AS debit, SUM(credit_amount) AS credit FROM ledgers
+                      WHERE tenant_id = :tid GROUP BY account_id) s
+                WHERE am.id = s.account_id
+            """), params)
+            session.execute(text("SELECT health_metrics_rebuild(:tid)"), params)
+            session.execute(text("""
+                SELECT lab_worklist_refresh(ARRAY(
+                    SELECT id FROM test_orders
+                    WHERE tenant_id = :tid AND is_deleted = FALSE
+                      AND status NOT IN ('COMPLETED', 'REPORTED', 'CANCELLED')
+                ))
+            """), params)
+        period = self.start_date.replace(day=1)
+        while period <= date.today():
+            GSTSummaryService.rebuild_period(self.tenant_id, period.strftime('%Y-%m'))
+            period = (period + timedelta(days=32)).replace(day=1)
+
+    def _progress(self, what: str, done: int, total: int):
+        if done == total or done % (CHUNK * 10) == 0:
+            logger.info(f"{self.code}: {what} {done}/{total}", "SyntheticData")
+
+    def run(self) -> Dict[str, int]:
+        started = time.monotonic()
+        self.setup()
+        self.masters()
+        self.sales_invoices()
+        self.purchase_invoices()
+        self.journals()
+        self.appointments()
+        self.test_orders()
+        self.finish()
+        logger.info(f"{self.code} (tenant {self.tenant_id}) generated in {time.monotonic() - started:.0f}s",
+                    "SyntheticData")
+        return {"tenant_id": self.tenant_id, "code": self.code, "login": self.user, **self.counts}
+
+
+def _generate(index: int, code: str, volumes: Dict[str, int], seed: int, days: int, password_hash: str):
+    # A forked worker must not reuse the parent's pooled connections
+    db_manager._engine.dispose(close=False)
+    return TenantGenerator(index, code, volumes, seed, days, password_hash).run()
+
+
+LOADED_TABLES = ("products", "customers", "suppliers", "doctors", "tests", "patients", "sales_invoices",
+                 "sales_invoice_items", "purchase_invoices", "purchase_invoice_items", "vouchers", "voucher_lines",
+                 "ledgers", "stock_transactions", "stock_balances", "appointments", "test_orders", "test_order_items")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic multi-tenant data for load testing")
+    parser.add_argument("--tenants", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every default volume")
+    parser.add_argument("--volume", action="append", default=[], metavar="NAME=COUNT",
+                        help=f"override one volume per tenant; names: {', '.join(VOLUMES)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=730, help="history length ending today")
+    parser.add_argument("--prefix", default="SYN", help="tenant codes are <prefix><nnnn>")
+    parser.add_argument("--password", default="Bench@123", help="password of each tenant's bench_ login")
+    parser.add_argument("--workers", type=int, default=1, help="tenants generated in parallel")
+    parser.add_argument("--allow-remote", action="store_true", help="allow a DB_HOST other than localhost")
+    args = parser.parse_args(argv)
+
+    host = os.getenv('DB_HOST') or 'localhost'
+    if not args.allow_remote and host not in ('localhost', '127.0.0.1', '::1'):
+        parser.error(f"DB_HOST is {host}; synthetic data goes to a local database unless --allow-remote is given")
+
+    volumes = {name: max(1, int(count * args.scale)) for name, count in VOLUMES.items()}
+    for override in args.volume:
+        name, _, count = override.partition('=')
+        if name not in VOLUMES:
+            parser.error(f"unknown volume {name}")
+        volumes[name] = int(count)
+
+    password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    jobs = [(index, f"{args.prefix}{index:04d}", volumes, args.seed, args.days, password_hash)
+            for index in range(1, args.tenants + 1)]
+    started = time.monotonic()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(_generate, *zip(*jobs)))
+    else:
+        results = [TenantGenerator(*job).run() for job in jobs]
+
+    with db_manager.get_session() as session:
+        for table in LOADED_TABLES:
+            session.execute(text(f"ANALYZE {table}"))
+
+    for result in results:
+        print(result)
+    print(f"Generated {len(results)} tenant(s) in {time.monotonic() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
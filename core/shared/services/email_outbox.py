@@ -0,0 +1,292 @@
+"""
+Transactional email outbox and its delivery workers.
+
+enqueue() only inserts an email_outbox row, in the caller's transaction when a
+session is passed, so a message is queued exactly when the business change it
+belongs to commits. Delivery threads claim due rows in batches (FOR UPDATE
+SKIP LOCKED, so several API processes can run workers side by side), send
+each batch over a persistent SMTP connection that the thread keeps open
+between batches, and write the outcomes back with one UPDATE and one COPY
+into notification_logs. Transient failures are retried with exponential
+backoff; permanent ones (5xx replies, refused recipients) fail immediately.
+
+Delivery is at-least-once: a row left in SENDING by a crashed worker is
+claimed again after EMAIL_CLAIM_TIMEOUT seconds.
+
+For local testing run an SMTP stand-in and point the workers at it:
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=false
+"""
+import atexit
+import os
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.database.bulk_copy import copy_rows
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+
+LOG_COLUMNS = ("tenant_id", "notification_type", "recipient", "subject", "status", "error_message", "sent_at")
+
+_ENQUEUED_KEY = 'email_outbox_enqueued'
+
+_CLAIM = """
+    UPDATE email_outbox SET status = 'SENDING', locked_at = now(), attempts = attempts + 1
+    WHERE id IN (
+        SELECT id FROM email_outbox
+        WHERE (status = 'QUEUED' AND next_attempt_at <= now())
+           OR (status = 'SENDING' AND locked_at < now() - make_interval(secs => :claim_timeout))
+        ORDER BY next_attempt_at, id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, tenant_id, recipient, subject, body, attempts
+"""
+
+_RECORD = """
+    UPDATE email_outbox o
+    SET status = v.status,
+        sent_at = CASE WHEN v.status = 'SENT' THEN now() END,
+        next_attempt_at = now() + make_interval(secs => v.delay),
+        last_error = v.error,
+        locked_at = NULL
+    FROM unnest(CAST(:ids AS BIGINT[]), CAST(:statuses AS TEXT[]), CAST(:delays AS DOUBLE PRECISION[]),
+                CAST(:errors AS TEXT[])) AS v(id, status, delay, error)
+    WHERE o.id = v.id
+"""
+
+
+class SMTPConnection:
+    """One persistent SMTP session, reopened when the server drops it or it sat idle too long"""
+
+    def __init__(self):
+        self.host = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+        self.port = int(os.getenv('SMTP_PORT', '587'))
+        self.user = os.getenv('SMTP_USER')
+        self.password = os.getenv('SMTP_PASS')
+        self.sender = os.getenv('SMTP_FROM') or self.user
+        self.starttls = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+        self.timeout = int(os.getenv('SMTP_TIMEOUT', 30))
+        self.idle_seconds = int(os.getenv('SMTP_IDLE_SECONDS', 60))
+        self.max_messages = int(os.getenv('SMTP_MESSAGES_PER_CONNECTION', 500))
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._sent = 0
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self._server, self._sent = server, 0
+
+    def _usable(self) -> bool:
+        if self._server is None or self._sent >= self.max_messages:
+            return False
+        if time.monotonic() - self._last_used < self.idle_seconds:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, recipient: str, subject: str, body: str):
+        if not self._usable():
+            self.close()
+            self._open()
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'html'))
+        try:
+            self._server.send_message(msg)
+        except Exception as e:
+            if _is_connection_failure(e):
+                self.close()
+            raise
+        self._sent += 1
+        self._last_used = time.monotonic()
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+
+def _is_connection_failure(error: Exception) -> bool:
+    """The server could not be reached or dropped us, as opposed to rejecting one message"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError, so refused recipients and data errors would match too
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class EmailOutbox:
+    def __init__(self):
+        self.logger_name = "EmailOutbox"
+
+    def enqueue(self, tenant_id: int, recipient: str, subject: str, body: str,
+                reference_type: Optional[str] = None, reference_id=None, created_by: Optional[str] = None,
+                session: Optional[Session] = None) -> int:
+        """Queue a message; with a session it is sent only if that transaction commits"""
+        params = {"tid": tenant_id, "recipient": recipient, "subject": subject, "body": body,
+                  "rtype": reference_type, "rid": None if reference_id is None else str(reference_id),
+                  "created_by": created_by}
+        sql = text("""
+            INSERT INTO email_outbox (tenant_id, recipient, subject, body, reference_type, reference_id, created_by)
+            VALUES (:tid, :recipient, :subject, :body, :rtype, :rid, :created_by)
+            RETURNING id
+        """)
+        if session is not None:
+            session.info[_ENQUEUED_KEY] = True
+            return session.execute(sql, params).scalar()
+        with db_manager.get_session() as own_session:
+            own_session.info[_ENQUEUED_KEY] = True
+            return own_session.execute(sql, params).scalar()
+
+    @staticmethod
+    def get(message_id: int, tenant_id: int) -> Optional[Dict]:
+        with db_manager.get_session() as session:
+            row = session.execute(text("""
+                SELECT id, recipient, subject, reference_type, reference_id, status, attempts,
+                       next_attempt_at, last_error, created_at, sent_at
+                FROM email_outbox WHERE id = :id AND tenant_id = :tid
+            """), {"id": message_id, "tid": tenant_id}).mappings().first()
+        return dict(row) if row else None
+
+
+class EmailDeliveryWorker:
+    """Background threads draining email_outbox, one persistent SMTP connection each"""
+
+    def __init__(self):
+        self.enabled = os.getenv('EMAIL_DELIVERY_WORKER', 'true').lower() == 'true'
+        self.workers = int(os.getenv('EMAIL_DELIVERY_WORKERS', 2))
+        self.batch_size = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+        self.poll_interval = float(os.getenv('EMAIL_POLL_INTERVAL', 5))
+        self.claim_timeout = int(os.getenv('EMAIL_CLAIM_TIMEOUT', 600))
+        self.max_attempts = int(os.getenv('EMAIL_MAX_ATTEMPTS', 6))
+        self.retry_base = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', 30))
+        self.retry_max = float(os.getenv('EMAIL_RETRY_MAX_SECONDS', 3600))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self.enabled or self._threads:
+                return
+            self._stop.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"email-delivery-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Email delivery started with {self.workers} workers", "EmailDeliveryWorker")
+
+    def stop(self, timeout: float = 30):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        self._stop.set()
+        self._wake.set()
+        for thread in threads:
+            thread.join(timeout)
+        logger.info("Email delivery stopped", "EmailDeliveryWorker")
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        connection = SMTPConnection()
+        try:
+            while not self._stop.is_set():
+                try:
+                    delivered = self.deliver_batch(connection)
+                except Exception as e:
+                    logger.error(f"Email delivery batch failed: {str(e)}", "EmailDeliveryWorker")
+                    delivered = 0
+                if delivered < self.batch_size:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            connection.close()
+
+    def deliver_batch(self, connection: SMTPConnection) -> int:
+        """Claim, send and record one batch; returns the number of messages claimed"""
+        with db_manager.get_session() as session:
+            messages = session.execute(text(_CLAIM), {"claim_timeout": self.claim_timeout,
+                                                      "batch_size": self.batch_size}).mappings().all()
+        if not messages:
+            return 0
+
+        ids, statuses, delays, errors, logs = [], [], [], [], []
+        unreachable = None
+        for message in messages:
+            error = None
+            try:
+                if unreachable is not None:
+                    # Server is down; don't wait out a connect timeout for every message
+                    raise unreachable
+                connection.send(message["recipient"], message["subject"], message["body"])
+                status, delay = 'SENT', 0.0
+            except Exception as e:
+                error = str(e)
+                if _is_connection_failure(e):
+                    unreachable = e
+                if _is_permanent(e) or message["attempts"] >= self.max_attempts:
+                    status, delay = 'FAILED', 0.0
+                else:
+                    status = 'QUEUED'
+                    delay = min(self.retry_base * 2 ** (message["attempts"] - 1), self.retry_max)
+                    delay *= random.uniform(0.8, 1.2)
+            ids.append(message["id"])
+            statuses.append(status)
+            delays.append(delay)
+            errors.append(error)
+            if status != 'QUEUED':
+                logs.append((message["tenant_id"], 'EMAIL', message["recipient"], message["subject"], status,
+                             error, datetime.now()))
+
+        with db_manager.get_session() as session:
+            session.execute(text(_RECORD), {"ids": ids, "statuses": statuses, "delays": delays, "errors": errors})
+            if logs:
+                copy_rows(session, 'notification_logs', LOG_COLUMNS, logs)
+        sent = statuses.count('SENT')
+        logger.info(f"Email batch: {sent} sent, {statuses.count('QUEUED')} retrying, "
+                    f"{statuses.count('FAILED')} failed", "EmailDeliveryWorker")
+        return len(messages)
+
+
+email_outbox = EmailOutbox()
+email_delivery_worker = EmailDeliveryWorker()
+atexit.register(email_delivery_worker.stop)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_delivery(session):
+    if session.info.pop(_ENQUEUED_KEY, False):
+        email_delivery_worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_enqueued(session):
+    session.info.pop(_ENQUEUED_KEY, None)
@@ -1,104 +1,320 @@
 import io
+import os
+import json
 import base64
-import barcode
-from barcode.writer import ImageWriter
-import qrcode
-from typing import Optional, Literal
+import hashlib
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Literal, Sequence
+from core.shared.utils.cache_utils import TTLCache
+from core.shared.utils.logger import logger
+
+OutputFormat = Literal['png', 'svg']
+
+BARCODE_CACHE_DIR = os.getenv('BARCODE_CACHE_DIR', 'cache/barcodes')
+# Disk cache bounds: files unused for BARCODE_CACHE_MAX_DAYS go, then the least recently used above the size cap
+BARCODE_CACHE_MAX_DAYS = float(os.getenv('BARCODE_CACHE_MAX_DAYS', 30))
+BARCODE_CACHE_MAX_MB = float(os.getenv('BARCODE_CACHE_MAX_MB', 512))
+BARCODE_CACHE_PURGE_SECONDS = 3600
+# Batches at least this large are rendered in the process pool
+POOL_THRESHOLD = int(os.getenv('BARCODE_POOL_THRESHOLD', 16))
+
+_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+_BARCODE_OPTIONS = {
+    'module_width': 0.2,
+    'module_height': 10,
+    'quiet_zone': 2,
+    'font_size': 8,
+    'text_distance': 3
+}
+
+# Rendered data URIs keyed by content hash; long TTL so it behaves as an LRU
+_memory_cache = TTLCache(max_entries=int(os.getenv('BARCODE_CACHE_ENTRIES', 5000)), ttl_seconds=86400)
+_pool: Optional[ProcessPoolExecutor] = None
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def _cache_key(kind: str, data: str, options: Dict, output_format: str) -> str:
+    raw = json.dumps([kind, data, options, output_format], sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _disk_path(key: str, output_format: str) -> str:
+    return os.path.join(BARCODE_CACHE_DIR, key[:2], f"{key}.{output_format}")
+
+
+def _render(kind: str, data: str, options: Dict, output_format: str) -> bytes:
+    """Render one symbol to PNG or SVG bytes (also runs inside pool workers)"""
+    # Imported here: qrcode, python-barcode and Pillow cost startup time and most requests never render
+    buffer = io.BytesIO()
+    if kind == 'qr':
+        import qrcode
+        import qrcode.image.svg
+        error_levels = {
+            'L': qrcode.constants.ERROR_CORRECT_L,
+            'M': qrcode.constants.ERROR_CORRECT_M,
+            'Q': qrcode.constants.ERROR_CORRECT_Q,
+            'H': qrcode.constants.ERROR_CORRECT_H
+        }
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=error_levels[options['error_correction']],
+            box_size=options['box_size'],
+            border=options['border'],
+            image_factory=qrcode.image.svg.SvgPathImage if output_format == 'svg' else None
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        if output_format == 'svg':
+            qr.make_image().save(buffer)
+        else:
+            qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    else:
+        import barcode
+        from barcode.writer import ImageWriter, SVGWriter
+        barcode_class = barcode.get_barcode_class(options['barcode_type'])
+        writer = SVGWriter() if output_format == 'svg' else ImageWriter()
+        barcode_instance = barcode_class(data, writer=writer, add_checksum=options['add_checksum'])
+        barcode_instance.write(buffer, options=_BARCODE_OPTIONS)
+    return buffer.getvalue()
+
+
+def _to_data_uri(content: bytes, output_format: str) -> str:
+    return f"data:{_MIME_TYPES[output_format]};base64,{base64.b64encode(content).decode('utf-8')}"
+
+
+def _cached(kind: str, data: str, options: Dict, output_format: str) -> Optional[str]:
+    key = _cache_key(kind, data, options, output_format)
+    uri = _memory_cache.get(key)
+    if uri is not None:
+        return uri
+    path = _disk_path(key, output_format)
+    try:
+        with open(path, 'rb') as f:
+            uri = _to_data_uri(f.read(), output_format)
+        # The modification time doubles as last use for purge_disk_cache
+        os.utime(path)
+    except OSError:
+        return None
+    _memory_cache.set(key, uri)
+    return uri
+
+
+def _store(kind: str, data: str, options: Dict, output_format: str, content: bytes) -> str:
+    key = _cache_key(kind, data, options, output_format)
+    uri = _to_data_uri(content, output_format)
+    _memory_cache.set(key, uri)
+    path = _disk_path(key, output_format)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Barcode disk cache write failed: {str(e)}", "BarcodeGenerator")
+    _maybe_purge_disk_cache()
+    return uri
+
+
+def purge_disk_cache(max_age_days: float = BARCODE_CACHE_MAX_DAYS, max_bytes: Optional[int] = None) -> int:
+    """Remove cached files unused for max_age_days, then the least recently used above max_bytes"""
+    max_bytes = int(BARCODE_CACHE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+    cutoff = time.time() - max_age_days * 86400
+    files, removed = [], 0
+    for directory, _, names in os.walk(BARCODE_CACHE_DIR):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    files.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+    if removed:
+        logger.info(f"Purged {removed} cached barcode files", "BarcodeGenerator")
+    return removed
+
+
+def _maybe_purge_disk_cache():
+    global _last_purge
+    if time.time() - _last_purge < BARCODE_CACHE_PURGE_SECONDS:
+        return
+    with _purge_lock:
+        if time.time() - _last_purge < BARCODE_CACHE_PURGE_SECONDS:
+            return
+        _last_purge = time.time()
+    try:
+        purge_disk_cache()
+    except OSError as e:
+        logger.warning(f"Barcode disk cache purge failed: {str(e)}", "BarcodeGenerator")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=int(os.getenv('BARCODE_WORKERS', os.cpu_count() or 2)))
+    return _pool
+
 
 class BarcodeGenerator:
     """Utility for generating barcodes and QR codes as base64 strings"""
-    
-    
+
+
     @staticmethod
     def generate_barcode(
         data: str,
         barcode_type: Literal['code128', 'code39', 'ean13', 'ean8'] = 'code128',
-        add_checksum: bool = False
+        add_checksum: bool = False,
+        output_format: OutputFormat = 'png'
     ) -> str:
         """
         Generate barcode and return as base64 data URI
-        
+
         Args:
             data: Data to encode (alphanumeric for code128/code39, numeric for ean)
             barcode_type: Type of barcode (code128 recommended for alphanumeric)
             add_checksum: Add checksum for EAN barcodes
-            
+            output_format: 'png' or 'svg' (smaller and faster to render)
+
         Returns:
-            Base64 data URI string (data:image/png;base64,...)
+            Base64 data URI string (data:image/png;base64,... or data:image/svg+xml;base64,...)
         """
+        options = {'barcode_type': barcode_type, 'add_checksum': add_checksum}
         try:
-            barcode_class = barcode.get_barcode_class(barcode_type)
-            buffer = io.BytesIO()
-            
-            barcode_instance = barcode_class(data, writer=ImageWriter(), add_checksum=add_checksum)
-            barcode_instance.write(buffer, options={
-                'module_width': 0.2,
-                'module_height': 10,
-                'quiet_zone': 2,
-                'font_size': 8,
-                'text_distance': 3
-            })
-            
-            buffer.seek(0)
-            img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-            return f"data:image/png;base64,{img_base64}"
+            return _cached('barcode', data, options, output_format) or \
+                _store('barcode', data, options, output_format, _render('barcode', data, options, output_format))
         except Exception as e:
             raise ValueError(f"Barcode generation failed: {str(e)}")
-    
+
     @staticmethod
     def generate_qr_code(
         data: str,
         box_size: int = 10,
         border: int = 2,
-        error_correction: Literal['L', 'M', 'Q', 'H'] = 'M'
+        error_correction: Literal['L', 'M', 'Q', 'H'] = 'M',
+        output_format: OutputFormat = 'png'
     ) -> str:
         """
         Generate QR code and return as base64 data URI
-        
+
         Args:
             data: Data to encode (can be URL, JSON, text, etc.)
             box_size: Size of each box in pixels
             border: Border size in boxes
             error_correction: L=7%, M=15%, Q=25%, H=30% error correction
-            
+            output_format: 'png' or 'svg' (smaller and faster to render)
+
         Returns:
-            Base64 data URI string (data:image/png;base64,...)
+            Base64 data URI string (data:image/png;base64,... or data:image/svg+xml;base64,...)
         """
+        options = {'box_size': box_size, 'border': border, 'error_correction': error_correction}
         try:
-            error_levels = {
-                'L': qrcode.constants.ERROR_CORRECT_L,
-                'M': qrcode.constants.ERROR_CORRECT_M,
-                'Q': qrcode.constants.ERROR_CORRECT_Q,
-                'H': qrcode.constants.ERROR_CORRECT_H
-            }
-            
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=error_levels[error_correction],
-                box_size=box_size,
-                border=border
-            )
-            qr.add_data(data)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            buffer.seek(0)
-            
-            img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-            return f"data:image/png;base64,{img_base64}"
+            return _cached('qr', data, options, output_format) or \
+                _store('qr', data, options, output_format, _render('qr', data, options, output_format))
         except Exception as e:
             raise ValueError(f"QR code generation failed: {str(e)}")
-    
+
+    @staticmethod
+    def generate_many(
+        items: Sequence[str],
+        kind: Literal['barcode', 'qr'] = 'barcode',
+        output_format: OutputFormat = 'svg',
+        barcode_type: str = 'code128'
+    ) -> List[Optional[str]]:
+        """
+        Render many symbols at once; cache misses of large batches are rendered in a
+        process pool. Returns data URIs in input order (None where rendering failed).
+        """
+        options = {'barcode_type': barcode_type, 'add_checksum': False} if kind == 'barcode' else \
+            {'box_size': 10, 'border': 2, 'error_correction': 'M'}
+        results: List[Optional[str]] = [None] * len(items)
+        missing: Dict[str, List[int]] = {}
+        for index, data in enumerate(items):
+            cached = _cached(kind, data, options, output_format)
+            if cached:
+                results[index] = cached
+            else:
+                missing.setdefault(data, []).append(index)
+        if not missing:
+            return results
+
+        values = list(missing)
+        if len(values) >= POOL_THRESHOLD:
+            futures = [_get_pool().submit(_render, kind, data, options, output_format) for data in values]
+            rendered = []
+            for data, future in zip(values, futures):
+                try:
+                    rendered.append(future.result())
+                except Exception as e:
+                    logger.error(f"Rendering '{data}' failed: {str(e)}", "BarcodeGenerator")
+                    rendered.append(None)
+        else:
+            rendered = []
+            for data in values:
+                try:
+                    rendered.append(_render(kind, data, options, output_format))
+                except Exception as e:
+                    logger.error(f"Rendering '{data}' failed: {str(e)}", "BarcodeGenerator")
+                    rendered.append(None)
+
+        for data, content in zip(values, rendered):
+            if content is None:
+                continue
+            uri = _store(kind, data, options, output_format, content)
+            for index in missing[data]:
+                results[index] = uri
+        return results
+
     @staticmethod
     def generate_product_barcode(product_code: str) -> str:
         """Generate barcode for product code (uses Code128)"""
         return BarcodeGenerator.generate_barcode(product_code, 'code128')
-    
+
     @staticmethod
     def generate_order_qr(order_number: str, order_id: int, base_url: Optional[str] = None) -> str:
         """Generate QR code for order with URL or order number"""
         data = f"{base_url}/orders/{order_id}" if base_url else f"ORDER:{order_number}"
         return BarcodeGenerator.generate_qr_code(data)
 
+
+def build_labels(entries: List[Dict], kind: Literal['barcode', 'qr'] = 'barcode',
+                 output_format: OutputFormat = 'svg', barcode_type: str = 'code128') -> List[Dict]:
+    """Attach a rendered symbol ('image') to label entries that carry the encoded 'value'"""
+    images = BarcodeGenerator.generate_many([e['value'] for e in entries], kind, output_format, barcode_type)
+    return [{**entry, 'image': image} for entry, image in zip(entries, images)]
+
+
+def render_label_sheet(labels: List[Dict], columns: int = 3) -> str:
+    """
+    Printable HTML label sheet. Each label is a dict with 'title', optional
+    'subtitle' and 'image' (data URI).
+    """
+    from html import escape
+    cells = []
+    for label in labels:
+        image = f'<img src="{label["image"]}" alt="">' if label.get('image') else ''
+        subtitle = f'<div class="sub">{escape(str(label["subtitle"]))}</div>' if label.get('subtitle') else ''
+        cells.append(f'<div class="label">{image}<div class="title">{escape(str(label["title"]))}</div>{subtitle}</div>')
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><style>"
+        f"body{{margin:0;font-family:sans-serif}}.sheet{{display:grid;grid-template-columns:repeat({columns},1fr);gap:4mm;padding:4mm}}"
+        ".label{border:1px dashed #ccc;padding:2mm;text-align:center;page-break-inside:avoid}"
+        ".label img{max-width:100%;height:18mm}.title{font-size:9pt}.sub{font-size:8pt;color:#444}"
+        "</style></head><body><div class=\"sheet\">" + "".join(cells) + "</div></body></html>"
+    )
@@ -1,18 +1,29 @@
-from cryptography.fernet import Fernet
 import base64
 import os
 from typing import Optional
+from core.shared.utils.cache_utils import TTLCache
 
 
 class CryptoUtils:
     """Utility for encrypting/decrypting sensitive data"""
     
     def __init__(self):
-        # Get secret key from environment or generate one
-        secret_key = os.getenv('SECRET_KEY', 'default_secret_key_change_in_production')
-        # Ensure key is 32 bytes for Fernet
-        key = base64.urlsafe_b64encode(secret_key.encode().ljust(32)[:32])
-        self.cipher = Fernet(key)
+        self._cipher = None
+        # Fernet tokens are randomized; reusing one per document keeps public links
+        # (and the QR codes that encode them) stable, so rendered QR images can be cached
+        self._url_tokens = TTLCache(max_entries=20000, ttl_seconds=86400)
+    
+    @property
+    def cipher(self):
+        """Fernet cipher, built on first use so importing this module does not load cryptography"""
+        if self._cipher is None:
+            from cryptography.fernet import Fernet
+            # Get secret key from environment or generate one
+            secret_key = os.getenv('SECRET_KEY', 'default_secret_key_change_in_production')
+            # Ensure key is 32 bytes for Fernet
+            key = base64.urlsafe_b64encode(secret_key.encode().ljust(32)[:32])
+            self._cipher = Fernet(key)
+        return self._cipher
     
     def encrypt(self, data: str) -> str:
         """Encrypt string data and return base64 encoded string"""
@@ -33,13 +44,13 @@ class CryptoUtils:
     
     def generate_test_result_url(self, result_number: str) -> str:
         """Generate public URL for test result with encrypted result_number"""
-        encrypted_result_no = self.encrypt(result_number)
+        encrypted_result_no = self._url_tokens.get_or_set(('test_result', result_number), lambda: self.encrypt(result_number))
         web_app_url = os.getenv('WEB_APP_URL', 'http://localhost:3000')
         return f"{web_app_url}/public/health/test-result/{encrypted_result_no}"
 
     def generate_appointment_invoice_url(self, number: str) -> str:
         """Generate public URL for appointment invoice with encrypted number"""
-        encrypted_data = self.encrypt(number)
+        encrypted_data = self._url_tokens.get_or_set(('appointment_invoice', number), lambda: self.encrypt(number))
         web_app_url = os.getenv('WEB_APP_URL', 'http://localhost:3000')
         return f"{web_app_url}/public/health/appointment-invoice/{encrypted_data}"
 
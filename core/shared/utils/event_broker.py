@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+
+
+class Subscription:
+    """One consumer's queue of events on a topic; `overflowed` means events were dropped"""
+
+    def __init__(self, topic: str, predicate: Optional[Callable[[Any], bool]], max_queue: int):
+        self.topic = topic
+        self.predicate = predicate
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def _put(self, event: Any):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow consumer must resynchronize instead of blocking publishers
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[Any]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """
+    In-process fan-out of events to asyncio consumers such as SSE streams.
+    publish() is thread-safe, so background threads can feed request handlers.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str, predicate: Optional[Callable[[Any], bool]] = None) -> Subscription:
+        """Must be called from the event loop that will consume the subscription"""
+        subscription = Subscription(topic, predicate, self.max_queue)
+        with self._lock:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.get(subscription.topic, set()).discard(subscription)
+
+    def has_subscribers(self, topic: str, predicate: Optional[Callable[[Subscription], bool]] = None) -> bool:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(topic, ()))
+        return any(predicate is None or predicate(s) for s in subscriptions)
+
+    def publish(self, topic: str, event: Any) -> int:
+        """Deliver an event to matching subscribers; returns how many it was queued for"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(topic, ()))
+        delivered = 0
+        for subscription in subscriptions:
+            if subscription.predicate and not subscription.predicate(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+                delivered += 1
+            except RuntimeError:
+                # Event loop already closed; the consumer is gone
+                self.unsubscribe(subscription)
+        return delivered
+
+
+event_broker = EventBroker()
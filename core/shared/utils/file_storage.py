@@ -0,0 +1,242 @@
+"""
+Pluggable binary object storage.
+
+The interface follows the S3 object model (keys, ranged GETs, multipart uploads
+with numbered parts and metadata) so an S3-compatible backend can be dropped in;
+LocalFileStorage satisfies it on the filesystem. Completed objects are content
+addressed by SHA-256, so identical uploads are stored once.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from core.shared.utils.logger import logger
+
+COPY_BUFFER = 1024 * 1024
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    sha256: str
+    deduplicated: bool = False
+
+
+class FileStorage:
+    """Backend interface; keys are opaque strings returned by complete_multipart_upload/put_object"""
+
+    name = 'abstract'
+
+    def put_object(self, body: BinaryIO) -> StoredObject:
+        raise NotImplementedError
+
+    def head_object(self, key: str) -> Optional[int]:
+        """Object size in bytes, or None when it does not exist"""
+        raise NotImplementedError
+
+    def get_object_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Stream bytes start..end (inclusive)"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path when the backend has one, so the server can sendfile() it"""
+        return None
+
+    def create_multipart_upload(self, metadata: Dict) -> str:
+        raise NotImplementedError
+
+    def get_upload_metadata(self, upload_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def open_part(self, upload_id: str, part_number: int) -> BinaryIO:
+        """Writable handle for one part; nothing is visible until commit_part()"""
+        raise NotImplementedError
+
+    def commit_part(self, upload_id: str, part_number: int, handle: BinaryIO) -> int:
+        raise NotImplementedError
+
+    def list_parts(self, upload_id: str) -> Dict[int, int]:
+        """part_number -> size of every committed part"""
+        raise NotImplementedError
+
+    def complete_multipart_upload(self, upload_id: str, part_numbers: List[int],
+                                  expected_sha256: Optional[str] = None) -> StoredObject:
+        """Store the parts as one object; on an expected_sha256 mismatch nothing is stored and the parts are kept"""
+        raise NotImplementedError
+
+    def abort_multipart_upload(self, upload_id: str):
+        raise NotImplementedError
+
+
+class LocalFileStorage(FileStorage):
+    """
+    Filesystem backend. Objects live under objects/<aa>/<bb>/<sha256>; each
+    multipart upload is a directory of part files plus its metadata.
+    """
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.uploads_dir = os.path.join(root, 'uploads')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.uploads_dir, exist_ok=True)
+
+    @staticmethod
+    def _key(sha256: str) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def _object_path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.objects_dir, key))
+        if not path.startswith(self.objects_dir + os.sep):
+            raise ValueError("Invalid storage key")
+        return path
+
+    def _upload_dir(self, upload_id: str) -> str:
+        # Upload ids are uuid4 hex; anything else is rejected before touching the filesystem
+        if len(upload_id) != 32 or any(c not in '0123456789abcdef' for c in upload_id):
+            raise ValueError("Invalid upload id")
+        return os.path.join(self.uploads_dir, upload_id)
+
+    def _store(self, temp_path: str, size: int, sha256: str) -> StoredObject:
+        key = self._key(sha256)
+        path = self._object_path(key)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            return StoredObject(key, size, sha256, deduplicated=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return StoredObject(key, size, sha256)
+
+    def put_object(self, body: BinaryIO) -> StoredObject:
+        temp_path = os.path.join(self.uploads_dir, f"put-{uuid.uuid4().hex}.tmp")
+        digest, size = hashlib.sha256(), 0
+        with open(temp_path, 'wb') as out:
+            while True:
+                chunk = body.read(COPY_BUFFER)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        return self._store(temp_path, size, digest.hexdigest())
+
+    def head_object(self, key: str) -> Optional[int]:
+        path = self._object_path(key)
+        return os.path.getsize(path) if os.path.isfile(path) else None
+
+    def get_object_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self._object_path(key), 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(COPY_BUFFER, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._object_path(key)
+
+    def create_multipart_upload(self, metadata: Dict) -> str:
+        upload_id = uuid.uuid4().hex
+        directory = self._upload_dir(upload_id)
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'metadata.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, default=str)
+        return upload_id
+
+    def get_upload_metadata(self, upload_id: str) -> Optional[Dict]:
+        path = os.path.join(self._upload_dir(upload_id), 'metadata.json')
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def open_part(self, upload_id: str, part_number: int) -> BinaryIO:
+        directory = self._upload_dir(upload_id)
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(upload_id)
+        # Unique temp name: a retried part may arrive while an earlier attempt is still writing
+        return open(os.path.join(directory, f"{part_number:06d}.{uuid.uuid4().hex[:8]}.tmp"), 'wb')
+
+    def commit_part(self, upload_id: str, part_number: int, handle: BinaryIO) -> int:
+        handle.flush()
+        os.fsync(handle.fileno())
+        handle.close()
+        size = os.path.getsize(handle.name)
+        os.replace(handle.name, os.path.join(self._upload_dir(upload_id), f"{part_number:06d}.part"))
+        return size
+
+    def list_parts(self, upload_id: str) -> Dict[int, int]:
+        directory = self._upload_dir(upload_id)
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(upload_id)
+        return {int(name[:6]): os.path.getsize(os.path.join(directory, name))
+                for name in os.listdir(directory) if name.endswith('.part')}
+
+    def complete_multipart_upload(self, upload_id: str, part_numbers: List[int],
+                                  expected_sha256: Optional[str] = None) -> StoredObject:
+        directory = self._upload_dir(upload_id)
+        # Unique temp name: two completes of the same upload must not write one file
+        temp_path = os.path.join(directory, f"assembled.{uuid.uuid4().hex[:8]}.tmp")
+        digest, size = hashlib.sha256(), 0
+        # One pass over the parts: hash and concatenate with a fixed-size buffer
+        with open(temp_path, 'wb') as out:
+            for part_number in sorted(part_numbers):
+                with open(os.path.join(directory, f"{part_number:06d}.part"), 'rb') as part:
+                    while True:
+                        chunk = part.read(COPY_BUFFER)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        out.write(chunk)
+                        size += len(chunk)
+        if expected_sha256 and expected_sha256 != digest.hexdigest():
+            os.remove(temp_path)
+            raise ValueError("Uploaded content does not match the declared sha256")
+        stored = self._store(temp_path, size, digest.hexdigest())
+        shutil.rmtree(directory, ignore_errors=True)
+        return stored
+
+    def abort_multipart_upload(self, upload_id: str):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def purge_stale_uploads(self, max_age_seconds: float) -> int:
+        """Remove multipart uploads untouched for longer than max_age_seconds"""
+        cutoff, removed = time.time() - max_age_seconds, 0
+        for name in os.listdir(self.uploads_dir):
+            path = os.path.join(self.uploads_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Purged {removed} stale uploads", "LocalFileStorage")
+        return removed
+
+
+_storages: Dict[str, FileStorage] = {}
+
+
+def get_file_storage(name: Optional[str] = None) -> FileStorage:
+    """Storage backend by name (FILE_STORAGE_BACKEND by default)"""
+    name = name or os.getenv('FILE_STORAGE_BACKEND', 'local')
+    if name not in _storages:
+        if name == 'local':
+            _storages[name] = LocalFileStorage(os.path.abspath(os.getenv('FILE_STORAGE_ROOT', 'storage')))
+        else:
+            raise ValueError(f"Unsupported file storage backend: {name}")
+    return _storages[name]
@@ -0,0 +1,108 @@
+import os
+import re
+from typing import Callable, Iterator, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_ENTITY_TAG_RE = re.compile(r'\s*(?:W/)?"([^"]*)"\s*(?:,|$)')
+
+CHUNK_SIZE = 256 * 1024
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range 'bytes=start-end' header into inclusive offsets; None means whole file"""
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        raise HTTPException(status_code=416, detail="Invalid Range header",
+                            headers={"Content-Range": f"bytes */{size}"})
+
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    else:
+        # Suffix range: last N bytes
+        start = max(size - int(end_text), 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """
+    True when an If-None-Match header matches `etag` (the opaque tag, unquoted):
+    `*`, or one of its comma-separated entity-tags compared weakly (W/ ignored)
+    """
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in _ENTITY_TAG_RE.findall(header)
+
+
+def iter_file_range(path: str, start: int, end: int, chunk_size: int = CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def range_file_response(path: str, media_type: str, filename: Optional[str] = None,
+                        range_header: Optional[str] = None, etag: Optional[str] = None):
+    """
+    Serve a file with HTTP Range support so interrupted downloads can resume.
+
+    Full-file requests go through FileResponse, which lets the server use
+    sendfile; partial requests stream only the requested byte range.
+    """
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if etag:
+        headers["ETag"] = etag
+
+    byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{size}",
+        "Content-Length": str(end - start + 1)
+    })
+    return StreamingResponse(iter_file_range(path, start, end), status_code=206,
+                             media_type=media_type, headers=headers)
+
+
+def range_stream_response(size: int, read_range: Callable[[int, int], Iterator[bytes]], media_type: str,
+                          filename: Optional[str] = None, range_header: Optional[str] = None,
+                          etag: Optional[str] = None):
+    """Range-aware response for content that is not a local file (read_range yields bytes start..end)"""
+    headers = {"Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if etag:
+        headers["ETag"] = etag
+
+    byte_range = parse_range(range_header, size)
+    start, end = byte_range or (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range is None:
+        return StreamingResponse(read_range(start, end), media_type=media_type, headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(read_range(start, end), status_code=206, media_type=media_type, headers=headers)
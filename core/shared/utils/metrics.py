@@ -0,0 +1,214 @@
+"""
+Prometheus metrics.
+
+HTTP requests are timed per route template and tenant tier by MetricsMiddleware.
+Every SQL statement is timed through engine cursor events and counted against
+the request that issued it, and the connection pool reports checkouts, wait
+time, timeouts, checked-out connections and overflow. Business counters
+(invoices posted, ledger rows written) are taken from session flushes and
+counted when the transaction commits.
+
+Tenant tiers come from METRICS_TENANT_TIERS, e.g. "enterprise:1,7;trial:12";
+unlisted tenants are "standard" and unauthenticated requests "anonymous".
+With several worker processes set PROMETHEUS_MULTIPROC_DIR to an empty
+directory so /metrics aggregates all of them.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests', ['method', 'route', 'status', 'tenant_tier'])
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'route', 'tenant_tier'],
+                         buckets=LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being served', multiprocess_mode='livesum')
+REQUEST_QUERIES = Histogram('http_request_db_queries', 'SQL statements issued per request', ['method', 'route'],
+                            buckets=QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_SECONDS = Histogram('http_request_db_seconds', 'Time spent in SQL per request', ['method', 'route'],
+                                  buckets=LATENCY_BUCKETS)
+
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed', ['operation'])
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds', 'SQL statement latency', ['operation'],
+                             buckets=QUERY_BUCKETS)
+POOL_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connections checked out of the pool')
+POOL_WAIT = Histogram('db_pool_wait_seconds', 'Time waiting for a pooled connection', buckets=QUERY_BUCKETS)
+POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Pool checkouts that timed out')
+POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections currently checked out', multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('db_pool_overflow', 'Connections open beyond pool_size', multiprocess_mode='livesum')
+
+INVOICES_POSTED = Counter('invoices_posted_total', 'Invoices moved to POSTED', ['invoice_type'])
+LEDGER_ROWS = Counter('ledger_rows_written_total', 'Ledger and voucher line rows written', ['table'])
+
+# [statement count, seconds in SQL] of the request being served
+_request_queries: ContextVar[Optional[list]] = ContextVar('request_queries', default=None)
+
+_BUSINESS_KEY = 'metrics_business_counts'
+
+
+def _parse_tiers(spec: str) -> Dict[int, str]:
+    tiers = {}
+    for part in filter(None, (p.strip() for p in spec.split(';'))):
+        tier, _, ids = part.partition(':')
+        for tenant_id in filter(None, (i.strip() for i in ids.split(','))):
+            tiers[int(tenant_id)] = tier.strip()
+    return tiers
+
+
+_TENANT_TIERS = _parse_tiers(os.getenv('METRICS_TENANT_TIERS', ''))
+
+
+def tenant_tier(tenant_id: Optional[int]) -> str:
+    if tenant_id is None:
+        return 'anonymous'
+    return _TENANT_TIERS.get(int(tenant_id), 'standard')
+
+
+def render() -> tuple:
+    """Body and content type for the /metrics endpoint"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request and the SQL it issues"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            _request_queries.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            tier = tenant_tier(scope.get("state", {}).get("tenant_id"))
+            HTTP_REQUESTS.labels(method, route, str(status[0]), tier).inc()
+            HTTP_LATENCY.labels(method, route, tier).observe(elapsed)
+            REQUEST_QUERIES.labels(method, route).observe(queries[0])
+            REQUEST_QUERY_SECONDS.labels(method, route).observe(queries[1])
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """Attach query timing and pool accounting to an engine"""
+    pool = engine.pool
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        DB_QUERIES.labels(operation).inc()
+        DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _failed_query(context):
+        starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKOUTS.inc()
+        POOL_CHECKED_OUT.inc()
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        POOL_CHECKED_OUT.dec()
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def _business_entities():
+    from modules.account_module.models.entities import VoucherLine
+    from modules.account_module.models.ledger_entity import Ledger
+    from modules.health_module.models.test_invoice_entity import TestInvoice
+    from modules.inventory_module.models.purchase_invoice_entity import PurchaseInvoice
+    from modules.inventory_module.models.sales_invoice_entity import SalesInvoice
+    return ({SalesInvoice: 'SALES', PurchaseInvoice: 'PURCHASE', TestInvoice: 'TEST'},
+            {Ledger: 'ledgers', VoucherLine: 'voucher_lines'})
+
+
+_entities = None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_business_counts(session, flush_context):
+    global _entities
+    if _entities is None:
+        _entities = _business_entities()
+    invoices, ledger_tables = _entities
+    found = []
+    for obj in session.new:
+        if type(obj) in ledger_tables:
+            found.append(('ledger', ledger_tables[type(obj)]))
+    for obj in list(session.new) + list(session.dirty):
+        if type(obj) in invoices and 'POSTED' in inspect(obj).attrs.status.history.added:
+            found.append(('invoice', invoices[type(obj)]))
+    if found:
+        counts = session.info.setdefault(_BUSINESS_KEY, {})
+        for key in found:
+            counts[key] = counts.get(key, 0) + 1
+
+
+@event.listens_for(Session, "after_commit")
+def _count_business_events(session):
+    for (kind, label), count in session.info.pop(_BUSINESS_KEY, {}).items():
+        (INVOICES_POSTED if kind == 'invoice' else LEDGER_ROWS).labels(label).inc(count)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_business_counts(session):
+    session.info.pop(_BUSINESS_KEY, None)
@@ -0,0 +1,201 @@
+"""
+N+1 and slow-query detector for development and staging.
+
+With QUERY_DETECTOR=true every SQL statement issued while serving a request
+is fingerprinted (literals and bind parameters replaced by ?, IN lists
+collapsed), so the same statement shape run in a loop groups together. A
+shape repeated QUERY_DETECTOR_N1_THRESHOLD times in one request is reported
+as an N+1 together with the application frames that issued it. Statements
+slower than QUERY_DETECTOR_SLOW_MS get their plan captured with EXPLAIN
+(ANALYZE for SELECTs when QUERY_DETECTOR_ANALYZE=true), run inside a
+savepoint that is always rolled back, so a failing EXPLAIN cannot abort the
+request's transaction and whatever ANALYZE executed does not persist.
+
+Requests with findings, or more than QUERY_DETECTOR_MAX_QUERIES statements,
+are appended as JSON lines to QUERY_DETECTOR_REPORT and kept in memory for
+GET /debug/query-reports (admin only). Responses carry X-Query-Count.
+"""
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from core.shared.utils.logger import logger
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM = re.compile(r"%\([^)]+\)s|%s|\$\d+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+_SKIP_FRAMES = (os.sep + 'sqlalchemy' + os.sep, 'query_detector.py', os.sep + 'site-packages' + os.sep)
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape: literals and parameters become ?, IN lists (?, ?, ...) become (?+)"""
+    shape = _STRING.sub('?', statement)
+    shape = _PARAM.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _LIST.sub('(?+)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def _call_site() -> List[str]:
+    frames = [frame for frame in traceback.extract_stack()[:-2]
+              if frame.filename.startswith(_PROJECT_ROOT) and not any(s in frame.filename for s in _SKIP_FRAMES)]
+    return [f"{os.path.relpath(f.filename, _PROJECT_ROOT)}:{f.lineno} in {f.name}" for f in frames[-4:]]
+
+
+class _RequestTrace:
+    __slots__ = ('shapes', 'count', 'seconds', 'slow')
+
+    def __init__(self):
+        self.shapes: Dict[str, dict] = {}
+        self.count = 0
+        self.seconds = 0.0
+        self.slow: List[dict] = []
+
+
+_trace: ContextVar[Optional[_RequestTrace]] = ContextVar('query_detector_trace', default=None)
+
+
+class QueryDetector:
+    def __init__(self):
+        self.enabled = os.getenv('QUERY_DETECTOR', 'false').lower() == 'true'
+        self.n1_threshold = int(os.getenv('QUERY_DETECTOR_N1_THRESHOLD', 5))
+        self.max_queries = int(os.getenv('QUERY_DETECTOR_MAX_QUERIES', 50))
+        self.slow_seconds = float(os.getenv('QUERY_DETECTOR_SLOW_MS', 200)) / 1000
+        self.analyze = os.getenv('QUERY_DETECTOR_ANALYZE', 'false').lower() == 'true'
+        self.report_path = os.getenv('QUERY_DETECTOR_REPORT', 'logs/query_detector.jsonl')
+        self.reports = deque(maxlen=int(os.getenv('QUERY_DETECTOR_KEEP', 200)))
+        self._lock = threading.Lock()
+
+    def install(self, engine):
+        """Hook the engine's cursor events; no-op unless QUERY_DETECTOR is enabled"""
+        if not self.enabled:
+            return
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if _trace.get() is not None:
+                conn.info.setdefault('query_detector_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            trace = _trace.get()
+            starts = conn.info.get('query_detector_start')
+            if trace is None or not starts:
+                return
+            self._record(trace, conn, statement, parameters, executemany, time.perf_counter() - starts.pop())
+
+        @event.listens_for(engine, "handle_error")
+        def _failed(context):
+            starts = context.connection.info.get('query_detector_start') if context.connection is not None else None
+            if starts:
+                starts.pop()
+
+        logger.info("Query detector enabled", "QueryDetector")
+
+    def _record(self, trace: _RequestTrace, conn, statement: str, parameters, executemany: bool, elapsed: float):
+        trace.count += 1
+        trace.seconds += elapsed
+        shape = fingerprint(statement)
+        entry = trace.shapes.get(shape)
+        if entry is None:
+            entry = trace.shapes[shape] = {"count": 0, "seconds": 0.0, "statement": statement}
+        entry["count"] += 1
+        entry["seconds"] += elapsed
+        if entry["count"] == self.n1_threshold:
+            entry["call_site"] = _call_site()
+        if elapsed >= self.slow_seconds:
+            trace.slow.append({"statement": statement, "ms": round(elapsed * 1000, 2), "call_site": _call_site(),
+                               "plan": None if executemany else self._explain(conn, statement, parameters)})
+
+    def _explain(self, conn, statement: str, parameters):
+        analyze = self.analyze and statement.lstrip()[:6].upper() == 'SELECT'
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("SAVEPOINT query_detector_explain")
+            try:
+                cursor.execute(f"EXPLAIN (FORMAT JSON{', ANALYZE, BUFFERS' if analyze else ''}) {statement}",
+                               parameters or None)
+                return cursor.fetchone()[0]
+            except Exception as e:
+                return {"error": str(e)}
+            finally:
+                # Always rolled back: EXPLAIN ANALYZE executes the statement, and its effects must not persist
+                cursor.execute("ROLLBACK TO SAVEPOINT query_detector_explain")
+                cursor.execute("RELEASE SAVEPOINT query_detector_explain")
+        except Exception as e:
+            return {"error": str(e)}
+        finally:
+            cursor.close()
+
+    def report(self, method: str, path: str, status: int, elapsed: float, trace: _RequestTrace) -> Optional[Dict]:
+        n_plus_one = [{"fingerprint": shape, "count": entry["count"], "ms": round(entry["seconds"] * 1000, 2),
+                       "example": entry["statement"], "call_site": entry.get("call_site", [])}
+                      for shape, entry in trace.shapes.items() if entry["count"] >= self.n1_threshold]
+        if not n_plus_one and not trace.slow and trace.count <= self.max_queries:
+            return None
+        n_plus_one.sort(key=lambda item: item["count"], reverse=True)
+        report = {"at": datetime.now().isoformat(), "method": method, "path": path, "status": status,
+                  "ms": round(elapsed * 1000, 2), "queries": trace.count, "query_ms": round(trace.seconds * 1000, 2),
+                  "distinct_statements": len(trace.shapes), "n_plus_one": n_plus_one, "slow": trace.slow}
+        with self._lock:
+            self.reports.append(report)
+            try:
+                directory = os.path.dirname(self.report_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.report_path, 'a') as handle:
+                    handle.write(json.dumps(report, default=str) + "\n")
+            except OSError as e:
+                logger.error(f"Could not write query report: {str(e)}", "QueryDetector")
+        logger.warning(f"{method} {path}: {trace.count} queries, {len(n_plus_one)} repeated shapes, "
+                       f"{len(trace.slow)} slow", "QueryDetector")
+        return report
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.reports)[-limit:][::-1]
+
+
+query_detector = QueryDetector()
+
+
+class QueryDetectorMiddleware:
+    """ASGI middleware tracing the SQL of each request for query_detector"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        trace = _RequestTrace()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                # Statements issued while streaming the body are not in this count
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-query-count", str(trace.count).encode())]
+            await send(message)
+
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            query_detector.report(scope["method"], scope["path"], status[0], time.perf_counter() - start, trace)
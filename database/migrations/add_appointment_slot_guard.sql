@@ -0,0 +1,33 @@
+-- Migration: Conflict-safe appointment booking
+-- Date: 2026-10-19
+-- Description: Adds a generated time range to appointments and an exclusion
+--              constraint so one doctor cannot hold two overlapping active
+--              appointments, plus an index for the slot availability engine.
+--              Existing overlaps must be resolved first; list them with:
+--                SELECT a.id, b.id FROM appointments a JOIN appointments b
+--                  ON a.doctor_id = b.doctor_id AND a.id < b.id AND a.slot_range && b.slot_range
+--                 WHERE NOT a.is_deleted AND NOT b.is_deleted
+--                   AND a.status IN ('SCHEDULED','CONFIRMED','COMPLETED')
+--                   AND b.status IN ('SCHEDULED','CONFIRMED','COMPLETED');
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE doctors ADD COLUMN IF NOT EXISTS working_days TEXT[];
+ALTER TABLE doctors ADD COLUMN IF NOT EXISTS consultation_duration INTEGER DEFAULT 15;
+
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS slot_range TSRANGE
+    GENERATED ALWAYS AS (
+        tsrange(appointment_date + appointment_time,
+                appointment_date + appointment_time + make_interval(mins => GREATEST(COALESCE(duration_minutes, 15), 1)),
+                '[)')
+    ) STORED;
+
+ALTER TABLE appointments
+    ADD CONSTRAINT appointments_no_doctor_overlap
+    EXCLUDE USING gist (doctor_id WITH =, slot_range WITH &&)
+    WHERE (is_deleted = false AND status IN ('SCHEDULED', 'CONFIRMED', 'COMPLETED'));
+
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor_day
+    ON appointments (tenant_id, doctor_id, appointment_date)
+    INCLUDE (appointment_time, duration_minutes, status)
+    WHERE is_deleted = false;
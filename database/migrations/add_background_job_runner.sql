@@ -0,0 +1,10 @@
+-- Migration: Background job runner
+-- Date: 2026-10-19
+-- Description: Records the host:pid executing each background job, so jobs left
+--              behind by a recycled or killed server worker can be marked failed
+
+BEGIN;
+
+ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS runner VARCHAR(100);
+
+COMMIT;
@@ -0,0 +1,29 @@
+-- Migration: Background jobs
+-- Date: 2026-10-19
+-- Description: Tracks long-running server-side work (return file exports, batch
+--              renders, campaigns) so clients can poll status and download results
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id VARCHAR(36) PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    job_type VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'QUEUED',
+    progress BIGINT DEFAULT 0,
+    total BIGINT,
+    params JSON,
+    result JSON,
+    result_path TEXT,
+    result_size BIGINT,
+    content_type VARCHAR(100),
+    error TEXT,
+    created_by VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+
+    CONSTRAINT chk_background_job_status
+        CHECK (status IN ('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_jobs_tenant_type
+    ON background_jobs (tenant_id, job_type, created_at);
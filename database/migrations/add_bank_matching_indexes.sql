@@ -0,0 +1,12 @@
+-- Migration: Indexes for bank statement auto-matching
+-- Date: 2026-10-19
+-- Description: Partial indexes so the matching engine can load unreconciled
+--              statement and ledger lines for one account with range scans
+
+CREATE INDEX IF NOT EXISTS idx_bank_statements_unreconciled
+    ON bank_statements (tenant_id, account_id, trans_date)
+    WHERE is_reconciled = false;
+
+CREATE INDEX IF NOT EXISTS idx_ledgers_unreconciled_account_date
+    ON ledgers (tenant_id, account_id, transaction_date)
+    WHERE is_reconciled = false AND is_deleted = false;
@@ -0,0 +1,15 @@
+-- Migration: Catalog versions
+-- Date: 2026-10-19
+-- Description: One row per tenant, bumped in the transaction that changes a test,
+--              test panel, panel item or billing master. Each API worker compares
+--              it with the version of its cached price catalog before using it.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS catalog_versions (
+    tenant_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMIT;
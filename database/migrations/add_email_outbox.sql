@@ -0,0 +1,33 @@
+-- Migration: Email outbox
+-- Date: 2026-10-19
+-- Description: Transactional outbox for outgoing email. Requests insert rows in
+--              their own transaction; delivery workers claim due rows with
+--              FOR UPDATE SKIP LOCKED, send them over pooled SMTP connections and
+--              record the outcome, retrying transient failures with backoff.
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    reference_type VARCHAR(50),
+    reference_id VARCHAR(100),
+    status VARCHAR(20) NOT NULL DEFAULT 'QUEUED',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    created_by VARCHAR(100),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+
+    CONSTRAINT chk_email_outbox_status
+        CHECK (status IN ('QUEUED', 'SENDING', 'SENT', 'FAILED'))
+);
+
+-- Only undelivered rows are indexed, so the claim query stays small as history grows
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+    ON email_outbox (next_attempt_at, id) WHERE status IN ('QUEUED', 'SENDING');
+CREATE INDEX IF NOT EXISTS idx_email_outbox_tenant
+    ON email_outbox (tenant_id, created_at);
@@ -0,0 +1,59 @@
+-- Migration: Precomputed GST return summaries
+-- Date: 2026-10-19
+-- Description: Per-tenant, per-return-period GST totals maintained when sales
+--              invoices, credit notes, purchase invoices and debit notes are
+--              posted or reversed. GSTR-1 / GSTR-3B read these tables directly.
+--              Backfill existing periods with POST /api/v1/account/gst-summaries/rebuild
+
+CREATE TABLE IF NOT EXISTS gst_return_summaries (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    return_period VARCHAR(7) NOT NULL,          -- YYYY-MM
+    section VARCHAR(10) NOT NULL,               -- B2B, B2CL, B2CS, CDNR, CDNUR, HSN, ITC, ITC_REV
+    gstin VARCHAR(20) NOT NULL DEFAULT '',
+    hsn_code VARCHAR(20) NOT NULL DEFAULT '',
+    gst_rate NUMERIC(5,2) NOT NULL DEFAULT 0,
+    party_name VARCHAR(200),
+
+    document_count INTEGER NOT NULL DEFAULT 0,
+    quantity NUMERIC(15,4) NOT NULL DEFAULT 0,
+    taxable_value NUMERIC(15,4) NOT NULL DEFAULT 0,
+    cgst_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    sgst_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    igst_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    cess_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    total_value NUMERIC(15,4) NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT uq_gst_return_summary_key
+        UNIQUE (tenant_id, return_period, section, gstin, hsn_code, gst_rate)
+);
+
+CREATE TABLE IF NOT EXISTS gst_summary_document_lines (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    document_type VARCHAR(20) NOT NULL,         -- SALES_INVOICE, CREDIT_NOTE, PURCHASE_INVOICE, DEBIT_NOTE
+    document_id INTEGER NOT NULL,
+    return_period VARCHAR(7) NOT NULL,
+    section VARCHAR(10) NOT NULL,
+    gstin VARCHAR(20) NOT NULL DEFAULT '',
+    hsn_code VARCHAR(20) NOT NULL DEFAULT '',
+    gst_rate NUMERIC(5,2) NOT NULL DEFAULT 0,
+    party_name VARCHAR(200),
+
+    quantity NUMERIC(15,4) NOT NULL DEFAULT 0,
+    taxable_value NUMERIC(15,4) NOT NULL DEFAULT 0,
+    cgst_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    sgst_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    igst_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    cess_amount NUMERIC(15,4) NOT NULL DEFAULT 0,
+    total_value NUMERIC(15,4) NOT NULL DEFAULT 0,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_gst_summary_doc_lines_document
+    ON gst_summary_document_lines (tenant_id, document_type, document_id);
+CREATE INDEX IF NOT EXISTS idx_gst_summary_doc_lines_period
+    ON gst_summary_document_lines (tenant_id, return_period);
@@ -0,0 +1,16 @@
+-- Migration: Place of supply in GST return summaries
+-- Date: 2026-10-19
+-- Description: Keys the summaries by place of supply as well, so inter-state B2CS
+--              rows can be reported per recipient state. Existing periods need a
+--              rebuild (POST /api/v1/account/gst-summaries/rebuild) to fill it in.
+
+BEGIN;
+
+ALTER TABLE gst_return_summaries ADD COLUMN IF NOT EXISTS place_of_supply VARCHAR(2) NOT NULL DEFAULT '';
+ALTER TABLE gst_summary_document_lines ADD COLUMN IF NOT EXISTS place_of_supply VARCHAR(2) NOT NULL DEFAULT '';
+
+ALTER TABLE gst_return_summaries DROP CONSTRAINT IF EXISTS uq_gst_return_summary_key;
+ALTER TABLE gst_return_summaries ADD CONSTRAINT uq_gst_return_summary_key
+    UNIQUE (tenant_id, return_period, section, gstin, hsn_code, gst_rate, place_of_supply);
+
+COMMIT;
@@ -0,0 +1,85 @@
+-- Migration: Incremental health dashboard counters
+-- Date: 2026-10-19
+-- Description: Per-tenant daily counters maintained by the health services as
+--              appointments, medical records, prescriptions, test orders,
+--              sample collections, test results and patients change. The health
+--              dashboard reads these rows instead of calling the get_*_analytics
+--              functions. health_metrics_rebuild() recomputes them from the
+--              source tables and backfills existing data below.
+
+CREATE TABLE IF NOT EXISTS health_daily_metrics (
+    tenant_id    INTEGER NOT NULL REFERENCES tenants(id),
+    metric_date  DATE NOT NULL,
+    metric       VARCHAR(50) NOT NULL,
+    dimension    VARCHAR(100) NOT NULL DEFAULT '',
+    value_count  BIGINT NOT NULL DEFAULT 0,
+    value_sum    NUMERIC(18, 4) NOT NULL DEFAULT 0,
+    updated_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tenant_id, metric, metric_date, dimension)
+);
+
+-- Appointments:  dimension '<doctor_id>:<status>', dated by appointment_date
+-- Test items:    dimension 'test:<id>' / 'panel:<id>', value_sum = line total
+-- Test results:  value_sum = hours from order to result
+-- Patients:      'patients_new' by creation day, 'patient_profile' running totals
+--                dated 1970-01-01 with dimension '<gender>|<birth year>|<active>'
+CREATE OR REPLACE FUNCTION health_metrics_rebuild(p_tenant_id INTEGER DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM health_daily_metrics WHERE p_tenant_id IS NULL OR tenant_id = p_tenant_id;
+
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum)
+    SELECT tenant_id, appointment_date, 'appointments', doctor_id || ':' || COALESCE(status, 'SCHEDULED'), COUNT(*), 0
+    FROM appointments
+    WHERE is_deleted = FALSE AND (p_tenant_id IS NULL OR tenant_id = p_tenant_id)
+    GROUP BY 1, 2, 4;
+
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum)
+    SELECT tenant_id, CAST(created_at AS DATE), metric, '', COUNT(*), 0
+    FROM (
+        SELECT tenant_id, created_at, 'medical_records' AS metric FROM medical_records WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT tenant_id, created_at, 'prescriptions' FROM prescriptions WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT tenant_id, created_at, 'test_orders' FROM test_orders WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT tenant_id, created_at, 'sample_collections' FROM sample_collections WHERE is_deleted = FALSE
+    ) AS records
+    WHERE p_tenant_id IS NULL OR tenant_id = p_tenant_id
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum)
+    SELECT r.tenant_id, CAST(r.created_at AS DATE), 'test_results', '', COUNT(*),
+           COALESCE(SUM(GREATEST(EXTRACT(EPOCH FROM (r.result_date - o.order_date)), 0) / 3600), 0)
+    FROM test_results r
+    LEFT JOIN test_orders o ON o.id = r.test_order_id
+    WHERE r.is_deleted = FALSE AND (p_tenant_id IS NULL OR r.tenant_id = p_tenant_id)
+    GROUP BY 1, 2;
+
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum)
+    SELECT tenant_id, CAST(created_at AS DATE), 'test_items',
+           CASE WHEN test_id IS NOT NULL THEN 'test:' || test_id
+                ELSE 'panel:' || COALESCE(CAST(panel_id AS TEXT), '') END,
+           COUNT(*), COALESCE(SUM(total_amount), 0)
+    FROM test_order_items
+    WHERE is_deleted = FALSE AND (p_tenant_id IS NULL OR tenant_id = p_tenant_id)
+    GROUP BY 1, 2, 4;
+
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum)
+    SELECT tenant_id, CAST(created_at AS DATE), 'patients_new', '', COUNT(*), 0
+    FROM patients
+    WHERE is_deleted IS NOT TRUE AND (p_tenant_id IS NULL OR tenant_id = p_tenant_id)
+    GROUP BY 1, 2;
+
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum)
+    SELECT tenant_id, DATE '1970-01-01', 'patient_profile',
+           COALESCE(gender, '') || '|' || COALESCE(CAST(EXTRACT(YEAR FROM date_of_birth) AS INTEGER)::TEXT, '')
+               || '|' || CASE WHEN is_active THEN '1' ELSE '0' END,
+           COUNT(*), 0
+    FROM patients
+    WHERE is_deleted IS NOT TRUE AND (p_tenant_id IS NULL OR tenant_id = p_tenant_id)
+    GROUP BY 1, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT health_metrics_rebuild();
@@ -0,0 +1,86 @@
+-- Migration: Lab worklist queue
+-- Date: 2026-10-19
+-- Description: One row per pending test order item, in the collection or
+--              processing stage, keyed for department / stage / urgency / age
+--              queues with keyset paging. Rows are recomputed per test order by
+--              lab_worklist_refresh() whenever an order, its items, its sample
+--              collections or its results change; the refreshing transaction
+--              sends a 'lab_worklist' NOTIFY that drives the live updates.
+
+CREATE TABLE IF NOT EXISTS lab_worklist (
+    test_order_item_id    INTEGER PRIMARY KEY REFERENCES test_order_items(id) ON DELETE CASCADE,
+    tenant_id             INTEGER NOT NULL REFERENCES tenants(id),
+    test_order_id         INTEGER NOT NULL REFERENCES test_orders(id) ON DELETE CASCADE,
+    test_order_number     VARCHAR(50),
+    patient_name          VARCHAR(200),
+    test_name             VARCHAR(200),
+    department_id         INTEGER,
+    department_name       VARCHAR(200),
+    urgency               VARCHAR(20) NOT NULL,
+    urgency_rank          SMALLINT NOT NULL,
+    stage                 VARCHAR(20) NOT NULL CHECK (stage IN ('COLLECTION', 'PROCESSING')),
+    sample_collection_id  INTEGER,
+    collection_number     VARCHAR(50),
+    sample_status         VARCHAR(20),
+    ordered_at            TIMESTAMP NOT NULL,
+    collected_at          TIMESTAMP,
+    updated_at            TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_lab_worklist_queue
+    ON lab_worklist (tenant_id, stage, urgency_rank, ordered_at, test_order_item_id);
+CREATE INDEX IF NOT EXISTS idx_lab_worklist_department_queue
+    ON lab_worklist (tenant_id, department_id, stage, urgency_rank, ordered_at, test_order_item_id);
+CREATE INDEX IF NOT EXISTS idx_lab_worklist_order
+    ON lab_worklist (test_order_id);
+
+-- Supporting lookups for the refresh
+CREATE INDEX IF NOT EXISTS idx_sample_collection_items_order_item
+    ON sample_collection_items (test_order_item_id) WHERE is_deleted = FALSE;
+CREATE INDEX IF NOT EXISTS idx_test_results_order
+    ON test_results (test_order_id) WHERE is_deleted = FALSE;
+
+-- An item leaves the worklist once its order is finished or cancelled, the item
+-- or its sample is completed, or a result has been entered for the order. A
+-- rejected sample puts the item back in the collection stage.
+CREATE OR REPLACE FUNCTION lab_worklist_refresh(p_order_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM lab_worklist WHERE test_order_id = ANY(p_order_ids);
+
+    INSERT INTO lab_worklist (test_order_item_id, tenant_id, test_order_id, test_order_number, patient_name,
+                              test_name, department_id, department_name, urgency, urgency_rank, stage,
+                              sample_collection_id, collection_number, sample_status, ordered_at, collected_at)
+    SELECT i.id, i.tenant_id, o.id, o.test_order_number, o.patient_name,
+           COALESCE(i.test_name, i.panel_name), c.id, c.name,
+           COALESCE(o.urgency, 'ROUTINE'),
+           CASE o.urgency WHEN 'STAT' THEN 0 WHEN 'CRITICAL' THEN 0 WHEN 'URGENT' THEN 1 ELSE 2 END,
+           CASE WHEN s.collection_id IS NULL THEN 'COLLECTION' ELSE 'PROCESSING' END,
+           s.collection_id, s.collection_number, s.item_status,
+           COALESCE(o.order_date, o.created_at, CURRENT_TIMESTAMP), s.collected_at
+    FROM test_orders o
+    JOIN test_order_items i ON i.test_order_id = o.id AND i.is_deleted = FALSE
+    LEFT JOIN tests t ON t.id = i.test_id
+    LEFT JOIN test_panels p ON p.id = i.panel_id
+    LEFT JOIN test_categories c ON c.id = COALESCE(t.category_id, p.category_id)
+    LEFT JOIN LATERAL (
+        SELECT sc.id AS collection_id, sc.collection_number, sci.item_status, sc.collection_date AS collected_at
+        FROM sample_collection_items sci
+        JOIN sample_collections sc ON sc.id = sci.collection_id AND sc.is_deleted = FALSE
+        WHERE sci.test_order_item_id = i.id AND sci.is_deleted = FALSE
+          AND sci.item_status <> 'REJECTED' AND sc.status <> 'REJECTED'
+        ORDER BY sci.id DESC
+        LIMIT 1
+    ) s ON TRUE
+    WHERE o.id = ANY(p_order_ids) AND o.is_deleted = FALSE
+      AND o.status NOT IN ('COMPLETED', 'REPORTED', 'CANCELLED')
+      AND COALESCE(i.item_status, 'PENDING') NOT IN ('COMPLETED', 'CANCELLED')
+      AND COALESCE(s.item_status, '') <> 'COMPLETED'
+      AND NOT EXISTS (SELECT 1 FROM test_results r WHERE r.test_order_id = o.id AND r.is_deleted = FALSE);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT lab_worklist_refresh(ARRAY(
+    SELECT id FROM test_orders
+    WHERE is_deleted = FALSE AND status NOT IN ('COMPLETED', 'REPORTED', 'CANCELLED')
+));
@@ -0,0 +1,9 @@
+-- Migration: Covering index for multi-period ledger reports
+-- Date: 2026-10-19
+-- Description: Lets the period report engine aggregate a tenant's ledger over a
+--              date range with an index-only scan (no heap access for amounts)
+
+CREATE INDEX IF NOT EXISTS idx_ledgers_tenant_date_amounts
+    ON ledgers (tenant_id, transaction_date)
+    INCLUDE (account_id, debit_amount, credit_amount)
+    WHERE is_deleted = false;
@@ -0,0 +1,43 @@
+-- Migration: Patient master index
+-- Date: 2026-10-19
+-- Description: Indexable patient search. Normalized name and phone columns are
+--              generated from the patient row; trigram and full-text GIN indexes
+--              serve ranked name search (and make existing ILIKE '%term%'
+--              filters index-backed), and a btree on the normalized phone serves
+--              exact and prefix phone lookups. Appointment search columns get
+--              trigram indexes for the same reason.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- Last 10 digits, so '+91 98765-43210' and '9876543210' compare equal
+ALTER TABLE patients
+    ADD COLUMN IF NOT EXISTS search_name TEXT
+        GENERATED ALWAYS AS (lower(coalesce(first_name, '') || ' ' || coalesce(last_name, ''))) STORED,
+    ADD COLUMN IF NOT EXISTS phone_normalized VARCHAR(20)
+        GENERATED ALWAYS AS (right(regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'), 10)) STORED,
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')
+                                                   || ' ' || coalesce(patient_number, '') || ' ' || coalesce(email, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_patients_search_name_trgm
+    ON patients USING gin (tenant_id, search_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_search_vector
+    ON patients USING gin (tenant_id, search_vector);
+CREATE INDEX IF NOT EXISTS idx_patients_phone_normalized
+    ON patients (tenant_id, phone_normalized varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_phone_normalized_trgm
+    ON patients USING gin (phone_normalized gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_email_trgm
+    ON patients USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_patients_patient_number_trgm
+    ON patients USING gin (patient_number gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_appointments_patient_name_trgm
+    ON appointments USING gin (patient_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor_name_trgm
+    ON appointments USING gin (doctor_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_appointments_number_trgm
+    ON appointments USING gin (appointment_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_appointments_patient_phone_trgm
+    ON appointments USING gin (patient_phone gin_trgm_ops);
@@ -0,0 +1,37 @@
+-- Migration: Payment gateway webhook events
+-- Date: 2026-10-19
+-- Description: Raw gateway webhooks are stored once per (gateway, transaction);
+--              retries only bump received_count. A processor claims pending
+--              events in batches with FOR UPDATE SKIP LOCKED and posts the
+--              confirmed payments, recording each event's outcome.
+
+CREATE TABLE IF NOT EXISTS payment_gateway_events (
+    id BIGSERIAL PRIMARY KEY,
+    gateway VARCHAR(50) NOT NULL,
+    gateway_transaction_id VARCHAR(100) NOT NULL,
+    payment_id INTEGER,
+    tenant_id INTEGER,
+    transaction_reference VARCHAR(100),
+    gateway_status VARCHAR(20) NOT NULL,
+    gateway_fee NUMERIC(15,4),
+    payload JSONB NOT NULL,
+    received_count INTEGER NOT NULL DEFAULT 1,
+    first_received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    error TEXT,
+    processed_at TIMESTAMP,
+
+    CONSTRAINT uq_payment_gateway_event UNIQUE (gateway, gateway_transaction_id),
+    CONSTRAINT chk_payment_gateway_event_status
+        CHECK (status IN ('PENDING', 'PROCESSING', 'PROCESSED', 'IGNORED', 'FAILED'))
+);
+
+-- Only unprocessed events are indexed, so the claim query stays small as history grows
+CREATE INDEX IF NOT EXISTS idx_payment_gateway_events_due
+    ON payment_gateway_events (next_attempt_at, id) WHERE status IN ('PENDING', 'PROCESSING');
+CREATE INDEX IF NOT EXISTS idx_payment_gateway_events_payment
+    ON payment_gateway_events (payment_id);
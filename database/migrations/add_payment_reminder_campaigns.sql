@@ -0,0 +1,43 @@
+-- Migration: Payment reminder campaigns
+-- Date: 2026-10-19
+-- Description: A campaign computes outstanding receivables for every eligible
+--              customer in one query, renders the reminder for each and loads
+--              them into email_outbox, spaced out to the campaign's send rate.
+--              Outbox rows point back to their campaign for progress tracking.
+
+CREATE TABLE IF NOT EXISTS payment_reminder_campaigns (
+    id SERIAL PRIMARY KEY,
+    tenant_id INTEGER NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    name VARCHAR(200) NOT NULL,
+    subject_template TEXT NOT NULL,
+    body_template TEXT NOT NULL,
+    min_balance NUMERIC(15,2) NOT NULL DEFAULT 0,
+    min_days_overdue INTEGER NOT NULL DEFAULT 0,
+    rate_per_minute INTEGER NOT NULL DEFAULT 60,
+    status VARCHAR(20) NOT NULL DEFAULT 'QUEUED',
+    job_id VARCHAR(36),
+    eligible_customers INTEGER,
+    queued_messages INTEGER NOT NULL DEFAULT 0,
+    total_outstanding NUMERIC(15,2),
+    error TEXT,
+    created_by VARCHAR(100),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+
+    CONSTRAINT chk_payment_reminder_campaign_status
+        CHECK (status IN ('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_payment_reminder_campaigns_tenant
+    ON payment_reminder_campaigns (tenant_id, created_at);
+
+ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS campaign_id INTEGER
+    REFERENCES payment_reminder_campaigns(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_campaign
+    ON email_outbox (campaign_id, status) WHERE campaign_id IS NOT NULL;
+
+-- Receivables scan used by the campaign query
+CREATE INDEX IF NOT EXISTS idx_sales_invoices_open_balance
+    ON sales_invoices (tenant_id, customer_id)
+    WHERE balance_amount_base > 0 AND is_deleted = FALSE;
@@ -0,0 +1,10 @@
+-- Migration: Content-addressed test result file storage
+-- Date: 2026-10-19
+-- Description: Records the SHA-256 of attachments uploaded through the chunked
+--              upload API. The hash is the storage key, so files with the same
+--              content are kept once and repeat uploads to a result are skipped.
+
+ALTER TABLE test_result_files ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_test_result_files_result_hash
+    ON test_result_files (test_result_id, content_sha256) WHERE is_deleted = FALSE;
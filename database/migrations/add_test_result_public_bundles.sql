@@ -0,0 +1,18 @@
+-- Migration: Pre-rendered public test result bundles
+-- Date: 2026-10-19
+-- Description: Stores the public test result payload (including the QR image)
+--              rendered when a result is created or updated, so the public link
+--              is served from one primary-key lookup. Bundles for existing
+--              results are rendered on first access.
+
+CREATE TABLE IF NOT EXISTS test_result_public_bundles (
+    result_number   TEXT PRIMARY KEY,
+    tenant_id       INTEGER NOT NULL REFERENCES tenants(id),
+    test_result_id  INTEGER NOT NULL REFERENCES test_results(id) ON DELETE CASCADE,
+    payload         JSONB NOT NULL,
+    etag            VARCHAR(64) NOT NULL,
+    rendered_at     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_test_result_public_bundles_result
+    ON test_result_public_bundles (test_result_id);
@@ -0,0 +1,50 @@
+-- Migration: Let audit_trail_ensure_partitions recover rows from the default partition
+-- Date: 2026-10-19
+-- Description: Creating a month's partition fails once rows for that month sit in
+--              audit_trail_default. The function now moves such rows into a new
+--              table and attaches it as the month's partition. The audit writer
+--              calls it every AUDIT_PARTITION_CHECK_HOURS, so normally the
+--              partitions already exist before their month starts.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION audit_trail_ensure_partitions(months_ahead INTEGER DEFAULT 2, from_month DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE(from_month, CURRENT_DATE))::DATE;
+    last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'audit_trail_' || to_char(month_start, 'YYYY_MM');
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM audit_trail_default
+                       WHERE created_at >= month_start AND created_at < month_end) THEN
+                -- Rows already landed in the default partition: move them, then attach
+                EXECUTE format('CREATE TABLE %I (LIKE audit_trail INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                               partition_name);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM audit_trail_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, partition_name
+                );
+                EXECUTE format('ALTER TABLE audit_trail ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               partition_name, month_start, month_end);
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF audit_trail FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,51 @@
+-- Migration: Lab worklist refresh lock
+-- Date: 2026-10-19
+-- Description: lab_worklist_refresh() locks the refreshed test orders before it
+--              recomputes their rows, so concurrent writes to one order (sample
+--              collection and result entry) no longer fail with a unique_violation
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION lab_worklist_refresh(p_order_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    -- Serialize refreshes of the same orders: without the lock two transactions both
+    -- delete, then both insert, and the second insert violates the primary key.
+    -- NO KEY UPDATE does not block foreign key checks against the orders.
+    PERFORM 1 FROM test_orders WHERE id = ANY(p_order_ids) ORDER BY id FOR NO KEY UPDATE;
+
+    DELETE FROM lab_worklist WHERE test_order_id = ANY(p_order_ids);
+
+    INSERT INTO lab_worklist (test_order_item_id, tenant_id, test_order_id, test_order_number, patient_name,
+                              test_name, department_id, department_name, urgency, urgency_rank, stage,
+                              sample_collection_id, collection_number, sample_status, ordered_at, collected_at)
+    SELECT i.id, i.tenant_id, o.id, o.test_order_number, o.patient_name,
+           COALESCE(i.test_name, i.panel_name), c.id, c.name,
+           COALESCE(o.urgency, 'ROUTINE'),
+           CASE o.urgency WHEN 'STAT' THEN 0 WHEN 'CRITICAL' THEN 0 WHEN 'URGENT' THEN 1 ELSE 2 END,
+           CASE WHEN s.collection_id IS NULL THEN 'COLLECTION' ELSE 'PROCESSING' END,
+           s.collection_id, s.collection_number, s.item_status,
+           COALESCE(o.order_date, o.created_at, CURRENT_TIMESTAMP), s.collected_at
+    FROM test_orders o
+    JOIN test_order_items i ON i.test_order_id = o.id AND i.is_deleted = FALSE
+    LEFT JOIN tests t ON t.id = i.test_id
+    LEFT JOIN test_panels p ON p.id = i.panel_id
+    LEFT JOIN test_categories c ON c.id = COALESCE(t.category_id, p.category_id)
+    LEFT JOIN LATERAL (
+        SELECT sc.id AS collection_id, sc.collection_number, sci.item_status, sc.collection_date AS collected_at
+        FROM sample_collection_items sci
+        JOIN sample_collections sc ON sc.id = sci.collection_id AND sc.is_deleted = FALSE
+        WHERE sci.test_order_item_id = i.id AND sci.is_deleted = FALSE
+          AND sci.item_status <> 'REJECTED' AND sc.status <> 'REJECTED'
+        ORDER BY sci.id DESC
+        LIMIT 1
+    ) s ON TRUE
+    WHERE o.id = ANY(p_order_ids) AND o.is_deleted = FALSE
+      AND o.status NOT IN ('COMPLETED', 'REPORTED', 'CANCELLED')
+      AND COALESCE(i.item_status, 'PENDING') NOT IN ('COMPLETED', 'CANCELLED')
+      AND COALESCE(s.item_status, '') <> 'COMPLETED'
+      AND NOT EXISTS (SELECT 1 FROM test_results r WHERE r.test_order_id = o.id AND r.is_deleted = FALSE);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,79 @@
+-- Migration: Partition audit_trail by month
+-- Date: 2026-10-19
+-- Description: Recreates audit_trail as a table range-partitioned on created_at
+--              (one partition per month plus a default partition), copies the
+--              existing rows and adds a covering index for per-entity queries.
+--              audit_trail_ensure_partitions() is called by the audit writer at
+--              startup to keep upcoming months' partitions in place.
+
+BEGIN;
+
+ALTER TABLE audit_trail RENAME TO audit_trail_legacy;
+ALTER TABLE audit_trail_legacy RENAME CONSTRAINT audit_trail_pkey TO audit_trail_legacy_pkey;
+ALTER INDEX IF EXISTS idx_audit_trail_entity RENAME TO idx_audit_trail_legacy_entity;
+ALTER INDEX IF EXISTS idx_audit_trail_tenant RENAME TO idx_audit_trail_legacy_tenant;
+
+CREATE TABLE audit_trail (
+    id INTEGER NOT NULL DEFAULT nextval('audit_trail_id_seq'::regclass),
+    entity_type VARCHAR(50) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    action VARCHAR(20) NOT NULL,
+    old_value JSONB,
+    new_value JSONB,
+    user_id INTEGER,
+    username VARCHAR(100),
+    ip_address VARCHAR(50),
+    tenant_id INTEGER NOT NULL REFERENCES tenants(id),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    remarks TEXT,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE audit_trail_id_seq OWNED BY audit_trail.id;
+
+CREATE TABLE audit_trail_default PARTITION OF audit_trail DEFAULT;
+
+-- Creates monthly partitions from the oldest existing row (or the current month)
+-- up to months_ahead months in the future
+CREATE OR REPLACE FUNCTION audit_trail_ensure_partitions(months_ahead INTEGER DEFAULT 2, from_month DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE(from_month, CURRENT_DATE))::DATE;
+    last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'audit_trail_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_trail FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::DATE
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT audit_trail_ensure_partitions(2, (SELECT MIN(created_at)::DATE FROM audit_trail_legacy));
+
+INSERT INTO audit_trail (id, entity_type, entity_id, action, old_value, new_value, user_id, username,
+                         ip_address, tenant_id, created_at, remarks)
+SELECT id, entity_type, entity_id, action, old_value, new_value, user_id, username,
+       ip_address, tenant_id, created_at, remarks
+FROM audit_trail_legacy;
+
+-- Per-entity history: tenant + entity lookup ordered by time, with the list columns in the index
+CREATE INDEX idx_audit_trail_entity
+    ON audit_trail (tenant_id, entity_type, entity_id, created_at DESC)
+    INCLUDE (action, username);
+
+CREATE INDEX idx_audit_trail_tenant
+    ON audit_trail (tenant_id, created_at DESC);
+
+DROP TABLE audit_trail_legacy;
+
+COMMIT;
@@ -1,5 +1,7 @@
 DROP TABLE IF EXISTS public.appointments;
 
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 CREATE TABLE IF NOT EXISTS public.appointments (
     id                     SERIAL PRIMARY KEY,
 
@@ -13,6 +15,11 @@ CREATE TABLE IF NOT EXISTS public.appointments (
     appointment_date       DATE NOT NULL,
     appointment_time       TIME NOT NULL,
     duration_minutes       INTEGER,
+    slot_range             TSRANGE GENERATED ALWAYS AS (
+                               tsrange(appointment_date + appointment_time,
+                                       appointment_date + appointment_time + make_interval(mins => GREATEST(COALESCE(duration_minutes, 15), 1)),
+                                       '[)')
+                           ) STORED,
 
     -- Parties
     patient_id             INTEGER NOT NULL 
@@ -64,7 +71,12 @@ CREATE TABLE IF NOT EXISTS public.appointments (
 
     -- Constraints
     CONSTRAINT uq_appointment_number_tenant 
-        UNIQUE (appointment_number, tenant_id)
+        UNIQUE (appointment_number, tenant_id),
+
+    -- One doctor cannot hold overlapping active appointments
+    CONSTRAINT appointments_no_doctor_overlap
+        EXCLUDE USING gist (doctor_id WITH =, slot_range WITH &&)
+        WHERE (is_deleted = false AND status IN ('SCHEDULED','CONFIRMED','COMPLETED'))
 );
 
 -- Indexes
@@ -74,6 +86,8 @@ CREATE INDEX idx_appointments_patient ON public.appointments(patient_id);
 CREATE INDEX idx_appointments_doctor ON public.appointments(doctor_id);
 CREATE INDEX idx_appointments_agency ON public.appointments(agency_id);
 CREATE INDEX idx_appointments_date ON public.appointments(appointment_date);
+CREATE INDEX idx_appointments_doctor_day ON public.appointments(tenant_id, doctor_id, appointment_date)
+    INCLUDE (appointment_time, duration_minutes, status) WHERE is_deleted = false;
 CREATE INDEX idx_appointments_status ON public.appointments(status);
 CREATE INDEX idx_appointments_medical_record ON public.appointments(medical_record_id);
 CREATE INDEX idx_appointments_prescription ON public.appointments(prescription_id);
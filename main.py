@@ -18,6 +18,14 @@ def main():
     """Start the FIDEAS API server"""
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
+
+    # Production: gunicorn with pool-budgeted uvicorn workers (see api/server.py)
+    if "--production" in sys.argv[1:] or os.getenv("API_MODE", "development").lower() == "production":
+        from api.server import run_production
+        print(f"Starting FIDEAS API server (production) on {host}:{port}")
+        run_production(host, port)
+        return
+
     reload = os.getenv("API_RELOAD", "True").lower() == "true"
     
     print(f"Starting FIDEAS API server on {host}:{port}")
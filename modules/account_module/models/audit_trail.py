@@ -1,12 +1,19 @@
 """
 Audit Trail Models for Accounting Module
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Index
 from datetime import datetime
 from modules.inventory_module.models.entities import Base
 
 class AuditTrail(Base):
     __tablename__ = 'audit_trail'
+    # Range-partitioned by month on created_at (see migrations/partition_audit_trail.sql)
+    __table_args__ = (
+        Index('idx_audit_trail_entity', 'tenant_id', 'entity_type', 'entity_id', 'created_at',
+              postgresql_include=['action', 'username']),
+        Index('idx_audit_trail_tenant', 'tenant_id', 'created_at'),
+        {'extend_existing': True}
+    )
     
     id = Column(Integer, primary_key=True)
     entity_type = Column(String(50), nullable=False)  # VOUCHER, LEDGER, ACCOUNT, PAYMENT
@@ -18,5 +25,5 @@ class AuditTrail(Base):
     username = Column(String(100))
     ip_address = Column(String(50))
     tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
     remarks = Column(Text)
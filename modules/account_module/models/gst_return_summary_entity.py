@@ -0,0 +1,68 @@
+"""
+Precomputed GST return summaries (GSTR-1 / GSTR-3B)
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, UniqueConstraint, Index, ForeignKey
+from datetime import datetime
+from core.database.connection import Base
+
+
+class GSTReturnSummary(Base):
+    """Per-tenant, per-return-period tax totals by section, GSTIN, HSN, rate and place of supply"""
+    __tablename__ = 'gst_return_summaries'
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'return_period', 'section', 'gstin', 'hsn_code', 'gst_rate',
+                         'place_of_supply', name='uq_gst_return_summary_key'),
+        {'extend_existing': True}
+    )
+
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    return_period = Column(String(7), nullable=False)  # YYYY-MM
+    section = Column(String(10), nullable=False)  # B2B, B2CL, B2CS, CDNR, CDNUR, HSN, ITC, ITC_REV
+    gstin = Column(String(20), nullable=False, default='')
+    hsn_code = Column(String(20), nullable=False, default='')
+    gst_rate = Column(Numeric(5, 2), nullable=False, default=0)
+    place_of_supply = Column(String(2), nullable=False, default='')  # state code of customer documents
+    party_name = Column(String(200))
+
+    document_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Numeric(15, 4), nullable=False, default=0)
+    taxable_value = Column(Numeric(15, 4), nullable=False, default=0)
+    cgst_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    sgst_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    igst_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    cess_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    total_value = Column(Numeric(15, 4), nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class GSTSummaryDocumentLine(Base):
+    """Contribution of one posted document to the summaries, kept so it can be reversed exactly"""
+    __tablename__ = 'gst_summary_document_lines'
+    __table_args__ = (
+        Index('idx_gst_summary_doc_lines_document', 'tenant_id', 'document_type', 'document_id'),
+        {'extend_existing': True}
+    )
+
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    document_type = Column(String(20), nullable=False)  # SALES_INVOICE, CREDIT_NOTE, PURCHASE_INVOICE, DEBIT_NOTE
+    document_id = Column(Integer, nullable=False)
+    return_period = Column(String(7), nullable=False)
+    section = Column(String(10), nullable=False)
+    gstin = Column(String(20), nullable=False, default='')
+    hsn_code = Column(String(20), nullable=False, default='')
+    gst_rate = Column(Numeric(5, 2), nullable=False, default=0)
+    place_of_supply = Column(String(2), nullable=False, default='')  # state code of customer documents
+    party_name = Column(String(200))
+
+    quantity = Column(Numeric(15, 4), nullable=False, default=0)
+    taxable_value = Column(Numeric(15, 4), nullable=False, default=0)
+    cgst_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    sgst_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    igst_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    cess_amount = Column(Numeric(15, 4), nullable=False, default=0)
+    total_value = Column(Numeric(15, 4), nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -3,6 +3,7 @@ Audit Trail Service
 """
 from sqlalchemy.orm import Session
 from modules.account_module.models.audit_trail import AuditTrail
+from modules.account_module.services.audit_writer import audit_writer, add_pending_entry
 from core.shared.utils.session_manager import session_manager
 from datetime import datetime
 
@@ -23,7 +24,18 @@ class AuditService:
             old_value: Previous value (for updates)
             new_value: New value
             remarks: Additional remarks
+
+        With write-behind enabled (default) the entry is written by the audit
+        writer after the session commits; nothing is written on rollback.
         """
+        if audit_writer.enabled:
+            add_pending_entry(session, (
+                entity_type, entity_id, action, old_value, new_value,
+                session_manager.get_current_user_id(), session_manager.get_current_username(), None,
+                session_manager.get_current_tenant_id(), datetime.utcnow(), remarks
+            ))
+            return
+
         audit_entry = AuditTrail(
             entity_type=entity_type,
             entity_id=entity_id,
@@ -39,7 +51,8 @@ class AuditService:
     
     @staticmethod
     def get_audit_trail(session: Session, entity_type: str = None, entity_id: int = None, 
-                       tenant_id: int = None, limit: int = 100):
+                       tenant_id: int = None, limit: int = 100, from_date: datetime = None,
+                       to_date: datetime = None):
         """
         Get audit trail entries
         
@@ -49,6 +62,8 @@ class AuditService:
             entity_id: Filter by entity ID
             tenant_id: Filter by tenant
             limit: Maximum records to return
+            from_date: Only entries at or after this time (limits the partitions scanned)
+            to_date: Only entries before this time
             
         Returns:
             List of audit trail entries
@@ -63,5 +78,11 @@ class AuditService:
         
         if entity_id:
             query = query.filter(AuditTrail.entity_id == entity_id)
+
+        if from_date:
+            query = query.filter(AuditTrail.created_at >= from_date)
+
+        if to_date:
+            query = query.filter(AuditTrail.created_at < to_date)
         
         return query.order_by(AuditTrail.created_at.desc()).limit(limit).all()
@@ -0,0 +1,221 @@
+"""
+Write-behind audit trail writer.
+
+AuditService.log_action only records a tuple on the business session; the
+entries are handed to this writer when that transaction commits (and dropped
+if it rolls back). A background thread batches them, serializes the JSON
+values and loads each batch into audit_trail with COPY. Batches that cannot
+be written are appended to a spool file and replayed on the next start, and
+the queue is drained on shutdown. Server workers share the spool file, so
+appends and the hand-off to a replay take a file lock, and only one process
+replays at a time. The thread also creates upcoming monthly
+partitions every AUDIT_PARTITION_CHECK_HOURS, so rows never have to land in
+the default partition.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.database.bulk_copy import copy_rows
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+
+AUDIT_COLUMNS = ("entity_type", "entity_id", "action", "old_value", "new_value", "user_id",
+                 "username", "ip_address", "tenant_id", "created_at", "remarks")
+
+_PENDING_KEY = 'pending_audit_entries'
+
+
+def _json(value) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+class AuditWriter:
+    """Batches audit entries from an in-process queue into multi-row COPY loads"""
+
+    def __init__(self):
+        self.enabled = os.getenv('AUDIT_WRITE_BEHIND', 'true').lower() == 'true'
+        self.batch_size = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+        self.flush_interval = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', 1000)) / 1000
+        self.spool_path = os.getenv('AUDIT_SPOOL_PATH', 'logs/audit_spool.jsonl')
+        self.partition_months_ahead = int(os.getenv('AUDIT_PARTITION_MONTHS_AHEAD', 2))
+        self.partition_check_interval = float(os.getenv('AUDIT_PARTITION_CHECK_HOURS', 6)) * 3600
+        self._queue: queue.Queue = queue.Queue(maxsize=int(os.getenv('AUDIT_QUEUE_SIZE', 100000)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30):
+        """Stop the worker and write out everything still queued"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self._drain()
+        logger.info("Audit writer stopped", "AuditWriter")
+
+    def enqueue(self, entries: Sequence[tuple]):
+        if self._thread is None:
+            self.start()
+        for entry in entries:
+            try:
+                self._queue.put(entry, timeout=5)
+            except queue.Full:
+                # Writer cannot keep up; keep the entry durable rather than block the request
+                self._spool([entry])
+
+    def flush(self):
+        """Synchronously write everything queued so far"""
+        self._drain()
+
+    def _run(self):
+        self._ensure_partitions()
+        self._replay_spool()
+        next_partition_check = time.monotonic() + self.partition_check_interval
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            if time.monotonic() >= next_partition_check:
+                self._ensure_partitions()
+                next_partition_check = time.monotonic() + self.partition_check_interval
+
+    def _take_batch(self) -> List[tuple]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch: List[tuple]):
+        rows = [(entity_type, entity_id, action, _json(old_value), _json(new_value), user_id,
+                 username, ip_address, tenant_id, created_at, remarks)
+                for (entity_type, entity_id, action, old_value, new_value, user_id,
+                     username, ip_address, tenant_id, created_at, remarks) in batch]
+        try:
+            with db_manager.get_session() as session:
+                copy_rows(session, 'audit_trail', AUDIT_COLUMNS, rows)
+        except Exception as e:
+            logger.error(f"Audit batch of {len(rows)} entries could not be written, spooling: {str(e)}",
+                         "AuditWriter")
+            self._spool(rows, serialized=True)
+
+    @contextmanager
+    def _spool_file_lock(self, suffix: str = '.lock', blocking: bool = True):
+        """Exclusive lock shared with the other worker processes; yields False when busy and not blocking"""
+        os.makedirs(os.path.dirname(self.spool_path) or '.', exist_ok=True)
+        with open(f"{self.spool_path}{suffix}", 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spool(self, rows, serialized: bool = False):
+        with self._spool_lock, self._spool_file_lock(), open(self.spool_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                values = list(row)
+                if not serialized:
+                    values[3], values[4] = _json(values[3]), _json(values[4])
+                values[9] = values[9].isoformat()
+                f.write(json.dumps(values) + '\n')
+
+    def _ensure_partitions(self):
+        """Create the audit partitions for the next AUDIT_PARTITION_MONTHS_AHEAD months"""
+        try:
+            with db_manager.get_session() as session:
+                session.execute(text("SELECT audit_trail_ensure_partitions(:months)"),
+                                {"months": self.partition_months_ahead})
+        except Exception as e:
+            logger.warning(f"Audit partition maintenance skipped: {str(e)}", "AuditWriter")
+
+    def _replay_spool(self):
+        """Replay spooled entries, including files kept by earlier replays that failed"""
+        with self._spool_file_lock('.replay.lock', blocking=False) as acquired:
+            if not acquired:
+                logger.info("Audit spool is being replayed by another process", "AuditWriter")
+                return
+            self._replay_pending()
+
+    def _replay_pending(self):
+        with self._spool_lock, self._spool_file_lock():
+            if os.path.exists(self.spool_path):
+                # A unique name per replay, so a file kept by a failed replay is never overwritten
+                os.replace(self.spool_path, f"{self.spool_path}.{time.time_ns()}.replay")
+        pending = sorted(glob.glob(f"{glob.escape(self.spool_path)}.*.replay"))
+        if os.path.exists(f"{self.spool_path}.replay"):
+            pending.insert(0, f"{self.spool_path}.replay")
+        for replay_path in pending:
+            with open(replay_path, encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            try:
+                with db_manager.get_session() as session:
+                    copy_rows(session, 'audit_trail', AUDIT_COLUMNS, rows)
+                os.remove(replay_path)
+                logger.info(f"Replayed {len(rows)} spooled audit entries", "AuditWriter")
+            except Exception as e:
+                logger.error(f"Audit spool replay failed, kept in {replay_path}: {str(e)}", "AuditWriter")
+                return
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.stop)
+
+
+def add_pending_entry(session: Session, entry: tuple):
+    session.info.setdefault(_PENDING_KEY, []).append(entry)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed_entries(session):
+    entries = session.info.pop(_PENDING_KEY, None)
+    if entries:
+        audit_writer.enqueue(entries)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_uncommitted_entries(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,222 @@
+import csv
+import re
+from io import StringIO
+from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import text
+from core.database.connection import db_manager
+from core.database.bulk_copy import copy_rows
+from core.shared.utils.logger import logger
+from core.shared.middleware.exception_handler import ExceptionMiddleware
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _to_cents(value) -> int:
+    """Convert an amount (str/Decimal/float/None) to integer cents"""
+    if value in (None, ''):
+        return 0
+    try:
+        return int((Decimal(str(value)) * 100).quantize(Decimal('1')))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value}")
+
+
+def _tokens(value: Optional[str]) -> set:
+    return set(_TOKEN_RE.findall(value.lower())) if value else set()
+
+
+class LedgerIndex:
+    """
+    In-memory index of unreconciled ledger lines for one bank account.
+
+    Keyed by (signed amount in cents, transaction date) so that a statement line
+    is matched with a handful of dict lookups across the date window instead of a
+    non-sargable join.
+    """
+
+    def __init__(self, date_window_days: int):
+        self.date_window_days = date_window_days
+        self._buckets: Dict[Tuple[int, date], List[Dict]] = {}
+
+    def add(self, entry: Dict):
+        key = (entry['amount_cents'], entry['transaction_date'])
+        self._buckets.setdefault(key, []).append(entry)
+
+    def candidates(self, amount_cents: int, trans_date: date):
+        for offset in range(-self.date_window_days, self.date_window_days + 1):
+            for entry in self._buckets.get((amount_cents, trans_date + timedelta(days=offset)), ()):
+                yield entry, abs(offset)
+
+
+class BankMatchingEngine:
+    """Bulk import and auto-matching of bank statements against the ledger"""
+
+    # Weights for candidate scoring; an amount match is a precondition
+    DATE_WEIGHT = 0.4
+    REFERENCE_WEIGHT = 0.35
+    NARRATION_WEIGHT = 0.25
+
+    def __init__(self, date_window_days: int = 3, min_score: float = 0.3):
+        self.logger_name = "BankMatchingEngine"
+        self.date_window_days = date_window_days
+        self.min_score = min_score
+
+    @ExceptionMiddleware.handle_exceptions("BankMatchingEngine")
+    def import_statement(self, csv_content: str, account_id: int, tenant_id: int) -> List[Dict]:
+        """Load a statement CSV with COPY through a staging table and return the new rows"""
+        reader = csv.DictReader(StringIO(csv_content))
+        rows = (
+            (account_id, row['date'], row.get('description'),
+             row.get('debit') or 0, row.get('credit') or 0, row.get('balance') or None, tenant_id)
+            for row in reader
+        )
+        with db_manager.get_session() as session:
+            session.execute(text("""
+                CREATE TEMP TABLE bank_statements_stage (
+                    account_id INTEGER, trans_date DATE, description TEXT,
+                    debit NUMERIC(15,2), credit NUMERIC(15,2), balance NUMERIC(15,2), tenant_id INTEGER
+                ) ON COMMIT DROP
+            """))
+            copy_rows(session, "bank_statements_stage",
+                      ["account_id", "trans_date", "description", "debit", "credit", "balance", "tenant_id"],
+                      rows)
+            result = session.execute(text("""
+                INSERT INTO bank_statements (account_id, trans_date, description, debit, credit, balance, tenant_id)
+                SELECT account_id, trans_date, description, debit, credit, balance, tenant_id
+                FROM bank_statements_stage
+                RETURNING statement_id, description
+            """))
+            imported = [{"statement_id": r[0], "description": r[1]} for r in result]
+
+        logger.info(f"Imported {len(imported)} statement lines for account {account_id}", self.logger_name)
+        return imported
+
+    @ExceptionMiddleware.handle_exceptions("BankMatchingEngine")
+    def auto_match(self, account_id: int, tenant_id: int) -> List[Dict]:
+        """Match unreconciled statement lines to unreconciled ledger lines and apply in bulk"""
+        with db_manager.get_session() as session:
+            statements = self._load_statements(session, account_id, tenant_id)
+            if not statements:
+                return []
+
+            from_date = min(s['trans_date'] for s in statements) - timedelta(days=self.date_window_days)
+            to_date = max(s['trans_date'] for s in statements) + timedelta(days=self.date_window_days + 1)
+            index = self._build_index(session, account_id, tenant_id, from_date, to_date)
+
+            matches = self._assign(statements, index)
+            if matches:
+                self._apply(session, matches, tenant_id)
+
+        logger.info(f"Auto-matched {len(matches)} of {len(statements)} statement lines for account {account_id}",
+                    self.logger_name)
+        return [{
+            "statement_id": m['statement_id'],
+            "voucher_id": m['voucher_id'],
+            "ledger_id": m['ledger_id'],
+            "amount": m['amount_cents'] / 100,
+            "score": round(m['score'], 3)
+        } for m in matches]
+
+    def _load_statements(self, session, account_id: int, tenant_id: int) -> List[Dict]:
+        result = session.execute(text("""
+            SELECT statement_id, trans_date, description, debit, credit
+            FROM bank_statements
+            WHERE account_id = :aid AND tenant_id = :tid AND is_reconciled = false
+        """), {"aid": account_id, "tid": tenant_id})
+        return [{
+            "statement_id": r[0],
+            "trans_date": r[1],
+            "description": r[2],
+            # Bank credit (deposit) is a debit on the bank ledger account
+            "amount_cents": _to_cents(r[4]) - _to_cents(r[3]),
+            "tokens": _tokens(r[2])
+        } for r in result]
+
+    def _build_index(self, session, account_id: int, tenant_id: int, from_date: date, to_date: date) -> LedgerIndex:
+        result = session.execute(text("""
+            SELECT l.id, l.voucher_id, l.transaction_date, l.debit_amount, l.credit_amount,
+                   l.narration, l.reference_number, v.voucher_number
+            FROM ledgers l
+            JOIN vouchers v ON v.id = l.voucher_id
+            WHERE l.tenant_id = :tid AND l.account_id = :aid
+              AND l.is_reconciled = false AND l.is_deleted = false
+              AND l.transaction_date >= :from_date AND l.transaction_date < :to_date
+        """), {"tid": tenant_id, "aid": account_id, "from_date": from_date, "to_date": to_date})
+
+        index = LedgerIndex(self.date_window_days)
+        for r in result:
+            refs = {ref.lower() for ref in (r[6], r[7]) if ref}
+            index.add({
+                "ledger_id": r[0],
+                "voucher_id": r[1],
+                "transaction_date": r[2].date() if isinstance(r[2], datetime) else r[2],
+                "amount_cents": _to_cents(r[3]) - _to_cents(r[4]),
+                "refs": refs,
+                "tokens": _tokens(r[5])
+            })
+        return index
+
+    def _score(self, statement: Dict, entry: Dict, day_distance: int) -> float:
+        score = self.DATE_WEIGHT * (1 - day_distance / (self.date_window_days + 1))
+
+        description = (statement['description'] or '').lower()
+        if any(ref in description for ref in entry['refs']):
+            score += self.REFERENCE_WEIGHT
+
+        if statement['tokens'] and entry['tokens']:
+            overlap = len(statement['tokens'] & entry['tokens'])
+            score += self.NARRATION_WEIGHT * overlap / len(statement['tokens'] | entry['tokens'])
+        return score
+
+    def _assign(self, statements: List[Dict], index: LedgerIndex) -> List[Dict]:
+        """Greedy best-score-first assignment; each ledger line is used at most once"""
+        pairs = []
+        for statement in statements:
+            if statement['amount_cents'] == 0:
+                continue
+            for entry, day_distance in index.candidates(statement['amount_cents'], statement['trans_date']):
+                score = self._score(statement, entry, day_distance)
+                if score >= self.min_score:
+                    pairs.append((score, statement, entry))
+
+        pairs.sort(key=lambda p: p[0], reverse=True)
+        used_statements, used_ledgers, matches = set(), set(), []
+        for score, statement, entry in pairs:
+            if statement['statement_id'] in used_statements or entry['ledger_id'] in used_ledgers:
+                continue
+            used_statements.add(statement['statement_id'])
+            used_ledgers.add(entry['ledger_id'])
+            matches.append({
+                "statement_id": statement['statement_id'],
+                "ledger_id": entry['ledger_id'],
+                "voucher_id": entry['voucher_id'],
+                "amount_cents": statement['amount_cents'],
+                "score": score
+            })
+        return matches
+
+    def _apply(self, session, matches: List[Dict], tenant_id: int):
+        """Apply all matches with one UPDATE per table"""
+        now = datetime.now()
+        params = {
+            "sids": [m['statement_id'] for m in matches],
+            "vids": [m['voucher_id'] for m in matches],
+            "lids": [m['ledger_id'] for m in matches],
+            "now": now,
+            "tid": tenant_id
+        }
+        session.execute(text("""
+            UPDATE bank_statements bs
+            SET is_reconciled = true, voucher_id = m.voucher_id, reconciled_at = :now
+            FROM unnest(CAST(:sids AS INTEGER[]), CAST(:vids AS INTEGER[])) AS m(statement_id, voucher_id)
+            WHERE bs.statement_id = m.statement_id AND bs.tenant_id = :tid
+        """), params)
+        session.execute(text("""
+            UPDATE ledgers l
+            SET is_reconciled = true, reconciliation_date = :now,
+                reconciliation_ref = 'BS-' || m.statement_id, updated_at = :now
+            FROM unnest(CAST(:lids AS INTEGER[]), CAST(:sids AS INTEGER[])) AS m(ledger_id, statement_id)
+            WHERE l.id = m.ledger_id AND l.tenant_id = :tid
+        """), params)
@@ -8,6 +8,7 @@ from modules.account_module.models.entities import VoucherType, Voucher, Voucher
 from modules.account_module.models.account_configuration_entity import AccountConfiguration
 from modules.account_module.models.account_configuration_key_entity import AccountConfigurationKey
 from modules.admin_module.models.currency import Currency
+from modules.account_module.services.gst_summary_service import GSTSummaryService
 
 
 class CreditNoteService:
@@ -48,6 +49,8 @@ class CreditNoteService:
                         session, credit_note.id, note_data, tenant_id, created_by
                     )
                 
+                GSTSummaryService.sync_document(session, 'CREDIT_NOTE', credit_note.id, tenant_id)
+                
                 session.commit()
                 return credit_note.id
                 
@@ -263,6 +266,9 @@ class CreditNoteService:
                         session, note_id, note_data, tenant_id, updated_by
                     )
                 
+                # Posting adds the note to the GST summaries; cancelling reverses it
+                GSTSummaryService.sync_document(session, 'CREDIT_NOTE', note_id, tenant_id)
+                
                 session.commit()
                 return True
                 
@@ -0,0 +1,394 @@
+"""
+Incrementally maintained GST return summaries.
+
+Every posted sales invoice, credit note, purchase invoice and debit note
+contributes rows to gst_return_summaries. The contribution is also stored per
+document in gst_summary_document_lines so that a reversal (cancel, delete,
+re-post after edit) subtracts exactly what was added. GSTR-1 / GSTR-3B screens
+read the summary table instead of re-aggregating invoice items.
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import text
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from core.shared.middleware.exception_handler import ExceptionMiddleware
+
+# Inter-state B2C invoices above this value are reported individually (B2CL);
+# intra-state ones of any value stay in B2CS. IGST marks an inter-state supply.
+B2CL_THRESHOLD = 250000
+B2CL_CONDITION = f"h.total_amount_base > {B2CL_THRESHOLD} AND COALESCE(h.igst_amount_base, 0) > 0"
+
+
+
+def place_of_supply_sql(party: str, shipping_address: bool = True) -> Tuple[str, str]:
+    """
+    Joins and expression for the place of supply of a customer document `h`:
+    its shipping address, else the customer's default address, else the state
+    of the customer's GSTIN. The expression is NULL when none is known.
+    """
+    joins = f"""
+        LEFT JOIN LATERAL (
+            SELECT a.state_code FROM addresses a
+            WHERE a.tenant_id = h.tenant_id AND a.entity_type = 'CUSTOMER' AND a.entity_id = {party}.id
+              AND a.is_deleted = false AND COALESCE(a.state_code, '') <> ''
+            ORDER BY a.is_default_shipping DESC, a.is_default_billing DESC, a.id
+            LIMIT 1
+        ) pa ON TRUE
+    """
+    expression = f"pa.state_code, NULLIF(LEFT(COALESCE({party}.tax_id, ''), 2), '')"
+    if shipping_address:
+        joins = "LEFT JOIN addresses sa ON sa.id = h.shipping_address_id" + joins
+        expression = f"NULLIF(sa.state_code, ''), {expression}"
+    return joins, f"COALESCE({expression})"
+
+
+_OUTWARD_SECTIONS = ('B2B', 'B2CL', 'B2CS')
+_NOTE_SECTIONS = ('CDNR', 'CDNUR')
+
+DOCUMENT_SPECS = {
+    'SALES_INVOICE': {
+        'header': 'sales_invoices', 'items': 'sales_invoice_items', 'fk': 'invoice_id',
+        'date': 'invoice_date', 'party': 'customers', 'party_fk': 'customer_id',
+        'statuses': ('POSTED', 'PAID', 'PARTIALLY_PAID'),
+        'section': f"CASE WHEN COALESCE(p.tax_id, '') <> '' THEN 'B2B' "
+                   f"WHEN {B2CL_CONDITION} THEN 'B2CL' ELSE 'B2CS' END",
+        'rate': 'i.cgst_rate + i.sgst_rate + i.igst_rate',
+        'sgst': 'i.sgst_amount_base',
+        'pos': place_of_supply_sql('p'),
+        'hsn_sign': 1
+    },
+    'CREDIT_NOTE': {
+        'header': 'credit_notes', 'items': 'credit_note_items', 'fk': 'credit_note_id',
+        'date': 'note_date', 'party': 'customers', 'party_fk': 'customer_id',
+        'statuses': ('POSTED', 'APPLIED'),
+        'section': "CASE WHEN COALESCE(p.tax_id, '') <> '' THEN 'CDNR' ELSE 'CDNUR' END",
+        'rate': 'i.cgst_rate + i.sgst_rate + i.igst_rate',
+        'sgst': 'i.sgst_amount_base',
+        'pos': place_of_supply_sql('p', shipping_address=False),
+        # Sales returns reduce the outward HSN summary
+        'hsn_sign': -1
+    },
+    'PURCHASE_INVOICE': {
+        'header': 'purchase_invoices', 'items': 'purchase_invoice_items', 'fk': 'invoice_id',
+        'date': 'invoice_date', 'party': 'suppliers', 'party_fk': 'supplier_id',
+        'statuses': ('POSTED', 'PAID', 'PARTIALLY_PAID'),
+        'section': "'ITC'",
+        'rate': 'i.cgst_rate + i.sgst_rate + i.igst_rate + i.ugst_rate',
+        'sgst': 'i.sgst_amount_base + i.ugst_amount_base',
+        'hsn_sign': None
+    },
+    'DEBIT_NOTE': {
+        'header': 'debit_notes', 'items': 'debit_note_items', 'fk': 'debit_note_id',
+        'date': 'note_date', 'party': 'suppliers', 'party_fk': 'supplier_id',
+        'statuses': ('POSTED', 'PAID', 'PARTIALLY_PAID'),
+        'section': "'ITC_REV'",
+        'rate': 'i.cgst_rate + i.sgst_rate + i.igst_rate + i.ugst_rate',
+        'sgst': 'i.sgst_amount_base + i.ugst_amount_base',
+        'hsn_sign': None
+    },
+}
+
+_LINE_COLUMNS = ("tenant_id, document_type, document_id, return_period, section, gstin, hsn_code, gst_rate, "
+                 "place_of_supply, party_name, quantity, taxable_value, cgst_amount, sgst_amount, igst_amount, cess_amount, total_value")
+
+
+def _contribution_sql(document_type: str, where: str) -> str:
+    """SELECT producing the summary lines of every matching document, one row per summary key"""
+    spec = DOCUMENT_SPECS[document_type]
+    statuses = ", ".join(f"'{s}'" for s in spec['statuses'])
+    pos_joins, pos = spec.get('pos', ('', 'NULL'))
+    source = f"""
+        FROM {spec['header']} h
+        JOIN {spec['party']} p ON p.id = h.{spec['party_fk']}
+        JOIN {spec['items']} i ON i.{spec['fk']} = h.id
+        {pos_joins}
+        WHERE {where} AND h.status IN ({statuses}) AND h.is_deleted = false
+    """
+    amounts = (f"SUM(i.quantity) * {{sign}}, SUM(i.taxable_amount_base) * {{sign}}, "
+               f"SUM(i.cgst_amount_base) * {{sign}}, SUM({spec['sgst']}) * {{sign}}, "
+               f"SUM(i.igst_amount_base) * {{sign}}, SUM(i.cess_amount_base) * {{sign}}, "
+               f"SUM(i.total_amount_base) * {{sign}}")
+    sql = f"""
+        SELECT h.tenant_id, '{document_type}', h.id, TO_CHAR(h.{spec['date']}, 'YYYY-MM'),
+               {spec['section']}, COALESCE(p.tax_id, ''), '', {spec['rate']}, COALESCE({pos}, ''), MAX(p.name),
+               {amounts.format(sign=1)}
+        {source}
+        GROUP BY h.tenant_id, h.id, 4, 5, 6, 8, 9
+    """
+    if spec['hsn_sign'] is not None:
+        sql += f"""
+        UNION ALL
+        SELECT h.tenant_id, '{document_type}', h.id, TO_CHAR(h.{spec['date']}, 'YYYY-MM'),
+               'HSN', '', COALESCE(i.hsn_code, ''), {spec['rate']}, '', NULL,
+               {amounts.format(sign=spec['hsn_sign'])}
+        {source}
+        GROUP BY h.tenant_id, h.id, 4, 7, 8
+        """
+    return sql
+
+
+class GSTSummaryService:
+    """Maintains and reads precomputed GST return summaries"""
+
+    logger_name = "GSTSummaryService"
+
+    @staticmethod
+    def sync_document(session, document_type: str, document_id: int, tenant_id: int):
+        """
+        Bring the summaries in line with the current state of one document.
+
+        Call inside the business transaction after the document is posted,
+        edited, cancelled or deleted; safe to call repeatedly.
+        """
+        if document_type not in DOCUMENT_SPECS:
+            raise ValueError(f"Unsupported GST document type: {document_type}")
+        params = {"tid": tenant_id, "dtype": document_type, "did": document_id}
+        session.flush()
+
+        lines_where = "tenant_id = :tid AND document_type = :dtype AND document_id = :did"
+        GSTSummaryService._reverse(session, lines_where, params)
+        GSTSummaryService._apply(session, document_type, "h.tenant_id = :tid AND h.id = :did", lines_where, params)
+
+    @staticmethod
+    @ExceptionMiddleware.handle_exceptions("GSTSummaryService")
+    def rebuild_period(tenant_id: int, return_period: str) -> Dict[str, Any]:
+        """Recompute a tenant's return period from source documents (backfill / repair)"""
+        start = datetime.strptime(return_period, '%Y-%m').date()
+        end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+        params = {"tid": tenant_id, "period": return_period, "start": start, "end": end}
+        with db_manager.get_session() as session:
+            session.execute(text("""
+                DELETE FROM gst_summary_document_lines WHERE tenant_id = :tid AND return_period = :period
+            """), params)
+            session.execute(text("""
+                DELETE FROM gst_return_summaries WHERE tenant_id = :tid AND return_period = :period
+            """), params)
+            for document_type, spec in DOCUMENT_SPECS.items():
+                GSTSummaryService._apply(
+                    session, document_type,
+                    f"h.tenant_id = :tid AND h.{spec['date']} >= :start AND h.{spec['date']} < :end",
+                    "tenant_id = :tid AND document_type = :dtype AND return_period = :period",
+                    {**params, "dtype": document_type}
+                )
+            count = session.execute(text("""
+                SELECT COUNT(*) FROM gst_return_summaries WHERE tenant_id = :tid AND return_period = :period
+            """), params).scalar()
+
+        logger.info(f"Rebuilt GST summaries for tenant {tenant_id} period {return_period}: {count} rows",
+                    GSTSummaryService.logger_name)
+        return {"return_period": return_period, "summary_rows": count}
+
+    @staticmethod
+    def _apply(session, document_type: str, where: str, lines_where: str, params: Dict):
+        # Store the per-document contribution, then fold it into the summaries
+        result = session.execute(text(f"""
+            INSERT INTO gst_summary_document_lines ({_LINE_COLUMNS})
+            {_contribution_sql(document_type, where)}
+        """), params)
+        if not result.rowcount:
+            return
+
+        session.execute(text("""
+            INSERT INTO gst_return_summaries (tenant_id, return_period, section, gstin, hsn_code, gst_rate,
+                place_of_supply, party_name, document_count, quantity, taxable_value, cgst_amount, sgst_amount, igst_amount,
+                cess_amount, total_value, updated_at)
+            SELECT tenant_id, return_period, section, gstin, hsn_code, gst_rate, place_of_supply, MAX(party_name),
+                   COUNT(DISTINCT document_id), SUM(quantity), SUM(taxable_value), SUM(cgst_amount),
+                   SUM(sgst_amount), SUM(igst_amount), SUM(cess_amount), SUM(total_value), NOW()
+            FROM gst_summary_document_lines
+            WHERE """ + lines_where + """
+            GROUP BY tenant_id, return_period, section, gstin, hsn_code, gst_rate, place_of_supply
+            ON CONFLICT (tenant_id, return_period, section, gstin, hsn_code, gst_rate, place_of_supply)
+            DO UPDATE SET
+                party_name = COALESCE(EXCLUDED.party_name, gst_return_summaries.party_name),
+                document_count = gst_return_summaries.document_count + EXCLUDED.document_count,
+                quantity = gst_return_summaries.quantity + EXCLUDED.quantity,
+                taxable_value = gst_return_summaries.taxable_value + EXCLUDED.taxable_value,
+                cgst_amount = gst_return_summaries.cgst_amount + EXCLUDED.cgst_amount,
+                sgst_amount = gst_return_summaries.sgst_amount + EXCLUDED.sgst_amount,
+                igst_amount = gst_return_summaries.igst_amount + EXCLUDED.igst_amount,
+                cess_amount = gst_return_summaries.cess_amount + EXCLUDED.cess_amount,
+                total_value = gst_return_summaries.total_value + EXCLUDED.total_value,
+                updated_at = NOW()
+        """), params)
+
+    @staticmethod
+    def _reverse(session, where: str, params: Dict):
+        session.execute(text(f"""
+            UPDATE gst_return_summaries s SET
+                document_count = s.document_count - d.document_count,
+                quantity = s.quantity - d.quantity,
+                taxable_value = s.taxable_value - d.taxable_value,
+                cgst_amount = s.cgst_amount - d.cgst_amount,
+                sgst_amount = s.sgst_amount - d.sgst_amount,
+                igst_amount = s.igst_amount - d.igst_amount,
+                cess_amount = s.cess_amount - d.cess_amount,
+                total_value = s.total_value - d.total_value,
+                updated_at = NOW()
+            FROM (
+                SELECT tenant_id, return_period, section, gstin, hsn_code, gst_rate, place_of_supply,
+                       COUNT(DISTINCT document_id) AS document_count, SUM(quantity) AS quantity,
+                       SUM(taxable_value) AS taxable_value, SUM(cgst_amount) AS cgst_amount,
+                       SUM(sgst_amount) AS sgst_amount, SUM(igst_amount) AS igst_amount,
+                       SUM(cess_amount) AS cess_amount, SUM(total_value) AS total_value
+                FROM gst_summary_document_lines
+                WHERE {where}
+                GROUP BY tenant_id, return_period, section, gstin, hsn_code, gst_rate, place_of_supply
+            ) d
+            WHERE s.tenant_id = d.tenant_id AND s.return_period = d.return_period AND s.section = d.section
+              AND s.gstin = d.gstin AND s.hsn_code = d.hsn_code AND s.gst_rate = d.gst_rate
+              AND s.place_of_supply = d.place_of_supply
+        """), params)
+        session.execute(text(f"DELETE FROM gst_summary_document_lines WHERE {where}"), params)
+
+    @staticmethod
+    def get_period_rows(tenant_id: int, return_period: str, sections: Optional[List[str]] = None) -> List[Dict]:
+        with db_manager.get_session() as session:
+            query = """
+                SELECT section, gstin, hsn_code, gst_rate, party_name, document_count, quantity,
+                       taxable_value, cgst_amount, sgst_amount, igst_amount, cess_amount, total_value,
+                       place_of_supply
+                FROM gst_return_summaries
+                WHERE tenant_id = :tid AND return_period = :period AND document_count <> 0
+            """
+            params = {"tid": tenant_id, "period": return_period}
+            if sections:
+                query += " AND section = ANY(CAST(:sections AS TEXT[]))"
+                params["sections"] = list(sections)
+            query += " ORDER BY section, gstin, hsn_code, gst_rate, place_of_supply"
+            rows = session.execute(text(query), params).fetchall()
+
+        return [{
+            "section": r[0],
+            "gstin": r[1] or None,
+            "hsn_code": r[2] or None,
+            "gst_rate": float(r[3]),
+            "party_name": r[4],
+            "document_count": r[5],
+            "quantity": float(r[6]),
+            "taxable_value": float(r[7]),
+            "cgst": float(r[8]),
+            "sgst": float(r[9]),
+            "igst": float(r[10]),
+            "cess": float(r[11]),
+            "total_value": float(r[12]),
+            "place_of_supply": r[13] or None
+        } for r in rows]
+
+    @staticmethod
+    def count_documents(tenant_id: int, return_period: str, sections: List[str]) -> int:
+        """Distinct documents in the sections; a summary row counts a document once per rate"""
+        with db_manager.get_session() as session:
+            return session.execute(text("""
+                SELECT COUNT(DISTINCT (document_type, document_id))
+                FROM gst_summary_document_lines
+                WHERE tenant_id = :tid AND return_period = :period AND section = ANY(CAST(:sections AS TEXT[]))
+            """), {"tid": tenant_id, "period": return_period, "sections": list(sections)}).scalar()
+
+    @staticmethod
+    def get_b2b_invoices(tenant_id: int, return_period: str) -> List[Dict]:
+        """B2B sales invoices of a period, one row per invoice, from the per-document summary lines"""
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT h.invoice_number, h.invoice_date, MAX(l.party_name), l.gstin,
+                       SUM(l.taxable_value), SUM(l.cgst_amount), SUM(l.sgst_amount), SUM(l.igst_amount),
+                       SUM(l.cess_amount), SUM(l.total_value)
+                FROM gst_summary_document_lines l
+                JOIN sales_invoices h ON h.id = l.document_id AND h.tenant_id = l.tenant_id
+                WHERE l.tenant_id = :tid AND l.return_period = :period
+                  AND l.document_type = 'SALES_INVOICE' AND l.section = 'B2B'
+                GROUP BY h.id, h.invoice_number, h.invoice_date, l.gstin
+                ORDER BY h.invoice_date, h.invoice_number
+            """), {"tid": tenant_id, "period": return_period}).fetchall()
+
+        return [{
+            "invoice_number": r[0],
+            "invoice_date": r[1],
+            "customer_name": r[2],
+            "gstin": r[3],
+            "taxable_value": float(r[4]),
+            "cgst": float(r[5]),
+            "sgst": float(r[6]),
+            "igst": float(r[7]),
+            "cess": float(r[8]),
+            "total_value": float(r[9])
+        } for r in rows]
+
+    @staticmethod
+    def get_sales_invoice_rows(tenant_id: int, return_period: str) -> List[Dict]:
+        """Outward sales invoices of a period with their GST totals, summed from the per-document summary lines"""
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT h.*, c.tax_id AS customer_gstin, l.taxable_value, l.cgst_amount, l.sgst_amount,
+                       l.igst_amount
+                FROM (
+                    SELECT document_id, SUM(taxable_value) AS taxable_value, SUM(cgst_amount) AS cgst_amount,
+                           SUM(sgst_amount) AS sgst_amount, SUM(igst_amount) AS igst_amount
+                    FROM gst_summary_document_lines
+                    WHERE tenant_id = :tid AND return_period = :period AND document_type = 'SALES_INVOICE'
+                      AND section = ANY(CAST(:sections AS TEXT[]))
+                    GROUP BY document_id
+                ) l
+                JOIN sales_invoices h ON h.id = l.document_id AND h.tenant_id = :tid
+                JOIN customers c ON c.id = h.customer_id
+                ORDER BY h.invoice_date, h.id
+            """), {"tid": tenant_id, "period": return_period, "sections": list(_OUTWARD_SECTIONS)}).fetchall()
+        return [dict(row._mapping) for row in rows]
+
+    @staticmethod
+    def get_gstr1_summary(tenant_id: int, return_period: str) -> Dict[str, Any]:
+        rows = GSTSummaryService.get_period_rows(
+            tenant_id, return_period, list(_OUTWARD_SECTIONS + _NOTE_SECTIONS) + ['HSN']
+        )
+
+        def totals(section_rows):
+            keys = ('taxable_value', 'cgst', 'sgst', 'igst', 'cess', 'total_value')
+            result = {k: sum(r[k] for r in section_rows) for k in keys}
+            result['document_count'] = sum(r['document_count'] for r in section_rows)
+            return result
+
+        by_section = {}
+        for row in rows:
+            by_section.setdefault(row['section'], []).append(row)
+
+        for row in by_section.get('B2B', []):
+            row['total_tax'] = row['cgst'] + row['sgst'] + row['igst'] + row['cess']
+
+        return {
+            'period': return_period,
+            'b2b': by_section.get('B2B', []),
+            'b2c_large': totals(by_section.get('B2CL', [])),
+            'b2c_small': totals(by_section.get('B2CS', [])),
+            'b2c_small_by_rate': by_section.get('B2CS', []),
+            'cdnr': by_section.get('CDNR', []),
+            'cdnur': totals(by_section.get('CDNUR', [])),
+            'hsn': by_section.get('HSN', [])
+        }
+
+    @staticmethod
+    def get_gstr3b_summary(tenant_id: int, return_period: str) -> Dict[str, Any]:
+        rows = GSTSummaryService.get_period_rows(tenant_id, return_period)
+        components = ('taxable_value', 'cgst', 'sgst', 'igst', 'cess')
+
+        def net(plus_sections, minus_sections):
+            result = dict.fromkeys(components, 0.0)
+            for row in rows:
+                sign = 1 if row['section'] in plus_sections else -1 if row['section'] in minus_sections else 0
+                for key in components:
+                    result[key] += sign * row[key]
+            return result
+
+        outward = net(_OUTWARD_SECTIONS, _NOTE_SECTIONS)
+        itc = net(('ITC',), ('ITC_REV',))
+        tax_keys = ('cgst', 'sgst', 'igst', 'cess')
+
+        return {
+            'period': return_period,
+            'outward_supplies': {**outward, 'total_tax': sum(outward[k] for k in tax_keys)},
+            'itc_available': {**{k: itc[k] for k in tax_keys}, 'total_itc': sum(itc[k] for k in tax_keys)},
+            'net_liability': {
+                **{k: outward[k] - itc[k] for k in tax_keys},
+                'total': sum(outward[k] for k in tax_keys) - sum(itc[k] for k in tax_keys)
+            }
+        }
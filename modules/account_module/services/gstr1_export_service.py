@@ -0,0 +1,387 @@
+"""
+Streaming GSTR-1 / GSTR-3B return file generation (GSTN offline tool JSON and Excel).
+
+Invoice-level sections (B2B, B2CL, CDNR) are read through a server-side cursor
+and written out invoice by invoice, so memory stays bounded regardless of the
+number of invoices. Aggregate sections (B2CS, HSN) come from the precomputed
+GST return summaries. GSTINs and invoice totals are validated while streaming.
+"""
+import json
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import text
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from modules.account_module.services.gst_summary_service import (
+    GSTSummaryService, B2CL_CONDITION, place_of_supply_sql
+)
+
+GSTIN_RE = re.compile(r"^[0-9]{2}[A-Z0-9]{10}[0-9A-Z]Z[0-9A-Z]$")
+_GSTIN_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+STREAM_BATCH_SIZE = 2000
+MAX_REPORTED_ISSUES = 500
+# Allowed difference between invoice value and line totals (round-off)
+TOTAL_TOLERANCE = Decimal('1.00')
+
+_POSTED_STATUSES = "('POSTED', 'PAID', 'PARTIALLY_PAID')"
+
+XLSX_HEADERS = {
+    'b2b': ["GSTIN/UIN of Recipient", "Receiver Name", "Invoice Number", "Invoice date", "Invoice Value",
+            "Place Of Supply", "Reverse Charge", "Applicable % of Tax Rate", "Invoice Type",
+            "E-Commerce GSTIN", "Rate", "Taxable Value", "Cess Amount"],
+    'b2cl': ["Invoice Number", "Invoice date", "Invoice Value", "Place Of Supply", "Applicable % of Tax Rate",
+             "Rate", "Taxable Value", "Cess Amount", "E-Commerce GSTIN"],
+    'b2cs': ["Type", "Place Of Supply", "Applicable % of Tax Rate", "Rate", "Taxable Value", "Cess Amount",
+             "E-Commerce GSTIN"],
+    'cdnr': ["GSTIN/UIN of Recipient", "Receiver Name", "Note Number", "Note Date", "Note Type",
+             "Place Of Supply", "Reverse Charge", "Note Supply Type", "Note Value", "Applicable % of Tax Rate",
+             "Rate", "Taxable Value", "Cess Amount"],
+    'hsn': ["HSN", "Description", "UQC", "Total Quantity", "Total Value", "Rate", "Taxable Value",
+            "Integrated Tax Amount", "Central Tax Amount", "State/UT Tax Amount", "Cess Amount"],
+}
+
+
+def is_valid_gstin(gstin: Optional[str]) -> bool:
+    """Format and mod-36 check digit validation of a GSTIN"""
+    if not gstin or not GSTIN_RE.match(gstin):
+        return False
+    total = 0
+    for index, char in enumerate(gstin[:14]):
+        value = _GSTIN_CHARS.index(char) * (2 if index % 2 else 1)
+        total += value // 36 + value % 36
+    return _GSTIN_CHARS[(36 - total % 36) % 36] == gstin[14]
+
+
+def _money(value) -> float:
+    return float(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+class GSTR1Exporter:
+    """Builds the GSTR-1 return file for one tenant and return period"""
+
+    def __init__(self, tenant_id: int, return_period: str, gstin: str):
+        self.tenant_id = tenant_id
+        self.return_period = return_period
+        self.gstin = (gstin or '').upper()
+        start = datetime.strptime(return_period, '%Y-%m').date()
+        self.start_date = start
+        self.end_date = start.replace(year=start.year + 1, month=1) if start.month == 12 \
+            else start.replace(month=start.month + 1)
+        self.state_code = self.gstin[:2]
+        self.issues: List[Dict[str, Any]] = []
+        self.issue_count = 0
+        self.section_totals: Dict[str, Dict[str, Decimal]] = {}
+        self.documents_written = 0
+        self.progress_callback = None
+
+        if not is_valid_gstin(self.gstin):
+            raise ValueError(f"Invalid filer GSTIN: {gstin}")
+
+    # ------------------------------------------------------------------ helpers
+
+    def _issue(self, section: str, reference: str, message: str):
+        self.issue_count += 1
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append({"section": section, "reference": reference, "message": message})
+
+    def _add_totals(self, section: str, item: Dict):
+        totals = self.section_totals.setdefault(section, {"txval": Decimal(0), "tax": Decimal(0)})
+        totals["txval"] += Decimal(str(item['txval']))
+        totals["tax"] += Decimal(str(item['iamt'] + item['camt'] + item['samt'] + item['csamt']))
+
+    def _params(self) -> Dict:
+        return {"tid": self.tenant_id, "start": self.start_date, "end": self.end_date, "state": self.state_code}
+
+    def _stream(self, session, sql: str) -> Iterator:
+        """Iterate a query through a server-side cursor in fixed-size batches"""
+        connection = session.connection().execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+        result = connection.execute(text(sql), self._params())
+        for partition in result.partitions(STREAM_BATCH_SIZE):
+            for row in partition:
+                yield row
+
+    def _documents(self, session, section: str, sql: str, party_required: bool) -> Iterator[Dict]:
+        """
+        Fold (document, rate) rows - ordered by party and document - into one
+        dict per document with its rate-wise items.
+        """
+        current = None
+        for row in self._stream(session, sql):
+            doc_id, number, doc_date, value, ctin, name, rate, txval, iamt, camt, samt, csamt, pos = row
+            if current is None or current['id'] != doc_id:
+                if current is not None:
+                    document = self._finish_document(section, current, party_required)
+                    if document:
+                        yield document
+                current = {"id": doc_id, "number": number, "date": doc_date, "value": value,
+                           "ctin": (ctin or '').upper(), "name": name, "pos": pos, "items": []}
+            current['items'].append({
+                "rt": float(rate or 0), "txval": _money(txval), "iamt": _money(iamt),
+                "camt": _money(camt), "samt": _money(samt), "csamt": _money(csamt)
+            })
+        if current is not None:
+            document = self._finish_document(section, current, party_required)
+            if document:
+                yield document
+
+    def _finish_document(self, section: str, document: Dict, party_required: bool) -> Optional[Dict]:
+        self.documents_written += 1
+        if self.progress_callback:
+            self.progress_callback(self.documents_written)
+
+        if party_required and not is_valid_gstin(document['ctin']):
+            self._issue(section, document['number'], f"Invalid recipient GSTIN '{document['ctin']}', document skipped")
+            return None
+
+        line_total = sum(Decimal(str(i['txval'] + i['iamt'] + i['camt'] + i['samt'] + i['csamt']))
+                         for i in document['items'])
+        if abs(Decimal(document['value'] or 0) - line_total) > TOTAL_TOLERANCE:
+            self._issue(section, document['number'],
+                        f"Document value {_money(document['value'])} differs from line total {float(line_total)}")
+
+        for item in document['items']:
+            self._add_totals(section, item)
+        if not document['pos']:
+            # Without it a B2CL invoice would be reported as supplied in the filer's own state
+            self._issue(section, document['number'], "Place of supply unknown, filer state used")
+            document['pos'] = self.state_code
+        document['idt'] = document['date'].strftime('%d-%m-%Y')
+        document['val'] = _money(document['value'])
+        return document
+
+    # ----------------------------------------------------------------- sections
+
+    def _invoice_sql(self, section_filter: str, group_by_pos: bool = False) -> str:
+        pos_joins, pos = place_of_supply_sql('c')
+        # Rows of one group must be adjacent: by recipient GSTIN, or for B2CL by the pos they are filed under
+        order = f"COALESCE({pos}, :state), h.id, 7" if group_by_pos else "5, h.id, 7"
+        return f"""
+            SELECT h.id, h.invoice_number, h.invoice_date, h.total_amount_base,
+                   COALESCE(c.tax_id, ''), c.name, i.cgst_rate + i.sgst_rate + i.igst_rate,
+                   SUM(i.taxable_amount_base), SUM(i.igst_amount_base), SUM(i.cgst_amount_base),
+                   SUM(i.sgst_amount_base), SUM(i.cess_amount_base), {pos}
+            FROM sales_invoices h
+            JOIN customers c ON c.id = h.customer_id
+            JOIN sales_invoice_items i ON i.invoice_id = h.id
+            {pos_joins}
+            WHERE h.tenant_id = :tid AND h.invoice_date >= :start AND h.invoice_date < :end
+              AND h.status IN {_POSTED_STATUSES} AND h.is_deleted = false
+              AND {section_filter}
+            GROUP BY h.id, c.tax_id, c.name, 7, 13
+            ORDER BY {order}
+        """
+
+    def b2b_invoices(self, session) -> Iterator[Dict]:
+        return self._documents(session, 'b2b', self._invoice_sql("COALESCE(c.tax_id, '') <> ''"), True)
+
+    def b2cl_invoices(self, session) -> Iterator[Dict]:
+        return self._documents(session, 'b2cl', self._invoice_sql(
+            f"COALESCE(c.tax_id, '') = '' AND {B2CL_CONDITION}", group_by_pos=True), False)
+
+    def cdnr_notes(self, session) -> Iterator[Dict]:
+        pos_joins, pos = place_of_supply_sql('c', shipping_address=False)
+        sql = f"""
+            SELECT h.id, h.note_number, h.note_date, h.total_amount_base,
+                   COALESCE(c.tax_id, ''), c.name, i.cgst_rate + i.sgst_rate + i.igst_rate,
+                   SUM(i.taxable_amount_base), SUM(i.igst_amount_base), SUM(i.cgst_amount_base),
+                   SUM(i.sgst_amount_base), SUM(i.cess_amount_base), {pos}
+            FROM credit_notes h
+            JOIN customers c ON c.id = h.customer_id
+            JOIN credit_note_items i ON i.credit_note_id = h.id
+            {pos_joins}
+            WHERE h.tenant_id = :tid AND h.note_date >= :start AND h.note_date < :end
+              AND h.status IN ('POSTED', 'APPLIED') AND h.is_deleted = false
+              AND COALESCE(c.tax_id, '') <> ''
+            GROUP BY h.id, c.tax_id, c.name, 7, 13
+            ORDER BY 5, h.id, 7
+        """
+        return self._documents(session, 'cdnr', sql, True)
+
+    def b2cs_rows(self) -> List[Dict]:
+        """One row per supply type, place of supply and rate; inter-state rows carry the recipient's state"""
+        rows = GSTSummaryService.get_period_rows(self.tenant_id, self.return_period, ['B2CS'])
+        grouped: Dict[tuple, Dict] = {}
+        for row in rows:
+            supply_type = "INTER" if row['igst'] else "INTRA"
+            pos = row['place_of_supply'] if supply_type == "INTER" else self.state_code
+            if not pos:
+                self._issue('b2cs', f"rate {row['gst_rate']}", "Place of supply unknown, filer state used")
+                pos = self.state_code
+            item = grouped.setdefault((supply_type, pos, row['gst_rate']), {
+                "sply_ty": supply_type, "pos": pos, "typ": "OE", "rt": row['gst_rate'],
+                "txval": 0.0, "iamt": 0.0, "camt": 0.0, "samt": 0.0, "csamt": 0.0})
+            for key, column in (("txval", 'taxable_value'), ("iamt", 'igst'), ("camt", 'cgst'),
+                                ("samt", 'sgst'), ("csamt", 'cess')):
+                item[key] = _money(Decimal(str(item[key])) + Decimal(str(row[column])))
+        result = list(grouped.values())
+        for item in result:
+            self._add_totals('b2cs', item)
+        return result
+
+    def hsn_rows(self) -> List[Dict]:
+        rows = GSTSummaryService.get_period_rows(self.tenant_id, self.return_period, ['HSN'])
+        result = []
+        for num, row in enumerate(rows, start=1):
+            if not row['hsn_code']:
+                self._issue('hsn', f"rate {row['gst_rate']}", "Items without HSN code")
+            result.append({"num": num, "hsn_sc": row['hsn_code'] or '', "uqc": "NOS",
+                           "qty": round(row['quantity'], 2), "val": _money(row['total_value']),
+                           "rt": row['gst_rate'], "txval": _money(row['taxable_value']),
+                           "iamt": _money(row['igst']), "camt": _money(row['cgst']),
+                           "samt": _money(row['sgst']), "csamt": _money(row['cess'])})
+        return result
+
+    def expected_documents(self) -> int:
+        return GSTSummaryService.count_documents(self.tenant_id, self.return_period, ['B2B', 'B2CL', 'CDNR'])
+
+    def validate_against_summaries(self):
+        """Compare streamed section totals with the precomputed summaries"""
+        summary = {}
+        for row in GSTSummaryService.get_period_rows(self.tenant_id, self.return_period, ['B2B', 'B2CL', 'CDNR']):
+            summary[row['section'].lower()] = summary.get(row['section'].lower(), 0) + row['taxable_value']
+        for section, expected in summary.items():
+            streamed = float(self.section_totals.get(section, {}).get('txval', 0))
+            if abs(streamed - expected) > float(TOTAL_TOLERANCE):
+                self._issue(section, self.return_period,
+                            f"Taxable value {streamed:.2f} does not match summary {expected:.2f}")
+
+    def validation_report(self) -> Dict[str, Any]:
+        return {
+            "issue_count": self.issue_count,
+            "issues": self.issues,
+            "documents": self.documents_written,
+            "section_totals": {k: {"txval": float(v['txval']), "tax": float(v['tax'])}
+                               for k, v in self.section_totals.items()}
+        }
+
+    # ------------------------------------------------------------------ writers
+
+    def iter_json(self) -> Iterator[bytes]:
+        """Yield the GSTN offline-tool JSON in chunks"""
+        dumps = lambda value: json.dumps(value, separators=(',', ':'))
+        fp = self.start_date.strftime('%m%Y')
+        yield f'{{"gstin":{dumps(self.gstin)},"fp":"{fp}","version":"GST3.0.4","hash":"hash"'.encode()
+
+        with db_manager.get_session() as session:
+            for section, documents, group_key, doc_key in (
+                ('b2b', self.b2b_invoices(session), 'ctin', 'inv'),
+                ('b2cl', self.b2cl_invoices(session), 'pos', 'inv'),
+                ('cdnr', self.cdnr_notes(session), 'ctin', 'nt'),
+            ):
+                yield from self._json_grouped(section, documents, group_key, doc_key, dumps)
+
+        yield f',"b2cs":{dumps(self.b2cs_rows())}'.encode()
+        yield f',"hsn":{{"data":{dumps(self.hsn_rows())}}}}}'.encode()
+
+    def _json_grouped(self, section, documents, group_key, doc_key, dumps) -> Iterator[bytes]:
+        yield f',"{section}":['.encode()
+        current_group, first_group = None, True
+        for doc in documents:
+            group = doc['ctin'] if group_key == 'ctin' else doc['pos']
+            if group != current_group:
+                prefix = '' if first_group else ']},'
+                yield f'{prefix}{{"{group_key}":{dumps(group)},"{doc_key}":['.encode()
+                current_group, first_group, separator = group, False, ''
+            else:
+                separator = ','
+            yield (separator + dumps(self._json_document(section, doc))).encode()
+        yield (']' if first_group else ']}]').encode()
+
+    @staticmethod
+    def _json_document(section: str, doc: Dict) -> Dict:
+        items = [{"num": n, "itm_det": {k: item[k] for k in ('rt', 'txval', 'iamt', 'camt', 'samt', 'csamt')}}
+                 for n, item in enumerate(doc['items'], start=1)]
+        if section == 'cdnr':
+            return {"ntty": "C", "nt_num": doc['number'], "nt_dt": doc['idt'], "val": doc['val'],
+                    "pos": doc['pos'], "rchrg": "N", "inv_typ": "R", "itms": items}
+        invoice = {"inum": doc['number'], "idt": doc['idt'], "val": doc['val'], "itms": items}
+        if section == 'b2b':
+            invoice.update({"pos": doc['pos'], "rchrg": "N", "inv_typ": "R"})
+        return invoice
+
+    def write_json(self, path: str) -> str:
+        with open(path, 'wb') as f:
+            for chunk in self.iter_json():
+                f.write(chunk)
+        self.validate_against_summaries()
+        return path
+
+    def write_xlsx(self, path: str) -> str:
+        """Write the offline-tool Excel layout with a write-only (streaming) workbook"""
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheets = {name: workbook.create_sheet(name) for name in XLSX_HEADERS}
+        for name, sheet in sheets.items():
+            sheet.append(XLSX_HEADERS[name])
+
+        with db_manager.get_session() as session:
+            for doc in self.b2b_invoices(session):
+                for item in doc['items']:
+                    sheets['b2b'].append([doc['ctin'], doc['name'], doc['number'], doc['idt'], doc['val'],
+                                          doc['pos'], 'N', None, 'Regular', None, item['rt'],
+                                          item['txval'], item['csamt']])
+            for doc in self.b2cl_invoices(session):
+                for item in doc['items']:
+                    sheets['b2cl'].append([doc['number'], doc['idt'], doc['val'], doc['pos'], None,
+                                           item['rt'], item['txval'], item['csamt'], None])
+            for doc in self.cdnr_notes(session):
+                for item in doc['items']:
+                    sheets['cdnr'].append([doc['ctin'], doc['name'], doc['number'], doc['idt'], 'C',
+                                           doc['pos'], 'N', 'Regular', doc['val'], None, item['rt'],
+                                           item['txval'], item['csamt']])
+
+        for row in self.b2cs_rows():
+            sheets['b2cs'].append(['OE', row['pos'], None, row['rt'], row['txval'], row['csamt'], None])
+        for row in self.hsn_rows():
+            sheets['hsn'].append([row['hsn_sc'], None, row['uqc'], row['qty'], row['val'], row['rt'],
+                                  row['txval'], row['iamt'], row['camt'], row['samt'], row['csamt']])
+
+        workbook.save(path)
+        self.validate_against_summaries()
+        return path
+
+
+def build_gstr3b_json(tenant_id: int, return_period: str, gstin: str) -> Dict[str, Any]:
+    """GSTR-3B offline JSON (tables 3.1(a) and 4(A)(5)) from the precomputed summaries"""
+    if not is_valid_gstin((gstin or '').upper()):
+        raise ValueError(f"Invalid filer GSTIN: {gstin}")
+    summary = GSTSummaryService.get_gstr3b_summary(tenant_id, return_period)
+    outward, itc = summary['outward_supplies'], summary['itc_available']
+    return {
+        "gstin": gstin.upper(),
+        "ret_period": datetime.strptime(return_period, '%Y-%m').strftime('%m%Y'),
+        "sup_details": {
+            "osup_det": {"txval": _money(outward['taxable_value']), "iamt": _money(outward['igst']),
+                         "camt": _money(outward['cgst']), "samt": _money(outward['sgst']),
+                         "csamt": _money(outward['cess'])}
+        },
+        "itc_elg": {
+            "itc_avl": [{"ty": "OTH", "iamt": _money(itc['igst']), "camt": _money(itc['cgst']),
+                         "samt": _money(itc['sgst']), "csamt": _money(itc['cess'])}]
+        }
+    }
+
+
+def run_gstr1_export_job(context, tenant_id: int, return_period: str, gstin: str, file_format: str):
+    """JobService entry point: write the GSTR-1 file and return (path, content_type, result)"""
+    exporter = GSTR1Exporter(tenant_id, return_period, gstin)
+    total = exporter.expected_documents()
+    context.update_progress(0, total, force=True)
+    exporter.progress_callback = lambda done: context.update_progress(done, total)
+
+    period = exporter.start_date.strftime('%m%Y')
+    if file_format == 'xlsx':
+        path = exporter.write_xlsx(context.output_path(f"GSTR1_{exporter.gstin}_{period}.xlsx"))
+        content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        path = exporter.write_json(context.output_path(f"GSTR1_{exporter.gstin}_{period}.json"))
+        content_type = "application/json"
+
+    context.update_progress(exporter.documents_written, total, force=True)
+    logger.info(f"GSTR-1 {file_format} for tenant {tenant_id} period {return_period}: "
+                f"{exporter.documents_written} documents, {exporter.issue_count} issues", "GSTR1Exporter")
+    return path, content_type, exporter.validation_report()
@@ -0,0 +1,218 @@
+"""
+Payment reminder campaigns.
+
+A campaign is one background job. A single grouped query computes the open
+receivable balance of every eligible customer, each reminder is rendered from
+the campaign's templates, and the messages are COPY-loaded into email_outbox
+in chunks, all in one transaction with the campaign's totals, so a failed run
+leaves no partial campaign behind. Each message's next_attempt_at is then
+spaced out from the database clock so delivery follows the campaign's
+rate_per_minute instead of flooding the SMTP server. Progress counts come from
+the campaign's outbox rows.
+
+Templates use $placeholders: $customer_name, $outstanding, $invoice_count,
+$oldest_due_date, $days_overdue, $company.
+"""
+import html
+from datetime import datetime
+from decimal import Decimal
+from string import Template
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from core.database.bulk_copy import copy_rows
+from core.database.connection import db_manager
+from core.shared.services.email_outbox import email_delivery_worker
+from core.shared.utils.logger import logger
+from modules.admin_module.services.job_service import JobService
+
+DEFAULT_SUBJECT = "Payment Reminder - Pending: Rs$outstanding"
+DEFAULT_BODY = ("<h3>Payment Reminder</h3><p>Dear $customer_name,</p>"
+                "<p>Pending payment: Rs$outstanding across $invoice_count invoice(s), "
+                "oldest due on $oldest_due_date ($days_overdue days overdue).</p>")
+
+ENQUEUE_CHUNK = 1000
+
+OUTBOX_COLUMNS = ("tenant_id", "recipient", "subject", "body", "reference_type", "reference_id", "created_by",
+                  "campaign_id")
+
+# One message every 60/rate seconds from now(), in the order the messages were queued
+STAGGER_SQL = """
+    UPDATE email_outbox o
+    SET next_attempt_at = now() + make_interval(secs => (q.position - 1) * 60.0 / :rate)
+    FROM (SELECT id, row_number() OVER (ORDER BY id) AS position
+          FROM email_outbox WHERE campaign_id = :campaign_id) q
+    WHERE o.id = q.id
+"""
+
+# Open balances per customer; one pass over the open sales invoices of the tenant
+OUTSTANDING_SQL = """
+    SELECT c.id AS customer_id, c.name AS customer_name, c.email,
+           COUNT(*) AS invoice_count,
+           SUM(si.balance_amount_base) AS outstanding,
+           MIN(COALESCE(si.due_date, si.invoice_date)) AS oldest_due_date,
+           MAX(CURRENT_DATE - COALESCE(si.due_date, si.invoice_date)) AS days_overdue
+    FROM sales_invoices si
+    JOIN customers c ON c.id = si.customer_id AND c.tenant_id = si.tenant_id
+    WHERE si.tenant_id = :tid
+      AND si.is_deleted = FALSE
+      AND si.status IN ('POSTED', 'PARTIALLY_PAID')
+      AND si.balance_amount_base > 0
+      AND COALESCE(si.due_date, si.invoice_date) <= CURRENT_DATE - CAST(:min_days AS INTEGER)
+      AND c.is_deleted = FALSE
+      AND COALESCE(c.email, '') <> ''
+      {customer_filter}
+    GROUP BY c.id, c.name, c.email
+    HAVING SUM(si.balance_amount_base) >= :min_balance
+    ORDER BY c.id
+"""
+
+
+def render_reminder(subject_template: str, body_template: str, row, company: str = "") -> tuple:
+    values = {
+        "customer_name": row["customer_name"],
+        "outstanding": f"{Decimal(row['outstanding']):,.2f}",
+        "invoice_count": row["invoice_count"],
+        "oldest_due_date": row["oldest_due_date"].isoformat() if row["oldest_due_date"] else "",
+        "days_overdue": row["days_overdue"],
+        "company": company
+    }
+    subject = Template(subject_template).safe_substitute(values)
+    body = Template(body_template).safe_substitute({k: html.escape(str(v)) for k, v in values.items()})
+    return subject, body
+
+
+class PaymentReminderService:
+    def __init__(self):
+        self.logger_name = "PaymentReminderService"
+
+    @staticmethod
+    def outstanding(session, tenant_id: int, min_balance: float = 0, min_days_overdue: int = 0,
+                    customer_id: Optional[int] = None):
+        sql = OUTSTANDING_SQL.format(customer_filter="AND c.id = :cid" if customer_id else "")
+        params = {"tid": tenant_id, "min_days": min_days_overdue, "min_balance": min_balance}
+        if customer_id:
+            params["cid"] = customer_id
+        return session.execute(text(sql), params).mappings()
+
+    def create_campaign(self, tenant_id: int, username: Optional[str], name: str,
+                        subject_template: Optional[str] = None, body_template: Optional[str] = None,
+                        min_balance: float = 0, min_days_overdue: int = 0, rate_per_minute: int = 60) -> Dict:
+        """Record the campaign and run it as one background job"""
+        with db_manager.get_session() as session:
+            campaign_id = session.execute(text("""
+                INSERT INTO payment_reminder_campaigns
+                    (tenant_id, name, subject_template, body_template, min_balance, min_days_overdue,
+                     rate_per_minute, created_by)
+                VALUES (:tid, :name, :subject, :body, :min_balance, :min_days, :rate, :username)
+                RETURNING id
+            """), {"tid": tenant_id, "name": name, "subject": subject_template or DEFAULT_SUBJECT,
+                   "body": body_template or DEFAULT_BODY, "min_balance": min_balance, "min_days": min_days_overdue,
+                   "rate": rate_per_minute, "username": username}).scalar()
+
+        job_id = JobService.submit("PAYMENT_REMINDER_CAMPAIGN", tenant_id, username, run_campaign_job,
+                                   tenant_id, campaign_id, params={"campaign_id": campaign_id})
+        self._update(campaign_id, job_id=job_id)
+        return {"campaign_id": campaign_id, "job_id": job_id}
+
+    @staticmethod
+    def _update(campaign_id: int, **values):
+        assignments = ", ".join(f"{key} = :{key}" for key in values)
+        with db_manager.get_session() as session:
+            session.execute(text(f"UPDATE payment_reminder_campaigns SET {assignments} WHERE id = :id"),
+                            {**values, "id": campaign_id})
+
+    def run(self, context, tenant_id: int, campaign_id: int) -> Dict:
+        with db_manager.get_session() as session:
+            campaign = session.execute(text("""
+                SELECT c.*, t.name AS company
+                FROM payment_reminder_campaigns c LEFT JOIN tenants t ON t.id = c.tenant_id
+                WHERE c.id = :id AND c.tenant_id = :tid
+            """), {"id": campaign_id, "tid": tenant_id}).mappings().first()
+        if not campaign:
+            raise ValueError(f"Campaign {campaign_id} not found")
+        self._update(campaign_id, status='RUNNING')
+
+        try:
+            queued, total_outstanding = 0, Decimal('0')
+            with db_manager.get_session() as session:
+                # Customers that still have an undelivered reminder from an earlier campaign are skipped
+                pending = {row[0] for row in session.execute(text("""
+                    SELECT DISTINCT reference_id FROM email_outbox
+                    WHERE tenant_id = :tid AND campaign_id IS NOT NULL AND status IN ('QUEUED', 'SENDING')
+                """), {"tid": tenant_id})}
+                customers = [row for row in self.outstanding(session, tenant_id, campaign["min_balance"],
+                                                             campaign["min_days_overdue"])
+                             if str(row["customer_id"]) not in pending]
+            context.update_progress(0, len(customers), force=True)
+
+            with db_manager.get_session() as session:
+                for offset in range(0, len(customers), ENQUEUE_CHUNK):
+                    rows: List[tuple] = []
+                    for row in customers[offset:offset + ENQUEUE_CHUNK]:
+                        subject, body = render_reminder(campaign["subject_template"], campaign["body_template"],
+                                                        row, campaign["company"] or "")
+                        rows.append((tenant_id, row["email"], subject, body, 'CUSTOMER', str(row["customer_id"]),
+                                     campaign["created_by"], campaign_id))
+                        queued += 1
+                        total_outstanding += Decimal(row["outstanding"])
+                    copy_rows(session, 'email_outbox', OUTBOX_COLUMNS, rows)
+                    context.update_progress(queued, len(customers))
+                session.execute(text(STAGGER_SQL), {"campaign_id": campaign_id,
+                                                    "rate": max(campaign["rate_per_minute"], 1)})
+                session.execute(text("""
+                    UPDATE payment_reminder_campaigns
+                    SET status = 'COMPLETED', eligible_customers = :eligible, queued_messages = :queued,
+                        total_outstanding = :total_outstanding, finished_at = now()
+                    WHERE id = :id
+                """), {"eligible": len(customers), "queued": queued, "total_outstanding": total_outstanding,
+                       "id": campaign_id})
+            email_delivery_worker.wake()
+        except Exception as e:
+            self._update(campaign_id, status='FAILED', error=str(e), finished_at=datetime.now())
+            raise
+
+        context.update_progress(queued, len(customers), force=True)
+        logger.info(f"Campaign {campaign_id}: {queued} reminders queued, outstanding {total_outstanding}",
+                    self.logger_name)
+        return {"campaign_id": campaign_id, "queued": queued, "total_outstanding": float(total_outstanding)}
+
+    @staticmethod
+    def get_campaign(campaign_id: int, tenant_id: int) -> Optional[Dict]:
+        with db_manager.get_session() as session:
+            campaign = session.execute(text("""
+                SELECT id, name, status, job_id, min_balance, min_days_overdue, rate_per_minute,
+                       eligible_customers, queued_messages, total_outstanding, error, created_by,
+                       created_at, finished_at
+                FROM payment_reminder_campaigns WHERE id = :id AND tenant_id = :tid
+            """), {"id": campaign_id, "tid": tenant_id}).mappings().first()
+            if not campaign:
+                return None
+            delivery = dict(session.execute(text("""
+                SELECT status, COUNT(*) FROM email_outbox WHERE campaign_id = :id GROUP BY status
+            """), {"id": campaign_id}).fetchall())
+        result = dict(campaign)
+        for key in ("min_balance", "total_outstanding"):
+            result[key] = float(result[key]) if result[key] is not None else None
+        result["delivery"] = {status.lower(): delivery.get(status, 0)
+                              for status in ('QUEUED', 'SENDING', 'SENT', 'FAILED')}
+        return result
+
+    @staticmethod
+    def list_campaigns(tenant_id: int, limit: int = 50) -> List[Dict]:
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT id, name, status, eligible_customers, queued_messages, total_outstanding, created_by,
+                       created_at, finished_at
+                FROM payment_reminder_campaigns WHERE tenant_id = :tid
+                ORDER BY created_at DESC LIMIT :limit
+            """), {"tid": tenant_id, "limit": limit}).mappings().all()
+        return [{**row, "total_outstanding": float(row["total_outstanding"])
+                 if row["total_outstanding"] is not None else None} for row in rows]
+
+
+payment_reminder_service = PaymentReminderService()
+
+
+def run_campaign_job(context, tenant_id: int, campaign_id: int):
+    """JobService entry point"""
+    return payment_reminder_service.run(context, tenant_id, campaign_id)
@@ -2417,6 +2417,72 @@ class PaymentService:
         
         return voucher
 
+    @staticmethod
+    def _allocated_invoice_type(payment) -> str:
+        if payment.party_type == 'PATIENT':
+            return 'TEST'
+        return 'SALES' if payment.payment_type == 'RECEIPT' else 'PURCHASE'
+
+    @staticmethod
+    def _invoice_model(invoice_type: str):
+        if invoice_type == 'TEST':
+            from modules.health_module.models.test_invoice_entity import TestInvoice
+            return TestInvoice
+        if invoice_type == 'SALES':
+            from modules.inventory_module.models.sales_invoice_entity import SalesInvoice
+            return SalesInvoice
+        from modules.inventory_module.models.purchase_invoice_entity import PurchaseInvoice
+        return PurchaseInvoice
+
+    def _load_allocated_invoice(self, session, tenant_id, payment, allocation):
+        model = self._invoice_model(self._allocated_invoice_type(payment))
+        return session.query(model).filter(
+            model.id == allocation.document_id,
+            model.tenant_id == tenant_id
+        ).first()
+
+    def _post_gateway_payment(self, session, tenant_id, username, payment, detail, allocation, invoice):
+        """Post a gateway-confirmed DRAFT payment: apply it to its invoice (if any) and create the voucher"""
+        payment.status = 'POSTED'
+        payment_mode = detail.payment_mode if detail else 'UPI'
+        
+        if allocation:
+            # Invoice payment - update invoice
+            invoice_type = self._allocated_invoice_type(payment)
+            if invoice:
+                # Update invoice amounts
+                current_paid = invoice.paid_amount or Decimal(0)
+                total_amount = invoice.final_amount if hasattr(invoice, 'final_amount') else invoice.total_amount_base
+                new_paid_amount = current_paid + payment.total_amount_base
+                
+                invoice.paid_amount = new_paid_amount
+                
+                # Update payment status
+                if new_paid_amount == 0:
+                    invoice.payment_status = 'UNPAID'
+                elif new_paid_amount < total_amount:
+                    invoice.payment_status = 'PARTIAL'
+                elif new_paid_amount == total_amount:
+                    invoice.payment_status = 'PAID'
+                else:
+                    invoice.payment_status = 'OVERPAID'
+                
+                invoice.updated_by = username
+                invoice.updated_at = datetime.now()
+                
+                # Create voucher for invoice payment
+                voucher = self._create_invoice_payment_voucher_simple(
+                    session, tenant_id, username, payment, invoice, invoice_type, 
+                    payment_mode, payment.total_amount_base
+                )
+                payment.voucher_id = voucher.id
+        else:
+            # Advance payment - create voucher
+            voucher = self._create_advance_payment_voucher(
+                session, tenant_id, username, payment, payment_mode, payment.total_amount_base
+            )
+            payment.voucher_id = voucher.id
+
     @ExceptionMiddleware.handle_exceptions("PaymentService")
     def confirm_gateway_payment(self, payment_id: int, transaction_reference: str, gateway_transaction_id: str = None, 
                                gateway_status: str = 'SUCCESS', gateway_fee_base: Decimal = None, gateway_response: str = None):
@@ -2427,11 +2493,13 @@ class PaymentService:
             tenant_id = session_manager.get_current_tenant_id()
             username = session_manager.get_current_username()
             
+            # Row lock shared with the webhook processor: whichever confirms second waits,
+            # then sees the committed status below and does not post again
             payment = session.query(Payment).filter(
                 Payment.id == payment_id,
                 Payment.tenant_id == tenant_id,
                 Payment.is_deleted == False
-            ).first()
+            ).populate_existing().with_for_update().first()
             
             if not payment:
                 raise ValueError("Payment not found")
@@ -2459,72 +2527,11 @@ class PaymentService:
             
             # Only post payment if gateway status is SUCCESS
             if gateway_status == 'SUCCESS':
-                payment.status = 'POSTED'
-                
-                # Check if this is advance or invoice payment
                 allocation = session.query(PaymentAllocation).filter(
                     PaymentAllocation.payment_id == payment_id
                 ).first()
-                
-                if allocation:
-                    # Invoice payment - update invoice
-                    invoice_type = 'SALES' if payment.payment_type == 'RECEIPT' else 'PURCHASE'
-                    
-                    # Check if it's a test invoice by checking party_type
-                    if payment.party_type == 'PATIENT':
-                        invoice_type = 'TEST'
-                        from modules.health_module.models.test_invoice_entity import TestInvoice
-                        invoice = session.query(TestInvoice).filter(
-                            TestInvoice.id == allocation.document_id,
-                            TestInvoice.tenant_id == tenant_id
-                        ).first()
-                    elif invoice_type == 'SALES':
-                        from modules.inventory_module.models.sales_invoice_entity import SalesInvoice
-                        invoice = session.query(SalesInvoice).filter(
-                            SalesInvoice.id == allocation.document_id,
-                            SalesInvoice.tenant_id == tenant_id
-                        ).first()
-                    else:
-                        from modules.inventory_module.models.purchase_invoice_entity import PurchaseInvoice
-                        invoice = session.query(PurchaseInvoice).filter(
-                            PurchaseInvoice.id == allocation.document_id,
-                            PurchaseInvoice.tenant_id == tenant_id
-                        ).first()
-                    
-                    if invoice:
-                        # Update invoice amounts
-                        current_paid = invoice.paid_amount or Decimal(0)
-                        total_amount = invoice.final_amount if hasattr(invoice, 'final_amount') else invoice.total_amount_base
-                        new_paid_amount = current_paid + payment.total_amount_base
-                        
-                        invoice.paid_amount = new_paid_amount
-                        
-                        # Update payment status
-                        if new_paid_amount == 0:
-                            invoice.payment_status = 'UNPAID'
-                        elif new_paid_amount < total_amount:
-                            invoice.payment_status = 'PARTIAL'
-                        elif new_paid_amount == total_amount:
-                            invoice.payment_status = 'PAID'
-                        else:
-                            invoice.payment_status = 'OVERPAID'
-                        
-                        invoice.updated_by = username
-                        invoice.updated_at = datetime.now()
-                        
-                        # Create voucher for invoice payment
-                        voucher = self._create_invoice_payment_voucher_simple(
-                            session, tenant_id, username, payment, invoice, invoice_type, 
-                            detail.payment_mode if detail else 'UPI', payment.total_amount_base
-                        )
-                        payment.voucher_id = voucher.id
-                else:
-                    # Advance payment - create voucher
-                    voucher = self._create_advance_payment_voucher(
-                        session, tenant_id, username, payment, 
-                        detail.payment_mode if detail else 'UPI', payment.total_amount_base
-                    )
-                    payment.voucher_id = voucher.id
+                invoice = self._load_allocated_invoice(session, tenant_id, payment, allocation) if allocation else None
+                self._post_gateway_payment(session, tenant_id, username, payment, detail, allocation, invoice)
             # If FAILED, payment stays DRAFT with gateway info updated
             
             session.commit()
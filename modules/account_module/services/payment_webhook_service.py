@@ -0,0 +1,369 @@
+"""
+Payment gateway webhook ingestion and batched confirmation.
+
+ingest() stores the raw event with one INSERT ... ON CONFLICT keyed by
+(gateway, gateway_transaction_id) and returns, so the webhook is acknowledged
+without touching payments. A retry of the same event only bumps
+received_count; an event is queued again only when the gateway reports a
+different status for the transaction (e.g. PENDING followed by SUCCESS).
+
+The processor thread claims pending events in batches (FOR UPDATE SKIP LOCKED,
+so several API processes can run it side by side), keeps one event per
+payment, loads the payments (row-locked against the synchronous
+gateway-confirm endpoint), details, allocations and invoices with one query
+each, writes the gateway fields with set-based UPDATEs and posts each SUCCESS
+payment in its own savepoint through PaymentService. Outcomes are written
+back with one UPDATE in the same transaction as the postings.
+"""
+import atexit
+import json
+import os
+import random
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+from sqlalchemy import text, tuple_
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from modules.account_module.models.payment_entity import Payment, PaymentDetail, PaymentAllocation
+from modules.account_module.services.payment_service import PaymentService
+
+SUCCESS_STATUSES = {'SUCCESS', 'CAPTURED', 'PAID', 'COMPLETED'}
+FAILURE_STATUSES = {'FAILED', 'FAILURE', 'DECLINED', 'CANCELLED', 'EXPIRED'}
+
+_INGEST = """
+    INSERT INTO payment_gateway_events AS e
+        (gateway, gateway_transaction_id, payment_id, tenant_id, transaction_reference, gateway_status,
+         gateway_fee, payload)
+    VALUES (:gateway, :txn_id, :payment_id, :tenant_id, :reference, :gateway_status, :fee, CAST(:payload AS JSONB))
+    ON CONFLICT (gateway, gateway_transaction_id) DO UPDATE SET
+        received_count = e.received_count + 1,
+        last_received_at = now(),
+        gateway_status = EXCLUDED.gateway_status,
+        payload = CASE WHEN e.gateway_status = EXCLUDED.gateway_status THEN e.payload ELSE EXCLUDED.payload END,
+        transaction_reference = COALESCE(EXCLUDED.transaction_reference, e.transaction_reference),
+        gateway_fee = COALESCE(EXCLUDED.gateway_fee, e.gateway_fee),
+        status = CASE WHEN e.gateway_status = EXCLUDED.gateway_status THEN e.status ELSE 'PENDING' END,
+        attempts = CASE WHEN e.gateway_status = EXCLUDED.gateway_status THEN e.attempts ELSE 0 END,
+        next_attempt_at = CASE WHEN e.gateway_status = EXCLUDED.gateway_status THEN e.next_attempt_at
+                               ELSE now() END
+    RETURNING id, (xmax = 0) AS inserted, status, received_count
+"""
+
+_CLAIM = """
+    UPDATE payment_gateway_events SET status = 'PROCESSING', locked_at = now(), attempts = attempts + 1
+    WHERE id IN (
+        SELECT id FROM payment_gateway_events
+        WHERE (status = 'PENDING' AND next_attempt_at <= now())
+           OR (status = 'PROCESSING' AND locked_at < now() - make_interval(secs => :claim_timeout))
+        ORDER BY next_attempt_at, id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, gateway, gateway_transaction_id, payment_id, tenant_id, transaction_reference, gateway_status,
+              gateway_fee, payload, attempts
+"""
+
+# A concurrent ingest() may have re-queued an event while it was processed; that event is left PENDING
+_RECORD = """
+    UPDATE payment_gateway_events e
+    SET status = v.status,
+        error = v.error,
+        next_attempt_at = now() + make_interval(secs => v.delay),
+        processed_at = CASE WHEN v.status IN ('PROCESSED', 'IGNORED') THEN now() END,
+        payment_id = COALESCE(e.payment_id, v.payment_id),
+        tenant_id = COALESCE(e.tenant_id, v.tenant_id),
+        locked_at = NULL
+    FROM unnest(CAST(:ids AS BIGINT[]), CAST(:statuses AS TEXT[]), CAST(:delays AS DOUBLE PRECISION[]),
+                CAST(:errors AS TEXT[]), CAST(:payment_ids AS INTEGER[]), CAST(:tenant_ids AS INTEGER[]))
+         AS v(id, status, delay, error, payment_id, tenant_id)
+    WHERE e.id = v.id AND e.status = 'PROCESSING'
+"""
+
+_UPDATE_DETAILS = """
+    UPDATE payment_details d
+    SET transaction_reference = COALESCE(v.reference, d.transaction_reference),
+        payment_gateway = v.gateway,
+        gateway_transaction_id = v.txn_id,
+        gateway_status = v.gateway_status,
+        gateway_fee_base = v.fee,
+        gateway_response = CAST(v.response AS JSONB),
+        updated_by = v.username,
+        updated_at = now()
+    FROM unnest(CAST(:ids AS INTEGER[]), CAST(:references AS TEXT[]), CAST(:gateways AS TEXT[]),
+                CAST(:txn_ids AS TEXT[]), CAST(:gateway_statuses AS TEXT[]), CAST(:fees AS NUMERIC[]),
+                CAST(:responses AS TEXT[]), CAST(:usernames AS TEXT[]))
+         AS v(id, reference, gateway, txn_id, gateway_status, fee, response, username)
+    WHERE d.id = v.id
+"""
+
+_UPDATE_PAYMENTS = """
+    UPDATE payments p
+    SET reference_number = COALESCE(LEFT(v.reference, 50), p.reference_number),
+        updated_by = v.username,
+        updated_at = now()
+    FROM unnest(CAST(:ids AS INTEGER[]), CAST(:references AS TEXT[]), CAST(:usernames AS TEXT[]))
+         AS v(id, reference, username)
+    WHERE p.id = v.id
+"""
+
+
+def normalize_status(status: Optional[str]) -> str:
+    """Map gateway-specific status words onto SUCCESS / FAILED; anything else is kept as sent"""
+    status = (status or '').strip().upper()
+    if status in SUCCESS_STATUSES:
+        return 'SUCCESS'
+    if status in FAILURE_STATUSES:
+        return 'FAILED'
+    return status[:20] or 'UNKNOWN'
+
+
+class PaymentWebhookService:
+    def __init__(self):
+        self.logger_name = "PaymentWebhookService"
+
+    def ingest(self, gateway: str, gateway_transaction_id: str, gateway_status: str, payload: Dict,
+               payment_id: Optional[int] = None, tenant_id: Optional[int] = None,
+               transaction_reference: Optional[str] = None, gateway_fee=None) -> Dict:
+        """Persist one webhook event; returns whether it was a duplicate of one already received"""
+        with db_manager.get_session() as session:
+            row = session.execute(text(_INGEST), {
+                "gateway": gateway.upper(), "txn_id": gateway_transaction_id, "payment_id": payment_id,
+                "tenant_id": tenant_id, "reference": transaction_reference,
+                "gateway_status": normalize_status(gateway_status),
+                "fee": None if gateway_fee is None else Decimal(str(gateway_fee)),
+                "payload": json.dumps(payload, default=str)
+            }).mappings().first()
+        queued = row["inserted"] or row["status"] == 'PENDING'
+        if queued:
+            payment_webhook_processor.wake()
+        return {"event_id": row["id"], "duplicate": not row["inserted"], "queued": queued,
+                "received_count": row["received_count"]}
+
+    @staticmethod
+    def get_events(payment_id: int, tenant_id: int) -> List[Dict]:
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT id, gateway, gateway_transaction_id, gateway_status, status, received_count, attempts,
+                       error, first_received_at, last_received_at, processed_at
+                FROM payment_gateway_events WHERE payment_id = :pid AND tenant_id = :tid
+                ORDER BY id
+            """), {"pid": payment_id, "tid": tenant_id}).mappings().all()
+        return [dict(row) for row in rows]
+
+
+class PaymentWebhookProcessor:
+    """Background thread posting gateway confirmations from payment_gateway_events in batches"""
+
+    def __init__(self):
+        self.enabled = os.getenv('PAYMENT_WEBHOOK_PROCESSOR', 'true').lower() == 'true'
+        self.batch_size = int(os.getenv('PAYMENT_WEBHOOK_BATCH_SIZE', 200))
+        self.poll_interval = float(os.getenv('PAYMENT_WEBHOOK_POLL_INTERVAL', 2))
+        self.claim_timeout = int(os.getenv('PAYMENT_WEBHOOK_CLAIM_TIMEOUT', 300))
+        self.max_attempts = int(os.getenv('PAYMENT_WEBHOOK_MAX_ATTEMPTS', 5))
+        self.retry_base = float(os.getenv('PAYMENT_WEBHOOK_RETRY_BASE_SECONDS', 30))
+        self.retry_max = float(os.getenv('PAYMENT_WEBHOOK_RETRY_MAX_SECONDS', 1800))
+        self.payment_service = PaymentService()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self.enabled or self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="payment-webhooks", daemon=True)
+            self._thread.start()
+        logger.info("Payment webhook processor started", "PaymentWebhookProcessor")
+
+    def stop(self, timeout: float = 30):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        thread.join(timeout)
+        logger.info("Payment webhook processor stopped", "PaymentWebhookProcessor")
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Payment webhook batch failed: {str(e)}", "PaymentWebhookProcessor")
+                processed = 0
+            if processed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _retry(self, event, error: str) -> tuple:
+        if event["attempts"] >= self.max_attempts:
+            return 'FAILED', 0.0, error
+        delay = min(self.retry_base * 2 ** (event["attempts"] - 1), self.retry_max) * random.uniform(0.8, 1.2)
+        return 'PENDING', delay, error
+
+    def process_batch(self) -> int:
+        """Claim, post and record one batch; returns the number of events claimed"""
+        with db_manager.get_session() as session:
+            events = session.execute(text(_CLAIM), {"claim_timeout": self.claim_timeout,
+                                                    "batch_size": self.batch_size}).mappings().all()
+        if not events:
+            return 0
+
+        outcomes: Dict[int, tuple] = {}
+        resolved: Dict[int, tuple] = {}
+        try:
+            with db_manager.get_session() as session:
+                self._apply(session, events, outcomes, resolved)
+                self._record(session, outcomes, resolved)
+        except Exception as e:
+            logger.error(f"Payment webhook batch rolled back: {str(e)}", "PaymentWebhookProcessor")
+            outcomes = {event["id"]: self._retry(event, str(e)) for event in events}
+            with db_manager.get_session() as session:
+                self._record(session, outcomes, {})
+
+        statuses = [outcome[0] for outcome in outcomes.values()]
+        logger.info(f"Payment webhook batch: {statuses.count('PROCESSED')} processed, "
+                    f"{statuses.count('IGNORED')} ignored, {statuses.count('PENDING')} retrying, "
+                    f"{statuses.count('FAILED')} failed", "PaymentWebhookProcessor")
+        return len(events)
+
+    @staticmethod
+    def _record(session, outcomes: Dict[int, tuple], resolved: Dict[int, tuple]):
+        ids = list(outcomes)
+        session.execute(text(_RECORD), {
+            "ids": ids,
+            "statuses": [outcomes[i][0] for i in ids],
+            "delays": [outcomes[i][1] for i in ids],
+            "errors": [outcomes[i][2] for i in ids],
+            "payment_ids": [resolved.get(i, (None, None))[0] for i in ids],
+            "tenant_ids": [resolved.get(i, (None, None))[1] for i in ids]
+        })
+
+    def _resolve_payment_ids(self, session, events) -> Dict[int, int]:
+        """event id -> payment id; events without a payment_id are matched by (tenant_id, payment_number)"""
+        by_event = {event["id"]: event["payment_id"] for event in events if event["payment_id"]}
+        wanted = {event["id"]: (event["tenant_id"], str((event["payload"] or {}).get("payment_number")))
+                  for event in events
+                  if not event["payment_id"] and event["tenant_id"] and (event["payload"] or {}).get("payment_number")}
+        if wanted:
+            found = {(row.tenant_id, row.payment_number): row.id for row in session.query(
+                Payment.id, Payment.tenant_id, Payment.payment_number
+            ).filter(tuple_(Payment.tenant_id, Payment.payment_number).in_(set(wanted.values())))}
+            for event_id, key in wanted.items():
+                if key in found:
+                    by_event[event_id] = found[key]
+        return by_event
+
+    def _apply(self, session, events, outcomes: Dict[int, tuple], resolved: Dict[int, tuple]):
+        payment_ids = self._resolve_payment_ids(session, events)
+
+        # One event per payment: a SUCCESS wins, otherwise the most recent one
+        chosen: Dict[int, dict] = {}
+        for event in sorted(events, key=lambda e: e["id"]):
+            payment_id = payment_ids.get(event["id"])
+            if payment_id is None:
+                outcomes[event["id"]] = ('FAILED', 0.0, "No matching payment reference")
+                continue
+            current = chosen.get(payment_id)
+            if current is None or current["gateway_status"] != 'SUCCESS' or event["gateway_status"] == 'SUCCESS':
+                if current is not None:
+                    outcomes[current["id"]] = ('IGNORED', 0.0, f"Superseded by event {event['id']}")
+                chosen[payment_id] = event
+            else:
+                outcomes[event["id"]] = ('IGNORED', 0.0, f"Superseded by event {current['id']}")
+        if not chosen:
+            return
+
+        payments = {payment.id: payment for payment in session.query(Payment).filter(
+            Payment.id.in_(list(chosen)), Payment.is_deleted == False
+        ).order_by(Payment.id).with_for_update().all()}
+
+        live: Dict[int, dict] = {}
+        for payment_id, event in chosen.items():
+            payment = payments.get(payment_id)
+            if payment is None or (event["tenant_id"] and event["tenant_id"] != payment.tenant_id):
+                outcomes[event["id"]] = ('FAILED', 0.0, f"Payment {payment_id} not found")
+            elif payment.status != 'DRAFT':
+                resolved[event["id"]] = (payment.id, payment.tenant_id)
+                outcomes[event["id"]] = ('IGNORED', 0.0, f"Payment already {payment.status}")
+            else:
+                resolved[event["id"]] = (payment.id, payment.tenant_id)
+                live[payment_id] = event
+        if not live:
+            return
+
+        details: Dict[int, PaymentDetail] = {}
+        for detail in session.query(PaymentDetail).filter(
+                PaymentDetail.payment_id.in_(list(live))).order_by(PaymentDetail.payment_id, PaymentDetail.id):
+            details.setdefault(detail.payment_id, detail)
+
+        # Gateway fields and references for every live payment, as two set-based statements
+        detail_ids = [pid for pid in live if pid in details]
+        if detail_ids:
+            session.execute(text(_UPDATE_DETAILS), {
+                "ids": [details[pid].id for pid in detail_ids],
+                "references": [live[pid]["transaction_reference"] for pid in detail_ids],
+                "gateways": [live[pid]["gateway"] for pid in detail_ids],
+                "txn_ids": [live[pid]["gateway_transaction_id"] for pid in detail_ids],
+                "gateway_statuses": [live[pid]["gateway_status"] for pid in detail_ids],
+                "fees": [live[pid]["gateway_fee"] or Decimal(0) for pid in detail_ids],
+                "responses": [json.dumps(live[pid]["payload"], default=str) for pid in detail_ids],
+                "usernames": [f"{live[pid]['gateway'].lower()}-webhook" for pid in detail_ids]
+            })
+        session.execute(text(_UPDATE_PAYMENTS), {
+            "ids": list(live),
+            "references": [live[pid]["transaction_reference"] for pid in live],
+            "usernames": [f"{live[pid]['gateway'].lower()}-webhook" for pid in live]
+        })
+
+        succeeded = [pid for pid, event in live.items() if event["gateway_status"] == 'SUCCESS']
+        for pid, event in live.items():
+            if event["gateway_status"] != 'SUCCESS':
+                # Not a confirmation; the payment stays DRAFT with the gateway info recorded
+                outcomes[event["id"]] = ('PROCESSED', 0.0, None)
+        if not succeeded:
+            return
+
+        allocations: Dict[int, PaymentAllocation] = {}
+        for allocation in session.query(PaymentAllocation).filter(
+                PaymentAllocation.payment_id.in_(succeeded)).order_by(PaymentAllocation.id):
+            allocations.setdefault(allocation.payment_id, allocation)
+
+        wanted = defaultdict(set)
+        for pid, allocation in allocations.items():
+            wanted[PaymentService._allocated_invoice_type(payments[pid])].add(allocation.document_id)
+        invoices = {}
+        for invoice_type, ids in wanted.items():
+            model = PaymentService._invoice_model(invoice_type)
+            for invoice in session.query(model).filter(model.id.in_(ids)):
+                invoices[(invoice_type, invoice.tenant_id, invoice.id)] = invoice
+
+        # Invoices shared by several payments are the same session objects, so paid amounts accumulate
+        for pid in succeeded:
+            payment, event = payments[pid], live[pid]
+            allocation = allocations.get(pid)
+            invoice = invoices.get((PaymentService._allocated_invoice_type(payment), payment.tenant_id,
+                                    allocation.document_id)) if allocation else None
+            try:
+                with session.begin_nested():
+                    self.payment_service._post_gateway_payment(
+                        session, payment.tenant_id, f"{event['gateway'].lower()}-webhook", payment,
+                        details.get(pid), allocation, invoice)
+                outcomes[event["id"]] = ('PROCESSED', 0.0, None)
+            except Exception as e:
+                logger.error(f"Posting payment {pid} from event {event['id']} failed: {str(e)}",
+                             "PaymentWebhookProcessor")
+                outcomes[event["id"]] = self._retry(event, str(e))
+
+
+payment_webhook_service = PaymentWebhookService()
+payment_webhook_processor = PaymentWebhookProcessor()
+atexit.register(payment_webhook_processor.stop)
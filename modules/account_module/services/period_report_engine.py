@@ -0,0 +1,207 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.cache_utils import TTLCache
+from core.shared.utils.logger import logger
+from core.shared.middleware.exception_handler import ExceptionMiddleware
+from modules.account_module.models.ledger_entity import Ledger
+
+# Account types whose natural balance is on the credit side
+CREDIT_NATURE_TYPES = ('INCOME', 'LIABILITY', 'EQUITY')
+
+GRANULARITIES = ('month', 'quarter', 'year')
+
+_period_cache = TTLCache(max_entries=2048, ttl_seconds=300)
+
+
+def _period_label(granularity: str, period_start) -> str:
+    if granularity == 'month':
+        return period_start.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f"{period_start.year}-Q{(period_start.month - 1) // 3 + 1}"
+    return str(period_start.year)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    return value
+
+
+def bucket_ranges(granularity: str, from_date, to_date) -> List[Tuple[str, date, date]]:
+    """Split [from_date, to_date] into calendar month/quarter/year buckets (inclusive ranges)"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    step = {'month': 1, 'quarter': 3, 'year': 12}[granularity]
+    from_date, to_date = _as_date(from_date), _as_date(to_date)
+
+    if granularity == 'month':
+        cursor = from_date.replace(day=1)
+    elif granularity == 'quarter':
+        cursor = date(from_date.year, (from_date.month - 1) // 3 * 3 + 1, 1)
+    else:
+        cursor = date(from_date.year, 1, 1)
+
+    ranges = []
+    while cursor <= to_date:
+        month_index = cursor.month - 1 + step
+        next_start = date(cursor.year + month_index // 12, month_index % 12 + 1, 1)
+        ranges.append((_period_label(granularity, cursor), max(cursor, from_date),
+                       min(next_start - timedelta(days=1), to_date)))
+        cursor = next_start
+    return ranges
+
+
+class PeriodReportEngine:
+    """
+    Computes ledger totals for many periods in a single grouped pass.
+
+    Periods are either calendar buckets (month/quarter/year, grouped with
+    date_trunc) or arbitrary labelled ranges such as financial years (joined
+    against an unnest() of the range bounds). Results are cached per tenant
+    and period set; ledger writes invalidate the tenant's entries.
+    """
+
+    def __init__(self):
+        self.logger_name = "PeriodReportEngine"
+
+    @ExceptionMiddleware.handle_exceptions("PeriodReportEngine")
+    def compute_buckets(self, tenant_id: int, granularity: str, from_date, to_date,
+                        account_types: Optional[Sequence[str]] = None,
+                        account_ids: Optional[Sequence[int]] = None,
+                        by_account: bool = False) -> Dict[str, Dict]:
+        """Totals per calendar bucket; returns {period_label: {group_key: totals}}"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        from_date, to_date = _as_date(from_date), _as_date(to_date)
+        key = (tenant_id, 'buckets', granularity, from_date, to_date,
+               tuple(sorted(account_types or ())), tuple(sorted(account_ids or ())), by_account)
+
+        def load():
+            group_col = "am.id" if by_account else "ag.account_type"
+            sql = f"""
+                SELECT date_trunc('{granularity}', l.transaction_date) AS period_start,
+                       {group_col} AS group_key, ag.account_type,
+                       COALESCE(SUM(l.debit_amount), 0), COALESCE(SUM(l.credit_amount), 0)
+                FROM ledgers l
+                JOIN account_masters am ON am.id = l.account_id
+                JOIN account_groups ag ON ag.id = am.account_group_id
+                WHERE l.tenant_id = :tid AND l.is_deleted = false
+                  AND l.transaction_date >= :from_date AND l.transaction_date < :to_date
+                  {self._filters(account_types, account_ids)}
+                GROUP BY 1, 2, 3
+            """
+            params = self._params(tenant_id, from_date, to_date + timedelta(days=1), account_types, account_ids)
+            with db_manager.get_session() as session:
+                rows = session.execute(text(sql), params).fetchall()
+
+            result = {label: {} for label, _, _ in bucket_ranges(granularity, from_date, to_date)}
+            for r in rows:
+                label = _period_label(granularity, r[0])
+                result.setdefault(label, {})[r[1]] = self._totals(r[2], r[3], r[4])
+            return result
+
+        return _period_cache.get_or_set(key, load)
+
+    @ExceptionMiddleware.handle_exceptions("PeriodReportEngine")
+    def compute_ranges(self, tenant_id: int, ranges: Sequence[Tuple[str, object, object]],
+                       account_types: Optional[Sequence[str]] = None,
+                       account_ids: Optional[Sequence[int]] = None,
+                       by_account: bool = False) -> Dict[str, Dict]:
+        """Totals per labelled (label, start, end) range, inclusive of both dates"""
+        ranges = [(label, _as_date(start), _as_date(end)) for label, start, end in ranges]
+        if not ranges:
+            return {}
+        key = (tenant_id, 'ranges', tuple(ranges),
+               tuple(sorted(account_types or ())), tuple(sorted(account_ids or ())), by_account)
+
+        def load():
+            group_col = "am.id" if by_account else "ag.account_type"
+            # One ledger range scan over the union of periods; each row is
+            # attributed to every period it falls into (periods may overlap)
+            sql = f"""
+                SELECT p.label, {group_col} AS group_key, ag.account_type,
+                       COALESCE(SUM(l.debit_amount), 0), COALESCE(SUM(l.credit_amount), 0)
+                FROM ledgers l
+                JOIN account_masters am ON am.id = l.account_id
+                JOIN account_groups ag ON ag.id = am.account_group_id
+                JOIN unnest(CAST(:labels AS TEXT[]), CAST(:starts AS DATE[]), CAST(:ends AS DATE[]))
+                     AS p(label, start_date, end_date)
+                  ON l.transaction_date >= p.start_date AND l.transaction_date < p.end_date + 1
+                WHERE l.tenant_id = :tid AND l.is_deleted = false
+                  AND l.transaction_date >= :from_date AND l.transaction_date < :to_date
+                  {self._filters(account_types, account_ids)}
+                GROUP BY 1, 2, 3
+            """
+            params = self._params(tenant_id, min(r[1] for r in ranges),
+                                  max(r[2] for r in ranges) + timedelta(days=1), account_types, account_ids)
+            params.update({
+                "labels": [r[0] for r in ranges],
+                "starts": [r[1] for r in ranges],
+                "ends": [r[2] for r in ranges]
+            })
+            with db_manager.get_session() as session:
+                rows = session.execute(text(sql), params).fetchall()
+
+            result = {label: {} for label, _, _ in ranges}
+            for r in rows:
+                result[r[0]][r[1]] = self._totals(r[2], r[3], r[4])
+            return result
+
+        return _period_cache.get_or_set(key, load)
+
+    @staticmethod
+    def invalidate_tenant(tenant_id: int):
+        removed = _period_cache.invalidate_tenant(tenant_id)
+        if removed:
+            logger.debug(f"Invalidated {removed} cached period reports for tenant {tenant_id}", "PeriodReportEngine")
+
+    @staticmethod
+    def _filters(account_types, account_ids) -> str:
+        clauses = []
+        if account_types:
+            clauses.append("AND ag.account_type = ANY(CAST(:account_types AS TEXT[]))")
+        if account_ids:
+            clauses.append("AND am.id = ANY(CAST(:account_ids AS INTEGER[]))")
+        return " ".join(clauses)
+
+    @staticmethod
+    def _params(tenant_id, from_date, to_date, account_types, account_ids) -> Dict:
+        params = {"tid": tenant_id, "from_date": from_date, "to_date": to_date}
+        if account_types:
+            params["account_types"] = list(account_types)
+        if account_ids:
+            params["account_ids"] = list(account_ids)
+        return params
+
+    @staticmethod
+    def _totals(account_type: str, debit, credit) -> Dict:
+        debit, credit = float(debit), float(credit)
+        net = credit - debit if account_type in CREDIT_NATURE_TYPES else debit - credit
+        return {"account_type": account_type, "debit": debit, "credit": credit, "amount": net}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_ledger_tenants(session, flush_context):
+    tenants = session.info.setdefault('period_report_tenants', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Ledger) and obj.tenant_id:
+            tenants.add(obj.tenant_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_ledger_tenants(session):
+    for tenant_id in session.info.pop('period_report_tenants', ()):
+        PeriodReportEngine.invalidate_tenant(tenant_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_ledger_tenants(session):
+    session.info.pop('period_report_tenants', None)
+
+
+period_report_engine = PeriodReportEngine()
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, BigInteger, Index
+from datetime import datetime
+from core.database.connection import Base
+
+
+class BackgroundJob(Base):
+    """Long-running server-side work (exports, batch renders, campaigns) tracked per tenant"""
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        Index('idx_background_jobs_tenant_type', 'tenant_id', 'job_type', 'created_at'),
+        {'extend_existing': True}
+    )
+
+    id = Column(String(36), primary_key=True)  # UUID
+    tenant_id = Column(Integer, ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    job_type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default='QUEUED')  # QUEUED, RUNNING, COMPLETED, FAILED
+    progress = Column(BigInteger, default=0)
+    total = Column(BigInteger)
+    params = Column(JSON)
+    result = Column(JSON)
+    result_path = Column(Text)
+    result_size = Column(BigInteger)
+    content_type = Column(String(100))
+    error = Column(Text)
+    runner = Column(String(100))  # host:pid of the process executing the job
+
+    created_by = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,183 @@
+import os
+import socket
+import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from modules.admin_module.models.background_job_entity import BackgroundJob
+
+JOB_OUTPUT_DIR = os.getenv('JOB_OUTPUT_DIR', 'exports/jobs')
+HOST = socket.gethostname()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+class JobContext:
+    """Handed to a job function to report progress and place output files"""
+
+    # Progress is persisted at most this often to keep status writes cheap
+    PROGRESS_INTERVAL_SECONDS = 2
+
+    def __init__(self, job_id: str, tenant_id: int, username: Optional[str]):
+        self.job_id = job_id
+        self.tenant_id = tenant_id
+        self.username = username
+        self._last_progress_write = 0.0
+
+    def output_path(self, filename: str) -> str:
+        directory = os.path.join(JOB_OUTPUT_DIR, self.job_id)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def update_progress(self, done: int, total: Optional[int] = None, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_progress_write < self.PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_progress_write = now
+        values = {"progress": done}
+        if total is not None:
+            values["total"] = total
+        JobService._update(self.job_id, **values)
+
+
+class JobService:
+    """
+    Runs long operations off the request path and records their state in
+    background_jobs. A job function receives a JobContext plus its arguments
+    and returns either a dict (stored as the result) or a (path, content_type,
+    result) tuple when it produced a downloadable file.
+
+    Jobs run in the worker process that accepted them, which records itself
+    as the job's runner. A worker that is recycled or killed takes its jobs
+    with it, so on startup fail_orphaned() fails the QUEUED/RUNNING jobs of
+    runners on this host that no longer exist.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('JOB_WORKERS', 2)), thread_name_prefix="fideas-job"
+            )
+        return cls._executor
+
+    @classmethod
+    def submit(cls, job_type: str, tenant_id: int, username: Optional[str], func: Callable[..., Any],
+               *args, params: Optional[Dict] = None, **kwargs) -> str:
+        job_id = str(uuid.uuid4())
+        with db_manager.get_session() as session:
+            session.add(BackgroundJob(
+                id=job_id,
+                tenant_id=tenant_id,
+                job_type=job_type,
+                status='QUEUED',
+                params=params,
+                runner=cls._runner(),
+                created_by=username
+            ))
+
+        context = JobContext(job_id, tenant_id, username)
+        cls._get_executor().submit(cls._run, context, job_type, func, args, kwargs)
+        logger.info(f"Queued {job_type} job {job_id} for tenant {tenant_id}", "JobService")
+        return job_id
+
+    @classmethod
+    def _run(cls, context: JobContext, job_type: str, func: Callable, args, kwargs):
+        cls._update(context.job_id, status='RUNNING', started_at=datetime.utcnow())
+        try:
+            outcome = func(context, *args, **kwargs)
+            values = {"status": 'COMPLETED', "finished_at": datetime.utcnow()}
+            if isinstance(outcome, tuple):
+                path, content_type, result = outcome
+                values.update(result_path=path, content_type=content_type,
+                              result_size=os.path.getsize(path), result=result)
+            else:
+                values["result"] = outcome
+            cls._update(context.job_id, **values)
+            logger.info(f"{job_type} job {context.job_id} completed", "JobService")
+        except Exception as e:
+            logger.error(f"{job_type} job {context.job_id} failed: {str(e)}", "JobService", exc_info=True)
+            cls._update(context.job_id, status='FAILED', error=str(e), finished_at=datetime.utcnow())
+
+    @staticmethod
+    def _runner() -> str:
+        return f"{HOST}:{os.getpid()}"
+
+    @classmethod
+    def fail_orphaned(cls) -> int:
+        """Fail unfinished jobs whose runner process on this host has exited"""
+        orphaned = []
+        try:
+            with db_manager.get_session() as session:
+                jobs = session.query(BackgroundJob.id, BackgroundJob.runner).filter(
+                    BackgroundJob.status.in_(('QUEUED', 'RUNNING')),
+                    BackgroundJob.runner.like(f"{HOST}:%")
+                ).all()
+                for job_id, runner in jobs:
+                    pid = int(runner.rsplit(':', 1)[1])
+                    if pid != os.getpid() and not _process_alive(pid):
+                        orphaned.append(job_id)
+                if orphaned:
+                    session.query(BackgroundJob).filter(BackgroundJob.id.in_(orphaned)).update(
+                        {"status": 'FAILED', "error": 'Server worker exited before the job finished',
+                         "finished_at": datetime.utcnow()},
+                        synchronize_session=False
+                    )
+        except Exception as e:
+            logger.warning(f"Orphaned job check skipped: {str(e)}", "JobService")
+            return 0
+        if orphaned:
+            logger.warning(f"Marked {len(orphaned)} orphaned job(s) as failed", "JobService")
+        return len(orphaned)
+
+    @staticmethod
+    def _update(job_id: str, **values):
+        with db_manager.get_session() as session:
+            session.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(values)
+
+    @staticmethod
+    def get(job_id: str, tenant_id: int) -> Optional[Dict[str, Any]]:
+        with db_manager.get_session() as session:
+            job = session.query(BackgroundJob).filter(
+                BackgroundJob.id == job_id,
+                BackgroundJob.tenant_id == tenant_id
+            ).first()
+            if not job:
+                return None
+            return {
+                "id": job.id,
+                "job_type": job.job_type,
+                "status": job.status,
+                "progress": job.progress,
+                "total": job.total,
+                "params": job.params,
+                "result": job.result,
+                "result_path": job.result_path,
+                "result_size": job.result_size,
+                "content_type": job.content_type,
+                "error": job.error,
+                "created_by": job.created_by,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None
+            }
+
+    @classmethod
+    def shutdown(cls, wait: bool = True):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=wait)
+            cls._executor = None
@@ -1,122 +1,195 @@
-from datetime import datetime
+from datetime import date, timedelta
+from decimal import Decimal
 from sqlalchemy import text
 from typing import Dict, List
 from core.database.connection import db_manager
+from modules.health_module.services.health_metrics_service import dashboard_cache, health_metrics_service
+
+APPOINTMENT_STATUSES = ('SCHEDULED', 'COMPLETED', 'CANCELLED', 'NO_SHOW')
+CLINICAL_METRICS = ('medical_records', 'prescriptions', 'test_orders', 'sample_collections', 'test_results')
+
+def _age_group(age: int) -> str:
+    if age < 18:
+        return 'Under 18'
+    if age <= 35:
+        return '18-35'
+    if age <= 55:
+        return '36-55'
+    if age <= 70:
+        return '56-70'
+    return 'Over 70'
 
 class HealthDashboardService:
-    """Service for health module dashboard analytics using actual health data"""
+    """
+    Service for health module dashboard analytics. Figures are read from the
+    pre-aggregated health_daily_metrics counters and cached briefly per tenant.
+    """
 
     @staticmethod
     def get_patient_analytics(tenant_id: int) -> Dict:
-        """Get patient analytics using stored procedure"""
+        """Get patient analytics from the patient counters"""
+        return dashboard_cache.get_or_set((tenant_id, 'patients'),
+                                          lambda: HealthDashboardService._patient_analytics(tenant_id))
+
+    @staticmethod
+    def _patient_analytics(tenant_id: int) -> Dict:
+        today = date.today()
         with db_manager.get_session() as session:
-            results = session.execute(
-                text("SELECT * FROM get_patient_analytics(:tenant_id)"),
-                {"tenant_id": tenant_id}
-            ).fetchall()
-
-            if not results:
-                return {"total_patients": 0, "new_patients_month": 0, "active_patients": 0, 
-                       "age_groups": [], "gender_distribution": []}
-
-            # Extract basic stats from first row
-            total_patients = results[0][0]
-            new_patients_month = results[0][1] 
-            active_patients = results[0][2]
-
-            # Group age and gender data
-            age_groups = {}
-            gender_distribution = {}
-            
-            for row in results:
-                if row[3] and row[4]:  # age_group and age_count
-                    age_groups[row[3]] = row[4]
-                if row[5] and row[6]:  # gender and gender_count
-                    gender_distribution[row[5]] = row[6]
-
-            return {
-                "total_patients": total_patients,
-                "new_patients_month": new_patients_month,
-                "active_patients": active_patients,
-                "age_groups": [{"group": k, "count": v} for k, v in age_groups.items()],
-                "gender_distribution": [{"gender": k, "count": v} for k, v in gender_distribution.items()]
-            }
+            profiles = health_metrics_service.totals(session, tenant_id, ['patient_profile'])
+            new_patients = health_metrics_service.totals(session, tenant_id, ['patients_new'], today.replace(day=1))
+
+        total_patients = active_patients = 0
+        age_groups, gender_distribution = {}, {}
+        for (_, dimension), (count, _) in profiles.items():
+            gender, birth_year, active = dimension.split('|')
+            total_patients += count
+            if active == '1':
+                active_patients += count
+            if gender:
+                gender_distribution[gender] = gender_distribution.get(gender, 0) + count
+            if birth_year:
+                # Age by birth year; the day-level boundary is not worth a per-patient scan
+                group = _age_group(today.year - int(birth_year))
+                age_groups[group] = age_groups.get(group, 0) + count
+
+        return {
+            "total_patients": total_patients,
+            "new_patients_month": new_patients.get(('patients_new', ''), (0, 0))[0],
+            "active_patients": active_patients,
+            "age_groups": [{"group": k, "count": v} for k, v in age_groups.items() if v],
+            "gender_distribution": [{"gender": k, "count": v} for k, v in gender_distribution.items() if v]
+        }
 
     @staticmethod
     def get_appointment_analytics(tenant_id: int) -> Dict:
-        """Get appointment analytics using stored procedure"""
+        """Get appointment analytics for the last 7 days from the appointment counters"""
+        return dashboard_cache.get_or_set((tenant_id, 'appointments'),
+                                          lambda: HealthDashboardService._appointment_analytics(tenant_id))
+
+    @staticmethod
+    def _appointment_analytics(tenant_id: int) -> Dict:
         with db_manager.get_session() as session:
-            result = session.execute(
-                text("SELECT * FROM get_appointment_analytics(:tenant_id)"),
-                {"tenant_id": tenant_id}
-            ).fetchone()
-
-            return {
-                "total_appointments": int(result[0]) if result else 0,
-                "scheduled": int(result[1]) if result else 0,
-                "completed": int(result[2]) if result else 0,
-                "cancelled": int(result[3]) if result else 0,
-                "no_show": int(result[4]) if result else 0,
-                "completion_rate": float(result[5]) if result else 0,
-                "no_show_rate": float(result[6]) if result else 0,
-                "avg_daily_appointments": float(result[7]) if result else 0
-            }
+            counters = health_metrics_service.totals(session, tenant_id, ['appointments'],
+                                                     date.today() - timedelta(days=7))
+
+        by_status = dict.fromkeys(APPOINTMENT_STATUSES, 0)
+        total = 0
+        for (_, dimension), (count, _) in counters.items():
+            status = dimension.split(':', 1)[1]
+            by_status[status] = by_status.get(status, 0) + count
+            total += count
+
+        return {
+            "total_appointments": total,
+            "scheduled": by_status['SCHEDULED'],
+            "completed": by_status['COMPLETED'],
+            "cancelled": by_status['CANCELLED'],
+            "no_show": by_status['NO_SHOW'],
+            "completion_rate": round(by_status['COMPLETED'] / total * 100, 2) if total else 0,
+            "no_show_rate": round(by_status['NO_SHOW'] / total * 100, 2) if total else 0,
+            "avg_daily_appointments": round(total / 7, 2)
+        }
 
     @staticmethod
     def get_clinical_operations(tenant_id: int) -> Dict:
-        """Get clinical operations metrics using stored procedure"""
+        """Get this month's clinical operations metrics from the daily counters"""
+        return dashboard_cache.get_or_set((tenant_id, 'clinical'),
+                                          lambda: HealthDashboardService._clinical_operations(tenant_id))
+
+    @staticmethod
+    def _clinical_operations(tenant_id: int) -> Dict:
         with db_manager.get_session() as session:
-            result = session.execute(
-                text("SELECT * FROM get_clinical_operations(:tenant_id)"),
-                {"tenant_id": tenant_id}
-            ).fetchone()
-
-            return {
-                "medical_records_generated": int(result[0]) if result else 0,
-                "prescriptions_issued": int(result[1]) if result else 0,
-                "test_orders_created": int(result[2]) if result else 0,
-                "sample_collections": int(result[3]) if result else 0,
-                "test_results_completed": int(result[4]) if result else 0,
-                "avg_turnaround_hours": float(result[5]) if result else 0
-            }
+            counters = health_metrics_service.totals(session, tenant_id, CLINICAL_METRICS,
+                                                     date.today().replace(day=1))
+
+        def count(metric: str) -> int:
+            return counters.get((metric, ''), (0, 0))[0]
+
+        results, turnaround_hours = counters.get(('test_results', ''), (0, Decimal(0)))
+        return {
+            "medical_records_generated": count('medical_records'),
+            "prescriptions_issued": count('prescriptions'),
+            "test_orders_created": count('test_orders'),
+            "sample_collections": count('sample_collections'),
+            "test_results_completed": results,
+            "avg_turnaround_hours": round(float(turnaround_hours) / results, 2) if results else 0
+        }
 
     @staticmethod
     def get_doctor_performance(tenant_id: int) -> List[Dict]:
-        """Get doctor performance metrics using stored procedure"""
+        """Get this month's top 10 doctors by appointments from the appointment counters"""
+        return dashboard_cache.get_or_set((tenant_id, 'doctors'),
+                                          lambda: HealthDashboardService._doctor_performance(tenant_id))
+
+    @staticmethod
+    def _doctor_performance(tenant_id: int) -> List[Dict]:
         with db_manager.get_session() as session:
-            results = session.execute(
-                text("SELECT * FROM get_doctor_performance(:tenant_id)"),
-                {"tenant_id": tenant_id}
-            ).fetchall()
-
-            return [
-                {
-                    "doctor_name": row[0],
-                    "specialization": row[1],
-                    "total_appointments": int(row[2]),
-                    "completed_appointments": int(row[3]),
-                    "consultation_fee": float(row[4]) if row[4] else 0,
-                    "completion_rate": round((int(row[3]) / int(row[2]) * 100), 2) if int(row[2]) > 0 else 0
-                }
-                for row in results
-            ]
+            counters = health_metrics_service.totals(session, tenant_id, ['appointments'],
+                                                     date.today().replace(day=1))
+            doctors = session.execute(text("""
+                SELECT id, first_name || ' ' || last_name, specialization, consultation_fee
+                FROM doctors WHERE tenant_id = :tenant_id AND is_active = TRUE
+            """), {"tenant_id": tenant_id}).fetchall()
+
+        totals, completed = {}, {}
+        for (_, dimension), (count, _) in counters.items():
+            doctor_id, status = dimension.split(':', 1)
+            totals[doctor_id] = totals.get(doctor_id, 0) + count
+            if status == 'COMPLETED':
+                completed[doctor_id] = completed.get(doctor_id, 0) + count
+
+        performance = []
+        for row in doctors:
+            total = totals.get(str(row[0]), 0)
+            done = completed.get(str(row[0]), 0)
+            performance.append({
+                "doctor_name": row[1],
+                "specialization": row[2],
+                "total_appointments": total,
+                "completed_appointments": done,
+                "consultation_fee": float(row[3]) if row[3] else 0,
+                "completion_rate": round((done / total * 100), 2) if total > 0 else 0
+            })
+        performance.sort(key=lambda d: d["total_appointments"], reverse=True)
+        return performance[:10]
 
     @staticmethod
     def get_test_analytics(tenant_id: int) -> List[Dict]:
-        """Get test analytics using stored procedure"""
+        """Get this month's top 10 tests and panels by orders from the test item counters"""
+        return dashboard_cache.get_or_set((tenant_id, 'tests'),
+                                          lambda: HealthDashboardService._test_analytics(tenant_id))
+
+    @staticmethod
+    def _test_analytics(tenant_id: int) -> List[Dict]:
         with db_manager.get_session() as session:
-            results = session.execute(
-                text("SELECT * FROM get_test_analytics(:tenant_id)"),
-                {"tenant_id": tenant_id}
-            ).fetchall()
-
-            return [
-                {
-                    "test_name": row[0],
-                    "category": row[1],
-                    "total_orders": int(row[2]),
-                    "revenue": float(row[3]),
-                    "avg_turnaround_days": float(row[4])
-                }
-                for row in results
-            ]
\ No newline at end of file
+            counters = health_metrics_service.totals(session, tenant_id, ['test_items'],
+                                                     date.today().replace(day=1))
+            top = sorted(((dimension, count, revenue) for (_, dimension), (count, revenue) in counters.items()
+                          if count > 0), key=lambda t: t[1], reverse=True)[:10]
+            ids = {'test': [], 'panel': []}
+            for dimension, _, _ in top:
+                kind, item_id = dimension.split(':', 1)
+                if item_id:
+                    ids[kind].append(int(item_id))
+            names = {}
+            for kind, table in (('test', 'tests'), ('panel', 'test_panels')):
+                if not ids[kind]:
+                    continue
+                rows = session.execute(text(f"""
+                    SELECT t.id, t.name, c.name
+                    FROM {table} t LEFT JOIN test_categories c ON c.id = t.category_id
+                    WHERE t.tenant_id = :tenant_id AND t.id = ANY(CAST(:ids AS INTEGER[]))
+                """), {"tenant_id": tenant_id, "ids": ids[kind]}).fetchall()
+                names.update({f"{kind}:{row[0]}": (row[1], row[2]) for row in rows})
+
+        # Results are recorded per order, not per test, so turnaround is only tracked overall
+        return [
+            {
+                "test_name": names.get(dimension, ('Unknown', None))[0],
+                "category": names.get(dimension, ('Unknown', None))[1],
+                "total_orders": count,
+                "revenue": float(revenue),
+                "avg_turnaround_days": 0.0
+            }
+            for dimension, count, revenue in top
+        ]
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Date, Time
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Date, Time, Computed
 from sqlalchemy.types import Numeric
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime
 from core.database.connection import Base
 
@@ -25,6 +26,9 @@ class Patient(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String(100))
+    # Maintained by the database for the patient search indexes
+    search_name = Column(Text, Computed("lower(coalesce(first_name, '') || ' ' || coalesce(last_name, ''))"))
+    phone_normalized = Column(String(20), Computed("right(regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'), 10)"))
     
     appointments = relationship("Appointment", back_populates="patient")
     prescriptions = relationship("Prescription", back_populates="patient")
@@ -43,6 +47,8 @@ class Doctor(Base):
     email = Column(String(100))
     schedule_start = Column(Time)
     schedule_end = Column(Time)
+    working_days = Column(ARRAY(String))  # ['MON','TUE','WED']; empty means every day
+    consultation_duration = Column(Integer, default=15)  # minutes, slot length for availability
     consultation_fee = Column(Numeric(10, 2))
     tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
     is_active = Column(Boolean, default=True)
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Numeric, Enum, BigInteger
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database.connection import Base
@@ -100,6 +101,7 @@ class TestResultFile(Base):
     acquisition_date = Column(DateTime)
     description = Column(Text)
     storage_system = Column(Text)
+    content_sha256 = Column(String(64))
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String(100))
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -107,3 +109,14 @@ class TestResultFile(Base):
     is_deleted = Column(Boolean, default=False)
     
     result = relationship("TestResult", back_populates="files")
+
+class TestResultPublicBundle(Base):
+    """Rendered public view of a test result (payload + QR), refreshed whenever the result changes"""
+    __tablename__ = 'test_result_public_bundles'
+    
+    result_number = Column(Text, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
+    test_result_id = Column(Integer, ForeignKey('test_results.id', ondelete='CASCADE'), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    etag = Column(String(64), nullable=False)
+    rendered_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, Date, Numeric, BigInteger, ForeignKey
+from datetime import datetime
+from core.database.connection import Base
+
+class HealthDailyMetric(Base):
+    """Pre-aggregated health dashboard counter, maintained as records change"""
+    __tablename__ = 'health_daily_metrics'
+
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), primary_key=True)
+    metric = Column(String(50), primary_key=True)
+    metric_date = Column(Date, primary_key=True)
+    dimension = Column(String(100), primary_key=True, default='')
+    value_count = Column(BigInteger, nullable=False, default=0)
+    value_sum = Column(Numeric(18, 4), nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, SmallInteger, ForeignKey
+from datetime import datetime
+from core.database.connection import Base
+
+class LabWorklistEntry(Base):
+    """Pending test order item in the lab worklist (maintained by lab_worklist_refresh)"""
+    __tablename__ = 'lab_worklist'
+
+    test_order_item_id = Column(Integer, ForeignKey('test_order_items.id', ondelete='CASCADE'), primary_key=True)
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
+    test_order_id = Column(Integer, ForeignKey('test_orders.id', ondelete='CASCADE'), nullable=False)
+    test_order_number = Column(String(50))
+    patient_name = Column(String(200))
+    test_name = Column(String(200))
+    department_id = Column(Integer)
+    department_name = Column(String(200))
+    urgency = Column(String(20), nullable=False)
+    urgency_rank = Column(SmallInteger, nullable=False)
+    stage = Column(String(20), nullable=False)
+    sample_collection_id = Column(Integer)
+    collection_number = Column(String(50))
+    sample_status = Column(String(20))
+    ordered_at = Column(DateTime, nullable=False)
+    collected_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -4,6 +4,7 @@ from modules.health_module.models.clinic_entities import Appointment
 from modules.account_module.models.entities import Voucher, VoucherLine, VoucherType
 from modules.account_module.services.account_master_service import AccountMasterService
 from core.shared.utils.logger import logger
+from modules.health_module.services.catalog_service import catalog_service
 from datetime import datetime
 from fastapi import HTTPException
 from sqlalchemy import or_
@@ -131,6 +132,9 @@ class AppointmentInvoiceService:
                 username = data.pop('created_by', 'system')
                 appointment_id = data['appointment_id']
                 
+                catalog_service.price_invoice_items(tenant_id, items, bool(data.pop('is_interstate', False)))
+                catalog_service.apply_totals(data, items)
+                
                 # Validate appointment exists
                 appointment = session.query(Appointment).filter(
                     Appointment.id == appointment_id,
@@ -2,7 +2,10 @@ from core.database.connection import db_manager
 from modules.health_module.models.clinic_entities import Appointment, Patient, Doctor
 from modules.health_module.services.patient_service import PatientService
 from modules.health_module.services.doctor_service import DoctorService
+from modules.health_module.services.slot_availability_service import SlotAvailabilityService, BLOCKING_STATUSES
+from sqlalchemy.exc import IntegrityError
 from core.shared.utils.logger import logger
+import modules.health_module.services.health_metrics_service  # noqa: F401  registers the dashboard counters
 from datetime import datetime, date
 import csv
 import io
@@ -44,9 +47,19 @@ class AppointmentService:
                         appointment_data['doctor_license_number'] = doctor.license_number
                         appointment_data['doctor_specialization'] = doctor.specialization
                 
+                # Serialize bookings per doctor and reject overlapping slots
+                if appointment_data.get('status', 'SCHEDULED') in BLOCKING_STATUSES:
+                    appointment_data['duration_minutes'] = SlotAvailabilityService.reserve(
+                        session, tenant_id, doctor_id, appointment_data['appointment_date'],
+                        appointment_data['appointment_time'], appointment_data.get('duration_minutes')
+                    )
+                
                 appointment = Appointment(**appointment_data)
                 session.add(appointment)
-                session.flush()
+                try:
+                    session.flush()
+                except IntegrityError as e:
+                    SlotAvailabilityService.translate_conflict(e)
                 appointment_id = appointment.id
                 logger.info(f"Appointment created: {appointment.appointment_number}", self.logger_name)
                 session.expunge(appointment)
@@ -87,11 +100,13 @@ class AppointmentService:
                 # 4. Global Search Filter
                 if search:
                     from sqlalchemy import or_
+                    # Trigram-indexed columns plus an exact status match, so the OR stays index-backed
                     query = query.filter(or_(
                         Appointment.appointment_number.ilike(f"%{search}%"),
                         Appointment.patient_name.ilike(f"%{search}%"),
                         Appointment.doctor_name.ilike(f"%{search}%"),
-                        Appointment.status.ilike(f"%{search}%")
+                        Appointment.patient_phone.ilike(f"%{search}%"),
+                        Appointment.status == search.strip().upper()
                     ))
                 
                 # 5. Sorting and Pagination
@@ -106,17 +121,20 @@ class AppointmentService:
             logger.error(f"Error fetching appointments: {str(e)}", self.logger_name)
             raise
         
-    def get_by_date(self, appointment_date, tenant_id=None):
+    def get_by_date(self, appointment_date, tenant_id=None, doctor_id=None):
         try:
             with db_manager.get_session() as session:
-                query = session.query(Appointment).join(Patient).join(Doctor)
-                query = query.filter(Appointment.appointment_date == appointment_date)
+                # Patient and doctor names are denormalized on the appointment, so no joins;
+                # expire_on_commit=False keeps the rows usable after the session closes
+                query = session.query(Appointment).filter(
+                    Appointment.appointment_date == appointment_date,
+                    Appointment.is_deleted == False
+                )
                 if tenant_id:
                     query = query.filter(Appointment.tenant_id == tenant_id)
-                appointments = query.all()
-                for appointment in appointments:
-                    session.expunge(appointment)
-                return appointments
+                if doctor_id:
+                    query = query.filter(Appointment.doctor_id == doctor_id)
+                return query.order_by(Appointment.appointment_time).all()
         except Exception as e:
             logger.error(f"Error fetching appointments by date: {str(e)}", self.logger_name)
             return []
@@ -167,10 +185,26 @@ class AppointmentService:
                 update_data['updated_by'] = updated_by
                 update_data['updated_at'] = datetime.utcnow()
                 
+                slot_fields = ('doctor_id', 'appointment_date', 'appointment_time', 'duration_minutes', 'status')
+                if any(field in update_data for field in slot_fields):
+                    status = update_data.get('status', appointment.status)
+                    if status in BLOCKING_STATUSES:
+                        update_data['duration_minutes'] = SlotAvailabilityService.reserve(
+                            session, appointment.tenant_id,
+                            update_data.get('doctor_id') or appointment.doctor_id,
+                            update_data.get('appointment_date') or appointment.appointment_date,
+                            update_data.get('appointment_time') or appointment.appointment_time,
+                            update_data.get('duration_minutes') or appointment.duration_minutes,
+                            exclude_appointment_id=appointment.id
+                        )
+                
                 for key, value in update_data.items():
                     setattr(appointment, key, value)
                 
-                session.flush()
+                try:
+                    session.flush()
+                except IntegrityError as e:
+                    SlotAvailabilityService.translate_conflict(e)
                 logger.info(f"Appointment updated: {appointment.appointment_number}", self.logger_name)
                 return appointment
         except Exception as e:
@@ -281,7 +315,7 @@ class AppointmentService:
         """Generate CSV template for appointment import"""
         template_data = [
             ['Patient Name', 'Patient Phone', 'Doctor Name', 'Doctor Phone', 'Appointment Date', 'Appointment Time', 'Duration Minutes', 'Status', 'Reason', 'Notes'],
-            ['John Doe', '123-456-7890', 'Dr. Jane Smith', '987-654-3210', '2024-01-15', '09:00', '30', 'scheduled', 'Regular checkup', 'Patient follow-up']
+            ['John Doe', '123-456-7890', 'Dr. Jane Smith', '987-654-3210', '2024-01-15', '09:00', '30', 'SCHEDULED', 'Regular checkup', 'Patient follow-up']
         ]
         
         output = io.StringIO()
@@ -338,30 +372,43 @@ class AppointmentService:
                             }
                             doctor = doctor_service.create(doctor_data)
                         
+                        time_text = row['Appointment Time'].strip()
                         appointment_data = {
                             'patient_id': patient.id,
                             'doctor_id': doctor.id,
-                            'appointment_date': row['Appointment Date'],
-                            'appointment_time': row['Appointment Time'],
-                            'duration_minutes': int(row.get('Duration Minutes', 30)),
-                            'status': row.get('Status', 'scheduled'),
+                            'appointment_date': datetime.strptime(row['Appointment Date'].strip(), '%Y-%m-%d').date(),
+                            'appointment_time': datetime.strptime(
+                                time_text, '%H:%M:%S' if time_text.count(':') == 2 else '%H:%M').time(),
+                            'duration_minutes': int(row.get('Duration Minutes') or 30),
+                            # The exclusion constraint only covers upper-case blocking statuses
+                            'status': (row.get('Status') or 'SCHEDULED').strip().upper(),
                             'reason': row.get('Reason', ''),
                             'notes': row.get('Notes', ''),
                             'tenant_id': tenant_id
                         }
                         
-                        appointment_number = self.generate_appointment_number(tenant_id)
-                        appointment = Appointment(
-                            appointment_number=appointment_number,
-                            **appointment_data
-                        )
-                        session.add(appointment)
+                        # Each row in its own savepoint: a conflicting row is reported and skipped
+                        # instead of failing the final flush of the whole import
+                        with session.begin_nested():
+                            if appointment_data['status'] in BLOCKING_STATUSES:
+                                appointment_data['duration_minutes'] = SlotAvailabilityService.reserve(
+                                    session, tenant_id, doctor.id, appointment_data['appointment_date'],
+                                    appointment_data['appointment_time'], appointment_data['duration_minutes']
+                                )
+                            appointment = Appointment(
+                                appointment_number=self.generate_appointment_number(tenant_id),
+                                **appointment_data
+                            )
+                            session.add(appointment)
+                            try:
+                                session.flush()
+                            except IntegrityError as e:
+                                SlotAvailabilityService.translate_conflict(e)
                         imported_count += 1
                         
                     except Exception as e:
                         errors.append(f"Row {row_num}: {str(e)}")
                 
-                session.flush()
                 logger.info(f"Imported {imported_count} appointments", self.logger_name)
                 
             return {'imported': imported_count, 'errors': errors}
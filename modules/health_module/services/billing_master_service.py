@@ -1,6 +1,7 @@
 from core.shared.services.base_service import BaseService
 from modules.health_module.models.clinic_entities import ClinicBillingMaster
 from core.database.connection import db_manager
+import modules.health_module.services.catalog_service  # noqa: F401  evicts the price catalog on change
 import csv
 import io
 from datetime import datetime
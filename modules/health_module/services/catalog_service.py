@@ -0,0 +1,223 @@
+"""
+Compiled per-tenant price catalog.
+
+Tests, test panels with their expanded test lists, and clinic billing masters
+are loaded together (four queries) into an immutable snapshot held in memory.
+Order and invoice creation price their lines from it without touching the
+catalog tables. A flush that changes a catalog row bumps the tenant's row in
+catalog_versions inside the same transaction; every worker reads that version
+(one primary-key lookup) before using its snapshot and reloads when it moved.
+"""
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.cache_utils import TTLCache
+from core.shared.utils.logger import logger
+from modules.health_module.models.care_entities import Test
+from modules.health_module.models.clinic_entities import ClinicBillingMaster
+from modules.health_module.models.diagnostic_entities import TestPanel, TestPanelItem
+
+# (tenant_id,) -> (catalog version, Catalog)
+catalog_cache = TTLCache(max_entries=1000, ttl_seconds=int(os.getenv('CLINIC_CATALOG_CACHE_TTL', 300)))
+
+_ZERO = Decimal('0')
+_CENT = Decimal('0.01')
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    id: int
+    name: str
+    rate: Decimal
+    gst_rate: Decimal
+    cess_rate: Decimal
+    hsn_code: Optional[str] = None
+    tests: Tuple[Tuple[int, str], ...] = ()
+
+
+@dataclass
+class Catalog:
+    tests: Dict[int, CatalogEntry] = field(default_factory=dict)
+    panels: Dict[int, CatalogEntry] = field(default_factory=dict)
+    billing_masters: Dict[int, CatalogEntry] = field(default_factory=dict)
+
+
+class CatalogService:
+    def __init__(self):
+        self.logger_name = "CatalogService"
+
+    def get(self, tenant_id: int) -> Catalog:
+        version = self._version(tenant_id)
+        cached = catalog_cache.get((tenant_id,))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        catalog = self._load(tenant_id)
+        catalog_cache.set((tenant_id,), (version, catalog))
+        return catalog
+
+    @staticmethod
+    def _version(tenant_id: int) -> int:
+        # Read before loading: a change committed mid-load only causes one extra reload
+        with db_manager.get_session() as session:
+            version = session.execute(text("SELECT version FROM catalog_versions WHERE tenant_id = :tenant_id"),
+                                      {"tenant_id": tenant_id}).scalar()
+        return version or 0
+
+    def invalidate(self, tenant_id: int):
+        catalog_cache.invalidate_tenant(tenant_id)
+
+    def _load(self, tenant_id: int) -> Catalog:
+        catalog = Catalog()
+        with db_manager.get_session() as session:
+            for row in session.query(Test.id, Test.name, Test.rate, Test.gst, Test.cess, Test.hsn_code).filter(
+                    Test.tenant_id == tenant_id, Test.is_deleted == False):
+                catalog.tests[row.id] = CatalogEntry(row.id, row.name, _money(row.rate), Decimal(str(row.gst or 0)),
+                                                     Decimal(str(row.cess or 0)), row.hsn_code)
+
+            panel_tests: Dict[int, List[Tuple[int, str]]] = {}
+            for row in session.query(TestPanelItem.panel_id, TestPanelItem.test_id, TestPanelItem.test_name).filter(
+                    TestPanelItem.tenant_id == tenant_id, TestPanelItem.is_deleted == False
+            ).order_by(TestPanelItem.panel_id, TestPanelItem.id):
+                test = catalog.tests.get(row.test_id)
+                panel_tests.setdefault(row.panel_id, []).append((row.test_id, test.name if test else row.test_name))
+            for row in session.query(TestPanel.id, TestPanel.name, TestPanel.cost, TestPanel.gst, TestPanel.cess).filter(
+                    TestPanel.tenant_id == tenant_id, TestPanel.is_deleted == False):
+                catalog.panels[row.id] = CatalogEntry(row.id, row.name, _money(row.cost), Decimal(str(row.gst or 0)),
+                                                      Decimal(str(row.cess or 0)),
+                                                      tests=tuple(panel_tests.get(row.id, ())))
+
+            for row in session.query(ClinicBillingMaster).filter(
+                    ClinicBillingMaster.tenant_id == tenant_id, ClinicBillingMaster.is_deleted == False,
+                    ClinicBillingMaster.is_active == True):
+                catalog.billing_masters[row.id] = CatalogEntry(row.id, row.description, _money(row.amount),
+                                                               Decimal(str(row.gst_percentage or 0)), _ZERO,
+                                                               row.hsn_code)
+        logger.info(f"Catalog loaded for tenant {tenant_id}: {len(catalog.tests)} tests, {len(catalog.panels)} "
+                    f"panels, {len(catalog.billing_masters)} billing masters", self.logger_name)
+        return catalog
+
+    def panel_tests(self, tenant_id: int, panel_id: int) -> List[Dict]:
+        panel = self.get(tenant_id).panels.get(panel_id)
+        return [{"test_id": test_id, "test_name": name} for test_id, name in panel.tests] if panel else []
+
+    @staticmethod
+    def _price_line(item: Dict, entry: CatalogEntry, quantity: int = 1, is_interstate: bool = False):
+        """Fill rate, discount, GST (IGST inter-state, else split CGST/SGST) and totals of a line without a rate"""
+        rate = entry.rate
+        gross = rate * quantity
+        disc_percentage = Decimal(str(item.get('disc_percentage') or 0))
+        disc_amount = _money(item.get('disc_amount')) or _money(gross * disc_percentage / 100)
+        taxable = gross - disc_amount
+        cess = _money(taxable * entry.cess_rate / 100)
+        if is_interstate:
+            igst = _money(taxable * entry.gst_rate / 100)
+            item.update(cgst_rate=_ZERO, cgst_amount=_ZERO, sgst_rate=_ZERO, sgst_amount=_ZERO,
+                        igst_rate=entry.gst_rate, igst_amount=igst)
+            tax = igst
+        else:
+            half_rate = entry.gst_rate / 2
+            cgst = _money(taxable * half_rate / 100)
+            item.update(cgst_rate=half_rate, cgst_amount=cgst, sgst_rate=half_rate, sgst_amount=cgst,
+                        igst_rate=_ZERO, igst_amount=_ZERO)
+            tax = cgst + cgst
+        item.update(rate=rate, disc_amount=disc_amount, taxable_amount=taxable,
+                    cess_rate=entry.cess_rate, cess_amount=cess, total_amount=taxable + tax + cess)
+
+    @staticmethod
+    def _require_amounts(item: Dict):
+        """A line priced by the client is stored as sent; its NOT NULL amounts must be there"""
+        missing = [key for key in ('taxable_amount', 'total_amount') if item.get(key) is None]
+        if missing:
+            raise ValueError(f"Line {item.get('line_no')} carries a rate but no {' or '.join(missing)}")
+
+    def price_test_order_items(self, tenant_id: int, items: List[Dict], is_interstate: bool = False):
+        """Complete test order lines in place from the catalog; lines that carry a rate keep the client's pricing"""
+        catalog = self.get(tenant_id)
+        for item in items:
+            if item.get('panel_id'):
+                entry = catalog.panels.get(item['panel_id'])
+                if entry is None:
+                    raise ValueError(f"Test panel {item['panel_id']} not found")
+                item['panel_name'] = item.get('panel_name') or entry.name
+            else:
+                entry = catalog.tests.get(item.get('test_id'))
+                if entry is None:
+                    raise ValueError(f"Test {item.get('test_id')} not found")
+                item['test_name'] = item.get('test_name') or entry.name
+            if item.get('rate') is None:
+                self._price_line(item, entry, is_interstate=is_interstate)
+            else:
+                self._require_amounts(item)
+
+    def price_invoice_items(self, tenant_id: int, items: List[Dict], is_interstate: bool = False):
+        """Complete appointment invoice lines in place from the billing masters"""
+        catalog = self.get(tenant_id)
+        for item in items:
+            if not item.get('billing_master_id'):
+                if item.get('rate') is None or not item.get('description'):
+                    raise ValueError(f"Line {item.get('line_no')} needs a billing_master_id or a description and rate")
+                self._require_amounts(item)
+                continue
+            entry = catalog.billing_masters.get(item['billing_master_id'])
+            if entry is None:
+                raise ValueError(f"Billing master {item['billing_master_id']} not found")
+            item['description'] = item.get('description') or entry.name
+            item['hsn_code'] = item.get('hsn_code') or entry.hsn_code
+            if item.get('rate') is None:
+                self._price_line(item, entry, item.get('quantity') or 1, is_interstate)
+                item['unit_price'] = entry.rate
+            else:
+                self._require_amounts(item)
+                if item.get('unit_price') is None:
+                    item['unit_price'] = item['rate']
+
+    @staticmethod
+    def apply_totals(data: Dict, items: List[Dict]):
+        """Fill header amounts the client left out from the priced lines"""
+        def total(key):
+            return sum((Decimal(str(item.get(key) or 0)) for item in items), _ZERO)
+
+        computed = {
+            'subtotal_amount': sum((Decimal(str(item.get('rate') or 0)) * (item.get('quantity') or 1)
+                                    for item in items), _ZERO),
+            'items_total_discount_amount': total('disc_amount'),
+            'taxable_amount': total('taxable_amount'),
+            'cgst_amount': total('cgst_amount'),
+            'sgst_amount': total('sgst_amount'),
+            'igst_amount': total('igst_amount'),
+            'cess_amount': total('cess_amount')
+        }
+        for key, value in computed.items():
+            if data.get(key) is None:
+                data[key] = value
+        if data.get('final_amount') is None:
+            data['final_amount'] = (total('total_amount') - Decimal(str(data.get('overall_disc_amount') or 0))
+                                    + Decimal(str(data.get('overall_cess_amount') or 0))
+                                    + Decimal(str(data.get('roundoff') or 0)))
+
+
+_CATALOG_ENTITIES = (Test, TestPanel, TestPanelItem, ClinicBillingMaster)
+
+_BUMP_VERSION_SQL = text("""
+    INSERT INTO catalog_versions (tenant_id, version, updated_at) VALUES (:tenant_id, 1, NOW())
+    ON CONFLICT (tenant_id) DO UPDATE SET version = catalog_versions.version + 1, updated_at = NOW()
+""")
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_catalog_versions(session, flush_context):
+    tenants = {obj.tenant_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+               if isinstance(obj, _CATALOG_ENTITIES)}
+    if tenants:
+        session.connection().execute(_BUMP_VERSION_SQL, [{"tenant_id": tenant_id} for tenant_id in sorted(tenants)])
+
+
+catalog_service = CatalogService()
@@ -0,0 +1,217 @@
+"""
+Incremental health dashboard counters.
+
+Every flush that inserts, edits or deletes a tracked health record is turned
+into signed deltas on health_daily_metrics (tenant, day, metric, dimension)
+and applied in the same transaction, so the counters commit or roll back with
+the change itself. The dashboard reads these rows instead of scanning the
+health tables; its short-lived cache is dropped when a change commits here.
+
+Listeners are registered when this module is imported, which every health
+service that writes tracked records does.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.cache_utils import TTLCache
+from core.shared.utils.logger import logger
+from modules.health_module.models.clinic_entities import Appointment, MedicalRecord, Patient, Prescription
+from modules.health_module.models.diagnostic_entities import TestResult
+from modules.health_module.models.sample_collection_entity import SampleCollection
+from modules.health_module.models.test_order_entity import TestOrder, TestOrderItem
+
+# Running totals that are not bucketed by day (the patient profile) live on this date
+TOTALS_DATE = date(1970, 1, 1)
+
+# (tenant_id, view) -> dashboard payload
+dashboard_cache = TTLCache(max_entries=5000, ttl_seconds=int(os.getenv('HEALTH_DASHBOARD_CACHE_TTL', 30)))
+
+_TENANTS_KEY = 'health_metric_tenants'
+
+_UPSERT = """
+    INSERT INTO health_daily_metrics (tenant_id, metric_date, metric, dimension, value_count, value_sum, updated_at)
+    {source}
+    ON CONFLICT (tenant_id, metric_date, metric, dimension) DO UPDATE
+    SET value_count = health_daily_metrics.value_count + EXCLUDED.value_count,
+        value_sum = health_daily_metrics.value_sum + EXCLUDED.value_sum,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def _day(value) -> date:
+    value = value or datetime.utcnow()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _appointment(get, order_date):
+    if get('is_deleted'):
+        return []
+    return [(get('appointment_date'), 'appointments', f"{get('doctor_id')}:{get('status') or 'SCHEDULED'}", 1, 0)]
+
+
+def _created(metric: str):
+    def contribute(get, order_date):
+        return [] if get('is_deleted') else [(_day(get('created_at')), metric, '', 1, 0)]
+    return contribute
+
+
+def _test_result(get, order_date):
+    if get('is_deleted'):
+        return []
+    hours = 0
+    ordered_at, resulted_at = order_date(get('test_order_id')), get('result_date')
+    if ordered_at and resulted_at:
+        hours = round(max((resulted_at - ordered_at).total_seconds(), 0) / 3600, 4)
+    return [(_day(get('created_at')), 'test_results', '', 1, hours)]
+
+
+def _test_item(get, order_date):
+    if get('is_deleted'):
+        return []
+    dimension = f"test:{get('test_id')}" if get('test_id') else f"panel:{get('panel_id') or ''}"
+    return [(_day(get('created_at')), 'test_items', dimension, 1, get('total_amount') or 0)]
+
+
+def _patient(get, order_date):
+    born = get('date_of_birth')
+    profile = f"{get('gender') or ''}|{born.year if born else ''}|{1 if get('is_active') else 0}"
+    return [(_day(get('created_at')), 'patients_new', '', 1, 0), (TOTALS_DATE, 'patient_profile', profile, 1, 0)]
+
+
+# entity -> (attributes the counters depend on, contribution of one row)
+_TRACKED: Dict[type, Tuple[Tuple[str, ...], Callable]] = {
+    Appointment: (('is_deleted', 'appointment_date', 'doctor_id', 'status'), _appointment),
+    MedicalRecord: (('is_deleted', 'created_at'), _created('medical_records')),
+    Prescription: (('is_deleted', 'created_at'), _created('prescriptions')),
+    TestOrder: (('is_deleted', 'created_at'), _created('test_orders')),
+    SampleCollection: (('is_deleted', 'created_at'), _created('sample_collections')),
+    TestResult: (('is_deleted', 'created_at', 'result_date', 'test_order_id'), _test_result),
+    TestOrderItem: (('is_deleted', 'created_at', 'test_id', 'panel_id', 'total_amount'), _test_item),
+    Patient: (('created_at', 'gender', 'date_of_birth', 'is_active'), _patient),
+}
+
+
+def _values(obj, state, previous: bool):
+    """Attribute reader for the row as it is now, or as it was before this flush"""
+    def get(name):
+        if previous:
+            deleted = state.attrs[name].history.deleted
+            if deleted:
+                return deleted[0]
+        return getattr(obj, name)
+    return get
+
+
+class HealthMetricsService:
+    """Maintains and reads the pre-aggregated health dashboard counters"""
+
+    def __init__(self):
+        self.logger_name = "HealthMetricsService"
+
+    @staticmethod
+    def apply(connection, deltas: Dict[tuple, list]) -> set:
+        """Upsert (tenant_id, date, metric, dimension) -> [count, sum] deltas; returns the tenants touched"""
+        rows = [{"tenant_id": key[0], "metric_date": key[1], "metric": key[2], "dimension": key[3],
+                 "value_count": count, "value_sum": amount, "updated_at": datetime.utcnow()}
+                for key, (count, amount) in sorted(deltas.items()) if count or amount]
+        if rows:
+            # Sorted keys keep concurrent transactions locking counter rows in the same order
+            connection.execute(text(_UPSERT.format(source="""
+                VALUES (:tenant_id, :metric_date, :metric, :dimension, :value_count, :value_sum, :updated_at)
+            """)), rows)
+        return {row["tenant_id"] for row in rows}
+
+    @staticmethod
+    def retract_test_order_items(session, test_order_id: int):
+        """Take an order's items out of the counters before they are bulk-deleted (bulk deletes skip flush hooks)"""
+        session.execute(text(_UPSERT.format(source="""
+            SELECT tenant_id, CAST(created_at AS DATE), 'test_items',
+                   CASE WHEN test_id IS NOT NULL THEN 'test:' || test_id
+                        ELSE 'panel:' || COALESCE(CAST(panel_id AS TEXT), '') END,
+                   -COUNT(*), -COALESCE(SUM(total_amount), 0), now()
+            FROM test_order_items
+            WHERE test_order_id = :order_id AND is_deleted = false
+            GROUP BY 1, 2, 4
+        """)), {"order_id": test_order_id})
+        tenant_id = session.execute(text("SELECT tenant_id FROM test_orders WHERE id = :order_id"),
+                                    {"order_id": test_order_id}).scalar()
+        if tenant_id:
+            session.info.setdefault(_TENANTS_KEY, set()).add(tenant_id)
+
+    @staticmethod
+    def totals(session, tenant_id: int, metrics: Iterable[str],
+               from_date: date = TOTALS_DATE) -> Dict[Tuple[str, str], Tuple[int, Decimal]]:
+        """(metric, dimension) -> (count, sum) summed over days from from_date on"""
+        rows = session.execute(text("""
+            SELECT metric, dimension, SUM(value_count), SUM(value_sum)
+            FROM health_daily_metrics
+            WHERE tenant_id = :tid AND metric = ANY(CAST(:metrics AS TEXT[])) AND metric_date >= :from_date
+            GROUP BY metric, dimension
+        """), {"tid": tenant_id, "metrics": list(metrics), "from_date": from_date}).fetchall()
+        return {(row[0], row[1]): (int(row[2]), row[3] or Decimal(0)) for row in rows}
+
+    def rebuild(self, tenant_id: Optional[int] = None):
+        """Recompute the counters from the health tables (one tenant, or all when omitted)"""
+        with db_manager.get_session() as session:
+            session.execute(text("SELECT health_metrics_rebuild(:tid)"), {"tid": tenant_id})
+        if tenant_id:
+            dashboard_cache.invalidate_tenant(tenant_id)
+        else:
+            dashboard_cache.clear()
+        logger.info(f"Health metrics rebuilt for {'tenant ' + str(tenant_id) if tenant_id else 'all tenants'}",
+                    self.logger_name)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flushed_changes(session, flush_context):
+    changes = [(obj, False, True) for obj in session.new] + \
+              [(obj, True, True) for obj in session.dirty] + \
+              [(obj, True, False) for obj in session.deleted]
+    deltas: Dict[tuple, list] = defaultdict(lambda: [0, Decimal(0)])
+    order_dates: Dict[int, Optional[datetime]] = {}
+
+    def order_date(order_id):
+        if order_id not in order_dates:
+            order_dates[order_id] = session.connection().execute(
+                text("SELECT order_date FROM test_orders WHERE id = :id"), {"id": order_id}
+            ).scalar()
+        return order_dates[order_id]
+
+    for obj, had_row, has_row in changes:
+        tracked = _TRACKED.get(type(obj))
+        if tracked is None:
+            continue
+        attributes, contribute = tracked
+        state = inspect(obj)
+        if had_row and has_row and not any(state.attrs[a].history.has_changes() for a in attributes):
+            continue
+        for sign, present in ((-1, had_row), (1, has_row)):
+            if not present:
+                continue
+            for metric_date, metric, dimension, count, amount in contribute(_values(obj, state, sign < 0), order_date):
+                delta = deltas[(obj.tenant_id, metric_date, metric, dimension)]
+                delta[0] += sign * count
+                delta[1] += sign * Decimal(str(amount))
+
+    if deltas:
+        tenants = HealthMetricsService.apply(session.connection(), deltas)
+        session.info.setdefault(_TENANTS_KEY, set()).update(tenants)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_dashboards(session):
+    for tenant_id in session.info.pop(_TENANTS_KEY, ()):
+        dashboard_cache.invalidate_tenant(tenant_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dashboard_tenants(session):
+    session.info.pop(_TENANTS_KEY, None)
+
+
+health_metrics_service = HealthMetricsService()
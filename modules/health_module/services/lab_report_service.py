@@ -0,0 +1,309 @@
+"""
+Lab result PDF reports.
+
+Report data for one or many results is loaded with a fixed number of queries and
+handed, as plain dicts, to reportlab running in a process pool. Rendered PDFs are
+stored on disk keyed by a hash of the report content, so an unchanged result is
+never rendered twice and any edit produces a new version. Older versions of a
+result are pruned lazily, once the current version has existed for
+LAB_REPORT_VERSION_GRACE_SECONDS, so a download that started on an old
+version is not cut off.
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+from sqlalchemy import text
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+
+LAB_REPORT_CACHE_DIR = os.getenv('LAB_REPORT_CACHE_DIR', 'cache/lab_reports')
+LAB_REPORT_VERSION_GRACE_SECONDS = int(os.getenv('LAB_REPORT_VERSION_GRACE_SECONDS', 600))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=int(os.getenv('LAB_REPORT_WORKERS', os.cpu_count() or 2)))
+    return _pool
+
+
+def _text(value) -> str:
+    """User text for a Paragraph: `<0.5` or `&` must not be parsed as markup"""
+    return escape(str(value)) if value is not None else ''
+
+
+def render_lab_report(report: Dict) -> bytes:
+    """Render one lab report to PDF bytes (runs inside pool workers)"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5 * inch, bottomMargin=0.5 * inch,
+                            title=f"Lab Report {report['result']['result_number']}")
+    styles = getSampleStyleSheet()
+    elements = []
+
+    # Tenant branding
+    tenant = report['tenant']
+    if tenant.get('logo') and os.path.isfile(tenant['logo']):
+        elements.append(Image(tenant['logo'], width=1.2 * inch, height=0.6 * inch, kind='proportional'))
+    elements.append(Paragraph(_text(tenant.get('name')), ParagraphStyle('Tenant', parent=styles['Heading1'],
+                                                                       alignment=TA_CENTER)))
+    for line in (tenant.get('tagline'), tenant.get('address')):
+        if line:
+            elements.append(Paragraph(_text(line), ParagraphStyle('Brand', parent=styles['Normal'], alignment=TA_CENTER)))
+    elements.append(Spacer(1, 0.2 * inch))
+    elements.append(Paragraph("Laboratory Report", ParagraphStyle('Title', parent=styles['Heading2'],
+                                                                  alignment=TA_CENTER)))
+
+    order, result = report['order'], report['result']
+    header = Table([
+        ['Patient', order.get('patient_name') or '', 'Report No', result['result_number'] or ''],
+        ['Phone', order.get('patient_phone') or '', 'Report Date', result.get('result_date') or ''],
+        ['Referred By', order.get('doctor_name') or '', 'Order No', order.get('test_order_number') or ''],
+    ], colWidths=[1.1 * inch, 2.4 * inch, 1.1 * inch, 2.4 * inch])
+    header.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    elements.extend([header, Spacer(1, 0.25 * inch)])
+
+    cell = ParagraphStyle('Cell', parent=styles['Normal'], fontSize=9)
+    table_data = [['Parameter', 'Result', 'Unit', 'Reference', 'Verdict']]
+    flagged_rows = []
+    for index, detail in enumerate(report['details'], start=1):
+        table_data.append([
+            Paragraph(_text(detail.get('parameter_name')), cell),
+            Paragraph(_text(detail.get('parameter_value')), cell),
+            detail.get('unit') or '',
+            Paragraph(_text(detail.get('reference_value')), cell),
+            detail.get('verdict') or ''
+        ])
+        if (detail.get('verdict') or '').upper() not in ('', 'NORMAL'):
+            flagged_rows.append(index)
+    table = Table(table_data, colWidths=[2.2 * inch, 1.3 * inch, 0.8 * inch, 1.7 * inch, 1.0 * inch],
+                  repeatRows=1)
+    style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+    ]
+    for row in flagged_rows:
+        style.append(('TEXTCOLOR', (4, row), (4, row), colors.red))
+        style.append(('FONTNAME', (4, row), (4, row), 'Helvetica-Bold'))
+    table.setStyle(TableStyle(style))
+    elements.append(table)
+
+    if result.get('overall_report'):
+        elements.extend([Spacer(1, 0.2 * inch), Paragraph("<b>Impression</b>", styles['Normal']),
+                         Paragraph(_text(result['overall_report']), styles['Normal'])])
+    if result.get('notes'):
+        elements.extend([Spacer(1, 0.1 * inch), Paragraph(f"<b>Notes:</b> {_text(result['notes'])}", styles['Normal'])])
+
+    signature = result.get('performed_by') or ''
+    if result.get('license_number'):
+        signature += f" (Reg. No. {result['license_number']})"
+    elements.extend([Spacer(1, 0.5 * inch), Paragraph(_text(signature), styles['Normal'])])
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+class LabReportService:
+    """Builds, caches and batch-renders lab report PDFs"""
+
+    def __init__(self):
+        self.logger_name = "LabReportService"
+
+    def load_reports(self, tenant_id: int, result_ids: List[int]) -> List[Dict]:
+        """Report data for many results: one query each for results, details and tenant"""
+        if not result_ids:
+            return []
+        with db_manager.get_session() as session:
+            tenant = session.execute(text("""
+                SELECT name, code, logo, tagline, address FROM tenants WHERE id = :tid
+            """), {"tid": tenant_id}).mappings().first()
+            results = session.execute(text("""
+                SELECT r.id, r.result_number, r.result_date, r.overall_report, r.performed_by, r.result_type,
+                       r.notes, r.license_number, o.test_order_number, o.patient_name, o.patient_phone,
+                       o.doctor_name, o.order_date
+                FROM test_results r
+                JOIN test_orders o ON o.id = r.test_order_id
+                WHERE r.tenant_id = :tid AND r.id = ANY(CAST(:ids AS INTEGER[])) AND r.is_deleted = false
+                ORDER BY r.id
+            """), {"tid": tenant_id, "ids": list(result_ids)}).mappings().all()
+            details = session.execute(text("""
+                SELECT test_result_id, parameter_name, parameter_value, unit, reference_value, verdict
+                FROM test_result_details
+                WHERE tenant_id = :tid AND test_result_id = ANY(CAST(:ids AS INTEGER[])) AND is_deleted = false
+                ORDER BY test_result_id, id
+            """), {"tid": tenant_id, "ids": list(result_ids)}).mappings().all()
+
+        details_by_result: Dict[int, List[Dict]] = {}
+        for row in details:
+            detail = dict(row)
+            details_by_result.setdefault(detail.pop('test_result_id'), []).append(detail)
+
+        branding = dict(tenant) if tenant else {}
+        reports = []
+        for row in results:
+            report = {
+                "tenant_id": tenant_id,
+                "tenant": branding,
+                "order": {
+                    "test_order_number": row['test_order_number'],
+                    "patient_name": row['patient_name'],
+                    "patient_phone": row['patient_phone'],
+                    "doctor_name": row['doctor_name'],
+                    "order_date": row['order_date'].strftime('%d-%m-%Y') if row['order_date'] else None
+                },
+                "result": {
+                    "id": row['id'],
+                    "result_number": row['result_number'],
+                    "result_date": row['result_date'].strftime('%d-%m-%Y %H:%M') if row['result_date'] else None,
+                    "overall_report": row['overall_report'],
+                    "performed_by": row['performed_by'],
+                    "result_type": row['result_type'],
+                    "notes": row['notes'],
+                    "license_number": row['license_number']
+                },
+                "details": details_by_result.get(row['id'], [])
+            }
+            report['version'] = hashlib.sha256(json.dumps(report, sort_keys=True, default=str).encode()).hexdigest()[:16]
+            reports.append(report)
+        return reports
+
+    @staticmethod
+    def _cache_prefix(report: Dict) -> str:
+        name = str(report['result']['result_number'] or report['result']['id']).replace('/', '_')
+        return os.path.join(LAB_REPORT_CACHE_DIR, str(report['tenant_id']), name)
+
+    def _cache_path(self, report: Dict) -> str:
+        return f"{self._cache_prefix(report)}-{report['version']}.pdf"
+
+    def _remove_old_versions(self, report: Dict, current_path: str):
+        """Remove superseded versions once the current one is older than the grace period"""
+        try:
+            if time.time() - os.path.getmtime(current_path) < LAB_REPORT_VERSION_GRACE_SECONDS:
+                return
+        except OSError:
+            return
+        # Versions are 16 hex digits, so another result whose number extends this one never matches
+        pattern = f"{glob.escape(self._cache_prefix(report))}-{'[0-9a-f]' * 16}.pdf"
+        for path in glob.glob(pattern):
+            if path != current_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def render_many(self, reports: List[Dict], progress=None) -> List[Optional[str]]:
+        """
+        PDF paths for the reports; only versions not already on disk are rendered (in the pool).
+        A report that fails to render is logged and gets None, the others are still returned.
+        """
+        paths: List[Optional[str]] = [self._cache_path(report) for report in reports]
+        pending = [(index, report) for index, report in enumerate(reports) if not os.path.exists(paths[index])]
+        done = len(reports) - len(pending)
+        if progress:
+            progress(done, len(reports))
+
+        if pending:
+            futures = [(_get_pool().submit(render_lab_report, report), index, report) for index, report in pending]
+            for future, index, report in futures:
+                path = paths[index]
+                try:
+                    content = future.result()
+                except Exception as e:
+                    logger.error(f"Lab report {report['result']['result_number']} could not be rendered: {str(e)}",
+                                 self.logger_name)
+                    paths[index] = None
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # Unique temp name: threads of one process may render the same version at once
+                    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                    with open(temp_path, 'wb') as f:
+                        f.write(content)
+                    os.replace(temp_path, path)
+                done += 1
+                if progress:
+                    progress(done, len(reports))
+
+        for report, path in zip(reports, paths):
+            if path is not None:
+                self._remove_old_versions(report, path)
+        return paths
+
+    def get_report_path(self, tenant_id: int, result_id: int) -> Optional[str]:
+        reports = self.load_reports(tenant_id, [result_id])
+        if not reports:
+            return None
+        path = self.render_many(reports)[0]
+        if path is None:
+            raise RuntimeError(f"Lab report for result {result_id} could not be rendered")
+        return path
+
+    def find_results_for_day(self, tenant_id: int, report_date: date, branch_id: Optional[int] = None) -> List[int]:
+        """Results dated on a day, optionally limited to samples collected at one collection center (branch)"""
+        query = """
+            SELECT r.id FROM test_results r
+            WHERE r.tenant_id = :tid AND r.is_deleted = false
+              AND r.result_date >= :day_start AND r.result_date < :day_end
+        """
+        params = {"tid": tenant_id, "day_start": report_date, "day_end": report_date + timedelta(days=1)}
+        if branch_id:
+            query += """
+              AND EXISTS (SELECT 1 FROM sample_collections c
+                          WHERE c.test_order_id = r.test_order_id AND c.branch_id = :branch_id)
+            """
+            params["branch_id"] = branch_id
+        query += " ORDER BY r.id"
+        with db_manager.get_session() as session:
+            return [row[0] for row in session.execute(text(query), params).fetchall()]
+
+
+def run_lab_report_batch_job(context, tenant_id: int, report_date: str, branch_id: Optional[int] = None):
+    """JobService entry point: render a day's reports and bundle them in a ZIP"""
+    service = LabReportService()
+    day = datetime.strptime(report_date, '%Y-%m-%d').date()
+    result_ids = service.find_results_for_day(tenant_id, day, branch_id)
+    reports = service.load_reports(tenant_id, result_ids)
+    rendered = service.render_many(reports, progress=lambda done, total: context.update_progress(done, total))
+    paths = [path for path in rendered if path is not None]
+    failed = [report['result']['result_number'] for report, path in zip(reports, rendered) if path is None]
+
+    suffix = f"_branch{branch_id}" if branch_id else ''
+    zip_path = context.output_path(f"lab_reports_{day.strftime('%Y%m%d')}{suffix}.zip")
+    # PDFs are already compressed; storing avoids spending CPU on a second pass
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for path in paths:
+            archive.write(path, arcname=os.path.basename(path))
+
+    context.update_progress(len(rendered), len(rendered), force=True)
+    logger.info(f"Rendered {len(paths)} lab reports for tenant {tenant_id} on {report_date}"
+                f"{f', {len(failed)} failed' if failed else ''}", "LabReportService")
+    return zip_path, "application/zip", {"reports": len(paths), "failed": failed, "date": report_date,
+                                         "branch_id": branch_id}
+
+
+lab_report_service = LabReportService()
@@ -0,0 +1,299 @@
+"""
+Lab worklist: per-department queues of pending samples and tests.
+
+lab_worklist holds one row per pending test order item. A flush that touches a
+test order, its items, its sample collections or its results recomputes that
+order's rows in the same transaction and sends a 'lab_worklist' NOTIFY, which
+Postgres delivers only if the transaction commits. A listener thread in each
+API process turns notifications into row deltas and publishes them on the
+event broker, where the SSE streams pick them up.
+
+With LAB_WORKLIST_PUSH=local the NOTIFY is skipped and deltas are published
+from the committing process only (single-worker deployments).
+"""
+import json
+import os
+import queue
+import select
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.event_broker import event_broker
+from core.shared.utils.logger import logger
+from modules.health_module.models.diagnostic_entities import TestResult
+from modules.health_module.models.sample_collection_entity import SampleCollection, SampleCollectionItem
+from modules.health_module.models.test_order_entity import TestOrder, TestOrderItem
+
+WORKLIST_CHANNEL = 'lab_worklist'
+WORKLIST_TOPIC = 'lab_worklist'
+STAGES = ('COLLECTION', 'PROCESSING')
+PUSH_MODE = os.getenv('LAB_WORKLIST_PUSH', 'postgres')
+# Order ids per NOTIFY; keeps payloads well under Postgres' 8000 byte limit
+_NOTIFY_CHUNK = 500
+
+_ORDERS_KEY = 'lab_worklist_orders'
+
+_COLUMNS = """
+    test_order_item_id, test_order_id, test_order_number, patient_name, test_name, department_id,
+    department_name, urgency, urgency_rank, stage, sample_collection_id, collection_number, sample_status,
+    ordered_at, collected_at, updated_at
+"""
+
+
+def _row(mapping) -> Dict:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in mapping.items()}
+
+
+def _previous(state, name: str):
+    deleted = state.attrs[name].history.deleted
+    return deleted[0] if deleted else None
+
+
+class LabWorklistService:
+    """Maintains and serves the lab worklist queues"""
+
+    def __init__(self):
+        self.logger_name = "LabWorklistService"
+
+    @staticmethod
+    def refresh(connection, tenant_orders: Dict[int, Set[int]]):
+        """Recompute the worklist rows of these orders and announce the change"""
+        order_ids = sorted(set().union(*tenant_orders.values()))
+        if not order_ids:
+            return
+        connection.execute(text("SELECT lab_worklist_refresh(CAST(:ids AS INTEGER[]))"), {"ids": order_ids})
+        if PUSH_MODE != 'postgres':
+            return
+        for tenant_id, ids in tenant_orders.items():
+            ids = sorted(ids)
+            for start in range(0, len(ids), _NOTIFY_CHUNK):
+                connection.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                    "channel": WORKLIST_CHANNEL,
+                    "payload": json.dumps({"tenant_id": tenant_id, "order_ids": ids[start:start + _NOTIFY_CHUNK]})
+                })
+
+    def get_queue(self, tenant_id: int, stage: Optional[str] = None, department_id: Optional[int] = None,
+                  urgency: Optional[str] = None, after: Optional[str] = None, limit: int = 50) -> Dict:
+        """
+        One page of a queue, most urgent and oldest first. `after` is the
+        next_cursor of the previous page (keyset paging, no OFFSET or COUNT).
+        """
+        query = f"SELECT {_COLUMNS} FROM lab_worklist WHERE tenant_id = :tid"
+        params = {"tid": tenant_id, "limit": limit + 1}
+        if stage:
+            if stage not in STAGES:
+                raise ValueError(f"stage must be one of {', '.join(STAGES)}")
+            query += " AND stage = :stage"
+            params["stage"] = stage
+        if department_id:
+            query += " AND department_id = :department_id"
+            params["department_id"] = department_id
+        if urgency:
+            query += " AND urgency = :urgency"
+            params["urgency"] = urgency
+        if after:
+            try:
+                rank, ordered_at, item_id = after.split('|')
+                params.update(rank=int(rank), ordered_at=datetime.fromisoformat(ordered_at), item_id=int(item_id))
+            except ValueError:
+                raise ValueError("Invalid cursor")
+            query += " AND (urgency_rank, ordered_at, test_order_item_id) > (:rank, :ordered_at, :item_id)"
+        query += " ORDER BY urgency_rank, ordered_at, test_order_item_id LIMIT :limit"
+
+        with db_manager.get_session() as session:
+            rows = session.execute(text(query), params).mappings().all()
+        items = [_row(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = f"{last['urgency_rank']}|{last['ordered_at'].isoformat()}|{last['test_order_item_id']}"
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def get_summary(tenant_id: int) -> List[Dict]:
+        """Queue sizes and oldest pending item per department, stage and urgency"""
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT department_id, MAX(department_name) AS department_name, stage, urgency,
+                       COUNT(*) AS pending, MIN(ordered_at) AS oldest_ordered_at
+                FROM lab_worklist
+                WHERE tenant_id = :tid
+                GROUP BY department_id, stage, urgency
+                ORDER BY department_name NULLS LAST, stage, MIN(urgency_rank)
+            """), {"tid": tenant_id}).mappings().all()
+        return [_row(row) for row in rows]
+
+    @staticmethod
+    def get_order_rows(tenant_id: int, order_ids: Iterable[int]) -> List[Dict]:
+        with db_manager.get_session() as session:
+            rows = session.execute(text(f"""
+                SELECT {_COLUMNS} FROM lab_worklist
+                WHERE tenant_id = :tid AND test_order_id = ANY(CAST(:ids AS INTEGER[]))
+                ORDER BY urgency_rank, ordered_at, test_order_item_id
+            """), {"tid": tenant_id, "ids": list(order_ids)}).mappings().all()
+        return [_row(row) for row in rows]
+
+
+class LabWorklistListener:
+    """Background thread turning worklist change notifications into broker events"""
+
+    def __init__(self):
+        self._local: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._connection = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        target = self._listen if PUSH_MODE == 'postgres' else self._consume_local
+        self._thread = threading.Thread(target=target, name="lab-worklist-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def notify_local(self, tenant_orders: Dict[int, Set[int]]):
+        self._local.put(tenant_orders)
+
+    def _listen(self):
+        connected_before = False
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                raw = db_manager._engine.raw_connection()
+                # The listening connection lives for the whole process; keep it out of the pool
+                raw.detach()
+                self._connection = raw.driver_connection
+                self._connection.autocommit = True
+                self._connection.cursor().execute(f"LISTEN {WORKLIST_CHANNEL}")
+                if connected_before:
+                    # Notifications sent while disconnected are lost; clients must refetch
+                    event_broker.publish(WORKLIST_TOPIC, {"type": "resync", "tenant_id": None})
+                connected_before, backoff = True, 1
+                logger.info("Listening for lab worklist changes", "LabWorklistListener")
+
+                while not self._stop.is_set():
+                    changes: Dict[int, Set[int]] = {}
+                    for payload in self._wait_for_notifies(5):
+                        payload = json.loads(payload)
+                        changes.setdefault(payload["tenant_id"], set()).update(payload["order_ids"])
+                    self._deliver(changes)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.error(f"Lab worklist listener error, reconnecting in {backoff}s: {str(e)}",
+                                 "LabWorklistListener")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, 60)
+            finally:
+                if self._connection is not None:
+                    try:
+                        self._connection.close()
+                    except Exception:
+                        pass
+                    self._connection = None
+
+    def _wait_for_notifies(self, timeout: float) -> List[str]:
+        """Payloads received within `timeout` seconds, from either psycopg 3 or psycopg2"""
+        if callable(self._connection.notifies):
+            # psycopg 3: notifies() is a generator; stop_after returns once a burst arrived
+            return [notify.payload for notify in self._connection.notifies(timeout=timeout, stop_after=1)]
+        if select.select([self._connection], [], [], timeout) == ([], [], []):
+            return []
+        self._connection.poll()
+        payloads = []
+        while self._connection.notifies:
+            payloads.append(self._connection.notifies.pop(0).payload)
+        return payloads
+
+    def _consume_local(self):
+        while not self._stop.is_set():
+            try:
+                changes = self._local.get(timeout=1)
+            except queue.Empty:
+                continue
+            # Coalesce bursts into one query per tenant
+            while True:
+                try:
+                    for tenant_id, order_ids in self._local.get_nowait().items():
+                        changes.setdefault(tenant_id, set()).update(order_ids)
+                except queue.Empty:
+                    break
+            self._deliver(changes)
+
+    @staticmethod
+    def _deliver(changes: Dict[int, Set[int]]):
+        if not changes or not event_broker.has_subscribers(WORKLIST_TOPIC):
+            return
+        for tenant_id, order_ids in changes.items():
+            try:
+                rows = LabWorklistService.get_order_rows(tenant_id, order_ids)
+            except Exception as e:
+                logger.error(f"Loading lab worklist delta failed: {str(e)}", "LabWorklistListener")
+                event_broker.publish(WORKLIST_TOPIC, {"type": "resync", "tenant_id": tenant_id})
+                continue
+            event_broker.publish(WORKLIST_TOPIC, {
+                "type": "delta",
+                "tenant_id": tenant_id,
+                "order_ids": sorted(order_ids),
+                "rows": rows
+            })
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_flushed_orders(session, flush_context):
+    orders: Set[tuple] = set()
+    collections: Set[tuple] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TestOrder):
+            orders.add((obj.tenant_id, obj.id))
+        elif isinstance(obj, (TestOrderItem, SampleCollection, TestResult)):
+            orders.add((obj.tenant_id, obj.test_order_id))
+            previous = _previous(inspect(obj), 'test_order_id')
+            if previous:
+                orders.add((obj.tenant_id, previous))
+        elif isinstance(obj, SampleCollectionItem):
+            collections.add((obj.tenant_id, obj.collection_id))
+    if not orders and not collections:
+        return
+
+    connection = session.connection()
+    if collections:
+        rows = connection.execute(text("""
+            SELECT tenant_id, test_order_id FROM sample_collections WHERE id = ANY(CAST(:ids AS INTEGER[]))
+        """), {"ids": sorted({collection_id for _, collection_id in collections})}).fetchall()
+        orders.update((row[0], row[1]) for row in rows)
+
+    tenant_orders: Dict[int, Set[int]] = {}
+    for tenant_id, order_id in orders:
+        if order_id:
+            tenant_orders.setdefault(tenant_id, set()).add(order_id)
+    LabWorklistService.refresh(connection, tenant_orders)
+    if PUSH_MODE != 'postgres':
+        pending = session.info.setdefault(_ORDERS_KEY, {})
+        for tenant_id, order_ids in tenant_orders.items():
+            pending.setdefault(tenant_id, set()).update(order_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_orders(session):
+    tenant_orders = session.info.pop(_ORDERS_KEY, None)
+    if tenant_orders:
+        lab_worklist_listener.notify_local(tenant_orders)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_uncommitted_orders(session):
+    session.info.pop(_ORDERS_KEY, None)
+
+
+lab_worklist_service = LabWorklistService()
+lab_worklist_listener = LabWorklistListener()
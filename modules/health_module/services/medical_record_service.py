@@ -4,6 +4,7 @@ from modules.health_module.services.patient_service import PatientService
 from modules.health_module.services.doctor_service import DoctorService
 from modules.health_module.services.appointment_service import AppointmentService
 from core.shared.utils.logger import logger
+import modules.health_module.services.health_metrics_service  # noqa: F401  registers the dashboard counters
 from datetime import datetime
 import csv
 import io
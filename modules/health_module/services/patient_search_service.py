@@ -0,0 +1,245 @@
+"""
+Patient master index.
+
+Ranked search runs in Postgres on generated, indexed columns: exact or prefix
+match on the normalized phone, prefix match on the patient number, and
+trigram similarity plus full-text prefix match on the name. Typeahead is
+served from an in-memory per-tenant prefix index that is loaded on first use
+and updated as patients are created or edited in this process; other workers
+converge within PATIENT_TYPEAHEAD_TTL seconds.
+
+The prefix index is a sorted array searched with bisect rather than a node
+trie: the same prefix walk, but a few tuples per patient instead of a dict
+per character, which keeps large tenants within a sensible memory budget.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.logger import logger
+from modules.health_module.models.clinic_entities import Patient
+
+TYPEAHEAD_TTL = int(os.getenv('PATIENT_TYPEAHEAD_TTL', 600))
+TYPEAHEAD_MAX_TENANTS = int(os.getenv('PATIENT_TYPEAHEAD_MAX_TENANTS', 20))
+MIN_PHONE_DIGITS = 4
+
+_CHANGED_KEY = 'patient_index_changes'
+_SEPARATORS = re.compile(r"\s+")
+_PHONE_PUNCTUATION = re.compile(r"[\s+().-]")
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """Digits only, last 10 - matches the patients.phone_normalized column"""
+    return re.sub(r"[^0-9]", "", value or "")[-10:]
+
+
+def looks_like_phone(value: Optional[str], min_digits: int = MIN_PHONE_DIGITS) -> bool:
+    """Only digits once phone punctuation is dropped, e.g. `+91 98765-43210` but not `PAT-0001`"""
+    stripped = _PHONE_PUNCTUATION.sub("", value or "")
+    return len(stripped) >= min_digits and stripped.isdigit()
+
+
+def normalize_name(value: Optional[str]) -> str:
+    return _SEPARATORS.sub(" ", (value or "").strip().lower())
+
+
+class PrefixIndex:
+    """Sorted (key, patient_id) pairs of one tenant with bisect-based prefix lookup"""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, int]] = []
+        self.patients: Dict[int, tuple] = {}
+        self.loaded_at = time.monotonic()
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _keys(first_name: str, last_name: str, phone: str, patient_number: str) -> List[str]:
+        first, last = normalize_name(first_name), normalize_name(last_name)
+        keys = {f"{first} {last}".strip(), f"{last} {first}".strip(), normalize_phone(phone),
+                (patient_number or "").lower()}
+        return [key for key in keys if key]
+
+    def put(self, patient_id: int, patient_number: str, first_name: str, last_name: str, phone: str):
+        with self.lock:
+            self.remove(patient_id)
+            keys = self._keys(first_name, last_name, phone, patient_number)
+            for key in keys:
+                insort(self.entries, (key, patient_id))
+            self.patients[patient_id] = (keys, patient_number, first_name, last_name, phone)
+
+    def remove(self, patient_id: int):
+        with self.lock:
+            previous = self.patients.pop(patient_id, None)
+            if not previous:
+                return
+            for key in previous[0]:
+                position = bisect_left(self.entries, (key, patient_id))
+                if position < len(self.entries) and self.entries[position] == (key, patient_id):
+                    del self.entries[position]
+
+    def lookup(self, prefix: str, limit: int) -> List[Dict]:
+        results, seen = [], set()
+        with self.lock:
+            position = bisect_left(self.entries, (prefix, -1))
+            while position < len(self.entries) and len(results) < limit:
+                key, patient_id = self.entries[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if patient_id in seen:
+                    continue
+                seen.add(patient_id)
+                _, patient_number, first_name, last_name, phone = self.patients[patient_id]
+                results.append({"id": patient_id, "patient_number": patient_number, "first_name": first_name,
+                                "last_name": last_name, "phone": phone})
+        return results
+
+
+class PatientSearchService:
+    def __init__(self):
+        self.logger_name = "PatientSearchService"
+        self._indexes: "OrderedDict[int, PrefixIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[int, threading.Lock] = {}
+
+    def search(self, tenant_id: int, term: str, limit: int = 20) -> List[Dict]:
+        """Ranked patient matches for free text, a phone number or a patient number"""
+        term = (term or "").strip()
+        if not term:
+            return []
+        params = {"tid": tenant_id, "limit": limit}
+        if looks_like_phone(term):
+            # A country code is dropped with the rest beyond the last 10 digits
+            digits = normalize_phone(term)
+            # Phone: exact on the full number, otherwise prefix - both on the btree index
+            params["phone"] = digits if len(digits) == 10 else f"{digits}%"
+            where = "phone_normalized LIKE :phone"
+            score, match = "CASE WHEN phone_normalized = :digits THEN 1.0 ELSE 0.9 END", "phone"
+            params["digits"] = digits
+        else:
+            name = normalize_name(term)
+            tokens = [token for token in (re.sub(r"[^\w]", "", part) for part in name.split(" ")) if token]
+            if not tokens:
+                # Punctuation only: nothing to match, and an empty tsquery is a syntax error
+                return []
+            params.update(name=name, number=f"{term.upper()}%",
+                          query=" & ".join(f"{token}:*" for token in tokens))
+            where = ("(search_name % :name OR search_vector @@ to_tsquery('simple', :query) "
+                     "OR patient_number LIKE :number)")
+            score = ("CASE WHEN patient_number LIKE :number THEN 1.0 ELSE GREATEST(similarity(search_name, :name), "
+                     "word_similarity(:name, search_name), "
+                     "CASE WHEN search_vector @@ to_tsquery('simple', :query) THEN 0.6 ELSE 0 END) END")
+            match = "name"
+
+        with db_manager.get_session() as session:
+            rows = session.execute(text(f"""
+                SELECT id, patient_number, first_name, last_name, phone, date_of_birth, gender, {score} AS score
+                FROM patients
+                WHERE tenant_id = :tid AND is_active = TRUE AND {where}
+                ORDER BY score DESC, id DESC
+                LIMIT :limit
+            """), params).mappings().all()
+        return [{
+            "id": row["id"],
+            "patient_number": row["patient_number"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "phone": row["phone"],
+            "date_of_birth": row["date_of_birth"].isoformat() if row["date_of_birth"] else None,
+            "gender": row["gender"],
+            "score": round(float(row["score"]), 3),
+            "match": match
+        } for row in rows]
+
+    def typeahead(self, tenant_id: int, prefix: str, limit: int = 10) -> List[Dict]:
+        """Patients whose name (either order), phone or patient number starts with prefix"""
+        key = normalize_phone(prefix) if looks_like_phone(prefix, 1) else normalize_name(prefix)
+        if not key:
+            return []
+        return self._index(tenant_id).lookup(key, limit)
+
+    def _index(self, tenant_id: int) -> PrefixIndex:
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is not None and time.monotonic() - index.loaded_at < TYPEAHEAD_TTL:
+                self._indexes.move_to_end(tenant_id)
+                return index
+            loading = self._loading.setdefault(tenant_id, threading.Lock())
+        # One loader per tenant; concurrent requests wait for it instead of loading again
+        with loading:
+            with self._lock:
+                current = self._indexes.get(tenant_id)
+                if current is not None and current is not index:
+                    return current
+            fresh = self._load(tenant_id)
+            with self._lock:
+                self._indexes[tenant_id] = fresh
+                self._indexes.move_to_end(tenant_id)
+                while len(self._indexes) > TYPEAHEAD_MAX_TENANTS:
+                    self._indexes.popitem(last=False)
+            return fresh
+
+    def _load(self, tenant_id: int) -> PrefixIndex:
+        started = time.monotonic()
+        index = PrefixIndex()
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT id, patient_number, first_name, last_name, phone
+                FROM patients WHERE tenant_id = :tid AND is_active = TRUE
+            """), {"tid": tenant_id}).fetchall()
+        entries = []
+        for patient_id, patient_number, first_name, last_name, phone in rows:
+            keys = PrefixIndex._keys(first_name, last_name, phone, patient_number)
+            entries.extend((key, patient_id) for key in keys)
+            index.patients[patient_id] = (keys, patient_number, first_name, last_name, phone)
+        entries.sort()
+        index.entries = entries
+        logger.info(f"Patient typeahead index for tenant {tenant_id}: {len(rows)} patients in "
+                    f"{(time.monotonic() - started) * 1000:.0f}ms", self.logger_name)
+        return index
+
+    def apply_changes(self, changes: List[tuple]):
+        """Update loaded indexes with committed patient rows"""
+        for tenant_id, patient_id, values in changes:
+            with self._lock:
+                index = self._indexes.get(tenant_id)
+            if index is None:
+                continue
+            if values is None:
+                index.remove(patient_id)
+            else:
+                index.put(patient_id, *values)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_patient_changes(session, flush_context):
+    changes = session.info.setdefault(_CHANGED_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Patient):
+            active = obj.is_active is not False
+            changes.append((obj.tenant_id, obj.id, (obj.patient_number, obj.first_name, obj.last_name, obj.phone)
+                            if active else None))
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            changes.append((obj.tenant_id, obj.id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_patient_changes(session):
+    changes = session.info.pop(_CHANGED_KEY, None)
+    if changes:
+        patient_search_service.apply_changes(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_patient_changes(session):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+patient_search_service = PatientSearchService()
@@ -1,6 +1,8 @@
 from core.database.connection import db_manager
 from modules.health_module.models.clinic_entities import Patient
 from core.shared.utils.logger import logger
+import modules.health_module.services.health_metrics_service  # noqa: F401  registers the dashboard counters
+import modules.health_module.services.patient_search_service  # noqa: F401  keeps the typeahead index current
 from datetime import datetime
 
 class PatientService:
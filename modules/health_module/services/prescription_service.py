@@ -4,6 +4,7 @@ from modules.health_module.models.clinic_entities import Patient, Prescription,
 from modules.health_module.services.appointment_service import AppointmentService
 from modules.inventory_module.services.inventory_service import InventoryService
 from core.shared.utils.logger import logger
+import modules.health_module.services.health_metrics_service  # noqa: F401  registers the dashboard counters
 from datetime import datetime
 from sqlalchemy.orm import joinedload, selectinload
 
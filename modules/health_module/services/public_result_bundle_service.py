@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+from typing import Optional, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.barcode_utils import BarcodeGenerator
+from core.shared.utils.cache_utils import TTLCache
+from core.shared.utils.crypto_utils import crypto_utils
+from core.shared.utils.logger import logger
+from modules.admin_module.models.entities import Tenant
+from modules.health_module.models.diagnostic_entities import (
+    TestResult, TestResultDetail, TestResultFile, TestResultPublicBundle
+)
+from modules.health_module.models.test_order_entity import TestOrder
+
+PUBLIC_MESSAGE = "Your test results are ready for viewing"
+
+# result_number -> (response body bytes, etag). Entries are dropped as soon as a
+# result change commits in this process; other workers pick it up within the TTL.
+_bundle_cache = TTLCache(max_entries=5000, ttl_seconds=int(os.getenv('PUBLIC_RESULT_CACHE_TTL', 60)))
+# encrypted link token -> result_number, so repeat hits skip the Fernet decrypt
+_token_cache = TTLCache(max_entries=20000, ttl_seconds=3600)
+
+
+class PublicResultBundleService:
+    """Renders the public test result view once per change and serves it from cache"""
+
+    def __init__(self):
+        self.logger_name = "PublicResultBundleService"
+
+    @staticmethod
+    def resolve_token(encrypted_result_no: str) -> Optional[str]:
+        result_number = _token_cache.get(encrypted_result_no)
+        if result_number is None:
+            result_number = crypto_utils.decrypt(encrypted_result_no)
+            if result_number:
+                _token_cache.set(encrypted_result_no, result_number)
+        return result_number
+
+    def get(self, result_number: str) -> Optional[Tuple[bytes, str]]:
+        """Response body and ETag of the public view; renders it if it was never stored"""
+        cached = _bundle_cache.get(result_number)
+        if cached:
+            return cached
+
+        with db_manager.get_session() as session:
+            bundle = session.query(TestResultPublicBundle.payload, TestResultPublicBundle.etag).filter(
+                TestResultPublicBundle.result_number == result_number
+            ).first()
+            if bundle:
+                payload, etag = bundle
+            else:
+                result_id = session.query(TestResult.id).filter(
+                    TestResult.result_number == result_number,
+                    TestResult.is_deleted == False
+                ).scalar()
+                if not result_id:
+                    return None
+                payload, etag = self.render(session, result_id)
+
+        entry = (self._body(payload), etag)
+        _bundle_cache.set(result_number, entry)
+        return entry
+
+    def render(self, session, result_id: int) -> Tuple[dict, str]:
+        """Build and store the public payload of a result inside the caller's transaction"""
+        session.flush()
+        result = session.query(TestResult).filter(TestResult.id == result_id).first()
+        test_order = session.query(TestOrder).filter(TestOrder.id == result.test_order_id).first()
+        tenant = session.query(Tenant).filter(Tenant.id == result.tenant_id).first()
+        details = session.query(TestResultDetail).filter(
+            TestResultDetail.test_result_id == result_id,
+            TestResultDetail.is_deleted == False
+        ).all()
+        files = session.query(TestResultFile).filter(
+            TestResultFile.test_result_id == result_id,
+            TestResultFile.is_deleted == False
+        ).all()
+
+        qr_code = None
+        try:
+            qr_code = BarcodeGenerator.generate_qr_code(crypto_utils.generate_test_result_url(result.result_number))
+        except Exception as qr_error:
+            logger.error(f"QR code generation failed: {str(qr_error)}", self.logger_name)
+
+        payload = {
+            "header": "Test Results Available",
+            "tenant": {
+                "name": tenant.name,
+                "code": tenant.code,
+                "logo": tenant.logo,
+                "tagline": tenant.tagline,
+                "address": tenant.address
+            } if tenant else None,
+            "test_order": {
+                "id": test_order.id,
+                "test_order_number": test_order.test_order_number,
+                "order_date": test_order.order_date.isoformat() if test_order.order_date else None,
+                "patient_name": test_order.patient_name,
+                "patient_phone": test_order.patient_phone,
+                "doctor_name": test_order.doctor_name,
+                "doctor_phone": test_order.doctor_phone,
+                "doctor_license_number": test_order.doctor_license_number,
+                "urgency": test_order.urgency,
+                "status": test_order.status
+            } if test_order else None,
+            "result": {
+                "id": result.id,
+                "result_number": result.result_number,
+                "result_date": result.result_date.isoformat() if result.result_date else None,
+                "overall_report": result.overall_report,
+                "performed_by": result.performed_by,
+                "result_type": result.result_type,
+                "notes": result.notes,
+                "license_number": result.license_number,
+                "qr_code": qr_code,
+                "details": [{
+                    "parameter_name": detail.parameter_name,
+                    "unit": detail.unit,
+                    "parameter_value": detail.parameter_value,
+                    "reference_value": detail.reference_value,
+                    "verdict": detail.verdict,
+                    "notes": detail.notes
+                } for detail in details],
+                "files": [{
+                    "file_name": file.file_name,
+                    "file_path": file.file_path,
+                    "file_format": file.file_format,
+                    "file_size": file.file_size,
+                    "description": file.description
+                } for file in files]
+            },
+            "action": "View Results"
+        }
+        etag = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+        # A renumbered result must not stay reachable under its old number
+        stale = session.execute(text("""
+            DELETE FROM test_result_public_bundles
+            WHERE test_result_id = :result_id AND result_number <> :result_number
+            RETURNING result_number
+        """), {"result_id": result.id, "result_number": result.result_number}).scalars().all()
+        session.info.setdefault('public_result_numbers', set()).update(stale)
+
+        session.execute(text("""
+            INSERT INTO test_result_public_bundles (result_number, tenant_id, test_result_id, payload, etag, rendered_at)
+            VALUES (:result_number, :tenant_id, :result_id, CAST(:payload AS JSONB), :etag, now())
+            ON CONFLICT (result_number) DO UPDATE
+            SET payload = EXCLUDED.payload, etag = EXCLUDED.etag, rendered_at = EXCLUDED.rendered_at
+        """), {"result_number": result.result_number, "tenant_id": result.tenant_id, "result_id": result.id,
+               "payload": json.dumps(payload, default=str), "etag": etag})
+        session.info['public_result_numbers'].add(result.result_number)
+        return payload, etag
+
+    @staticmethod
+    def remove(session, result_id: int):
+        """Drop the public view of a deleted result"""
+        numbers = session.execute(text("""
+            DELETE FROM test_result_public_bundles WHERE test_result_id = :result_id RETURNING result_number
+        """), {"result_id": result_id}).scalars().all()
+        session.info.setdefault('public_result_numbers', set()).update(numbers)
+
+    @staticmethod
+    def _body(payload: dict) -> bytes:
+        return json.dumps({"success": True, "message": PUBLIC_MESSAGE, "data": payload}, default=str).encode()
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_public_results(session):
+    for result_number in session.info.pop('public_result_numbers', ()):
+        _bundle_cache.delete(result_number)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_public_results(session):
+    session.info.pop('public_result_numbers', None)
+
+
+public_result_bundle_service = PublicResultBundleService()
@@ -1,6 +1,8 @@
 from core.database.connection import db_manager
 from modules.health_module.models.sample_collection_entity import SampleCollection, SampleCollectionItem
 from core.shared.utils.logger import logger
+import modules.health_module.services.lab_worklist_service  # noqa: F401  registers the worklist refresh
+import modules.health_module.services.health_metrics_service  # noqa: F401  registers the dashboard counters
 from datetime import datetime
 from fastapi import HTTPException
 from sqlalchemy import or_
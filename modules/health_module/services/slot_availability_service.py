@@ -0,0 +1,262 @@
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from heapq import merge
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from core.database.connection import db_manager
+from core.shared.utils.cache_utils import TTLCache
+from modules.health_module.models.clinic_entities import Appointment
+
+DEFAULT_SLOT_MINUTES = 15
+MAX_SEARCH_DAYS = 62
+# Statuses that hold a doctor's time; cancelled / no-show appointments free the slot
+BLOCKING_STATUSES = ('SCHEDULED', 'CONFIRMED', 'COMPLETED')
+WEEKDAY_CODES = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN')
+OVERLAP_CONSTRAINT = 'appointments_no_doctor_overlap'
+
+# (tenant_id, doctor_id, date) -> sorted [(start_minute, end_minute)] of booked intervals.
+# Per process: a commit evicts the affected days only in the committing worker, so
+# other workers serve their entries for up to the 60s TTL - offering a slot that was
+# just booked elsewhere, or hiding one that was freed. Bookings re-check under the
+# doctor row lock and the exclusion constraint, so a stale entry never double-books.
+_booked_cache = TTLCache(max_entries=20000, ttl_seconds=60)
+
+
+def _minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class SlotAvailabilityService:
+    """
+    Server-side doctor availability: keeps a per-doctor, per-day index of booked
+    intervals and walks the doctors' schedules to find free slots, and guards
+    bookings against overlaps with a doctor row lock plus an exclusion constraint.
+    """
+
+    def __init__(self):
+        self.logger_name = "SlotAvailabilityService"
+
+    def find_free_slots(self, tenant_id: int, from_date: date, to_date: Optional[date] = None,
+                        doctor_id: Optional[int] = None, specialization: Optional[str] = None,
+                        count: int = 10, slot_minutes: Optional[int] = None,
+                        not_before: Optional[datetime] = None) -> List[Dict]:
+        """Earliest `count` free slots across the matching doctors, ordered by date and time"""
+        if not doctor_id and not specialization:
+            raise ValueError("doctor_id or specialization is required")
+        to_date = to_date or from_date + timedelta(days=13)
+        if to_date < from_date:
+            raise ValueError("to_date must not be before from_date")
+        if (to_date - from_date).days >= MAX_SEARCH_DAYS:
+            raise ValueError(f"Search range cannot exceed {MAX_SEARCH_DAYS} days")
+        not_before = not_before or datetime.now()
+
+        doctors = self._load_doctors(tenant_id, doctor_id, specialization)
+        if not doctors:
+            return []
+        booked = self._booked_intervals(tenant_id, [d['id'] for d in doctors], from_date, to_date)
+
+        slots: List[Dict] = []
+        day = from_date
+        while day <= to_date and len(slots) < count:
+            weekday = WEEKDAY_CODES[day.weekday()]
+            floor = _minutes(not_before.time()) if day == not_before.date() else 0
+            if day >= not_before.date():
+                streams = [
+                    self._doctor_day_slots(doctor, booked[(tenant_id, doctor['id'], day)], floor, slot_minutes)
+                    for doctor in doctors
+                    if not doctor['working_days'] or weekday in doctor['working_days']
+                ]
+                for start, _, step, doctor in merge(*streams):
+                    slots.append({
+                        "doctor_id": doctor['id'],
+                        "doctor_name": doctor['name'],
+                        "specialization": doctor['specialization'],
+                        "date": day.isoformat(),
+                        "start_time": _clock(start),
+                        "end_time": _clock(start + step),
+                        "duration_minutes": step
+                    })
+                    if len(slots) >= count:
+                        break
+            day += timedelta(days=1)
+        return slots
+
+    @staticmethod
+    def _doctor_day_slots(doctor: Dict, intervals: List[Tuple[int, int]], floor: int,
+                          slot_minutes: Optional[int]) -> Iterator[tuple]:
+        """Free grid slots of one doctor on one day; intervals are sorted by start"""
+        step = slot_minutes or doctor['slot_minutes']
+        ends = [end for _, end in intervals]
+        start = doctor['day_start']
+        while start + step <= doctor['day_end']:
+            if start >= floor:
+                # First booked interval that ends after this slot starts
+                index = bisect_right(ends, start)
+                if index >= len(intervals) or intervals[index][0] >= start + step:
+                    yield start, doctor['id'], step, doctor
+            start += step
+
+    @staticmethod
+    def _load_doctors(tenant_id: int, doctor_id: Optional[int], specialization: Optional[str]) -> List[Dict]:
+        query = """
+            SELECT id, first_name || ' ' || last_name, specialization, schedule_start, schedule_end,
+                   working_days, consultation_duration
+            FROM doctors
+            WHERE tenant_id = :tid AND is_active = true AND is_deleted = false
+              AND schedule_start IS NOT NULL AND schedule_end IS NOT NULL
+        """
+        params = {"tid": tenant_id}
+        if doctor_id:
+            query += " AND id = :doctor_id"
+            params["doctor_id"] = doctor_id
+        if specialization:
+            query += " AND specialization ILIKE :specialization"
+            params["specialization"] = specialization
+        query += " ORDER BY id"
+        with db_manager.get_session() as session:
+            rows = session.execute(text(query), params).fetchall()
+        return [{
+            "id": r[0], "name": r[1], "specialization": r[2],
+            "day_start": _minutes(r[3]), "day_end": _minutes(r[4]),
+            "working_days": {d.upper()[:3] for d in r[5]} if r[5] else None,
+            "slot_minutes": r[6] or DEFAULT_SLOT_MINUTES
+        } for r in rows]
+
+    @staticmethod
+    def _booked_intervals(tenant_id: int, doctor_ids: List[int], from_date: date,
+                          to_date: date) -> Dict[tuple, List[Tuple[int, int]]]:
+        """Interval index for every (doctor, day) in range; cache misses are loaded in one query"""
+        days = [from_date + timedelta(days=n) for n in range((to_date - from_date).days + 1)]
+        index, missing = {}, set()
+        for doctor_id in doctor_ids:
+            for day in days:
+                key = (tenant_id, doctor_id, day)
+                cached = _booked_cache.get(key)
+                if cached is None:
+                    missing.add(doctor_id)
+                    index[key] = []
+                else:
+                    index[key] = cached
+        if not missing:
+            return index
+
+        with db_manager.get_session() as session:
+            rows = session.execute(text("""
+                SELECT doctor_id, appointment_date, appointment_time, COALESCE(duration_minutes, :default_minutes)
+                FROM appointments
+                WHERE tenant_id = :tid AND doctor_id = ANY(CAST(:doctor_ids AS INTEGER[]))
+                  AND appointment_date BETWEEN :from_date AND :to_date
+                  AND is_deleted = false AND status = ANY(CAST(:statuses AS TEXT[]))
+                ORDER BY doctor_id, appointment_date, appointment_time
+            """), {"tid": tenant_id, "doctor_ids": sorted(missing), "from_date": from_date,
+                   "to_date": to_date, "statuses": list(BLOCKING_STATUSES),
+                   "default_minutes": DEFAULT_SLOT_MINUTES}).fetchall()
+
+        loaded = {(tenant_id, doctor_id, day): [] for doctor_id in missing for day in days}
+        for doctor_id, day, start, duration in rows:
+            begin = _minutes(start)
+            loaded[(tenant_id, doctor_id, day)].append((begin, begin + duration))
+        for key, intervals in loaded.items():
+            # Rows arrive ordered by start; merge overlaps so end times stay sorted too
+            merged: List[Tuple[int, int]] = []
+            for begin, end in intervals:
+                if merged and begin < merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((begin, end))
+            _booked_cache.set(key, merged)
+            index[key] = merged
+        return index
+
+    @staticmethod
+    def reserve(session, tenant_id: int, doctor_id: int, appointment_date: date, appointment_time: time,
+                duration_minutes: Optional[int], exclude_appointment_id: Optional[int] = None) -> int:
+        """
+        Lock the doctor row for the rest of the transaction and verify the slot is
+        free, so concurrent bookings for the same doctor are serialized. Returns the
+        effective duration in minutes.
+        """
+        doctor = session.execute(text("""
+            SELECT schedule_start, schedule_end, working_days, consultation_duration
+            FROM doctors WHERE id = :doctor_id AND tenant_id = :tid
+            FOR UPDATE
+        """), {"doctor_id": doctor_id, "tid": tenant_id}).fetchone()
+        if not doctor:
+            raise ValueError(f"Doctor {doctor_id} not found")
+
+        duration = duration_minutes or doctor[3] or DEFAULT_SLOT_MINUTES
+        start = _minutes(appointment_time)
+        if doctor[0] and doctor[1] and (start < _minutes(doctor[0]) or start + duration > _minutes(doctor[1])):
+            raise ValueError(f"Appointment is outside the doctor's schedule "
+                             f"({doctor[0].strftime('%H:%M')} - {doctor[1].strftime('%H:%M')})")
+        if doctor[2] and WEEKDAY_CODES[appointment_date.weekday()] not in {d.upper()[:3] for d in doctor[2]}:
+            raise ValueError(f"Doctor does not consult on {appointment_date.strftime('%A')}")
+
+        starts_at = datetime.combine(appointment_date, appointment_time)
+        conflict = session.execute(text("""
+            SELECT appointment_number, appointment_time
+            FROM appointments
+            WHERE doctor_id = :doctor_id AND is_deleted = false
+              AND status = ANY(CAST(:statuses AS TEXT[]))
+              AND id <> :exclude_id
+              AND slot_range && tsrange(:starts_at, :ends_at, '[)')
+            LIMIT 1
+        """), {"doctor_id": doctor_id, "statuses": list(BLOCKING_STATUSES),
+               "exclude_id": exclude_appointment_id or 0, "starts_at": starts_at,
+               "ends_at": starts_at + timedelta(minutes=duration)}).fetchone()
+        if conflict:
+            raise ValueError(f"Slot overlaps appointment {conflict[0]} at {conflict[1].strftime('%H:%M')}")
+        return duration
+
+    @staticmethod
+    def translate_conflict(error: IntegrityError):
+        """Turn an exclusion-constraint violation into the same error a failed reserve() raises"""
+        if OVERLAP_CONSTRAINT in str(error.orig):
+            raise ValueError("Slot is already booked for this doctor") from error
+        raise error
+
+    @staticmethod
+    def invalidate(tenant_id: int, doctor_id: int, appointment_date: Optional[date] = None):
+        if appointment_date:
+            _booked_cache.delete((tenant_id, doctor_id, appointment_date))
+        else:
+            _booked_cache.invalidate(lambda k: k[0] == tenant_id and k[1] == doctor_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_booked_days(session, flush_context):
+    days = session.info.setdefault('booked_slot_days', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Appointment):
+            continue
+        days.add((obj.tenant_id, obj.doctor_id, obj.appointment_date))
+        state = inspect(obj)
+        # A rescheduled appointment also frees its previous doctor/day
+        old_doctor = state.attrs.doctor_id.history.deleted
+        old_date = state.attrs.appointment_date.history.deleted
+        if old_doctor or old_date:
+            days.add((obj.tenant_id, old_doctor[0] if old_doctor else obj.doctor_id,
+                      old_date[0] if old_date else obj.appointment_date))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_booked_days(session):
+    for tenant_id, doctor_id, appointment_date in session.info.pop('booked_slot_days', ()):
+        if isinstance(appointment_date, str):
+            SlotAvailabilityService.invalidate(tenant_id, doctor_id)
+        else:
+            SlotAvailabilityService.invalidate(tenant_id, doctor_id, appointment_date)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_booked_days(session):
+    session.info.pop('booked_slot_days', None)
+
+
+slot_availability_service = SlotAvailabilityService()
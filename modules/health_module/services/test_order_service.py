@@ -2,6 +2,9 @@ from core.database.connection import db_manager
 from modules.health_module.models.test_invoice_entity import TestInvoice
 from modules.health_module.models.test_order_entity import TestOrder, TestOrderItem
 from core.shared.utils.logger import logger
+import modules.health_module.services.lab_worklist_service  # noqa: F401  registers the worklist refresh
+from modules.health_module.services.health_metrics_service import health_metrics_service
+from modules.health_module.services.catalog_service import catalog_service
 from datetime import datetime
 from fastapi import HTTPException
 from sqlalchemy import or_, and_, exists
@@ -13,8 +16,14 @@ class TestOrderService:
     
     def create(self, data):
         try:
+            items = data.pop('items', None) or []
+            is_interstate = bool(data.pop('is_interstate', False))
+            try:
+                catalog_service.price_test_order_items(data['tenant_id'], items, is_interstate)
+            except ValueError as ve:
+                raise HTTPException(status_code=400, detail=str(ve))
+            catalog_service.apply_totals(data, items)
             with db_manager.get_session() as session:
-                items = data.pop('items', [])
                 order = TestOrder(**data)
                 session.add(order)
                 session.flush()
@@ -31,6 +40,8 @@ class TestOrderService:
                 session.expunge(order)
                 order.id = order_id
                 return order
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error creating test order: {str(e)}", self.logger_name)
             raise
@@ -78,6 +89,17 @@ class TestOrderService:
                     raise HTTPException(status_code=400, detail="Cannot modify completed or reported orders")
                 
                 items = data.pop('items', None)
+                is_interstate = data.pop('is_interstate', None)
+                if items:
+                    if is_interstate is None:
+                        # Keep the supply type the order was priced with
+                        is_interstate = bool(order.igst_amount)
+                    try:
+                        catalog_service.price_test_order_items(order.tenant_id, items, is_interstate)
+                    except ValueError as ve:
+                        raise HTTPException(status_code=400, detail=str(ve))
+                    # Header amounts the client left out follow the repriced lines, as on create
+                    catalog_service.apply_totals(data, items)
                 for key, value in data.items():
                     if key not in ['id', 'created_at', 'created_by', 'tenant_id']:
                         setattr(order, key, value)
@@ -85,6 +107,7 @@ class TestOrderService:
                 
                 if items is not None:
                     # Delete existing items first to avoid unique constraint violation
+                    health_metrics_service.retract_test_order_items(session, order_id)
                     session.query(TestOrderItem).filter(TestOrderItem.test_order_id == order_id).delete()
                     session.flush()
                     
@@ -122,6 +145,7 @@ class TestOrderService:
                 
                 order.is_deleted = True
                 order.updated_at = datetime.utcnow()
+                health_metrics_service.retract_test_order_items(session, order_id)
                 session.query(TestOrderItem).filter(TestOrderItem.test_order_id == order_id).delete()
                 logger.info(f"Test order deleted: {order.test_order_number}", self.logger_name)
                 return True
@@ -0,0 +1,190 @@
+"""
+Binary attachments of test results (imaging, PDFs).
+
+Uploads are resumable: the client opens an upload, sends fixed-size chunks in
+any order (re-sending any chunk is safe) and completes it; the status call
+lists the chunks already received. Chunks are written straight to storage as
+they arrive, never held in memory, and completed files are stored once per
+content hash.
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional, Tuple
+from core.database.connection import db_manager
+from core.shared.utils.file_storage import get_file_storage, LocalFileStorage
+from core.shared.utils.logger import logger
+from modules.health_module.models.diagnostic_entities import TestResult, TestResultFile
+from modules.health_module.services.public_result_bundle_service import public_result_bundle_service
+
+CHUNK_SIZE = int(os.getenv('RESULT_FILE_CHUNK_SIZE', 8 * 1024 * 1024))
+MAX_FILE_SIZE = int(os.getenv('RESULT_FILE_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+UPLOAD_TTL_SECONDS = int(os.getenv('RESULT_FILE_UPLOAD_TTL_HOURS', 24)) * 3600
+
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+class TestResultFileService:
+    def __init__(self):
+        self.logger_name = "TestResultFileService"
+
+    @property
+    def storage(self):
+        return get_file_storage()
+
+    def create_upload(self, tenant_id: int, result_id: int, username: str, file_name: str, file_size: int,
+                      file_format: Optional[str] = None, description: Optional[str] = None,
+                      acquisition_date: Optional[str] = None, sha256: Optional[str] = None) -> Dict:
+        if file_size <= 0 or file_size > MAX_FILE_SIZE:
+            raise ValueError(f"file_size must be between 1 and {MAX_FILE_SIZE} bytes")
+        with db_manager.get_session() as session:
+            exists = session.query(TestResult.id).filter(
+                TestResult.id == result_id,
+                TestResult.tenant_id == tenant_id,
+                TestResult.is_deleted == False
+            ).scalar()
+        if not exists:
+            raise LookupError("Test result not found")
+        self._purge_stale_uploads()
+
+        total_chunks = math.ceil(file_size / CHUNK_SIZE)
+        upload_id = self.storage.create_multipart_upload({
+            "tenant_id": tenant_id,
+            "test_result_id": result_id,
+            "created_by": username,
+            "file_name": file_name,
+            "file_size": file_size,
+            "file_format": file_format or os.path.splitext(file_name)[1].lstrip('.').upper() or None,
+            "description": description,
+            "acquisition_date": acquisition_date,
+            "sha256": sha256.lower() if sha256 else None,
+            "chunk_size": CHUNK_SIZE,
+            "total_chunks": total_chunks
+        })
+        logger.info(f"Upload {upload_id} opened for result {result_id}: {file_name} ({file_size} bytes)",
+                    self.logger_name)
+        return {"upload_id": upload_id, "chunk_size": CHUNK_SIZE, "total_chunks": total_chunks}
+
+    def _metadata(self, tenant_id: int, upload_id: str) -> Dict:
+        try:
+            metadata = self.storage.get_upload_metadata(upload_id)
+        except ValueError:
+            metadata = None
+        if not metadata or metadata["tenant_id"] != tenant_id:
+            raise LookupError("Upload not found")
+        return metadata
+
+    def get_upload(self, tenant_id: int, upload_id: str) -> Dict:
+        """Upload state for resuming: which chunks the server already has"""
+        metadata = self._metadata(tenant_id, upload_id)
+        parts = self.storage.list_parts(upload_id)
+        received = sorted(part - 1 for part in parts)
+        return {
+            "upload_id": upload_id,
+            "test_result_id": metadata["test_result_id"],
+            "file_name": metadata["file_name"],
+            "file_size": metadata["file_size"],
+            "chunk_size": metadata["chunk_size"],
+            "total_chunks": metadata["total_chunks"],
+            "received_chunks": received,
+            "received_bytes": sum(parts.values())
+        }
+
+    def open_chunk(self, tenant_id: int, upload_id: str, index: int) -> Tuple[BinaryIO, int]:
+        """Writable handle for chunk `index` and the exact number of bytes it must contain"""
+        metadata = self._metadata(tenant_id, upload_id)
+        if index < 0 or index >= metadata["total_chunks"]:
+            raise ValueError(f"Chunk index must be between 0 and {metadata['total_chunks'] - 1}")
+        expected = min(metadata["chunk_size"], metadata["file_size"] - index * metadata["chunk_size"])
+        return self.storage.open_part(upload_id, index + 1), expected
+
+    def commit_chunk(self, upload_id: str, index: int, handle: BinaryIO, expected: int, received: int) -> int:
+        if received != expected:
+            self.discard_chunk(handle)
+            raise ValueError(f"Chunk {index} must be {expected} bytes, received {received}")
+        return self.storage.commit_part(upload_id, index + 1, handle)
+
+    @staticmethod
+    def discard_chunk(handle: BinaryIO):
+        handle.close()
+        try:
+            os.remove(handle.name)
+        except OSError:
+            pass
+
+    def complete_upload(self, tenant_id: int, upload_id: str) -> Dict:
+        """Assemble the chunks, hash and store the file, and attach it to the result"""
+        metadata = self._metadata(tenant_id, upload_id)
+        parts = self.storage.list_parts(upload_id)
+        missing = [i for i in range(metadata["total_chunks"]) if i + 1 not in parts]
+        if missing:
+            raise ValueError(f"Upload is missing chunks: {missing[:20]}")
+
+        # Checked before anything is stored; on a mismatch the chunks stay so they can be re-sent
+        stored = self.storage.complete_multipart_upload(upload_id, sorted(parts), metadata.get("sha256"))
+
+        result_id = metadata["test_result_id"]
+        with db_manager.get_session() as session:
+            existing = session.query(TestResultFile).filter(
+                TestResultFile.test_result_id == result_id,
+                TestResultFile.content_sha256 == stored.sha256,
+                TestResultFile.is_deleted == False
+            ).first()
+            if existing:
+                file_id, deduplicated = existing.id, True
+            else:
+                result_file = TestResultFile(
+                    tenant_id=tenant_id,
+                    test_result_id=result_id,
+                    file_name=metadata["file_name"],
+                    file_path=stored.key,
+                    file_format=metadata["file_format"],
+                    file_size=stored.size,
+                    acquisition_date=datetime.fromisoformat(metadata["acquisition_date"])
+                    if metadata.get("acquisition_date") else None,
+                    description=metadata["description"],
+                    storage_system=self.storage.name,
+                    content_sha256=stored.sha256,
+                    created_by=metadata["created_by"],
+                    updated_by=metadata["created_by"]
+                )
+                session.add(result_file)
+                session.flush()
+                file_id, deduplicated = result_file.id, stored.deduplicated
+                public_result_bundle_service.render(session, result_id)
+
+        logger.info(f"Upload {upload_id} stored as {stored.key} ({stored.size} bytes, "
+                    f"{'deduplicated' if deduplicated else 'new'})", self.logger_name)
+        return {"id": file_id, "file_size": stored.size, "sha256": stored.sha256, "deduplicated": deduplicated}
+
+    def abort_upload(self, tenant_id: int, upload_id: str):
+        self._metadata(tenant_id, upload_id)
+        self.storage.abort_multipart_upload(upload_id)
+
+    def get_file(self, tenant_id: int, result_id: int, file_id: int) -> Optional[TestResultFile]:
+        with db_manager.get_session() as session:
+            result_file = session.query(TestResultFile).filter(
+                TestResultFile.id == file_id,
+                TestResultFile.test_result_id == result_id,
+                TestResultFile.tenant_id == tenant_id,
+                TestResultFile.is_deleted == False
+            ).first()
+            if result_file:
+                session.expunge(result_file)
+            return result_file
+
+    def _purge_stale_uploads(self):
+        global _last_purge
+        if not isinstance(self.storage, LocalFileStorage) or time.time() - _last_purge < 3600:
+            return
+        with _purge_lock:
+            if time.time() - _last_purge < 3600:
+                return
+            _last_purge = time.time()
+        self.storage.purge_stale_uploads(UPLOAD_TTL_SECONDS)
+
+
+test_result_file_service = TestResultFileService()
@@ -2,8 +2,11 @@ from core.database.connection import db_manager
 from modules.health_module.models.diagnostic_entities import TestResult, TestResultDetail, TestResultFile, TestOrder
 from modules.admin_module.models.entities import Tenant
 from core.shared.utils.logger import logger
+import modules.health_module.services.lab_worklist_service  # noqa: F401  registers the worklist refresh
+import modules.health_module.services.health_metrics_service  # noqa: F401  registers the dashboard counters
 from core.shared.utils.barcode_utils import BarcodeGenerator
 from core.shared.utils.crypto_utils import crypto_utils
+from modules.health_module.services.public_result_bundle_service import public_result_bundle_service
 from datetime import datetime
 from sqlalchemy import or_
 import math
@@ -34,6 +37,7 @@ class TestResultService:
                     session.add(result_file)
                 
                 result_id = result.id
+                public_result_bundle_service.render(session, result_id)
                 logger.info(f"Test result created: {result_id}", self.logger_name)
                 session.expunge(result)
                 result.id = result_id
@@ -110,6 +114,7 @@ class TestResultService:
                             session.add(result_file)
                     
                     session.flush()
+                    public_result_bundle_service.render(session, result_id)
                     logger.info(f"Test result updated: {result_id}", self.logger_name)
                     session.expunge(result)
                     return result
@@ -127,6 +132,7 @@ class TestResultService:
                     result.updated_at = datetime.utcnow()
                     session.query(TestResultDetail).filter(TestResultDetail.test_result_id == result_id).update({'is_deleted': True})
                     session.query(TestResultFile).filter(TestResultFile.test_result_id == result_id).update({'is_deleted': True})
+                    public_result_bundle_service.remove(session, result_id)
                     logger.info(f"Test result deleted: {result_id}", self.logger_name)
                     return True
                 return False
@@ -1,6 +1,7 @@
 from core.database.connection import db_manager
 from modules.health_module.models.care_entities import Test, TestParameter
 from core.shared.utils.logger import logger
+import modules.health_module.services.catalog_service  # noqa: F401  evicts the price catalog on change
 from datetime import datetime
 
 class TestService:
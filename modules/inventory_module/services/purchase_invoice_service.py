@@ -10,6 +10,7 @@ from modules.inventory_module.services.stock_service import StockService
 from modules.account_module.services.voucher_service import VoucherService
 from modules.account_module.services.payment_service import PaymentService
 from modules.account_module.services.ledger_service import LedgerService
+from modules.account_module.services.gst_summary_service import GSTSummaryService
 from sqlalchemy import func, or_
 from decimal import Decimal
 from datetime import datetime
@@ -325,6 +326,9 @@ class PurchaseInvoiceService:
                         payment_remarks=payment_remarks
                     )
                 
+                # Fold the posted invoice into the GST return summaries (ITC)
+                GSTSummaryService.sync_document(session, 'PURCHASE_INVOICE', invoice.id, tenant_id)
+                
                 session.commit()
                 session.refresh(invoice)
                 
@@ -1104,6 +1108,8 @@ class PurchaseInvoiceService:
                         items=new_items
                     )
             
+            GSTSummaryService.sync_document(session, 'PURCHASE_INVOICE', invoice.id, tenant_id)
+            
             session.commit()
             session.refresh(invoice)
             
@@ -1146,6 +1152,8 @@ class PurchaseInvoiceService:
             invoice.is_active = False
             invoice.updated_by = username
             
+            GSTSummaryService.sync_document(session, 'PURCHASE_INVOICE', invoice_id, tenant_id)
+            
             session.commit()
             return True
     
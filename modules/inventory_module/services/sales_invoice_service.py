@@ -9,6 +9,7 @@ from modules.account_module.models.payment_entity import Payment, PaymentDetail
 from modules.inventory_module.services.stock_service import StockService
 from modules.account_module.services.voucher_service import VoucherService
 from modules.account_module.services.payment_service import PaymentService
+from modules.account_module.services.gst_summary_service import GSTSummaryService
 from sqlalchemy import func, or_
 from decimal import Decimal
 from datetime import datetime
@@ -405,6 +406,9 @@ class SalesInvoiceService:
                         ledger_service = LedgerService()
                         ledger_service.create_from_voucher(payment.voucher_id, session)
                 
+                # Fold the posted invoice into the GST return summaries
+                GSTSummaryService.sync_document(session, 'SALES_INVOICE', invoice.id, tenant_id)
+                
                 session.commit()
                 session.refresh(invoice)
                 
@@ -1225,6 +1229,8 @@ class SalesInvoiceService:
                 invoice.updated_by = username
                 invoice.updated_at = datetime.utcnow()
                 
+                GSTSummaryService.sync_document(session, 'SALES_INVOICE', invoice_id, tenant_id)
+                
                 session.commit()
                 
                 return {"message": "Sales invoice deleted successfully"}
@@ -5,6 +5,37 @@ from core.shared.utils.session_manager import session_manager
 from core.shared.middleware.exception_handler import ExceptionMiddleware
 from sqlalchemy import func
 from decimal import Decimal
+from core.database.pipeline import execute_pipelined
+
+# Same effect as _update_stock_balance in one statement, so a posting's balance
+# changes can be pipelined: update the balance row the ORM lookup would pick, or
+# insert one when the product/batch has none. A positive quantity is stock IN and
+# moves the average cost; a negative one is stock OUT and leaves it.
+_APPLY_STOCK_BALANCE_SQL = """
+    WITH target AS (
+        SELECT id FROM stock_balances
+        WHERE product_id = %(product_id)s AND batch_number = %(batch_number)s AND tenant_id = %(tenant_id)s
+        ORDER BY id LIMIT 1
+    ), updated AS (
+        UPDATE stock_balances b SET
+            average_cost = CASE
+                WHEN %(quantity)s > 0 AND COALESCE(b.total_quantity, 0) + %(quantity)s > 0
+                THEN (COALESCE(b.total_quantity, 0) * COALESCE(b.average_cost, 0) + %(quantity)s * %(unit_price)s)
+                     / (COALESCE(b.total_quantity, 0) + %(quantity)s)
+                ELSE b.average_cost END,
+            total_quantity = COALESCE(b.total_quantity, 0) + %(quantity)s,
+            available_quantity = COALESCE(b.available_quantity, 0) + %(quantity)s,
+            last_updated = now()
+        FROM target
+        WHERE b.id = target.id
+        RETURNING b.id
+    )
+    INSERT INTO stock_balances (product_id, batch_number, tenant_id, total_quantity, available_quantity,
+                                reserved_quantity, average_cost, last_updated)
+    SELECT %(product_id)s, %(batch_number)s, %(tenant_id)s, %(quantity)s, %(quantity)s, 0,
+           CASE WHEN %(quantity)s > 0 THEN %(unit_price)s ELSE 0 END, now()
+    WHERE NOT EXISTS (SELECT 1 FROM updated)
+"""
 
 class StockService:
     @ExceptionMiddleware.handle_exceptions("StockService")
@@ -39,6 +70,7 @@ class StockService:
     
     def record_purchase_invoice_transaction_in_session(self, session, invoice, items):
         """Record stock IN transactions for purchase invoice within existing session"""
+        balance_changes = []
         for item in items:
             paid_qty = float(item.quantity)
             free_qty = float(getattr(item, 'free_quantity', 0) or 0)
@@ -60,9 +92,8 @@ class StockService:
                 session.add(paid_transaction)
                 
                 # Update stock balance for paid quantity
-                self._update_stock_balance(session, item.product_id, 
-                                         getattr(item, 'batch_number', '') or '', 
-                                         paid_qty, float(item.unit_price_base), 'IN')
+                balance_changes.append((item.product_id, getattr(item, 'batch_number', '') or '',
+                                        paid_qty, float(item.unit_price_base)))
             
             # Create separate stock transaction for free quantity
             if free_qty > 0:
@@ -81,9 +112,10 @@ class StockService:
                 session.add(free_transaction)
                 
                 # Update stock balance for free quantity
-                self._update_stock_balance(session, item.product_id, 
-                                         getattr(item, 'batch_number', '') or '', 
-                                         free_qty, float(item.unit_price_base), 'IN')
+                balance_changes.append((item.product_id, getattr(item, 'batch_number', '') or '',
+                                        free_qty, float(item.unit_price_base)))
+        
+        self._apply_stock_balance_changes(session, balance_changes)
     
     @ExceptionMiddleware.handle_exceptions("StockService")
     def record_sales_transaction(self, sales_order, items):
@@ -159,6 +191,23 @@ class StockService:
         
         balance.last_updated = func.now()
     
+    def _apply_stock_balance_changes(self, session, changes):
+        """Apply (product_id, batch_number, signed quantity, unit_price) balance changes in one pipelined round trip"""
+        if not changes:
+            return
+        tenant_id = session_manager.get_current_tenant_id()
+        # Pending ORM balance changes must reach the table before the statements run
+        session.flush()
+        execute_pipelined(session, [
+            (_APPLY_STOCK_BALANCE_SQL, {"product_id": product_id, "batch_number": batch_number,
+                                        "tenant_id": tenant_id, "quantity": quantity, "unit_price": unit_price})
+            for product_id, batch_number, quantity, unit_price in changes
+        ])
+        # Balances already loaded in this session are stale now
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, StockBalance):
+                session.expire(obj)
+    
     @ExceptionMiddleware.handle_exceptions("StockService")
     def get_stock_transactions(self, product_id=None, limit=100):
         """Get stock transactions with optional product filter"""
@@ -390,6 +439,7 @@ class StockService:
             SalesInvoiceItem.tenant_id == tenant_id
         ).all()
         
+        balance_changes = []
         for item in items:
             paid_qty = float(item.quantity)
             free_qty = float(getattr(item, 'free_quantity', 0) or 0)
@@ -411,9 +461,8 @@ class StockService:
                 session.add(paid_transaction)
                 
                 # Update stock balance for paid quantity
-                self._update_stock_balance(session, item.product_id, 
-                                         getattr(item, 'batch_number', '') or '', 
-                                         paid_qty, float(item.unit_price_base), 'OUT')
+                balance_changes.append((item.product_id, getattr(item, 'batch_number', '') or '',
+                                        -paid_qty, float(item.unit_price_base)))
             
             # Create separate stock transaction for free quantity
             if free_qty > 0:
@@ -431,11 +480,11 @@ class StockService:
                 )
                 session.add(free_transaction)
                 
-                # Update stock balance for free quantity (use average cost for valuation)
-                avg_cost = self._get_average_cost(session, item.product_id, getattr(item, 'batch_number', '') or '')
-                self._update_stock_balance(session, item.product_id, 
-                                         getattr(item, 'batch_number', '') or '', 
-                                         free_qty, avg_cost, 'OUT')
+                # Update stock balance for free quantity (OUT keeps the average cost)
+                balance_changes.append((item.product_id, getattr(item, 'batch_number', '') or '',
+                                        -free_qty, 0.0))
+        
+        self._apply_stock_balance_changes(session, balance_changes)
     
     def reverse_sales_invoice_transaction_in_session(self, session, tenant_id, invoice_id, username):
         """Reverse stock OUT transactions for sales invoice within existing session"""
@@ -0,0 +1,128 @@
+"""Email delivery against a local aiosmtpd server: per-message rejections vs. an unreachable server"""
+import socket
+from contextlib import contextmanager
+import pytest
+
+pytest.importorskip("sqlalchemy")
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+from core.shared.services import email_outbox as outbox  # noqa: E402
+
+REFUSED = "refused@example.com"
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.delivered = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REFUSED:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeDatabase:
+    """Hands out the claimed batch, then captures what deliver_batch records"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.recorded = None
+
+    @contextmanager
+    def get_session(self):
+        database = self
+
+        class Session:
+            def execute(self, statement, params):
+                if database.recorded is None and "batch_size" in params:
+                    return FakeResult(database.messages)
+                database.recorded = params
+                return FakeResult([])
+
+        yield Session()
+
+
+def _message(number, recipient):
+    return {"id": number, "tenant_id": 1, "recipient": recipient, "subject": f"Message {number}",
+            "body": "<p>Hello</p>", "attempts": 1}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    monkeypatch.setenv("SMTP_FROM", "noreply@example.com")
+    monkeypatch.delenv("SMTP_USER", raising=False)
+    yield handler
+    controller.stop()
+
+
+def _deliver(monkeypatch, messages):
+    database = FakeDatabase(messages)
+    logs = []
+    monkeypatch.setattr(outbox, "db_manager", database)
+    monkeypatch.setattr(outbox, "copy_rows", lambda session, table, columns, rows: logs.extend(rows))
+    connection = outbox.SMTPConnection()
+    try:
+        outbox.EmailDeliveryWorker().deliver_batch(connection)
+    finally:
+        connection.close()
+    return database.recorded, logs
+
+
+def test_refused_recipient_fails_only_its_own_message(smtp_server, monkeypatch):
+    messages = [_message(1, "a@example.com"), _message(2, REFUSED), _message(3, "b@example.com")]
+
+    recorded, logs = _deliver(monkeypatch, messages)
+
+    assert recorded["statuses"] == ["SENT", "FAILED", "SENT"]
+    assert recorded["errors"][0] is None and recorded["errors"][2] is None
+    assert smtp_server.delivered == ["a@example.com", "b@example.com"]
+    assert [log[4] for log in logs] == ["SENT", "FAILED", "SENT"]
+
+
+def test_unreachable_server_retries_the_whole_batch(monkeypatch):
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(_free_port()))
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    messages = [_message(1, "a@example.com"), _message(2, "b@example.com")]
+
+    recorded, logs = _deliver(monkeypatch, messages)
+
+    assert recorded["statuses"] == ["QUEUED", "QUEUED"]
+    assert recorded["errors"][0] == recorded["errors"][1]
+    assert logs == []
+
+
+def test_connection_failure_classification():
+    assert outbox._is_connection_failure(ConnectionRefusedError())
+    assert outbox._is_connection_failure(outbox.smtplib.SMTPServerDisconnected("gone"))
+    assert not outbox._is_connection_failure(
+        outbox.smtplib.SMTPRecipientsRefused({REFUSED: (550, b"No such user")}))
+    assert not outbox._is_connection_failure(outbox.smtplib.SMTPDataError(554, b"Rejected"))